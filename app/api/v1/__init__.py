@@ -32,6 +32,8 @@ def create_v1_blueprint() -> Blueprint:
     v1_bp.register_blueprint(eventos.eventos_bp, url_prefix='/eventos')
     from app.api.v1.endpoints import alertas
     v1_bp.register_blueprint(alertas.alertas_bp, url_prefix='/alertas')
+    from app.api.v1.endpoints import reglas_alerta
+    v1_bp.register_blueprint(reglas_alerta.reglas_alerta_bp, url_prefix='/reglas-alerta')
     # Endpoints para la gestión de Datos de Entrenamiento (Videos/Imágenes)
     from app.api.v1.endpoints import videos_images 
     v1_bp.register_blueprint(videos_images.training_data_bp, url_prefix='/training-data') 
@@ -1,9 +1,11 @@
 # app/api/v1/endpoints/alertas.py
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from typing import Optional, List, Dict, Any
 import uuid
 import logging
 from datetime import datetime
+import json
+import queue
 
 # Importamos la instancia de la base de datos de Flask-SQLAlchemy
 from app.config.database import db 
@@ -11,6 +13,9 @@ from app.config.database import db
 from app.services.alert_notification_service import alert_notification_service
 # Importamos los modelos para poder devolver objetos tipados
 from app.models_db.cloud_database_models import Alerta 
+# Stream en vivo (SSE) de alertas y eventos
+from app.services.live_stream_service import live_stream_service, STREAM_TYPES
+from app.config.settings import settings
 
 # Setup logger para este módulo
 logger = logging.getLogger(__name__)
@@ -181,4 +186,82 @@ def update_alert_status(alert_id: uuid.UUID):
 
 # La eliminación de alertas (DELETE) no suele ser una operación expuesta
 # directamente en una API de producción para mantener el historial.
-# Si fuera necesario, se añadiría aquí.
\ No newline at end of file
+# Si fuera necesario, se añadiría aquí.
+
+
+def _format_sse(message: Dict[str, Any]) -> str:
+    return f"id: {message['id']}\nevent: {message['tipo']}\ndata: {json.dumps(message['payload'], ensure_ascii=False)}\n\n"
+
+@alertas_bp.route('/stream', methods=['GET'])
+def stream_alerts():
+    """
+    Endpoint SSE (text/event-stream) que empuja las alertas y eventos nuevos a medida que la
+    ingesta los confirma, en lugar de consultar /active y /eventos/recent periódicamente, y los
+    cambios de conexión de las Jetson (desconexión y reconexión).
+    Query parameters: id_empresa (UUID), id_bus (UUID), tipos (ej. 'alerta,evento'; por defecto
+    'alerta,evento,conexion').
+    Cabecera Last-Event-ID (o query param last_event_id): reanuda desde ese mensaje. Si quedan más
+    de LIVE_STREAM_BACKFILL_LIMIT mensajes por recuperar, se envía esa página y se cierra el stream:
+    el cliente se reconecta con el último id recibido y recibe la siguiente.
+    """
+    tipos = [tipo.strip() for tipo in request.args.get('tipos', ','.join(STREAM_TYPES)).split(',') if tipo.strip()]
+    if not tipos or any(tipo not in STREAM_TYPES for tipo in tipos):
+        return jsonify({"message": f"El parámetro 'tipos' admite: {', '.join(STREAM_TYPES)}."}), 400
+    try:
+        id_empresa = uuid.UUID(request.args['id_empresa']) if request.args.get('id_empresa') else None
+        id_bus = uuid.UUID(request.args['id_bus']) if request.args.get('id_bus') else None
+    except ValueError:
+        return jsonify({"message": "Los parámetros 'id_empresa' e 'id_bus' deben ser UUID válidos."}), 400
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({"message": "Last-Event-ID inválido."}), 400
+    if not settings.LIVE_STREAM_ENABLED:
+        return jsonify({"message": "El stream en vivo está desactivado."}), 503
+
+    logger.info(f"Cliente SSE conectado (tipos={tipos}, empresa={id_empresa}, bus={id_bus}, last_event_id={last_event_id}).")
+    # Se suscribe antes del relleno: lo que llegue mientras tanto queda en la cola y se descarta si ya se envió.
+    subscription = live_stream_service.subscribe(db.session, tipos, id_empresa=id_empresa, id_bus=id_bus)
+    try:
+        backfill = live_stream_service.backfill(db.session, subscription, last_event_id, settings.LIVE_STREAM_BACKFILL_LIMIT) \
+            if last_event_id is not None else []
+    except Exception as e:
+        live_stream_service.unsubscribe(subscription)
+        logger.exception(f"Error al rellenar el stream desde Last-Event-ID {last_event_id}: {e}")
+        return jsonify({"message": "Error interno del servidor al abrir el stream."}), 500
+    finally:
+        db.session.remove() # El stream no retiene una conexión de la BD mientras está abierto
+
+    # Relleno incompleto: la suscripción empieza en el último id confirmado, así que los mensajes entre
+    # esta página y ese cursor no llegarían nunca por la cola (y el Last-Event-ID del cliente los saltaría).
+    backfill_truncated = bool(backfill) and len(backfill) >= settings.LIVE_STREAM_BACKFILL_LIMIT
+
+    def generate():
+        sent_ids = {message['id'] for message in backfill}
+        try:
+            yield "retry: 3000\n\n"
+            for message in backfill:
+                yield _format_sse(message)
+            if backfill_truncated:
+                logger.info(f"Relleno del stream limitado a {len(backfill)} mensajes: se cierra para que el cliente "
+                            f"se reconecte desde el id {backfill[-1]['id']}.")
+                return
+            while not subscription.overflowed:
+                try:
+                    message = subscription.queue.get(timeout=settings.LIVE_STREAM_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if message['id'] in sent_ids:
+                    sent_ids.discard(message['id'])
+                    continue
+                yield _format_sse(message)
+            logger.warning("Cliente SSE demasiado lento: se cierra el stream (se reconectará con Last-Event-ID).")
+        finally:
+            live_stream_service.unsubscribe(subscription)
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no' # Evita que nginx acumule el stream
+    return response
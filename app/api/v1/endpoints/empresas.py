@@ -8,6 +8,7 @@ import logging
 from app.config.database import db # <<<<<<<<<<<<<<<< CAMBIO AQUI: Importar 'db' directamente
 # Import the service layer for Empresas
 from app.services.empresa_service import empresa_service
+from app.services.dashboard_counter_service import dashboard_counter_service
 # Import the schemas for validation (conceptual, as we haven't defined them yet)
 # from app.api.v1.schemas.empresa_schema import EmpresaCreate, EmpresaUpdate, EmpresaResponse
 
@@ -171,4 +172,21 @@ def delete_empresa(empresa_id: uuid.UUID):
     except Exception as e:
         logger.exception(f"Error deleting company ID {empresa_id}: {e}")
         return jsonify({"message": "Error interno del servidor al eliminar la empresa."}), 500
-    # No hay db.close() aquí.
\ No newline at end of file
+    # No hay db.close() aquí.
+
+@empresas_bp.route('/<uuid:empresa_id>/dashboard-summary', methods=['GET'])
+def get_empresa_dashboard_summary(empresa_id: uuid.UUID):
+    """
+    API endpoint for the dashboard summary of a company: active alerts, connected Jetsons and
+    active driving sessions. Served from the incrementally maintained counters (one primary-key
+    read, independent of fleet size).
+    """
+    try:
+        summary = dashboard_counter_service.get_summary(db.session, empresa_id)
+        if summary is None:
+            logger.warning(f"Company ID {empresa_id} not found for dashboard summary.")
+            return jsonify({"message": "Empresa no encontrada."}), 404
+        return jsonify({"id_empresa": str(empresa_id), **summary}), 200
+    except Exception as e:
+        logger.exception(f"Error retrieving dashboard summary for company ID {empresa_id}: {e}")
+        return jsonify({"message": "Error interno del servidor al obtener el resumen del dashboard."}), 500
@@ -1,14 +1,21 @@
 # app/api/v1/endpoints/eventos.py
-from flask import Blueprint, request, jsonify
-from typing import Optional, List, Dict, Any
+from flask import Blueprint, request, jsonify, url_for
+from typing import Optional, List, Dict, Any, Tuple
 import uuid
 import logging
+import gzip
+import json
 from datetime import datetime
 
 # Importamos la instancia de la base de datos de Flask-SQLAlchemy
 from app.config.database import db 
+from app.config.settings import settings
 # Importamos la capa de servicio para el procesamiento de Eventos
 from app.services.event_processing_service import event_processing_service
+# Spool durable para la ingesta asíncrona (modo EVENT_INGEST_MODE='spool')
+from app.services.event_ingest_spool import event_ingest_spool
+# Filtro en memoria de reenvíos idénticos
+from app.services.event_idempotency_filter import recent_event_filter
 # Importamos la instancia del CRUD de Eventos <<<<<<<<<<<<<<<< AÑADIDO ESTO
 from app.crud.crud_evento import evento_crud 
 # Importamos los modelos para poder devolver objetos tipados
@@ -26,15 +33,31 @@ if not logger.handlers:
 # Creamos un Blueprint para los endpoints de Eventos
 eventos_bp = Blueprint('eventos_api', __name__)
 
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+MAX_REPORTED_REJECTIONS = 100 # Rechazos detallados que se devuelven en la respuesta de un stream
+
 @eventos_bp.route('/', methods=['POST'])
 def receive_events_batch():
     """
     Endpoint API para recibir un lote de eventos de monitoreo desde la Jetson Nano.
     Este es el punto de entrada principal para los datos de IA.
     Requiere: Cuerpo JSON con una lista de diccionarios bajo la clave 'events'.
+    También acepta 'Content-Encoding: gzip' y cuerpos 'application/x-ndjson' (un evento por línea),
+    que se procesan en streaming por bloques de EVENT_INGEST_CHUNK_SIZE eventos.
+    En modo EVENT_INGEST_MODE='spool' el lote se guarda de forma durable y se responde 202 con un ticket.
     """
     logger.info("Solicitud recibida para procesar un lote de eventos.")
-    request_data = request.get_json()
+    if request.mimetype in NDJSON_MIMETYPES:
+        return _receive_ndjson_events()
+
+    if _is_gzip_request():
+        try:
+            request_data = json.load(_request_body_stream())
+        except (OSError, ValueError):
+            logger.warning("Cuerpo gzip/JSON inválido.")
+            return jsonify({"message": "Cuerpo comprimido o JSON inválido."}), 400
+    else:
+        request_data = request.get_json()
 
     if not request_data or 'events' not in request_data or not isinstance(request_data['events'], list):
         logger.warning("Cuerpo JSON inválido. Se espera una lista de eventos bajo la clave 'events'.")
@@ -46,29 +69,199 @@ def receive_events_batch():
         logger.info("Lote de eventos vacío recibido. No hay nada que procesar.")
         return jsonify({"message": "Lote de eventos vacío. Nada que procesar."}), 200
 
+    if settings.EVENT_INGEST_MODE == 'spool':
+        return _spool_events_batch(events_data)
+
     try:
         # Pasa la sesión gestionada por Flask-SQLAlchemy al servicio para procesar el lote
-        processed_events = event_processing_service.process_events_batch(db.session, events_data)
+        result = event_processing_service.bulk_ingest_events(db.session, events_data)
+        processed_events = result["processed_events"]
+        outcomes = result["outcomes"]
 
         logger.info(f"Lote de {len(events_data)} eventos procesado exitosamente. Guardados: {len(processed_events)}")
         return jsonify({
             "message": f"Lote de {len(events_data)} eventos procesado exitosamente.",
-            "processed_count": len(processed_events)
+            "processed_count": len(processed_events),
+            "created_count": sum(1 for o in outcomes if o["status"] == "created"),
+            "updated_count": sum(1 for o in outcomes if o["status"] == "updated"),
+            "rejected_count": sum(1 for o in outcomes if o["status"] == "rejected"),
+            "duplicate_count": sum(1 for o in outcomes if o["status"] == "duplicate"),
+            "results": outcomes # Resultado por evento, en el orden recibido
         }), 200
     except Exception as e:
         logger.exception(f"Error procesando el lote de eventos: {e}")
         return jsonify({"message": "Error interno del servidor al procesar el lote de eventos."}), 500
 
+def _is_gzip_request() -> bool:
+    return request.headers.get('Content-Encoding', '').strip().lower() == 'gzip'
+
+def _request_body_stream():
+    """Stream del cuerpo de la petición, descomprimido al vuelo si viene en gzip."""
+    stream = request.stream
+    if _is_gzip_request():
+        stream = gzip.GzipFile(fileobj=stream, mode='rb')
+    return stream
+
+def _iter_ndjson_chunks(stream, chunk_size: int):
+    """
+    Lee el cuerpo NDJSON línea a línea y produce bloques de hasta 'chunk_size' eventos.
+    Las líneas que no son JSON válido se devuelven aparte como rechazos.
+
+    Yields:
+        Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]: (eventos del bloque, rechazos de parseo del bloque)
+    """
+    chunk: List[Dict[str, Any]] = []
+    rejected: List[Dict[str, Any]] = []
+    for line_number, raw_line in enumerate(stream, start=1):
+        raw_line = raw_line.strip()
+        if not raw_line:
+            continue
+        try:
+            chunk.append(json.loads(raw_line))
+        except ValueError:
+            rejected.append({"id": None, "status": "rejected", "reason": f"Línea {line_number}: JSON inválido."})
+            continue
+        if len(chunk) >= chunk_size:
+            yield chunk, rejected
+            chunk, rejected = [], []
+    if chunk or rejected:
+        yield chunk, rejected
+
+def _receive_ndjson_events():
+    """
+    Ingesta en streaming de un cuerpo NDJSON (opcionalmente gzip): los eventos se parsean
+    incrementalmente y se confirman por bloques, así la memoria no depende del tamaño del
+    backlog y los primeros bloques llegan a la BD mientras la subida continúa.
+    En modo 'spool' cada bloque se acepta como un ticket independiente.
+    """
+    totals = {"received": 0, "processed": 0, "created": 0, "updated": 0, "rejected": 0, "duplicate": 0}
+    rejected_results: List[Dict[str, Any]] = []
+    tickets: List[str] = []
+    spool_mode = settings.EVENT_INGEST_MODE == 'spool'
+
+    try:
+        for chunk, parse_rejections in _iter_ndjson_chunks(_request_body_stream(), settings.EVENT_INGEST_CHUNK_SIZE):
+            totals["received"] += len(chunk) + len(parse_rejections)
+            outcomes = list(parse_rejections)
+            if chunk:
+                if spool_mode:
+                    tickets.append(event_ingest_spool.append(chunk))
+                else:
+                    result = event_processing_service.bulk_ingest_events(db.session, chunk)
+                    outcomes.extend(result["outcomes"])
+                    totals["processed"] += len(result["processed_events"])
+                    db.session.expunge_all() # Mantener acotado el identity map durante backlogs grandes
+            for outcome in outcomes:
+                totals[outcome["status"]] += 1
+                if outcome["status"] == "rejected" and len(rejected_results) < MAX_REPORTED_REJECTIONS:
+                    rejected_results.append(outcome)
+    except (OSError, EOFError) as e:
+        logger.warning(f"Cuerpo NDJSON/gzip truncado o inválido: {e}")
+        return jsonify({
+            "message": "Cuerpo comprimido inválido o truncado. Los bloques anteriores ya fueron confirmados.",
+            "received_count": totals["received"],
+            "processed_count": totals["processed"],
+            "ticket_ids": tickets
+        }), 400
+    except Exception as e:
+        logger.exception(f"Error procesando el stream de eventos: {e}")
+        return jsonify({"message": "Error interno del servidor al procesar el stream de eventos."}), 500
+
+    if spool_mode:
+        logger.info(f"Stream de {totals['received']} eventos aceptado en el spool ({len(tickets)} tickets).")
+        return jsonify({
+            "message": f"Stream de {totals['received']} eventos aceptado para procesamiento.",
+            "received_count": totals["received"],
+            "rejected_count": totals["rejected"],
+            "ticket_ids": tickets,
+            "rejected": rejected_results
+        }), 202
+
+    logger.info(f"Stream de {totals['received']} eventos procesado. Guardados: {totals['processed']}")
+    return jsonify({
+        "message": f"Stream de {totals['received']} eventos procesado exitosamente.",
+        "received_count": totals["received"],
+        "processed_count": totals["processed"],
+        "created_count": totals["created"],
+        "updated_count": totals["updated"],
+        "rejected_count": totals["rejected"],
+        "duplicate_count": totals["duplicate"],
+        "rejected": rejected_results # Sólo los primeros MAX_REPORTED_REJECTIONS rechazos
+    }), 200
+
+def _spool_events_batch(events_data: List[Dict[str, Any]]):
+    """
+    Guarda el lote en el spool de ingesta durable y responde 202 con el ticket.
+    El lote se procesa en segundo plano; su estado se consulta en /ingest/<ticket_id>.
+    """
+    try:
+        ticket_id = event_ingest_spool.append(events_data)
+    except Exception as e:
+        logger.exception(f"Error guardando el lote de eventos en el spool: {e}")
+        return jsonify({"message": "Error interno del servidor al aceptar el lote de eventos."}), 500
+
+    logger.info(f"Lote de {len(events_data)} eventos aceptado en el spool con ticket {ticket_id}.")
+    return jsonify({
+        "message": f"Lote de {len(events_data)} eventos aceptado para procesamiento.",
+        "ticket_id": ticket_id,
+        "status_url": url_for('.get_ingest_ticket_status', ticket_id=ticket_id)
+    }), 202
+
+@eventos_bp.route('/ingest/<string:ticket_id>', methods=['GET'])
+def get_ingest_ticket_status(ticket_id: str):
+    """
+    Endpoint API para consultar el estado de un lote aceptado en modo asíncrono.
+    Estados: 'accepted', 'processing', 'done' o 'failed' (el lote queda en el dead-letter del spool
+    para reprocesarlo). Un ticket cuyo resultado ya expiró (SPOOL_ACK_RETENTION_SECONDS) da 404.
+    """
+    status = event_ingest_spool.get_status(ticket_id)
+    if status is None:
+        return jsonify({"message": "Ticket de ingesta no encontrado."}), 404
+    return jsonify(status), 200
+
+@eventos_bp.route('/dedup/stats', methods=['GET'])
+def get_dedup_filter_stats():
+    """
+    Endpoint API con los contadores del filtro de reenvíos (aciertos, fallos, tamaño)
+    de este proceso, para dimensionar EVENT_DEDUP_CAPACITY.
+    """
+    return jsonify(recent_event_filter.stats()), 200
+
+def _parse_time_range_args() -> Tuple[Optional[datetime], Optional[datetime], Optional[str]]:
+    """
+    Lee los parámetros de consulta 'from' y 'to' (ISO 8601) que acotan timestamp_evento a [from, to).
+    Returns: (from, to, mensaje de error o None).
+    """
+    parsed = []
+    for name in ('from', 'to'):
+        value = request.args.get(name)
+        if not value:
+            parsed.append(None)
+            continue
+        try:
+            parsed.append(datetime.fromisoformat(value))
+        except ValueError:
+            return None, None, f"El parámetro '{name}' debe ser una fecha ISO 8601."
+    start_time, end_time = parsed
+    if start_time and end_time and start_time >= end_time:
+        return None, None, "El parámetro 'from' debe ser anterior a 'to'."
+    return start_time, end_time, None
+
 @eventos_bp.route('/', methods=['GET'])
 def get_all_events():
     """
     Endpoint API para obtener una lista de todos los eventos con paginación y filtrado.
     Query parameters: skip (int, default 0), limit (int, default 100),
-                      conductor_id (UUID str), bus_id (UUID str), session_id (UUID str).
+                      conductor_id (UUID str), bus_id (UUID str), session_id (UUID str),
+                      from / to (ISO 8601, rango [from, to) de timestamp_evento; acotarlo evita leer
+                      particiones de meses que no interesan).
                       También se pueden añadir filtros por tipo_evento, subtipo_evento, etc.
     """
     skip = request.args.get('skip', 0, type=int)
     limit = request.args.get('limit', 100, type=int)
+    start_time, end_time, range_error = _parse_time_range_args()
+    if range_error:
+        return jsonify({"message": range_error}), 400
     conductor_id_str = request.args.get('conductor_id')
     bus_id_str = request.args.get('bus_id')
     session_id_str = request.args.get('session_id')
@@ -92,11 +285,17 @@ def get_all_events():
     try:
         # Lógica de filtrado basada en los parámetros
         if conductor_id:
-            eventos = evento_crud.get_events_by_conductor(db.session, conductor_id, skip=skip, limit=limit)
+            eventos = evento_crud.get_events_by_conductor(db.session, conductor_id, skip=skip, limit=limit,
+                                                          start_time=start_time, end_time=end_time)
         elif bus_id:
-            eventos = evento_crud.get_events_by_bus(db.session, bus_id, skip=skip, limit=limit)
+            eventos = evento_crud.get_events_by_bus(db.session, bus_id, skip=skip, limit=limit,
+                                                    start_time=start_time, end_time=end_time)
         elif session_id:
-            eventos = evento_crud.get_events_by_session(db.session, session_id, skip=skip, limit=limit)
+            eventos = evento_crud.get_events_by_session(db.session, session_id, skip=skip, limit=limit,
+                                                        start_time=start_time, end_time=end_time)
+        elif start_time or end_time:
+            eventos = evento_crud.get_events_by_time_range(db.session, start_time=start_time, end_time=end_time,
+                                                           skip=skip, limit=limit)
         else: # Si no hay filtros específicos, obtener todos
             eventos = evento_crud.get_multi(db.session, skip=skip, limit=limit)
         
@@ -131,12 +330,15 @@ def get_all_events():
 def get_recent_events():
     """
     Endpoint API para obtener los eventos más recientes.
-    Query parameter: limit (int, default 50).
+    Query parameters: limit (int, default 50), from / to (ISO 8601, opcionales).
     """
     limit = request.args.get('limit', 50, type=int)
+    start_time, end_time, range_error = _parse_time_range_args()
+    if range_error:
+        return jsonify({"message": range_error}), 400
     logger.info(f"Solicitud recibida para los {limit} eventos más recientes.")
     try:
-        eventos = evento_crud.get_recent_events(db.session, limit=limit)
+        eventos = evento_crud.get_recent_events(db.session, limit=limit, start_time=start_time, end_time=end_time)
         response_data = []
         for evento in eventos:
             response_data.append({
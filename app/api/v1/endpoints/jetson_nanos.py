@@ -4,14 +4,19 @@ from flask import Blueprint, request, jsonify
 from sqlalchemy.exc import IntegrityError
 import uuid
 from datetime import datetime
+from typing import Optional
 
 # Import database session and services
 from app.config.database import db 
+from app.config.settings import settings
 from app.services.jetson_telemetry_service import jetson_telemetry_service
 # CORRECTED IMPORTS: Importing the instance of CRUDJetsonNano
 from app.crud.crud_jetson_nano import jetson_nano_crud 
 # Importing create_or_update_jetson_nano from jetson_nano_service as it exists there
-from app.services.jetson_nano_service import create_or_update_jetson_nano 
+from app.services.jetson_nano_service import create_or_update_jetson_nano, list_jetson_nanos, CONNECTION_STATUSES
+from app.services.dashboard_counter_service import dashboard_counter_service
+from app.services.jetson_last_seen_cache import jetson_last_seen_cache
+from app.services.telemetry_rollup_service import telemetry_rollup_service
 
 from app.models_db.cloud_database_models import JetsonNano, JetsonTelemetry
 
@@ -55,73 +60,106 @@ def receive_jetson_telemetry():
         logger.exception("Error receiving or processing Jetson telemetry data.")
         db.session.rollback()
         return jsonify({"message": f"Internal server error: {str(e)}"}), 500
-    
+
+@jetson_nanos_bp.route('/telemetry/batch', methods=['POST'])
+def receive_jetson_telemetry_batch():
+    """
+    Endpoint to receive a batch of telemetry samples, possibly from many Jetson Nano devices
+    (e.g. samples buffered on the device and uploaded every few minutes).
+    Expects a JSON payload {"samples": [...]} where each sample has the same fields as /telemetry
+    plus an optional 'id' (UUID) that makes re-uploading the same samples idempotent.
+    All valid samples are stored in one transaction; invalid ones are reported per sample.
+    """
+    try:
+        request_data = request.get_json(silent=True)
+        samples = request_data.get('samples') if isinstance(request_data, dict) else None
+        if not isinstance(samples, list):
+            logger.warning("Telemetry batch received without a 'samples' list.")
+            return jsonify({"message": "Invalid data format. Expected {'samples': [...]}"}), 400
+        if not samples:
+            return jsonify({"message": "Empty telemetry batch. Nothing to process."}), 200
+        if len(samples) > settings.TELEMETRY_BATCH_MAX_SAMPLES:
+            return jsonify({"message": f"Too many samples in one batch (max {settings.TELEMETRY_BATCH_MAX_SAMPLES})."}), 413
+
+        result = jetson_telemetry_service.process_telemetry_batch(db.session, samples)
+        outcomes = result["results"]
+        return jsonify({
+            "message": f"Telemetry batch of {len(samples)} samples processed.",
+            "inserted_count": result["inserted_count"],
+            "duplicate_count": sum(1 for o in outcomes if o["status"] == "duplicate"),
+            "rejected_count": sum(1 for o in outcomes if o["status"] == "rejected"),
+            "results": outcomes # One result per sample, in the order received
+        }), 200
+    except Exception as e:
+        logger.exception("Error receiving or processing Jetson telemetry batch.")
+        db.session.rollback()
+        return jsonify({"message": f"Internal server error: {str(e)}"}), 500
+
 @jetson_nanos_bp.route('/', methods=['GET'])
 def get_all_jetson_nanos_route():
     """
     Endpoint to retrieve all registered Jetson Nano devices with bus information.
-    Query parameters: skip (int), limit (int).
+    Query parameters: skip (int), limit (int), estado_conexion ('Conectado', 'Desconectado',
+    'Mantenimiento'), estado_salud (str), id_empresa (UUID), cursor (str).
+    The connection status is computed in SQL, so the filters are applied by the database.
+    When the page is full, the X-Next-Cursor response header holds the cursor for the next page
+    (keyset pagination by id_hardware_jetson; 'cursor' takes precedence over 'skip').
     """
     try:
         skip = request.args.get('skip', 0, type=int)
         limit = request.args.get('limit', 100, type=int)
+        estado_conexion = request.args.get('estado_conexion')
+        estado_salud = request.args.get('estado_salud')
+        cursor = request.args.get('cursor')
+        if estado_conexion is not None and estado_conexion not in CONNECTION_STATUSES:
+            return jsonify({"message": f"Invalid estado_conexion. Must be one of: {', '.join(CONNECTION_STATUSES)}"}), 400
+        try:
+            id_empresa = uuid.UUID(request.args['id_empresa']) if request.args.get('id_empresa') else None
+        except ValueError:
+            return jsonify({"message": "Invalid id_empresa format"}), 400
 
-        # Get all Jetson Nanos with pagination
-        jetsons = jetson_nano_crud.get_multi(db.session, skip=skip, limit=limit)
-        
-        if jetsons:
-            formatted_jetsons = []
-            for jetson in jetsons:
-                # Get bus information if assigned
-                bus_info = None
-                if jetson.id_bus and jetson.bus:
-                    bus_info = {
-                        "placa": jetson.bus.placa,
-                        "numero_interno": jetson.bus.numero_interno,
-                        "marca": jetson.bus.marca,
-                        "modelo": jetson.bus.modelo,
-                        "estado_operativo": jetson.bus.estado_operativo
-                    }
-
-                # Determine connection status based on last connection
-                estado_conexion = "Desconectado"
-                if jetson.activo:
-                    if jetson.ultima_conexion_cloud_at:
-                        # Check if last connection was within 10 minutes
-                        time_diff = datetime.utcnow() - jetson.ultima_conexion_cloud_at
-                        print(datetime.utcnow())
-                        print(jetson.ultima_conexion_cloud_at)
-                        print(time_diff)
-                        if time_diff.total_seconds() <= 600:  # 10 minutes
-                            estado_conexion = "Conectado"
-                        else:
-                            estado_conexion = "Desconectado"
-                    else:
-                        estado_conexion = "Desconectado"
-                else:
-                    estado_conexion = "Mantenimiento"
-
-                formatted_jetson = {
-                    "id": str(jetson.id),
-                    "id_hardware_jetson": jetson.id_hardware_jetson,
-                    "id_bus": str(jetson.id_bus) if jetson.id_bus else None,
-                    "version_firmware": jetson.version_firmware,
-                    "estado_salud": jetson.estado_salud,
-                    "estado_conexion": estado_conexion,  # Calculated connection status
-                    "ultima_actualizacion_firmware_at": jetson.ultima_actualizacion_firmware_at.isoformat() if jetson.ultima_actualizacion_firmware_at else None,
-                    "ultima_conexion_cloud_at": jetson.ultima_conexion_cloud_at.isoformat() if jetson.ultima_conexion_cloud_at else None,
-                    "last_telemetry_at": jetson.last_telemetry_at.isoformat() if jetson.last_telemetry_at else None,
-                    "fecha_instalacion": jetson.fecha_instalacion.isoformat() if jetson.fecha_instalacion else None,
-                    "activo": jetson.activo,
-                    "observaciones": jetson.observaciones,
-                    "last_updated_at": jetson.last_updated_at.isoformat(),
-                    "bus_info": bus_info  # Include bus information directly
+        # Get the Jetson Nanos page with its connection status
+        try:
+            jetsons, next_cursor = list_jetson_nanos(db.session, estado_conexion=estado_conexion, estado_salud=estado_salud,
+                                                     id_empresa=id_empresa, cursor=cursor, skip=skip, limit=limit)
+        except ValueError:
+            return jsonify({"message": "Invalid cursor"}), 400
+
+        formatted_jetsons = []
+        for jetson, estado_conexion_jetson, ultima_conexion_cloud_at in jetsons:
+            # Get bus information if assigned
+            bus_info = None
+            if jetson.id_bus and jetson.bus:
+                bus_info = {
+                    "placa": jetson.bus.placa,
+                    "numero_interno": jetson.bus.numero_interno,
+                    "marca": jetson.bus.marca,
+                    "modelo": jetson.bus.modelo,
+                    "estado_operativo": jetson.bus.estado_operativo
                 }
-                formatted_jetsons.append(formatted_jetson)
-            
-            return jsonify(formatted_jetsons), 200
-        else:
-            return jsonify([]), 200
+
+            formatted_jetson = {
+                "id": str(jetson.id),
+                "id_hardware_jetson": jetson.id_hardware_jetson,
+                "id_bus": str(jetson.id_bus) if jetson.id_bus else None,
+                "version_firmware": jetson.version_firmware,
+                "estado_salud": jetson.estado_salud,
+                "estado_conexion": estado_conexion_jetson,  # Calculated connection status
+                "ultima_actualizacion_firmware_at": jetson.ultima_actualizacion_firmware_at.isoformat() if jetson.ultima_actualizacion_firmware_at else None,
+                "ultima_conexion_cloud_at": ultima_conexion_cloud_at.isoformat() if ultima_conexion_cloud_at else None,
+                "last_telemetry_at": jetson.last_telemetry_at.isoformat() if jetson.last_telemetry_at else None,
+                "fecha_instalacion": jetson.fecha_instalacion.isoformat() if jetson.fecha_instalacion else None,
+                "activo": jetson.activo,
+                "observaciones": jetson.observaciones,
+                "last_updated_at": jetson.last_updated_at.isoformat(),
+                "bus_info": bus_info  # Include bus information directly
+            }
+            formatted_jetsons.append(formatted_jetson)
+
+        response = jsonify(formatted_jetsons)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response, 200
     except Exception as e:
         logger.exception("Error retrieving all Jetson Nano devices.")
         return jsonify({"message": f"Internal server error: {str(e)}"}), 500
@@ -148,18 +186,8 @@ def get_jetson_nano_details(id_hardware_jetson: str):
                 }
 
             # Determine connection status
-            estado_conexion = "Desconectado"
-            if jetson.activo:
-                if jetson.ultima_conexion_cloud_at:
-                    time_diff = datetime.utcnow() - jetson.ultima_conexion_cloud_at
-                    if time_diff.total_seconds() <= 600:  # 10 minutes
-                        estado_conexion = "Conectado"
-                    else:
-                        estado_conexion = "Desconectado"
-                else:
-                    estado_conexion = "Desconectado"
-            else:
-                estado_conexion = "Mantenimiento"
+            estado_conexion = determine_connection_status(jetson)
+            ultima_conexion_cloud_at = jetson_last_seen_cache.last_seen_of(jetson)
 
             return jsonify({
                 "id": str(jetson.id),
@@ -169,7 +197,7 @@ def get_jetson_nano_details(id_hardware_jetson: str):
                 "estado_salud": jetson.estado_salud,
                 "estado_conexion": estado_conexion,
                 "ultima_actualizacion_firmware_at": jetson.ultima_actualizacion_firmware_at.isoformat() if jetson.ultima_actualizacion_firmware_at else None,
-                "ultima_conexion_cloud_at": jetson.ultima_conexion_cloud_at.isoformat() if jetson.ultima_conexion_cloud_at else None,
+                "ultima_conexion_cloud_at": ultima_conexion_cloud_at.isoformat() if ultima_conexion_cloud_at else None,
                 "last_telemetry_at": jetson.last_telemetry_at.isoformat() if jetson.last_telemetry_at else None,
                 "fecha_instalacion": jetson.fecha_instalacion.isoformat() if jetson.fecha_instalacion else None,
                 "activo": jetson.activo,
@@ -202,6 +230,7 @@ def update_jetson_nano_details(id_hardware_jetson: str):
         # CORRECTED: Using update method of the jetson_nano_crud instance
         # Assuming update_data is a dictionary that can be directly passed to obj_in
         updated_jetson = jetson_nano_crud.update(db.session, db_obj=jetson, obj_in=update_data) 
+        jetson_last_seen_cache.forget(id_hardware_jetson) # activo/id_bus pueden haber cambiado
 
         if updated_jetson:
             return jsonify({
@@ -229,6 +258,7 @@ def delete_jetson_nano_route(id_hardware_jetson: str):
 
         # CORRECTED: Using remove method of the jetson_nano_crud instance with the primary ID
         deleted_jetson = jetson_nano_crud.remove(db.session, id=jetson_to_delete.id)
+        jetson_last_seen_cache.forget(id_hardware_jetson)
         
         if deleted_jetson: # remove method typically returns the removed object or None
             return jsonify({"message": "Jetson Nano deleted successfully"}), 204 # 204 No Content
@@ -268,13 +298,61 @@ def get_recent_jetson_telemetry(id_hardware_jetson: str):
 def get_jetson_telemetry_history(id_hardware_jetson: str):
     """
     Endpoint to retrieve historical telemetry records for a specific Jetson Nano with pagination.
-    Query parameters: skip (int), limit (int).
+    Query parameters: skip (int), limit (int, capped at TELEMETRY_EXPORT_MAX_PAGE_SIZE),
+                      cursor (str): keyset pagination for raw exports. When the page is full, the
+                      X-Next-Cursor response header holds the cursor for the next (older) page;
+                      'cursor' takes precedence over 'skip'.
+                      from / to (ISO 8601, [from, to) range on timestamp_telemetry; lets the
+                      database skip monthly partitions outside the range),
+                      max_points (int): chart mode. Requires 'from' ('to' defaults to now) and returns
+                      {"resolucion", "points"} at the finest resolution (raw, 1m, 1h or 1d rollups)
+                      that fits in max_points, each point with {min, max, avg, count} per metric.
+                      downsample (str): 'rollup' (default) or 'lttb'. With 'lttb', each metric is
+                      reduced to max_points samples with Largest-Triangle-Three-Buckets and returned
+                      as {"resolucion", "algoritmo", "series": {metric: [{timestamp, value}]}}.
     """
     try:
         skip = request.args.get('skip', 0, type=int)
-        limit = request.args.get('limit', 100, type=int)
+        limit = min(request.args.get('limit', 100, type=int), settings.TELEMETRY_EXPORT_MAX_PAGE_SIZE)
+        cursor = request.args.get('cursor')
+        try:
+            start_time = datetime.fromisoformat(request.args['from']) if request.args.get('from') else None
+            end_time = datetime.fromisoformat(request.args['to']) if request.args.get('to') else None
+        except ValueError:
+            return jsonify({"message": "'from' and 'to' must be ISO 8601 datetimes"}), 400
+
+        if 'max_points' in request.args:
+            max_points = request.args.get('max_points', type=int)
+            if not max_points or max_points <= 0:
+                return jsonify({"message": "'max_points' must be a positive integer"}), 400
+            if start_time is None:
+                return jsonify({"message": "'from' is required when 'max_points' is given"}), 400
+            end_time = end_time or datetime.utcnow()
+            if end_time <= start_time:
+                return jsonify({"message": "'to' must be later than 'from'"}), 400
+            downsample = request.args.get('downsample', 'rollup')
+            max_points = min(max_points, settings.TELEMETRY_HISTORY_MAX_POINTS)
+            if downsample == 'lttb':
+                history = telemetry_rollup_service.get_lttb_history(
+                    db.session, id_hardware_jetson, start_time, end_time, max_points, settings.TELEMETRY_LTTB_MAX_INPUT_POINTS)
+            elif downsample == 'rollup':
+                history = telemetry_rollup_service.get_history(db.session, id_hardware_jetson, start_time, end_time, max_points)
+            else:
+                return jsonify({"message": "'downsample' must be 'rollup' or 'lttb'"}), 400
+            return jsonify({
+                "id_hardware_jetson": id_hardware_jetson,
+                "from": start_time.isoformat(),
+                "to": end_time.isoformat(),
+                **history
+            }), 200
 
-        telemetry_history = jetson_telemetry_service.get_telemetry_history(db.session, id_hardware_jetson, skip=skip, limit=limit)
+        if limit <= 0:
+            return jsonify({"message": "'limit' must be a positive integer"}), 400
+        try:
+            telemetry_history, next_cursor = jetson_telemetry_service.get_telemetry_page(
+                db.session, id_hardware_jetson, cursor=cursor, skip=skip, limit=limit, start_time=start_time, end_time=end_time)
+        except ValueError:
+            return jsonify({"message": "Invalid cursor"}), 400
 
         if telemetry_history:
             formatted_history = []
@@ -290,7 +368,10 @@ def get_jetson_telemetry_history(id_hardware_jetson: str):
                     "temperatura_celsius": float(record.temperatura_celsius) if record.temperatura_celsius else None,
                     "created_at": record.created_at.isoformat()
                 })
-            return jsonify(formatted_history), 200
+            response = jsonify(formatted_history)
+            if next_cursor:
+                response.headers['X-Next-Cursor'] = next_cursor
+            return response, 200
         else:
             return jsonify([]), 200 # Return empty list if no history found
     except Exception as e:
@@ -303,31 +384,30 @@ def jetson_heartbeat(id_hardware_jetson: str):
     """
     Endpoint para que las Jetson Nanos envíen un "latido" indicando que están activas.
     Actualiza ultima_conexion_cloud_at sin necesidad de enviar telemetría completa.
+    Camino ligero: no carga la entidad JetsonNano. Con la caché de último contacto, un latido de una
+    Jetson conectada no ejecuta sentencias; si no, un único UPDATE ... RETURNING (ver
+    JetsonLastSeenCache.heartbeat).
     """
     try:
-        # Find the Jetson device
-        jetson = jetson_nano_crud.get_by_hardware_id(db.session, id_hardware_jetson)
-        if not jetson:
-            return jsonify({"message": "Jetson Nano not found"}), 404
+        # Optionally update health status if provided (only an actual change writes the row)
+        request_data = request.get_json(silent=True)
+        estado_salud = request_data.get('estado_salud') if isinstance(request_data, dict) else None
 
-        # Update last connection time
-        jetson.ultima_conexion_cloud_at = datetime.utcnow()
-        
-        # Optionally update health status if provided
-        request_data = request.get_json()
-        if request_data and 'estado_salud' in request_data:
-            jetson.estado_salud = request_data['estado_salud']
-        
-        db.session.add(jetson)
-        db.session.commit()
-        db.session.refresh(jetson)
+        now = datetime.utcnow()
+        state = jetson_last_seen_cache.heartbeat(db.session, id_hardware_jetson, now, estado_salud)
+        if state is None:
+            db.session.rollback()
+            return jsonify({"message": "Jetson Nano not found"}), 404
+        if db.session().in_transaction(): # El camino en memoria no abre transacción: nada que confirmar
+            db.session.commit()
 
-        logger.info(f"Heartbeat received from Jetson {id_hardware_jetson}")
+        logger.debug(f"Heartbeat received from Jetson {id_hardware_jetson}")
         
         return jsonify({
             "message": "Heartbeat received successfully",
-            "ultima_conexion_cloud_at": jetson.ultima_conexion_cloud_at.isoformat(),
-            "estado_conexion": determine_connection_status(jetson)
+            "ultima_conexion_cloud_at": now.isoformat(),
+            # Acaba de contactar: conectada salvo que esté inactiva
+            "estado_conexion": connection_status(state.activo, 'Conectado', now)
         }), 200
         
     except Exception as e:
@@ -345,15 +425,19 @@ def determine_connection_status(jetson: JetsonNano) -> str:
     Returns:
         str: Estado de conexión ('Conectado', 'Desconectado', 'Mantenimiento')
     """
-    if not jetson.activo:
+    # Estado persistido: lo mantienen el barrido de desconexiones y las reconexiones
+    # (sin barrido, se calcula del último contacto, incluido el pendiente de escribir)
+    return connection_status(jetson.activo, jetson.estado_conexion, jetson_last_seen_cache.last_seen_of(jetson))
+
+def connection_status(activo: Optional[bool], estado_conexion: Optional[str], last_seen: Optional[datetime] = None) -> str:
+    """
+    Estado de conexión ('Conectado', 'Desconectado', 'Mantenimiento') a partir de activo y el estado
+    persistido o, con el barrido de desconexiones desactivado, del último contacto (last_seen).
+    """
+    if not activo:
         return "Mantenimiento"
     
-    if jetson.ultima_conexion_cloud_at:
-        # Check if last connection was within 10 minutes
-        time_diff = datetime.utcnow() - jetson.ultima_conexion_cloud_at
-        if time_diff.total_seconds() <= 600:  # 10 minutes = 600 seconds
-            return "Conectado"
-        else:
-            return "Desconectado"
+    if dashboard_counter_service.is_jetson_connected(activo, estado_conexion, last_seen):
+        return "Conectado"
     else:
         return "Desconectado"
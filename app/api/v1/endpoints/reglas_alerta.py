@@ -0,0 +1,158 @@
+# app/api/v1/endpoints/reglas_alerta.py
+from flask import Blueprint, request, jsonify
+import uuid
+import logging
+
+# Importamos la instancia de la base de datos de Flask-SQLAlchemy
+from app.config.database import db
+# Importamos el motor de reglas de alertas (gestiona las reglas e invalida su caché)
+from app.services.alert_rule_engine import alert_rule_engine, validate_rule_data, RULE_FIELDS
+from app.models_db.cloud_database_models import ReglaAlerta
+
+# Setup logger para este módulo
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+# Creamos un Blueprint para los endpoints de Reglas de Alerta
+reglas_alerta_bp = Blueprint('reglas_alerta_api', __name__)
+
+REQUIRED_RULE_FIELDS = ('tipo_evento', 'tipo_alerta', 'descripcion_plantilla', 'nivel_criticidad')
+
+def _regla_to_dict(regla: ReglaAlerta) -> dict:
+    return {
+        "id": str(regla.id),
+        "id_empresa": str(regla.id_empresa) if regla.id_empresa else None,
+        "tipo_evento": regla.tipo_evento,
+        "subtipo_evento": regla.subtipo_evento,
+        "campo_condicion": regla.campo_condicion,
+        "umbral": float(regla.umbral) if regla.umbral is not None else None,
+        "tipo_alerta": regla.tipo_alerta,
+        "descripcion_plantilla": regla.descripcion_plantilla,
+        "nivel_criticidad": regla.nivel_criticidad,
+        "cooldown_minutos": regla.cooldown_minutos,
+        "prioridad": regla.prioridad,
+        "activa": regla.activa,
+        "ventana_minutos": regla.ventana_minutos,
+        "conteo_minimo": regla.conteo_minimo,
+        "agrupar_por": regla.agrupar_por,
+        "last_updated_at": regla.last_updated_at.isoformat() if regla.last_updated_at else None
+    }
+
+@reglas_alerta_bp.route('/', methods=['GET'])
+def get_reglas_alerta():
+    """
+    Endpoint API para listar las reglas de alerta de una empresa.
+    Query parameters: id_empresa (UUID; sin él se listan las reglas globales), skip, limit.
+    """
+    skip = request.args.get('skip', 0, type=int)
+    limit = request.args.get('limit', 100, type=int)
+    id_empresa = request.args.get('id_empresa')
+    logger.info(f"Solicitud recibida para reglas de alerta (empresa={id_empresa}, skip={skip}, limit={limit}).")
+
+    try:
+        empresa_uuid = uuid.UUID(id_empresa) if id_empresa else None
+    except ValueError:
+        return jsonify({"message": "El parámetro 'id_empresa' debe ser un UUID válido."}), 400
+
+    try:
+        reglas = alert_rule_engine.list_rules(db.session, empresa_uuid, skip=skip, limit=limit)
+        return jsonify([_regla_to_dict(regla) for regla in reglas]), 200
+    except Exception as e:
+        logger.exception(f"Error al obtener las reglas de alerta: {e}")
+        return jsonify({"message": "Error interno del servidor al obtener las reglas de alerta."}), 500
+
+@reglas_alerta_bp.route('/', methods=['POST'])
+def create_regla_alerta():
+    """
+    Endpoint API para crear una regla de alerta.
+    Requiere: JSON con 'tipo_evento', 'tipo_alerta', 'descripcion_plantilla', 'nivel_criticidad'.
+    Opcionales: 'id_empresa' (sin él la regla es global), 'subtipo_evento', 'campo_condicion', 'umbral',
+                'cooldown_minutos', 'prioridad', 'activa'.
+    Reglas de correlación: 'ventana_minutos', 'conteo_minimo' y 'agrupar_por' ('conductor' o 'bus').
+    """
+    logger.info("Solicitud recibida para crear una regla de alerta.")
+    rule_data = request.get_json()
+
+    if not rule_data or not isinstance(rule_data, dict):
+        return jsonify({"message": "Se requiere un cuerpo JSON con los datos de la regla."}), 400
+    missing = [field for field in REQUIRED_RULE_FIELDS if not rule_data.get(field)]
+    if missing:
+        return jsonify({"message": f"Faltan campos requeridos: {', '.join(missing)}."}), 400
+    error = validate_rule_data(rule_data)
+    if error:
+        return jsonify({"message": error}), 400
+
+    try:
+        regla = alert_rule_engine.create_rule(db.session, rule_data)
+        if regla:
+            logger.info(f"Regla de alerta '{regla.tipo_alerta}' (ID: {regla.id}) creada.")
+            return jsonify(_regla_to_dict(regla)), 201
+        return jsonify({"message": "Fallo al crear la regla de alerta. Verifique que la empresa exista."}), 400
+    except Exception as e:
+        logger.exception(f"Error al crear la regla de alerta: {e}")
+        return jsonify({"message": "Error interno del servidor al crear la regla de alerta."}), 500
+
+@reglas_alerta_bp.route('/<uuid:regla_id>', methods=['PUT'])
+def update_regla_alerta(regla_id: uuid.UUID):
+    """
+    Endpoint API para modificar una regla de alerta. El cambio se aplica sin reiniciar.
+    La regla resultante (campos actuales más los enviados) se valida igual que al crearla.
+    """
+    logger.info(f"Solicitud recibida para actualizar la regla de alerta ID: {regla_id}")
+    updates = request.get_json()
+    if not updates or not isinstance(updates, dict):
+        return jsonify({"message": "Se requiere un cuerpo JSON con los datos a actualizar."}), 400
+
+    try:
+        regla = alert_rule_engine.get_rule(db.session, regla_id)
+        if not regla:
+            return jsonify({"message": "Regla de alerta no encontrada."}), 404
+        current = {field: getattr(regla, field) for field in RULE_FIELDS}
+        missing = [field for field in REQUIRED_RULE_FIELDS if field in updates and not updates[field]]
+        if missing:
+            return jsonify({"message": f"Los campos requeridos no pueden quedar vacíos: {', '.join(missing)}."}), 400
+        error = validate_rule_data({**current, **updates})
+        if error:
+            return jsonify({"message": error}), 400
+
+        regla = alert_rule_engine.update_rule(db.session, regla_id, updates)
+        if regla:
+            return jsonify(_regla_to_dict(regla)), 200
+        return jsonify({"message": "Regla de alerta no encontrada o fallo al actualizar."}), 404
+    except Exception as e:
+        logger.exception(f"Error al actualizar la regla de alerta {regla_id}: {e}")
+        return jsonify({"message": "Error interno del servidor al actualizar la regla de alerta."}), 500
+
+@reglas_alerta_bp.route('/<uuid:regla_id>', methods=['DELETE'])
+def delete_regla_alerta(regla_id: uuid.UUID):
+    """
+    Endpoint API para eliminar una regla de alerta (para desactivarla sin borrarla, usar PUT con 'activa': false).
+    """
+    logger.info(f"Solicitud recibida para eliminar la regla de alerta ID: {regla_id}")
+    try:
+        if alert_rule_engine.delete_rule(db.session, regla_id):
+            return jsonify({"message": "Regla de alerta eliminada."}), 200
+        return jsonify({"message": "Regla de alerta no encontrada."}), 404
+    except Exception as e:
+        logger.exception(f"Error al eliminar la regla de alerta {regla_id}: {e}")
+        return jsonify({"message": "Error interno del servidor al eliminar la regla de alerta."}), 500
+
+@reglas_alerta_bp.route('/reload', methods=['POST'])
+def reload_reglas_alerta():
+    """
+    Endpoint API para forzar la recarga de las reglas en este worker (p. ej. tras editarlas
+    directamente en la BD). Los demás workers las recogen en su próxima comprobación de versión.
+    """
+    logger.info("Solicitud recibida para recargar las reglas de alerta.")
+    try:
+        alert_rule_engine.invalidate()
+        alert_rule_engine.ensure_fresh(db.session)
+        return jsonify({"message": "Reglas de alerta recargadas."}), 200
+    except Exception as e:
+        logger.exception(f"Error al recargar las reglas de alerta: {e}")
+        return jsonify({"message": "Error interno del servidor al recargar las reglas de alerta."}), 500
@@ -25,5 +25,80 @@ class AppSettings:
     SECRET_KEY: str = os.getenv("SECRET_KEY", "super_secret_key_default") 
     DEBUG_MODE: bool = os.getenv("DEBUG_MODE", "False").lower() == "true"
 
+    # Ingesta de eventos: 'sync' procesa el lote dentro de la petición;
+    # 'spool' lo guarda en un spool local durable, responde 202 y lo procesa en segundo plano.
+    EVENT_INGEST_MODE: str = os.getenv("EVENT_INGEST_MODE", "sync").lower()
+    SPOOL_PATH: str = os.getenv("SPOOL_PATH", os.path.join(PROJECT_ROOT, "spool"))
+    SPOOL_SEGMENT_MAX_BYTES: int = int(os.getenv("SPOOL_SEGMENT_MAX_BYTES", str(16 * 1024 * 1024)))
+    SPOOL_WORKERS: int = int(os.getenv("SPOOL_WORKERS", "2"))
+    SPOOL_FSYNC_INTERVAL_MS: int = int(os.getenv("SPOOL_FSYNC_INTERVAL_MS", "2")) # Ventana para agrupar escrituras en un fsync
+    SPOOL_MAX_ATTEMPTS: int = int(os.getenv("SPOOL_MAX_ATTEMPTS", "5")) # Después, el lote pasa al dead-letter del spool
+    SPOOL_ACK_RETENTION_SECONDS: float = float(os.getenv("SPOOL_ACK_RETENTION_SECONDS", str(24 * 3600))) # Estado de tickets terminados
+    EVENT_INGEST_CHUNK_SIZE: int = int(os.getenv("EVENT_INGEST_CHUNK_SIZE", "500")) # Eventos por bloque en la ingesta NDJSON
+    EVENT_INGEST_TRANSACTION_CHUNK_SIZE: int = int(os.getenv("EVENT_INGEST_TRANSACTION_CHUNK_SIZE", "200")) # Eventos por transacción
+    # Capacidad del filtro en memoria de eventos ya procesados (0 lo desactiva)
+    EVENT_DEDUP_CAPACITY: int = int(os.getenv("EVENT_DEDUP_CAPACITY", "100000"))
+
+    # Particionado mensual de 'eventos' y 'jetson_telemetry' (sólo PostgreSQL)
+    PARTITION_MAINTENANCE_INTERVAL_SECONDS: int = int(os.getenv("PARTITION_MAINTENANCE_INTERVAL_SECONDS", "3600"))
+    PARTITION_PREMAKE_MONTHS: int = int(os.getenv("PARTITION_PREMAKE_MONTHS", "3")) # Meses futuros creados por adelantado
+    # Retención en meses (0 = conservar todo). Las particiones vencidas se separan con DETACH.
+    EVENTOS_RETENTION_MONTHS: int = int(os.getenv("EVENTOS_RETENTION_MONTHS", "0"))
+    TELEMETRY_RETENTION_MONTHS: int = int(os.getenv("TELEMETRY_RETENTION_MONTHS", "0"))
+    PARTITION_DROP_DETACHED: bool = os.getenv("PARTITION_DROP_DETACHED", "False").lower() == "true" # Eliminar tras separar
+
+    # Motor de reglas de alertas: cada cuántos segundos se comprueba si las reglas cambiaron en la BD
+    ALERT_RULES_VERSION_CHECK_SECONDS: float = float(os.getenv("ALERT_RULES_VERSION_CHECK_SECONDS", "5"))
+    # Máximo de claves (bus, tipo de alerta) en la caché de enfriamiento de alertas
+    ALERT_COOLDOWN_CACHE_CAPACITY: int = int(os.getenv("ALERT_COOLDOWN_CACHE_CAPACITY", "50000"))
+    # Reglas de correlación por ventana: máximo de buffers (regla, conductor/bus) y de eventos por buffer
+    CORRELATION_MAX_KEYS: int = int(os.getenv("CORRELATION_MAX_KEYS", "100000"))
+    CORRELATION_MAX_EVENTS_PER_KEY: int = int(os.getenv("CORRELATION_MAX_EVENTS_PER_KEY", "64"))
+    CORRELATION_MAX_LATENESS_SECONDS: float = float(os.getenv("CORRELATION_MAX_LATENESS_SECONDS", "3600")) # Retraso admitido de un evento
+
+    # Notificaciones de alertas (outbox + dispatcher)
+    # Destinos 'canal:destinatario' separados por comas (canales: email, sms, dashboard)
+    ALERT_NOTIFICATION_TARGETS: str = os.getenv("ALERT_NOTIFICATION_TARGETS", "email:supervisores@tuempresa.com")
+    NOTIFICATION_DISPATCH_INTERVAL_SECONDS: float = float(os.getenv("NOTIFICATION_DISPATCH_INTERVAL_SECONDS", "2")) # 0 lo desactiva
+    NOTIFICATION_DISPATCH_BATCH_SIZE: int = int(os.getenv("NOTIFICATION_DISPATCH_BATCH_SIZE", "100"))
+    NOTIFICATION_WORKERS: int = int(os.getenv("NOTIFICATION_WORKERS", "8"))
+    # Envíos simultáneos por canal 'canal:n' separados por comas; los canales no listados usan 2
+    NOTIFICATION_CHANNEL_CONCURRENCY: str = os.getenv("NOTIFICATION_CHANNEL_CONCURRENCY", "email:4,sms:2,dashboard:8")
+    NOTIFICATION_MAX_ATTEMPTS: int = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "5"))
+    NOTIFICATION_BACKOFF_BASE_SECONDS: float = float(os.getenv("NOTIFICATION_BACKOFF_BASE_SECONDS", "10"))
+    NOTIFICATION_BACKOFF_MAX_SECONDS: float = float(os.getenv("NOTIFICATION_BACKOFF_MAX_SECONDS", "900"))
+    NOTIFICATION_LEASE_SECONDS: int = int(os.getenv("NOTIFICATION_LEASE_SECONDS", "120"))
+
+    # Stream en vivo (SSE) de alertas y eventos
+    LIVE_STREAM_ENABLED: bool = os.getenv("LIVE_STREAM_ENABLED", "True").lower() == "true"
+    LIVE_STREAM_POLL_INTERVAL_SECONDS: float = float(os.getenv("LIVE_STREAM_POLL_INTERVAL_SECONDS", "0.5"))
+    LIVE_STREAM_RETENTION_MINUTES: int = int(os.getenv("LIVE_STREAM_RETENTION_MINUTES", "60")) # Ventana de Last-Event-ID
+    LIVE_STREAM_BACKFILL_LIMIT: int = int(os.getenv("LIVE_STREAM_BACKFILL_LIMIT", "1000"))
+    LIVE_STREAM_QUEUE_SIZE: int = int(os.getenv("LIVE_STREAM_QUEUE_SIZE", "1000")) # Por suscriptor
+    LIVE_STREAM_KEEPALIVE_SECONDS: float = float(os.getenv("LIVE_STREAM_KEEPALIVE_SECONDS", "15"))
+
+    # Contadores del dashboard por empresa
+    DASHBOARD_RECONCILE_INTERVAL_SECONDS: float = float(os.getenv("DASHBOARD_RECONCILE_INTERVAL_SECONDS", "120")) # 0 lo desactiva
+    JETSON_CONNECTION_TIMEOUT_SECONDS: int = int(os.getenv("JETSON_CONNECTION_TIMEOUT_SECONDS", "600")) # Sin latido en este tiempo = desconectada
+    JETSON_CONNECTIVITY_SWEEP_SECONDS: float = float(os.getenv("JETSON_CONNECTIVITY_SWEEP_SECONDS", "30")) # Barrido de desconexiones (0 lo desactiva: el estado se calcula del último contacto al leer)
+    # Último contacto de las Jetson: se acumula en memoria y se escribe cada N segundos (0 = escribir en cada petición)
+    JETSON_LAST_SEEN_FLUSH_SECONDS: float = float(os.getenv("JETSON_LAST_SEEN_FLUSH_SECONDS", "5"))
+    JETSON_DEVICE_STATE_TTL_SECONDS: float = float(os.getenv("JETSON_DEVICE_STATE_TTL_SECONDS", "60")) # Estado (activo, bus) en memoria para el latido
+
+    # Telemetría de las Jetson
+    TELEMETRY_BATCH_MAX_SAMPLES: int = int(os.getenv("TELEMETRY_BATCH_MAX_SAMPLES", "10000")) # Muestras por petición en /telemetry/batch
+    TELEMETRY_ROLLUPS_ENABLED: bool = os.getenv("TELEMETRY_ROLLUPS_ENABLED", "True").lower() == "true" # Agregados 1m/1h/1d al ingerir
+    TELEMETRY_HISTORY_MAX_POINTS: int = int(os.getenv("TELEMETRY_HISTORY_MAX_POINTS", "5000")) # Tope de max_points en el historial
+    TELEMETRY_LTTB_MAX_INPUT_POINTS: int = int(os.getenv("TELEMETRY_LTTB_MAX_INPUT_POINTS", "50000")) # Muestras que lee el LTTB; si el rango tiene más, parte de los agregados
+    TELEMETRY_EXPORT_MAX_PAGE_SIZE: int = int(os.getenv("TELEMETRY_EXPORT_MAX_PAGE_SIZE", "5000")) # Tope de 'limit' en el historial crudo
+    # Archivo columnar de la telemetría antigua (ruta compartida por todos los workers que sirven lecturas)
+    TELEMETRY_ARCHIVE_PATH: str = os.getenv("TELEMETRY_ARCHIVE_PATH", os.path.join(PROJECT_ROOT, "telemetry_archive"))
+    TELEMETRY_ARCHIVE_AFTER_DAYS: int = int(os.getenv("TELEMETRY_ARCHIVE_AFTER_DAYS", "28")) # Días que la muestra sigue en la tabla
+    TELEMETRY_ARCHIVE_INTERVAL_SECONDS: float = float(os.getenv("TELEMETRY_ARCHIVE_INTERVAL_SECONDS", "0")) # 0 lo desactiva
+    TELEMETRY_ARCHIVE_MAX_DAYS_PER_RUN: int = int(os.getenv("TELEMETRY_ARCHIVE_MAX_DAYS_PER_RUN", "7"))
+    # Análisis de salud de las Jetson sobre la telemetría reciente (toda la flota en cada pasada)
+    DEVICE_HEALTH_INTERVAL_SECONDS: float = float(os.getenv("DEVICE_HEALTH_INTERVAL_SECONDS", "60")) # 0 lo desactiva
+    DEVICE_HEALTH_WINDOW_MINUTES: int = int(os.getenv("DEVICE_HEALTH_WINDOW_MINUTES", "30")) # Ventana de las estadísticas
+
 # Instancia de la configuración para ser usada en toda la aplicación
 settings = AppSettings()
\ No newline at end of file
@@ -0,0 +1,63 @@
+# app/core/commands.py
+from datetime import datetime
+from typing import Optional
+
+import click
+from sqlalchemy import func
+
+def register_commands(app) -> None:
+    """
+    Registra los comandos de mantenimiento de la CLI de Flask, p. ej.:
+        flask --app main telemetry-rollups-backfill --from 2025-01-01 --to 2025-02-01
+        flask --app main telemetry-archive
+        flask --app main spool-replay-dead-letters
+    """
+
+    @app.cli.command('telemetry-rollups-backfill')
+    @click.option('--from', 'start', type=click.DateTime(), default=None,
+                  help='Inicio (UTC). Por defecto, la muestra de telemetría más antigua.')
+    @click.option('--to', 'end', type=click.DateTime(), default=None, help='Fin exclusivo (UTC). Por defecto, ahora.')
+    @click.option('--jetson', 'id_hardware_jetson', default=None, help='Sólo este dispositivo (id_hardware_jetson).')
+    def telemetry_rollups_backfill(start: Optional[datetime], end: Optional[datetime], id_hardware_jetson: Optional[str]):
+        """Recalcula los agregados de telemetría 1m/1h/1d desde jetson_telemetry, día a día."""
+        from app.config.database import db
+        from app.models_db.cloud_database_models import JetsonTelemetry
+        from app.services.telemetry_archive_service import telemetry_archive_service
+        from app.services.telemetry_rollup_service import telemetry_rollup_service
+
+        if start is None:
+            query = db.session.query(func.min(JetsonTelemetry.timestamp_telemetry))
+            if id_hardware_jetson is not None:
+                query = query.filter(JetsonTelemetry.id_hardware_jetson == id_hardware_jetson)
+            start = query.scalar()
+            # Los días ya archivados también se agregan
+            devices = [id_hardware_jetson] if id_hardware_jetson is not None else telemetry_archive_service.list_devices()
+            archived_days = [days[0] for days in map(telemetry_archive_service.list_days, devices) if days]
+            if archived_days:
+                oldest_archived = datetime.combine(min(archived_days), datetime.min.time())
+                start = min(start, oldest_archived) if start is not None else oldest_archived
+            if start is None:
+                click.echo("No hay telemetría que agregar.")
+                return
+        end = end or datetime.utcnow()
+        written = telemetry_rollup_service.backfill(db.session, start, end, id_hardware_jetson)
+        click.echo(f"Agregados de telemetría recalculados entre {start} y {end}: {written} filas.")
+
+    @app.cli.command('telemetry-archive')
+    @click.option('--now', type=click.DateTime(), default=None, help='Fecha de referencia (UTC) para el corte. Por defecto, ahora.')
+    def telemetry_archive(now: Optional[datetime]):
+        """Mueve la telemetría antigua (TELEMETRY_ARCHIVE_AFTER_DAYS) al archivo columnar."""
+        from app.config.database import db
+        from app.services.telemetry_archive_service import telemetry_archive_service
+
+        stats = telemetry_archive_service.archive_once(db.session, now)
+        click.echo(f"Telemetría archivada: {stats['samples']} muestras en {stats['days']} días.")
+
+    @app.cli.command('spool-replay-dead-letters')
+    def spool_replay_dead_letters():
+        """Reprocesa los lotes del spool de ingesta que agotaron SPOOL_MAX_ATTEMPTS (dead-letter)."""
+        from app.config.database import db
+        from app.services.event_ingest_spool import event_ingest_spool
+
+        stats = event_ingest_spool.replay_dead_letters(db.session)
+        click.echo(f"Dead-letter del spool: {stats['replayed']} lotes reprocesados, {stats['failed']} vuelven a fallar.")
@@ -0,0 +1,70 @@
+# app/core/scheduler.py
+import logging
+import threading
+from typing import Callable, Optional
+
+# Configuración del logger para este módulo
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+class PeriodicTask:
+    """
+    Ejecuta una función cada 'interval_seconds' en un hilo daemon, dentro de un
+    contexto de aplicación de Flask (la sesión de Flask-SQLAlchemy se cierra al salir
+    del contexto en cada ejecución).
+    Un error en una ejecución se registra y no detiene las siguientes.
+    Cada proceso (worker de gunicorn) tiene su propia tarea: la función debe ser idempotente
+    o coordinarse por la BD (p. ej. con un advisory lock).
+    """
+
+    def __init__(self, name: str, interval_seconds: float, func: Callable[[], None], run_immediately: bool = False):
+        self.name = name
+        self.interval_seconds = interval_seconds
+        self.func = func
+        self.run_immediately = run_immediately
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._app = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, app) -> None:
+        if self.is_running:
+            return
+        if self.interval_seconds <= 0:
+            logger.info(f"Tarea periódica '{self.name}' desactivada (intervalo {self.interval_seconds}).")
+            return
+        self._app = app
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name=f"periodic-{self.name}", daemon=True)
+        self._thread.start()
+        logger.info(f"Tarea periódica '{self.name}' iniciada (cada {self.interval_seconds}s).")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run_once(self, app=None) -> None:
+        """Ejecuta la función una vez en el hilo actual (dentro de un contexto de aplicación)."""
+        with (app or self._app).app_context():
+            self.func()
+
+    def _loop(self) -> None:
+        if not self.run_immediately and self._stop_event.wait(self.interval_seconds):
+            return
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Error en la tarea periódica '{self.name}': {e}", exc_info=True)
+            if self._stop_event.wait(self.interval_seconds):
+                return
@@ -0,0 +1,105 @@
+# app/crud/coercion.py
+import json
+import threading
+import uuid
+from datetime import datetime, date
+from decimal import Decimal
+from typing import Any, Callable, Dict, Type
+
+# Conversores de valores de entrada (JSON) a tipos de Python de las columnas.
+# Sólo convierten strings: cualquier otro valor se devuelve tal cual, y un string
+# inválido se convierte en None (mismo criterio que el antiguo _process_data_for_model).
+
+def _to_uuid(value: Any) -> Any:
+    if isinstance(value, str):
+        try:
+            return uuid.UUID(value)
+        except ValueError:
+            return None
+    return value
+
+def _to_datetime(value: Any) -> Any:
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return value
+
+def _to_date(value: Any) -> Any:
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value).date()
+        except ValueError:
+            return None
+    return value
+
+def _to_number(value: Any) -> Any:
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return value
+
+def _to_json(value: Any) -> Any:
+    # Algunas Jetson envían el JSON serializado como string; sólo se decodifican
+    # objetos y listas para no alterar columnas JSON que guardan un string plano.
+    if isinstance(value, str) and value[:1] in ('{', '['):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+CONVERTERS_BY_PYTHON_TYPE: Dict[type, Callable[[Any], Any]] = {
+    uuid.UUID: _to_uuid,
+    datetime: _to_datetime,
+    date: _to_date,
+    Decimal: _to_number,
+    dict: _to_json,
+}
+
+
+class CoercionPlan:
+    """
+    Plan de conversión precalculado para un modelo: nombre de columna -> conversor.
+    Se construye una sola vez por modelo, así que convertir una fila es una búsqueda
+    en un diccionario por campo en lugar de recorrer las columnas del modelo.
+    """
+
+    def __init__(self, model: Type[Any]):
+        self.model = model
+        self.converters: Dict[str, Callable[[Any], Any]] = {}
+        for col_name, column in model.__table__.columns.items():
+            try:
+                python_type = column.type.python_type
+            except NotImplementedError:
+                continue
+            converter = CONVERTERS_BY_PYTHON_TYPE.get(python_type)
+            if converter is not None:
+                self.converters[col_name] = converter
+
+    def apply(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Devuelve una copia de 'data' con los valores convertidos al tipo de su columna."""
+        converters = self.converters
+        processed_data = {}
+        for key, value in data.items():
+            converter = converters.get(key)
+            processed_data[key] = converter(value) if converter is not None else value
+        return processed_data
+
+
+_plans: Dict[Type[Any], CoercionPlan] = {}
+_plans_lock = threading.Lock()
+
+def get_coercion_plan(model: Type[Any]) -> CoercionPlan:
+    """Obtiene (o construye y guarda) el plan de conversión de un modelo."""
+    plan = _plans.get(model)
+    if plan is None:
+        with _plans_lock:
+            plan = _plans.get(model)
+            if plan is None:
+                plan = CoercionPlan(model)
+                _plans[model] = plan
+    return plan
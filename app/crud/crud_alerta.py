@@ -1,5 +1,5 @@
 # app/crud/crud_alerta.py
-from typing import Optional, List
+from typing import Optional, List, Sequence, Set, Tuple
 import uuid
 from datetime import datetime
 
@@ -52,6 +52,46 @@ class CRUDAlerta(CRUDBase[Alerta]):
             query = query.filter(self.model.estado_alerta == estado_alerta)
         return query.order_by(desc(self.model.timestamp_alerta)).offset(skip).limit(limit).all()
 
+    def get_for_update(self, db: Session, alert_ids: Sequence[uuid.UUID]) -> List[Alerta]:
+        """
+        Obtiene y bloquea (SELECT ... FOR UPDATE, en orden de id) varias alertas, releyéndolas aunque
+        ya estén en la sesión: para read-modify-write de sus columnas JSON sin pisar a otro worker.
+        """
+        if not alert_ids:
+            return []
+        return db.query(self.model).filter(self.model.id.in_(list(alert_ids))).order_by(self.model.id) \
+            .with_for_update().populate_existing().all()
+
+    def get_active_bus_types(self, db: Session, tipos_alerta: Sequence[str]) -> Set[Tuple[uuid.UUID, str]]:
+        """
+        Pares (id_bus, tipo_alerta) con alguna alerta activa de esos tipos, en una sola consulta.
+        Sirve para no repetir una alerta mientras la anterior sigue sin gestionar.
+        """
+        if not tipos_alerta:
+            return set()
+        rows = db.query(self.model.id_bus, self.model.tipo_alerta).filter(
+            self.model.estado_alerta == 'Activa',
+            self.model.tipo_alerta.in_(list(tipos_alerta))
+        ).distinct().all()
+        return {(row.id_bus, row.tipo_alerta) for row in rows}
+
+    def resolve_active(self, db: Session, id_bus: uuid.UUID, tipo_alerta: str, resolved_at: datetime,
+                       comentarios: Optional[str] = None) -> int:
+        """
+        Cierra las alertas activas de un bus y tipo (estado 'Resuelta', gestión 'Automática') con un
+        único UPDATE. No hace commit.
+
+        Returns:
+            int: Número de alertas cerradas.
+        """
+        return db.query(self.model).filter(
+            self.model.id_bus == id_bus,
+            self.model.tipo_alerta == tipo_alerta,
+            self.model.estado_alerta == 'Activa'
+        ).update({self.model.estado_alerta: 'Resuelta', self.model.fecha_gestion: resolved_at,
+                  self.model.tipo_gestion: 'Automática', self.model.comentarios_gestion: comentarios},
+                 synchronize_session=False)
+
 # Instancia de la clase CRUD para Alertas.
 # Esta instancia será usada por los servicios y endpoints para interactuar con la tabla Alertas.
 alerta_crud = CRUDAlerta(Alerta)
\ No newline at end of file
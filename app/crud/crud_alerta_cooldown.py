@@ -0,0 +1,69 @@
+# app/crud/crud_alerta_cooldown.py
+from typing import Optional
+import uuid
+from datetime import datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.crud.crud_base import CRUDBase
+from app.models_db.cloud_database_models import AlertaCooldown, Alerta # Importa los modelos
+
+class CRUDAlertaCooldown(CRUDBase[AlertaCooldown]):
+    """
+    Clase CRUD específica para el modelo AlertaCooldown (última alerta por bus y tipo).
+    """
+    def get_last_alert_at(self, db: Session, bus_id: uuid.UUID, alert_type: str) -> Optional[datetime]:
+        """
+        Obtiene el momento de la última alerta registrada para (bus, tipo). Si aún no hay registro
+        (alertas anteriores a la tabla), lo toma de la tabla de alertas.
+        """
+        last_alert_at = db.execute(
+            select(self.model.ultima_alerta_at).where(self.model.id_bus == bus_id, self.model.tipo_alerta == alert_type)
+        ).scalar()
+        if last_alert_at is None:
+            last_alert_at = db.execute(
+                select(func.max(Alerta.timestamp_alerta)).where(Alerta.id_bus == bus_id, Alerta.tipo_alerta == alert_type)
+            ).scalar()
+        return last_alert_at
+
+    def try_claim(self, db: Session, bus_id: uuid.UUID, alert_type: str, alert_at: datetime, threshold: datetime) -> bool:
+        """
+        Registra una alerta de (bus, tipo) en alert_at sólo si la última registrada es anterior a
+        'threshold' (es decir, el enfriamiento ya terminó). Es una sola sentencia
+        INSERT ... ON CONFLICT DO UPDATE ... WHERE: entre transacciones concurrentes sólo una gana.
+        No hace commit: el registro se confirma (o se deshace) con la alerta.
+
+        Returns:
+            bool: True si se registró (la alerta puede dispararse), False si está en enfriamiento.
+        """
+        table = self.model.__table__
+        dialect_name = db.get_bind().dialect.name
+        if dialect_name in ('postgresql', 'sqlite'):
+            dialect_insert = postgresql_insert if dialect_name == 'postgresql' else sqlite_insert
+            stmt = dialect_insert(table).values(id_bus=bus_id, tipo_alerta=alert_type, ultima_alerta_at=alert_at)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.id_bus, table.c.tipo_alerta],
+                set_={'ultima_alerta_at': stmt.excluded.ultima_alerta_at},
+                where=table.c.ultima_alerta_at < threshold
+            ).returning(table.c.ultima_alerta_at)
+            return db.execute(stmt).first() is not None
+
+        # Camino portable para otros motores: UPDATE condicional y, si no hay fila, INSERT.
+        updated = db.execute(
+            table.update().where(
+                table.c.id_bus == bus_id, table.c.tipo_alerta == alert_type, table.c.ultima_alerta_at < threshold
+            ).values(ultima_alerta_at=alert_at)
+        ).rowcount
+        if updated:
+            return True
+        if db.get(self.model, (bus_id, alert_type)) is not None:
+            return False
+        db.add(self.model(id_bus=bus_id, tipo_alerta=alert_type, ultima_alerta_at=alert_at))
+        db.flush()
+        return True
+
+# Instancia de la clase CRUD para AlertaCooldown.
+alerta_cooldown_crud = CRUDAlertaCooldown(AlertaCooldown)
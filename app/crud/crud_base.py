@@ -1,15 +1,23 @@
 # app/crud/crud_base.py
 import uuid 
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
-from datetime import datetime, date 
+from typing import Any, Dict, Generic, List, Optional, Sequence, Set, Tuple, Type, TypeVar, Union
+from datetime import datetime
 
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from app.models_db.cloud_database_models import Base as DeclarativeBaseModel 
+from app.crud.coercion import get_coercion_plan
+from app.models_db.cloud_database_models import Base as DeclarativeBaseModel
 
 # Define un tipo genérico para el modelo de base de datos
 ModelType = TypeVar("ModelType", bound=DeclarativeBaseModel)
 
+# Máximo de parámetros enlazados por sentencia en operaciones masivas
+# (PostgreSQL admite 65535 y SQLite >= 3.32 admite 32766).
+BULK_MAX_PARAMS = 30000
+
 class CRUDBase(Generic[ModelType]):
     """
     Clase base para las operaciones CRUD (Crear, Leer, Actualizar, Borrar)
@@ -21,6 +29,8 @@ class CRUDBase(Generic[ModelType]):
             model (Type[ModelType]): El modelo de SQLAlchemy al que se aplicará el CRUD.
         """
         self.model = model
+        # Plan de conversión de tipos del modelo, calculado una sola vez al crear el CRUD.
+        self.coercion_plan = get_coercion_plan(model)
 
     def get(self, db: Session, id: Any) -> Optional[ModelType]:
         """
@@ -61,24 +71,29 @@ class CRUDBase(Generic[ModelType]):
         return db.query(self.model).filter(self.model.id.in_(processed_ids)).all()
 
 
-    def create(self, db: Session, obj_in: Dict[str, Any]) -> ModelType:
+    def create(self, db: Session, obj_in: Dict[str, Any], commit: bool = True) -> ModelType:
         """
         Crea un nuevo registro en la base de datos.
         obj_in debe ser un diccionario con los datos del nuevo registro.
+        Con commit=False sólo se hace flush y la transacción queda en manos del llamador.
         """
         processed_data = self._process_data_for_model(obj_in, self.model)
         
         db_obj = self.model(**processed_data)  
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        if commit:
+            db.commit()
+            db.refresh(db_obj)
+        else:
+            db.flush()
         return db_obj
 
-    def update(self, db: Session, db_obj: ModelType, obj_in: Union[Dict[str, Any], ModelType]) -> ModelType:
+    def update(self, db: Session, db_obj: ModelType, obj_in: Union[Dict[str, Any], ModelType], commit: bool = True) -> ModelType:
         """
         Actualiza un registro existente en la base de datos.
         db_obj es la instancia del modelo a actualizar.
         obj_in es un diccionario con los campos a actualizar.
+        Con commit=False sólo se hace flush y la transacción queda en manos del llamador.
         """
         if isinstance(obj_in, dict):
             update_data = obj_in
@@ -92,8 +107,11 @@ class CRUDBase(Generic[ModelType]):
                 setattr(db_obj, field, processed_update_data[field])
 
         db.add(db_obj) 
-        db.commit()
-        db.refresh(db_obj)
+        if commit:
+            db.commit()
+            db.refresh(db_obj)
+        else:
+            db.flush()
         return db_obj
 
     def remove(self, db: Session, id: Any) -> Optional[ModelType]:
@@ -151,29 +169,163 @@ class CRUDBase(Generic[ModelType]):
                 db.rollback()
                 raise ValueError(f"Error de integridad al crear el objeto: {e.orig}")
 
+    def bulk_upsert(self, db: Session, rows: List[Dict[str, Any]], unique_field: str = 'id',
+                    update_exclude: Sequence[str] = (), conflict_fields: Optional[Sequence[str]] = None) -> Set[Any]:
+        """
+        Inserta o actualiza un lote de registros con una sola sentencia multi-fila
+        INSERT ... ON CONFLICT (conflict_fields) DO UPDATE (PostgreSQL y SQLite).
+        Para otros motores se usa un camino portable: un SELECT por IN para separar
+        nuevos de existentes, un INSERT multi-fila y un UPDATE executemany.
+
+        conflict_fields es el índice único del ON CONFLICT (por defecto sólo unique_field);
+        en tablas particionadas debe incluir la clave de partición, p. ej. ('id', 'timestamp_evento').
+        La identidad de un registro sigue siendo unique_field: si ya existe, su fila se escribe con
+        los valores almacenados de los demás conflict_fields (se modifican en el propio dict), así
+        que un reenvío con otra clave de partición actualiza el registro original en lugar de
+        insertar otro con el mismo unique_field.
+
+        No hace commit: el llamador controla la transacción.
+        Las filas deben venir ya procesadas (tipos Python correctos) y con valor en unique_field.
+
+        Returns:
+            Set[Any]: Los valores de unique_field que ya existían antes del upsert
+                      (el resto de filas fueron insertadas).
+        """
+        if not rows:
+            return set()
+
+        table = self.model.__table__
+        unique_column = table.c[unique_field]
+        keys = [row[unique_field] for row in rows]
+        conflict_fields = tuple(conflict_fields or (unique_field,))
+        stored_fields = [name for name in conflict_fields if name != unique_field]
+
+        stored_keys: Dict[Any, Tuple[Any, ...]] = {}
+        for start in range(0, len(keys), BULK_MAX_PARAMS):
+            chunk_keys = keys[start:start + BULK_MAX_PARAMS]
+            query = select(unique_column, *(table.c[name] for name in stored_fields)).where(unique_column.in_(chunk_keys))
+            stored_keys.update((key, tuple(values)) for key, *values in db.execute(query))
+        existing_keys: Set[Any] = set(stored_keys)
+        for row in rows:
+            if stored_fields and row[unique_field] in stored_keys:
+                row.update(zip(stored_fields, stored_keys[row[unique_field]]))
+
+        # Todas las filas deben compartir las mismas columnas para el VALUES multi-fila.
+        # Las columnas ausentes toman su default de Python (si lo hay) o NULL.
+        columns = [col for col in table.columns if any(col.name in row for row in rows)]
+        column_names = [col.name for col in columns]
+        normalized_rows = []
+        for row in rows:
+            normalized = {}
+            for col in columns:
+                if col.name in row:
+                    normalized[col.name] = row[col.name]
+                else:
+                    normalized[col.name] = self._python_default(col.default)
+            normalized_rows.append(normalized)
+
+        conflict_columns = [table.c[name] for name in conflict_fields]
+        update_columns = [name for name in column_names
+                          if name != unique_field and name not in conflict_fields and name not in update_exclude]
+        # ON CONFLICT DO UPDATE no aplica los 'onupdate' de Python; se añaden explícitamente.
+        onupdate_values = {
+            col.name: self._python_default(col.onupdate)
+            for col in table.columns
+            if col.onupdate is not None and col.name not in update_columns
+            and col.name != unique_field and col.name not in conflict_fields
+        }
+
+        dialect_name = db.get_bind().dialect.name
+        chunk_size = max(1, BULK_MAX_PARAMS // max(1, len(column_names)))
+
+        if dialect_name in ('postgresql', 'sqlite'):
+            dialect_insert = postgresql_insert if dialect_name == 'postgresql' else sqlite_insert
+            for start in range(0, len(normalized_rows), chunk_size):
+                stmt = dialect_insert(table).values(normalized_rows[start:start + chunk_size])
+                set_ = {name: stmt.excluded[name] for name in update_columns}
+                set_.update(onupdate_values)
+                if set_:
+                    stmt = stmt.on_conflict_do_update(index_elements=conflict_columns, set_=set_)
+                else:
+                    stmt = stmt.on_conflict_do_nothing(index_elements=conflict_columns)
+                db.execute(stmt)
+        else:
+            new_rows = [row for row in normalized_rows if row[unique_field] not in existing_keys]
+            for start in range(0, len(new_rows), chunk_size):
+                db.execute(insert(table).values(new_rows[start:start + chunk_size]))
+
+            existing_rows = [row for row in normalized_rows if row[unique_field] in existing_keys]
+            if existing_rows and (update_columns or onupdate_values):
+                stmt = update(table).where(unique_column == bindparam('_unique_key')).values(
+                    {name: bindparam(name) for name in update_columns}
+                )
+                if onupdate_values:
+                    stmt = stmt.values(onupdate_values)
+                db.execute(stmt, [
+                    {'_unique_key': row[unique_field], **{name: row[name] for name in update_columns}}
+                    for row in existing_rows
+                ])
+
+        return existing_keys
+
+    def bulk_insert(self, db: Session, rows: List[Dict[str, Any]]) -> int:
+        """
+        Inserta un lote de registros nuevos con sentencias INSERT multi-fila
+        (bloques de como mucho BULK_MAX_PARAMS parámetros). Las columnas ausentes
+        toman su default de Python (p. ej. el id uuid4) o NULL.
+
+        No hace commit: el llamador controla la transacción.
+        Las filas deben venir ya procesadas (tipos Python correctos).
+
+        Returns:
+            int: Número de filas insertadas.
+        """
+        if not rows:
+            return 0
+
+        table = self.model.__table__
+        columns = [col for col in table.columns
+                   if col.default is not None or any(col.name in row for row in rows)]
+        normalized_rows = [
+            {col.name: row[col.name] if col.name in row else self._python_default(col.default) for col in columns}
+            for row in rows
+        ]
+        chunk_size = max(1, BULK_MAX_PARAMS // max(1, len(columns)))
+        for start in range(0, len(normalized_rows), chunk_size):
+            db.execute(insert(table).values(normalized_rows[start:start + chunk_size]))
+        return len(normalized_rows)
+
+    @staticmethod
+    def _apply_time_range(query, column, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None):
+        """
+        Restringe una consulta al intervalo [start_time, end_time) sobre una columna de fecha.
+        En tablas particionadas por esa columna el planificador descarta las particiones fuera del rango.
+        """
+        if start_time is not None:
+            query = query.filter(column >= start_time)
+        if end_time is not None:
+            query = query.filter(column < end_time)
+        return query
+
+    @staticmethod
+    def _python_default(default: Any) -> Any:
+        """
+        Evalúa un default/onupdate de columna definido en Python (escalar o callable).
+        Los defaults del lado del servidor no se evalúan y se devuelven como None.
+        """
+        if default is None:
+            return None
+        if getattr(default, 'is_callable', False):
+            return default.arg(None)
+        if getattr(default, 'is_scalar', False):
+            return default.arg
+        return None
+
     def _process_data_for_model(self, data: Dict[str, Any], model_class: Type[ModelType]) -> Dict[str, Any]:
         """
         Función auxiliar para procesar datos de entrada (dict) y convertir
-        UUIDs y fechas/horas de string a los tipos de Python correspondientes
-        basándose en las columnas del modelo.
-        """
-        processed_data = data.copy()
-        for col_name, column in model_class.__table__.columns.items():
-            if col_name in processed_data and isinstance(processed_data[col_name], str):
-                if hasattr(column.type, 'python_type'):
-                    if column.type.python_type == uuid.UUID:
-                        try:
-                            processed_data[col_name] = uuid.UUID(processed_data[col_name])
-                        except ValueError:
-                            processed_data[col_name] = None 
-                    elif column.type.python_type == datetime:
-                        try:
-                            processed_data[col_name] = datetime.fromisoformat(processed_data[col_name])
-                        except ValueError:
-                            processed_data[col_name] = None
-                    elif column.type.python_type == date:
-                        try:
-                            processed_data[col_name] = datetime.fromisoformat(processed_data[col_name]).date()
-                        except ValueError:
-                            processed_data[col_name] = None
-        return processed_data
\ No newline at end of file
+        UUIDs, fechas/horas, numéricos y JSON de string a los tipos de Python
+        correspondientes, usando el plan de conversión precalculado del modelo.
+        """
+        plan = self.coercion_plan if model_class is self.model else get_coercion_plan(model_class)
+        return plan.apply(data)
@@ -0,0 +1,119 @@
+# app/crud/crud_contador_dashboard.py
+from typing import Optional, Dict, List
+import uuid
+from datetime import datetime
+
+from sqlalchemy import func, literal, select, true
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.crud.crud_base import CRUDBase
+from app.crud.crud_jetson_nano import jetson_nano_crud
+from app.models_db.cloud_database_models import ContadorDashboard, Alerta, Bus, Empresa, JetsonNano, SesionConduccion # Importa los modelos
+
+COUNTER_FIELDS = ('alertas_activas', 'jetsons_conectadas', 'sesiones_activas')
+
+class CRUDContadorDashboard(CRUDBase[ContadorDashboard]):
+    """
+    Clase CRUD específica para los contadores del dashboard por empresa.
+    Los métodos no hacen commit: los incrementos van en la transacción del cambio que los produce.
+    """
+    def get_by_empresa(self, db: Session, empresa_id: uuid.UUID) -> Optional[ContadorDashboard]:
+        return db.get(self.model, empresa_id)
+
+    def get_all(self, db: Session) -> List[ContadorDashboard]:
+        return db.query(self.model).all()
+
+    def increment(self, db: Session, empresa_id: uuid.UUID, deltas: Dict[str, int]) -> None:
+        """
+        Suma 'deltas' ({contador: incremento}) a los contadores de una empresa con una sola sentencia
+        atómica (col = col + delta); si la empresa aún no tiene fila, la crea con esos valores.
+        """
+        deltas = {field: delta for field, delta in deltas.items() if field in COUNTER_FIELDS and delta}
+        if not deltas:
+            return
+        table = self.model.__table__
+        now = datetime.utcnow()
+        dialect_name = db.get_bind().dialect.name
+        if dialect_name in ('postgresql', 'sqlite'):
+            dialect_insert = postgresql_insert if dialect_name == 'postgresql' else sqlite_insert
+            stmt = dialect_insert(table).values(id_empresa=empresa_id, last_updated_at=now, **deltas)
+            set_ = {field: table.c[field] + stmt.excluded[field] for field in deltas}
+            set_['last_updated_at'] = now
+            db.execute(stmt.on_conflict_do_update(index_elements=[table.c.id_empresa], set_=set_))
+            return
+
+        # Camino portable para otros motores: UPDATE relativo y, si no hay fila, INSERT.
+        updated = db.execute(
+            table.update().where(table.c.id_empresa == empresa_id).values(
+                last_updated_at=now, **{field: table.c[field] + delta for field, delta in deltas.items()})
+        ).rowcount
+        if not updated:
+            db.execute(table.insert().values(id_empresa=empresa_id, last_updated_at=now, **deltas))
+
+    def lock_for_reconcile(self, db: Session, empresa_id: Optional[uuid.UUID] = None) -> None:
+        """
+        Crea a 0 las filas que falten y bloquea (SELECT ... FOR UPDATE, en orden de id_empresa) las de
+        las empresas a reconciliar, antes de recalcular. Así un incremento concurrente o ya está
+        confirmado (y el recálculo lo ve en las tablas de origen) o espera al commit del recálculo
+        y se suma sobre el valor nuevo; sin el bloqueo, replace_counts lo borraría.
+        En SQLite el INSERT toma el lock de escritura de la BD, con el mismo efecto.
+        """
+        table = self.model.__table__
+        # Siempre con WHERE: SQLite no admite 'INSERT ... SELECT ... FROM t ON CONFLICT' sin él
+        empresas_query = select(Empresa.id, *(literal(0) for _ in COUNTER_FIELDS), literal(datetime.utcnow())).where(
+            Empresa.id == empresa_id if empresa_id is not None else true())
+        dialect_name = db.get_bind().dialect.name
+        if dialect_name in ('postgresql', 'sqlite'):
+            dialect_insert = postgresql_insert if dialect_name == 'postgresql' else sqlite_insert
+            db.execute(dialect_insert(table).from_select(['id_empresa', *COUNTER_FIELDS, 'last_updated_at'], empresas_query)
+                       .on_conflict_do_nothing(index_elements=[table.c.id_empresa]))
+        lock_query = select(table.c.id_empresa)
+        if empresa_id is not None:
+            lock_query = lock_query.where(table.c.id_empresa == empresa_id)
+        db.execute(lock_query.order_by(table.c.id_empresa).with_for_update()).all()
+
+    def compute_counts(self, db: Session, empresa_id: Optional[uuid.UUID] = None,
+                       stale_before: Optional[datetime] = None) -> Dict[uuid.UUID, Dict[str, int]]:
+        """
+        Recalcula los contadores desde las tablas de origen (una consulta GROUP BY por contador).
+        Devuelve todas las empresas (o sólo empresa_id), con 0 en los contadores sin filas.
+        stale_before: ver CRUDJetsonNano.connection_status_expression.
+        """
+        empresas_query = select(Empresa.id)
+        if empresa_id is not None:
+            empresas_query = empresas_query.where(Empresa.id == empresa_id)
+        counts = {row_id: dict.fromkeys(COUNTER_FIELDS, 0) for row_id in db.execute(empresas_query).scalars()}
+
+        queries = {
+            'alertas_activas': select(Bus.id_empresa, func.count()).select_from(Alerta).join(Bus, Alerta.id_bus == Bus.id)
+                .where(Alerta.estado_alerta == 'Activa'),
+            'jetsons_conectadas': select(Bus.id_empresa, func.count()).select_from(JetsonNano).join(Bus, JetsonNano.id_bus == Bus.id)
+                .where(jetson_nano_crud.connection_status_filter('Conectado', stale_before)),
+            'sesiones_activas': select(Bus.id_empresa, func.count()).select_from(SesionConduccion).join(Bus, SesionConduccion.id_bus == Bus.id)
+                .where(SesionConduccion.estado_sesion == 'Activa', SesionConduccion.fecha_fin_real.is_(None)),
+        }
+        for field, query in queries.items():
+            if empresa_id is not None:
+                query = query.where(Bus.id_empresa == empresa_id)
+            for row_empresa_id, count in db.execute(query.group_by(Bus.id_empresa)).all():
+                if row_empresa_id in counts:
+                    counts[row_empresa_id][field] = count
+        return counts
+
+    def count_connected_jetsons(self, db: Session, empresa_id: uuid.UUID, stale_before: Optional[datetime] = None) -> int:
+        """Jetsons conectadas de una empresa (la de su bus), calculadas en el momento."""
+        return db.execute(select(func.count()).select_from(JetsonNano).join(Bus, JetsonNano.id_bus == Bus.id).where(
+            Bus.id_empresa == empresa_id, jetson_nano_crud.connection_status_filter('Conectado', stale_before))).scalar()
+
+    def replace_counts(self, db: Session, counts: Dict[uuid.UUID, Dict[str, int]], reconciled_at: datetime) -> None:
+        """Sobrescribe los contadores con los valores recalculados (upsert multi-fila)."""
+        rows = [
+            {'id_empresa': row_empresa_id, **values, 'last_updated_at': reconciled_at, 'reconciliado_at': reconciled_at}
+            for row_empresa_id, values in counts.items()
+        ]
+        self.bulk_upsert(db, rows, unique_field='id_empresa')
+
+# Instancia de la clase CRUD para ContadorDashboard.
+contador_dashboard_crud = CRUDContadorDashboard(ContadorDashboard)
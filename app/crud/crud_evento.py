@@ -4,7 +4,7 @@ import uuid
 from datetime import datetime
 
 from sqlalchemy.orm import Session
-from sqlalchemy import desc # Para ordenar resultados
+from sqlalchemy import desc, update # Para ordenar resultados y actualizaciones masivas
 
 from app.crud.crud_base import CRUDBase
 from app.models_db.cloud_database_models import Evento # Importa el modelo Evento
@@ -14,31 +14,78 @@ class CRUDEvento(CRUDBase[Evento]):
     Clase CRUD específica para el modelo Evento.
     Hereda la funcionalidad básica de CRUDBase y añade métodos específicos
     para la consulta de eventos.
+    La tabla está particionada por mes en timestamp_evento: pasar start_time/end_time
+    ([start_time, end_time)) permite que la consulta sólo lea las particiones del rango.
     """
-    def get_events_by_conductor(self, db: Session, conductor_id: uuid.UUID, skip: int = 0, limit: int = 100) -> List[Evento]:
+    def get_events_by_conductor(self, db: Session, conductor_id: uuid.UUID, skip: int = 0, limit: int = 100,
+                                start_time: Optional[datetime] = None, end_time: Optional[datetime] = None) -> List[Evento]:
         """
         Obtiene una lista de eventos para un conductor específico.
         """
-        return db.query(self.model).filter(self.model.id_conductor == conductor_id).offset(skip).limit(limit).all()
+        query = db.query(self.model).filter(self.model.id_conductor == conductor_id)
+        query = self._apply_time_range(query, self.model.timestamp_evento, start_time, end_time)
+        return query.offset(skip).limit(limit).all()
 
-    def get_events_by_bus(self, db: Session, bus_id: uuid.UUID, skip: int = 0, limit: int = 100) -> List[Evento]:
+    def get_events_by_bus(self, db: Session, bus_id: uuid.UUID, skip: int = 0, limit: int = 100,
+                          start_time: Optional[datetime] = None, end_time: Optional[datetime] = None) -> List[Evento]:
         """
         Obtiene una lista de eventos para un bus específico.
         """
-        return db.query(self.model).filter(self.model.id_bus == bus_id).offset(skip).limit(limit).all()
+        query = db.query(self.model).filter(self.model.id_bus == bus_id)
+        query = self._apply_time_range(query, self.model.timestamp_evento, start_time, end_time)
+        return query.offset(skip).limit(limit).all()
 
-    def get_events_by_session(self, db: Session, session_id_jetson: uuid.UUID, skip: int = 0, limit: int = 100) -> List[Evento]:
+    def get_events_by_session(self, db: Session, session_id_jetson: uuid.UUID, skip: int = 0, limit: int = 100,
+                              start_time: Optional[datetime] = None, end_time: Optional[datetime] = None) -> List[Evento]:
         """
         Obtiene una lista de eventos para una sesión de conducción específica (usando id_sesion_conduccion_jetson de Jetson).
         """
         # Aquí, el filtro es por id_sesion_conduccion (que es la FK a id_sesion_conduccion_jetson en SesionConduccion)
-        return db.query(self.model).filter(self.model.id_sesion_conduccion == session_id_jetson).offset(skip).limit(limit).all()
+        query = db.query(self.model).filter(self.model.id_sesion_conduccion == session_id_jetson)
+        query = self._apply_time_range(query, self.model.timestamp_evento, start_time, end_time)
+        return query.offset(skip).limit(limit).all()
 
-    def get_recent_events(self, db: Session, limit: int = 50) -> List[Evento]:
+    def get_events_by_time_range(self, db: Session, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None,
+                                 skip: int = 0, limit: int = 100) -> List[Evento]:
+        """
+        Obtiene los eventos de un rango de tiempo, del más reciente al más antiguo.
+        """
+        query = self._apply_time_range(db.query(self.model), self.model.timestamp_evento, start_time, end_time)
+        return query.order_by(desc(self.model.timestamp_evento)).offset(skip).limit(limit).all()
+
+    def get_events_by_ids(self, db: Session, ids: List[uuid.UUID],
+                          start_time: Optional[datetime] = None, end_time: Optional[datetime] = None) -> List[Evento]:
+        """
+        Obtiene eventos por sus IDs. Si se conoce el rango de sus timestamps (p. ej. al recargar
+        un lote recién escrito), pasarlo evita buscar el ID en todas las particiones.
+        """
+        if not ids:
+            return []
+        query = db.query(self.model).filter(self.model.id.in_(ids))
+        return self._apply_time_range(query, self.model.timestamp_evento, start_time, end_time).all()
+
+    def mark_alerts_triggered(self, db: Session, ids: List[uuid.UUID],
+                              start_time: Optional[datetime] = None, end_time: Optional[datetime] = None) -> int:
+        """
+        Marca alerta_disparada = True en los eventos indicados con un solo UPDATE (sin commit).
+        Los objetos Evento ya cargados en la sesión se actualizan en memoria.
+        """
+        if not ids:
+            return 0
+        stmt = update(self.model).where(self.model.id.in_(ids))
+        if start_time is not None:
+            stmt = stmt.where(self.model.timestamp_evento >= start_time)
+        if end_time is not None:
+            stmt = stmt.where(self.model.timestamp_evento < end_time)
+        return db.execute(stmt.values(alerta_disparada=True)).rowcount
+
+    def get_recent_events(self, db: Session, limit: int = 50,
+                          start_time: Optional[datetime] = None, end_time: Optional[datetime] = None) -> List[Evento]:
         """
         Obtiene los eventos más recientes, ordenados por timestamp_evento.
         """
-        return db.query(self.model).order_by(desc(self.model.timestamp_evento)).limit(limit).all()
+        query = self._apply_time_range(db.query(self.model), self.model.timestamp_evento, start_time, end_time)
+        return query.order_by(desc(self.model.timestamp_evento)).limit(limit).all()
 
 # Instancia de la clase CRUD para Eventos.
 evento_crud = CRUDEvento(Evento)
\ No newline at end of file
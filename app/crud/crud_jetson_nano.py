@@ -1,11 +1,13 @@
 # app/crud/crud_jetson_nano.py
-from typing import Optional, List
+from typing import Optional, List, Dict, Sequence, Tuple, Any
 import uuid
+from datetime import datetime
 
-from sqlalchemy.orm import Session
+from sqlalchemy import DateTime, Row, String, and_, bindparam, case, cast, column, literal, or_, select, values
+from sqlalchemy.orm import Session, selectinload
 
-from app.crud.crud_base import CRUDBase
-from app.models_db.cloud_database_models import JetsonNano # Import the JetsonNano model
+from app.crud.crud_base import CRUDBase, BULK_MAX_PARAMS
+from app.models_db.cloud_database_models import JetsonNano, Bus # Import the JetsonNano model
 
 class CRUDJetsonNano(CRUDBase[JetsonNano]):
     """
@@ -18,6 +20,185 @@ class CRUDJetsonNano(CRUDBase[JetsonNano]):
         """
         return db.query(self.model).filter(self.model.id_hardware_jetson == id_hardware_jetson).first()
 
+    def get_by_hardware_ids(self, db: Session, hardware_ids: Sequence[str]) -> Dict[str, JetsonNano]:
+        """
+        Obtiene varios dispositivos por ID de hardware con una sola consulta IN.
+        """
+        if not hardware_ids:
+            return {}
+        jetsons = db.query(self.model).filter(self.model.id_hardware_jetson.in_(list(hardware_ids))).all()
+        return {jetson.id_hardware_jetson: jetson for jetson in jetsons}
+
+    def _last_seen_values(self, table, seen_at, last_telemetry_at) -> Dict[str, Any]:
+        """SET de ultima_conexion_cloud_at / last_telemetry_at que nunca retrocede (varios workers escriben la misma fila)."""
+        return {
+            'ultima_conexion_cloud_at': case(
+                (table.c.ultima_conexion_cloud_at.is_(None), seen_at),
+                (table.c.ultima_conexion_cloud_at < seen_at, seen_at),
+                else_=table.c.ultima_conexion_cloud_at
+            ),
+            'last_telemetry_at': case(
+                (last_telemetry_at.is_(None), table.c.last_telemetry_at),
+                (table.c.last_telemetry_at.is_(None), last_telemetry_at),
+                (table.c.last_telemetry_at < last_telemetry_at, last_telemetry_at),
+                else_=table.c.last_telemetry_at
+            ),
+        }
+
+    def record_last_seen(self, db: Session, last_seen_by_hardware_id: Dict[str, Tuple[datetime, Optional[datetime]]]) -> None:
+        """
+        Escribe {id_hardware_jetson: (ultima_conexion_cloud_at, last_telemetry_at o None)} de varios
+        dispositivos, sin retroceder ninguna de las dos marcas: un único UPDATE ... FROM (VALUES ...)
+        en PostgreSQL y un UPDATE executemany en otros motores. Las filas se escriben ordenadas por
+        id_hardware_jetson para que dos escrituras concurrentes no se bloqueen mutuamente. No hace commit.
+        """
+        if not last_seen_by_hardware_id:
+            return
+        table = self.model.__table__
+        entries = sorted(last_seen_by_hardware_id.items())
+        if db.get_bind().dialect.name == 'postgresql':
+            chunk_size = max(1, BULK_MAX_PARAMS // 3)
+            for start in range(0, len(entries), chunk_size):
+                rows = [(hardware_id, seen_at, last_telemetry_at)
+                        for hardware_id, (seen_at, last_telemetry_at) in entries[start:start + chunk_size]]
+                incoming = values(column('hardware_id', String), column('seen_at', DateTime),
+                                  column('last_telemetry_at', DateTime), name='incoming').data(rows)
+                # CAST: si todas las filas traen last_telemetry_at nulo, PostgreSQL no puede inferir el tipo
+                db.execute(table.update().where(table.c.id_hardware_jetson == incoming.c.hardware_id).values(
+                    **self._last_seen_values(table, cast(incoming.c.seen_at, DateTime),
+                                             cast(incoming.c.last_telemetry_at, DateTime))))
+            return
+        stmt = table.update().where(table.c.id_hardware_jetson == bindparam('_hardware_id')).values(
+            **self._last_seen_values(table, bindparam('_seen_at', type_=DateTime),
+                                     bindparam('_last_telemetry_at', type_=DateTime)))
+        db.execute(stmt, [{'_hardware_id': hardware_id, '_seen_at': seen_at, '_last_telemetry_at': last_telemetry_at}
+                          for hardware_id, (seen_at, last_telemetry_at) in entries])
+
+    def _update_returning(self, db: Session, stmt, id_hardware_jetson: str) -> Optional[Row]:
+        """
+        Ejecuta un UPDATE de una fila y devuelve sus columnas de estado (activo, id_bus, estado_salud,
+        ultima_conexion_cloud_at) con UPDATE ... RETURNING, sin pasar por el identity map de la sesión.
+        En motores sin RETURNING, UPDATE y después SELECT.
+        """
+        table = self.model.__table__
+        columns = (table.c.activo, table.c.id_bus, table.c.estado_salud, table.c.ultima_conexion_cloud_at)
+        if db.get_bind().dialect.update_returning:
+            return db.execute(stmt.returning(*columns)).first()
+        if db.execute(stmt).rowcount != 1:
+            return None
+        return db.execute(select(*columns).where(table.c.id_hardware_jetson == id_hardware_jetson)).first()
+
+    def touch_returning(self, db: Session, id_hardware_jetson: str, seen_at: datetime,
+                        only_connected: bool = False) -> Optional[Row]:
+        """
+        Registra un contacto (latido) con una sola sentencia y devuelve el estado del dispositivo.
+        Con only_connected sólo actualiza si en la BD consta como conectado; devuelve None si no
+        actualizó nada. No hace commit.
+        """
+        table = self.model.__table__
+        stmt = table.update().where(table.c.id_hardware_jetson == id_hardware_jetson)
+        if only_connected:
+            stmt = stmt.where(table.c.estado_conexion == 'Conectado')
+        stmt = stmt.values(**self._last_seen_values(table, literal(seen_at, DateTime), literal(None, DateTime)))
+        return self._update_returning(db, stmt, id_hardware_jetson)
+
+    def claim_reconnection(self, db: Session, id_hardware_jetson: str, seen_at: datetime,
+                           last_telemetry_at: Optional[datetime]) -> Optional[Row]:
+        """
+        Escribe el contacto de un dispositivo y lo pasa a 'Conectado' sólo si en la BD constaba como
+        desconectado. Devuelve el estado del dispositivo si esta llamada hizo la reconexión (con varios
+        workers, sólo uno la cuenta) y None si no. No hace commit.
+        """
+        table = self.model.__table__
+        stmt = table.update().where(
+            table.c.id_hardware_jetson == id_hardware_jetson,
+            table.c.estado_conexion != 'Conectado'
+        ).values(estado_conexion='Conectado', estado_conexion_at=seen_at,
+                 **self._last_seen_values(table, literal(seen_at, DateTime), literal(last_telemetry_at, DateTime)))
+        return self._update_returning(db, stmt, id_hardware_jetson)
+
+    def mark_disconnected(self, db: Session, stale_before: datetime, now: datetime) -> List[Row]:
+        """
+        Pasa a 'Desconectado' los dispositivos conectados cuyo último contacto es anterior a
+        stale_before, con un único UPDATE condicional (recorre ix_jetson_nanos_estado_conexion_ultima_conexion,
+        así que sólo lee las filas que cambian). Devuelve (id_hardware_jetson, id_bus, activo,
+        ultima_conexion_cloud_at) de cada transición; con varios workers barriendo a la vez, cada
+        transición la devuelve uno solo. En motores sin RETURNING, SELECT ... FOR UPDATE y UPDATE. No hace commit.
+        """
+        table = self.model.__table__
+        stale = and_(table.c.estado_conexion == 'Conectado',
+                     or_(table.c.ultima_conexion_cloud_at.is_(None), table.c.ultima_conexion_cloud_at < stale_before))
+        columns = (table.c.id_hardware_jetson, table.c.id_bus, table.c.activo, table.c.ultima_conexion_cloud_at)
+        stmt = table.update().where(stale).values(estado_conexion='Desconectado', estado_conexion_at=now)
+        if db.get_bind().dialect.update_returning:
+            return db.execute(stmt.returning(*columns)).all()
+        rows = db.execute(select(*columns).where(stale).with_for_update()).all()
+        if rows:
+            db.execute(stmt.where(table.c.id_hardware_jetson.in_([row.id_hardware_jetson for row in rows])))
+        return rows
+
+    def set_estado_salud(self, db: Session, id_hardware_jetson: str, estado_salud: Optional[str]) -> None:
+        """Actualiza sólo estado_salud (sin cargar la entidad). No hace commit."""
+        table = self.model.__table__
+        db.execute(table.update().where(table.c.id_hardware_jetson == id_hardware_jetson).values(estado_salud=estado_salud))
+
+    def set_estados_salud(self, db: Session, estado_by_hardware_id: Dict[str, str]) -> None:
+        """Actualiza estado_salud de varios dispositivos con un UPDATE executemany (ordenado por id). No hace commit."""
+        if not estado_by_hardware_id:
+            return
+        table = self.model.__table__
+        stmt = table.update().where(table.c.id_hardware_jetson == bindparam('_hardware_id')).values(
+            estado_salud=bindparam('_estado_salud'))
+        db.execute(stmt, [{'_hardware_id': hardware_id, '_estado_salud': estado_salud}
+                          for hardware_id, estado_salud in sorted(estado_by_hardware_id.items())])
+
+    def connection_status_expression(self, stale_before: Optional[datetime] = None):
+        """
+        estado_conexion del listado en SQL: 'Mantenimiento' si no está activa y, si no, el persistido.
+        Con stale_before (barrido de desconexiones desactivado, nadie escribe 'Desconectado') se
+        calcula del último contacto: 'Conectado' si es posterior a stale_before.
+        """
+        if stale_before is None:
+            return case((self.model.activo.is_not(True), 'Mantenimiento'), else_=self.model.estado_conexion)
+        return case((self.model.activo.is_not(True), 'Mantenimiento'),
+                    (self.model.ultima_conexion_cloud_at >= stale_before, 'Conectado'), else_='Desconectado')
+
+    def connection_status_filter(self, estado_conexion: str, stale_before: Optional[datetime] = None):
+        """
+        Predicado equivalente a connection_status_expression(stale_before) == estado_conexion, sobre las
+        columnas para que use ix_jetson_nanos_estado_conexion_ultima_conexion.
+        """
+        if estado_conexion == 'Mantenimiento':
+            return self.model.activo.is_not(True)
+        if stale_before is None:
+            return and_(self.model.activo.is_(True), self.model.estado_conexion == estado_conexion)
+        if estado_conexion == 'Conectado':
+            return and_(self.model.activo.is_(True), self.model.ultima_conexion_cloud_at >= stale_before)
+        return and_(self.model.activo.is_(True), or_(self.model.ultima_conexion_cloud_at.is_(None),
+                                                     self.model.ultima_conexion_cloud_at < stale_before))
+
+    def get_listing(self, db: Session, estado_conexion: Optional[str] = None,
+                    estado_salud: Optional[str] = None, id_empresa: Optional[uuid.UUID] = None,
+                    after_hardware_id: Optional[str] = None, skip: int = 0, limit: int = 100,
+                    stale_before: Optional[datetime] = None) -> List[Tuple[JetsonNano, str]]:
+        """
+        Página del listado de Jetsons con su estado de conexión, ordenada por id_hardware_jetson.
+        Filtros opcionales por estado de conexión, estado de salud y empresa (la del bus).
+        Paginación por clave (id_hardware_jetson > after_hardware_id) u offset (skip).
+        El bus se carga con una consulta IN para toda la página. stale_before: ver connection_status_expression.
+        """
+        query = db.query(self.model, self.connection_status_expression(stale_before).label('estado_conexion')) \
+            .options(selectinload(self.model.bus))
+        if estado_conexion is not None:
+            query = query.filter(self.connection_status_filter(estado_conexion, stale_before))
+        if estado_salud is not None:
+            query = query.filter(self.model.estado_salud == estado_salud)
+        if id_empresa is not None:
+            query = query.join(Bus, self.model.id_bus == Bus.id).filter(Bus.id_empresa == id_empresa)
+        if after_hardware_id is not None:
+            query = query.filter(self.model.id_hardware_jetson > after_hardware_id)
+        return [tuple(row) for row in query.order_by(self.model.id_hardware_jetson).offset(skip).limit(limit).all()]
+
     def get_jetsons_by_bus(self, db: Session, bus_id: uuid.UUID, skip: int = 0, limit: int = 100) -> List[JetsonNano]:
         """
         Obtiene una lista de dispositivos Jetson Nano asociados a un bus específico.
@@ -1,31 +1,126 @@
 # app/crud/crud_jetson_telemetry.py
-from typing import Optional, List
+from typing import Optional, List, Iterator, Any, Tuple
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import Float, Row, and_, cast, delete, desc, func, or_, select
 
-from app.crud.crud_base import CRUDBase
+from app.crud.crud_base import CRUDBase, BULK_MAX_PARAMS
 from app.models_db.cloud_database_models import JetsonTelemetry # Importa el modelo JetsonTelemetry
 
+# Columnas numéricas de una muestra de telemetría
+TELEMETRY_METRIC_FIELDS = ('ram_usage_gb', 'cpu_usage_percent', 'disk_usage_gb', 'disk_usage_percent', 'temperatura_celsius')
+
 class CRUDJetsonTelemetry(CRUDBase[JetsonTelemetry]):
     """
     Clase CRUD específica para el modelo JetsonTelemetry.
     Hereda la funcionalidad básica de CRUDBase y añade métodos específicos
     para la consulta de datos de telemetría de Jetson.
+    La tabla está particionada por mes en timestamp_telemetry: pasar start_time/end_time
+    ([start_time, end_time)) permite que la consulta sólo lea las particiones del rango.
     """
-    def get_telemetry_by_hardware_id(self, db: Session, id_hardware_jetson: str, skip: int = 0, limit: int = 100) -> List[JetsonTelemetry]:
+    def get_telemetry_by_hardware_id(self, db: Session, id_hardware_jetson: str, skip: int = 0, limit: int = 100,
+                                     start_time: Optional[datetime] = None, end_time: Optional[datetime] = None,
+                                     before: Optional[Tuple[datetime, uuid.UUID]] = None) -> List[JetsonTelemetry]:
         """
-        Obtiene una lista de registros de telemetría para un Jetson Nano específico por su ID de hardware.
+        Obtiene una lista de registros de telemetría para un Jetson Nano específico por su ID de hardware,
+        de la más reciente a la más antigua (a igual timestamp, por id descendente).
+        Con before=(timestamp_telemetry, id) sólo devuelve las muestras anteriores a esa (paginación por cursor).
         """
-        return db.query(self.model).filter(self.model.id_hardware_jetson == id_hardware_jetson).order_by(desc(self.model.timestamp_telemetry)).offset(skip).limit(limit).all()
+        query = db.query(self.model).filter(self.model.id_hardware_jetson == id_hardware_jetson)
+        if before is not None:
+            before_time, before_id = before
+            end_time = min(end_time, before_time + timedelta(microseconds=1)) if end_time else before_time + timedelta(microseconds=1)
+            query = query.filter(or_(self.model.timestamp_telemetry < before_time,
+                                     and_(self.model.timestamp_telemetry == before_time, self.model.id < before_id)))
+        query = self._apply_time_range(query, self.model.timestamp_telemetry, start_time, end_time)
+        return query.order_by(desc(self.model.timestamp_telemetry), desc(self.model.id)).offset(skip).limit(limit).all()
 
-    def get_recent_telemetry_for_jetson(self, db: Session, id_hardware_jetson: str) -> Optional[JetsonTelemetry]:
+    def get_recent_telemetry_for_jetson(self, db: Session, id_hardware_jetson: str,
+                                        start_time: Optional[datetime] = None) -> Optional[JetsonTelemetry]:
         """
         Obtiene el registro de telemetría más reciente para un Jetson Nano específico.
+        Con start_time sólo se buscan las particiones a partir de esa fecha.
+        """
+        query = db.query(self.model).filter(self.model.id_hardware_jetson == id_hardware_jetson)
+        query = self._apply_time_range(query, self.model.timestamp_telemetry, start_time)
+        return query.order_by(desc(self.model.timestamp_telemetry)).first()
+
+    def count_in_range(self, db: Session, id_hardware_jetson: str, start_time: datetime, end_time: datetime, cap: int) -> int:
+        """
+        Cuenta las muestras de un dispositivo en [start_time, end_time), como mucho 'cap'
+        (la subconsulta con LIMIT evita recorrer todo el rango para decidir si cabe en un presupuesto).
+        """
+        subquery = select(self.model.id).where(
+            self.model.id_hardware_jetson == id_hardware_jetson,
+            self.model.timestamp_telemetry >= start_time,
+            self.model.timestamp_telemetry < end_time
+        ).limit(cap).subquery()
+        return db.execute(select(func.count()).select_from(subquery)).scalar() or 0
+
+    def iter_samples(self, db: Session, start_time: datetime, end_time: datetime,
+                     id_hardware_jetson: Optional[str] = None, batch_size: int = 5000,
+                     with_ids: bool = False) -> Iterator[Any]:
+        """
+        Recorre en streaming las muestras de [start_time, end_time) (id_hardware_jetson, timestamp y
+        métricas; con with_ids también id y created_at, ordenadas por timestamp), sin cargar el rango
+        completo en memoria.
+        """
+        columns = [self.model.id_hardware_jetson, self.model.timestamp_telemetry] + [getattr(self.model, field) for field in TELEMETRY_METRIC_FIELDS]
+        if with_ids:
+            columns += [self.model.id, self.model.created_at]
+        query = select(*columns).where(self.model.timestamp_telemetry >= start_time, self.model.timestamp_telemetry < end_time)
+        if id_hardware_jetson is not None:
+            query = query.where(self.model.id_hardware_jetson == id_hardware_jetson)
+        if with_ids:
+            query = query.order_by(self.model.timestamp_telemetry)
+        yield from db.execute(query.execution_options(yield_per=batch_size)).mappings()
+
+    def get_metric_window(self, db: Session, start_time: datetime, end_time: datetime,
+                          id_hardware_jetson: Optional[str] = None, with_ids: bool = False) -> List[Row]:
+        """
+        Muestras de [start_time, end_time) (de toda la flota o de un dispositivo) en una sola consulta,
+        como tuplas (id_hardware_jetson, timestamp_telemetry, métricas en float o None[, id]) ordenadas
+        por dispositivo y timestamp. Es la entrada de los cálculos que las convierten en arrays
+        (análisis de salud, LTTB del historial).
+        """
+        columns = [cast(getattr(self.model, field), Float) for field in TELEMETRY_METRIC_FIELDS]
+        if with_ids:
+            columns.append(self.model.id)
+        query = select(self.model.id_hardware_jetson, self.model.timestamp_telemetry, *columns).where(
+            self.model.timestamp_telemetry >= start_time,
+            self.model.timestamp_telemetry < end_time
+        )
+        if id_hardware_jetson is not None:
+            query = query.where(self.model.id_hardware_jetson == id_hardware_jetson)
+        return db.execute(query.order_by(self.model.id_hardware_jetson, self.model.timestamp_telemetry)).all()
+
+    def get_oldest_timestamp(self, db: Session, before: datetime) -> Optional[datetime]:
+        """Timestamp de la muestra más antigua anterior a 'before' (None si no hay)."""
+        return db.execute(select(func.min(self.model.timestamp_telemetry))
+                          .where(self.model.timestamp_telemetry < before)).scalar()
+
+    def get_hardware_ids_in_range(self, db: Session, start_time: datetime, end_time: datetime) -> List[str]:
+        """Dispositivos con alguna muestra en [start_time, end_time)."""
+        return list(db.execute(select(self.model.id_hardware_jetson).where(
+            self.model.timestamp_telemetry >= start_time,
+            self.model.timestamp_telemetry < end_time
+        ).distinct()).scalars())
+
+    def delete_by_ids(self, db: Session, ids: List[uuid.UUID], start_time: datetime, end_time: datetime) -> int:
+        """
+        Borra las muestras con esos ids dentro de [start_time, end_time) (el rango limita el borrado
+        a sus particiones), en lotes. No hace commit.
         """
-        return db.query(self.model).filter(self.model.id_hardware_jetson == id_hardware_jetson).order_by(desc(self.model.timestamp_telemetry)).first()
+        deleted = 0
+        for start in range(0, len(ids), BULK_MAX_PARAMS):
+            deleted += db.execute(delete(self.model).where(
+                self.model.timestamp_telemetry >= start_time,
+                self.model.timestamp_telemetry < end_time,
+                self.model.id.in_(ids[start:start + BULK_MAX_PARAMS])
+            )).rowcount
+        return deleted
 
 # Instancia de la clase CRUD para JetsonTelemetry.
 jetson_telemetry_crud = CRUDJetsonTelemetry(JetsonTelemetry)
@@ -0,0 +1,106 @@
+# app/crud/crud_jetson_telemetry_rollup.py
+from typing import Optional, List, Dict, Any
+from datetime import datetime
+
+from sqlalchemy import Row, case, delete, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.crud.crud_base import CRUDBase, BULK_MAX_PARAMS
+from app.models_db.cloud_database_models import JetsonTelemetryRollup # Importa el modelo JetsonTelemetryRollup
+
+ROLLUP_KEY_FIELDS = ('id_hardware_jetson', 'resolucion', 'bucket_inicio', 'metrica')
+
+class CRUDJetsonTelemetryRollup(CRUDBase[JetsonTelemetryRollup]):
+    """
+    Clase CRUD específica para los agregados de telemetría (jetson_telemetry_rollups).
+    Los métodos no hacen commit: el llamador controla la transacción.
+    """
+    def merge(self, db: Session, rows: List[Dict[str, Any]]) -> None:
+        """
+        Combina agregados parciales (minimo, maximo, suma, conteo) con los existentes:
+        INSERT ... ON CONFLICT DO UPDATE multi-fila en PostgreSQL y SQLite, y un camino portable
+        (SELECT de las claves existentes, UPDATE por fila e INSERT multi-fila) en otros motores.
+        """
+        if not rows:
+            return
+        table = self.model.__table__
+        dialect_name = db.get_bind().dialect.name
+        chunk_size = max(1, BULK_MAX_PARAMS // 8)
+
+        if dialect_name in ('postgresql', 'sqlite'):
+            dialect_insert = postgresql_insert if dialect_name == 'postgresql' else sqlite_insert
+            for start in range(0, len(rows), chunk_size):
+                stmt = dialect_insert(table).values(rows[start:start + chunk_size])
+                excluded = stmt.excluded
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[table.c[name] for name in ROLLUP_KEY_FIELDS],
+                    set_={
+                        'minimo': case((excluded.minimo < table.c.minimo, excluded.minimo), else_=table.c.minimo),
+                        'maximo': case((excluded.maximo > table.c.maximo, excluded.maximo), else_=table.c.maximo),
+                        'suma': table.c.suma + excluded.suma,
+                        'conteo': table.c.conteo + excluded.conteo,
+                    }
+                )
+                db.execute(stmt)
+            return
+
+        key_columns = tuple_(*(table.c[name] for name in ROLLUP_KEY_FIELDS))
+        existing = set()
+        for start in range(0, len(rows), chunk_size):
+            keys = [tuple(row[name] for name in ROLLUP_KEY_FIELDS) for row in rows[start:start + chunk_size]]
+            existing.update(tuple(row) for row in db.execute(select(*(table.c[name] for name in ROLLUP_KEY_FIELDS)).where(key_columns.in_(keys))))
+        new_rows = []
+        for row in rows:
+            key = tuple(row[name] for name in ROLLUP_KEY_FIELDS)
+            if key not in existing:
+                new_rows.append(row)
+                continue
+            db.execute(table.update().where(*(table.c[name] == row[name] for name in ROLLUP_KEY_FIELDS)).values(
+                minimo=case((table.c.minimo > row['minimo'], row['minimo']), else_=table.c.minimo),
+                maximo=case((table.c.maximo < row['maximo'], row['maximo']), else_=table.c.maximo),
+                suma=table.c.suma + row['suma'],
+                conteo=table.c.conteo + row['conteo'],
+            ))
+        self.bulk_insert(db, new_rows)
+
+    def replace_range(self, db: Session, start_time: datetime, end_time: datetime, rows: List[Dict[str, Any]],
+                      id_hardware_jetson: Optional[str] = None) -> None:
+        """
+        Sustituye los agregados cuyo intervalo empieza en [start_time, end_time) (de todos los
+        dispositivos o de uno) por 'rows'. Lo usa el backfill, que recalcula desde los datos crudos.
+        """
+        stmt = delete(self.model).where(self.model.bucket_inicio >= start_time, self.model.bucket_inicio < end_time)
+        if id_hardware_jetson is not None:
+            stmt = stmt.where(self.model.id_hardware_jetson == id_hardware_jetson)
+        db.execute(stmt)
+        self.bulk_insert(db, rows)
+
+    def get_range(self, db: Session, id_hardware_jetson: str, resolucion: str,
+                  start_time: datetime, end_time: datetime) -> List[JetsonTelemetryRollup]:
+        """
+        Agregados de un dispositivo y resolución con inicio en [start_time, end_time), ordenados por intervalo.
+        """
+        return db.query(self.model).filter(
+            self.model.id_hardware_jetson == id_hardware_jetson,
+            self.model.resolucion == resolucion,
+            self.model.bucket_inicio >= start_time,
+            self.model.bucket_inicio < end_time
+        ).order_by(self.model.bucket_inicio, self.model.metrica).all()
+
+    def get_average_series(self, db: Session, id_hardware_jetson: str, resolucion: str,
+                           start_time: datetime, end_time: datetime) -> List[Row]:
+        """
+        Media (suma / conteo) de cada métrica por intervalo con inicio en [start_time, end_time), como
+        tuplas (metrica, bucket_inicio, media) ordenadas por métrica e intervalo, sin cargar entidades.
+        """
+        return db.execute(select(self.model.metrica, self.model.bucket_inicio, self.model.suma / self.model.conteo).where(
+            self.model.id_hardware_jetson == id_hardware_jetson,
+            self.model.resolucion == resolucion,
+            self.model.bucket_inicio >= start_time,
+            self.model.bucket_inicio < end_time
+        ).order_by(self.model.metrica, self.model.bucket_inicio)).all()
+
+# Instancia de la clase CRUD para JetsonTelemetryRollup.
+jetson_telemetry_rollup_crud = CRUDJetsonTelemetryRollup(JetsonTelemetryRollup)
@@ -0,0 +1,77 @@
+# app/crud/crud_notificacion_outbox.py
+from typing import Any, Dict, List
+import uuid
+from datetime import datetime
+
+from sqlalchemy import and_, bindparam, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.crud.crud_base import CRUDBase
+from app.models_db.cloud_database_models import NotificacionOutbox # Importa el modelo NotificacionOutbox
+
+class CRUDNotificacionOutbox(CRUDBase[NotificacionOutbox]):
+    """
+    Clase CRUD específica para el outbox de notificaciones.
+    Los métodos no hacen commit: el dispatcher controla sus transacciones.
+    """
+    def _claimable(self, now: datetime):
+        """Pendientes cuyo próximo intento ya llegó, o reclamados cuyo lease venció (dispatcher caído)."""
+        return or_(
+            and_(self.model.estado == 'Pendiente', self.model.proximo_intento_at <= now),
+            and_(self.model.estado == 'Enviando', self.model.lease_hasta < now),
+        )
+
+    def claim_due(self, db: Session, now: datetime, lease_until: datetime, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Reclama hasta 'limit' mensajes listos para enviar: pasan a 'Enviando' con lease hasta lease_until.
+        El UPDATE repite la condición, así que si dos dispatchers eligen el mismo mensaje sólo uno lo reclama.
+
+        Returns:
+            List[Dict[str, Any]]: Los mensajes reclamados (id, id_alerta, canal, destinatario, asunto, cuerpo, intentos).
+        """
+        model = self.model
+        candidate_ids = db.execute(
+            select(model.id).where(self._claimable(now)).order_by(model.proximo_intento_at).limit(limit)
+        ).scalars().all()
+        if not candidate_ids:
+            return []
+
+        columns = (model.id, model.id_alerta, model.canal, model.destinatario, model.asunto, model.cuerpo, model.intentos)
+        stmt = update(model).where(model.id.in_(candidate_ids), self._claimable(now)).values(
+            estado='Enviando', lease_hasta=lease_until
+        )
+        if db.get_bind().dialect.name in ('postgresql', 'sqlite'):
+            rows = db.execute(stmt.returning(*columns), execution_options={"synchronize_session": False}).all()
+        else:
+            # Sin RETURNING: el lease recién asignado identifica los mensajes reclamados por esta llamada.
+            db.execute(stmt, execution_options={"synchronize_session": False})
+            rows = db.execute(select(*columns).where(
+                model.id.in_(candidate_ids), model.estado == 'Enviando', model.lease_hasta == lease_until
+            )).all()
+        return [row._asdict() for row in rows]
+
+    def record_results(self, db: Session, results: List[Dict[str, Any]]) -> None:
+        """
+        Guarda el resultado de cada envío con un UPDATE executemany. Cada resultado trae
+        id, estado, intentos, proximo_intento_at, ultimo_error y enviada_at.
+        """
+        if not results:
+            return
+        stmt = update(self.model.__table__).where(self.model.__table__.c.id == bindparam('_id')).values(
+            estado=bindparam('estado'), intentos=bindparam('intentos'),
+            proximo_intento_at=bindparam('proximo_intento_at'), ultimo_error=bindparam('ultimo_error'),
+            enviada_at=bindparam('enviada_at'), lease_hasta=None
+        )
+        db.execute(stmt, [{'_id': result['id'], **{key: value for key, value in result.items() if key != 'id'}}
+                          for result in results])
+
+    def count_by_estado(self, db: Session) -> Dict[str, int]:
+        """Número de mensajes por estado (para monitorizar el outbox)."""
+        return dict(db.execute(select(self.model.estado, func.count()).group_by(self.model.estado)).all())
+
+    def get_by_alerta(self, db: Session, alerta_id: uuid.UUID) -> List[NotificacionOutbox]:
+        """Mensajes del outbox de una alerta, en orden de creación."""
+        return db.query(self.model).filter(self.model.id_alerta == alerta_id).order_by(self.model.created_at).all()
+
+# Instancia de la clase CRUD para NotificacionOutbox.
+notificacion_outbox_crud = CRUDNotificacionOutbox(NotificacionOutbox)
@@ -0,0 +1,41 @@
+# app/crud/crud_regla_alerta.py
+from typing import Optional, List, Tuple
+import uuid
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+
+from app.crud.crud_base import CRUDBase
+from app.models_db.cloud_database_models import ReglaAlerta # Importa el modelo ReglaAlerta
+
+class CRUDReglaAlerta(CRUDBase[ReglaAlerta]):
+    """
+    Clase CRUD específica para el modelo ReglaAlerta.
+    Hereda la funcionalidad básica de CRUDBase y añade las consultas que usa
+    el motor de reglas de alertas.
+    """
+    def get_rules_by_empresa(self, db: Session, empresa_id: Optional[uuid.UUID], skip: int = 0, limit: int = 100) -> List[ReglaAlerta]:
+        """
+        Obtiene las reglas de una empresa (o las globales si empresa_id es None).
+        """
+        return db.query(self.model).filter(self.model.id_empresa == empresa_id).order_by(
+            self.model.tipo_evento, self.model.prioridad
+        ).offset(skip).limit(limit).all()
+
+    def get_all_rules(self, db: Session) -> List[ReglaAlerta]:
+        """
+        Obtiene todas las reglas (activas e inactivas) de todas las empresas, para compilarlas.
+        """
+        return db.query(self.model).all()
+
+    def get_rules_version(self, db: Session) -> Tuple[int, Optional[datetime]]:
+        """
+        Versión del conjunto de reglas: (número de reglas, última modificación).
+        Cambia con cualquier alta, baja o modificación; es una sola consulta agregada.
+        """
+        count, last_updated = db.query(func.count(self.model.id), func.max(self.model.last_updated_at)).one()
+        return count, last_updated
+
+# Instancia de la clase CRUD para ReglaAlerta.
+regla_alerta_crud = CRUDReglaAlerta(ReglaAlerta)
@@ -1,5 +1,5 @@
 # app/crud/crud_sesion_conduccion.py
-from typing import Optional, List
+from typing import Optional, List, Set
 import uuid
 from datetime import datetime
 
@@ -21,6 +21,17 @@ class CRUDSesionConduccion(CRUDBase[SesionConduccion]):
         """
         return db.query(self.model).filter(self.model.id_sesion_conduccion_jetson == jetson_session_id).first()
 
+    def get_existing_jetson_session_ids(self, db: Session, jetson_session_ids: List[uuid.UUID]) -> Set[uuid.UUID]:
+        """
+        Devuelve cuáles de los IDs de sesión de la Jetson existen en la nube, con una sola consulta IN.
+        """
+        if not jetson_session_ids:
+            return set()
+        rows = db.query(self.model.id_sesion_conduccion_jetson).filter(
+            self.model.id_sesion_conduccion_jetson.in_(jetson_session_ids)
+        ).all()
+        return {row[0] for row in rows}
+
     def get_active_session_for_bus(self, db: Session, bus_id: uuid.UUID) -> Optional[SesionConduccion]:
         """
         Obtiene la sesión de conducción activa actualmente para un bus específico.
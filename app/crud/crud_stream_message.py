@@ -0,0 +1,43 @@
+# app/crud/crud_stream_message.py
+from typing import Optional, List, Sequence
+import uuid
+from datetime import datetime
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from app.crud.crud_base import CRUDBase
+from app.models_db.cloud_database_models import StreamMessage # Importa el modelo StreamMessage
+
+class CRUDStreamMessage(CRUDBase[StreamMessage]):
+    """
+    Clase CRUD específica para el registro del stream en vivo (stream_messages).
+    """
+    def get_after(self, db: Session, after_id: int, limit: int = 1000, tipos: Optional[Sequence[str]] = None,
+                  id_empresa: Optional[uuid.UUID] = None, id_bus: Optional[uuid.UUID] = None) -> List[StreamMessage]:
+        """
+        Obtiene los mensajes con id > after_id en orden de id, con filtros opcionales.
+        """
+        query = select(self.model).where(self.model.id > after_id)
+        if tipos:
+            query = query.where(self.model.tipo.in_(list(tipos)))
+        if id_empresa is not None:
+            query = query.where(self.model.id_empresa == id_empresa)
+        if id_bus is not None:
+            query = query.where(self.model.id_bus == id_bus)
+        return db.execute(query.order_by(self.model.id).limit(limit)).scalars().all()
+
+    def get_by_ids(self, db: Session, ids: Sequence[int]) -> List[StreamMessage]:
+        if not ids:
+            return []
+        return db.execute(select(self.model).where(self.model.id.in_(list(ids))).order_by(self.model.id)).scalars().all()
+
+    def get_max_id(self, db: Session) -> int:
+        return db.execute(select(func.max(self.model.id))).scalar() or 0
+
+    def delete_older_than(self, db: Session, cutoff: datetime) -> int:
+        """Elimina los mensajes anteriores a cutoff (sin commit)."""
+        return db.execute(delete(self.model).where(self.model.created_at < cutoff)).rowcount
+
+# Instancia de la clase CRUD para StreamMessage.
+stream_message_crud = CRUDStreamMessage(StreamMessage)
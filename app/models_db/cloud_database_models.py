@@ -1,7 +1,7 @@
 # app/models_db/cloud_database_models.py
 import uuid
 from datetime import datetime, date
-from sqlalchemy import Column, String, Integer, DateTime, Date, Boolean, Numeric, ForeignKey, Text, JSON
+from sqlalchemy import Column, String, Integer, BigInteger, Float, DateTime, Date, Boolean, Numeric, ForeignKey, Text, JSON, Index
 from sqlalchemy.dialects.postgresql import UUID 
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
@@ -27,6 +27,7 @@ class Empresa(Base):
     buses = relationship("Bus", back_populates="empresa") 
     conductores = relationship("Conductor", back_populates="empresa") 
     usuarios = relationship("Usuario", back_populates="empresa") 
+    reglas_alerta = relationship("ReglaAlerta", back_populates="empresa")
 
     def __repr__(self):
         return f"<Empresa(id='{self.id}', nombre_empresa='{self.nombre_empresa}')>"
@@ -34,7 +35,7 @@ class Empresa(Base):
 class Bus(Base):
     __tablename__ = 'buses'
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
-    id_empresa = Column(UUID(as_uuid=True), ForeignKey('empresas.id'), nullable=False) 
+    id_empresa = Column(UUID(as_uuid=True), ForeignKey('empresas.id'), nullable=False, index=True) # Filtros por empresa (listados, contadores)
     placa = Column(String, nullable=False)
     numero_interno = Column(String, nullable=False) 
     marca = Column(String)
@@ -145,6 +146,13 @@ class SesionConduccion(Base):
 
 class JetsonNano(Base):
     __tablename__ = 'jetson_nanos'
+    # Índices del listado filtrado: estado de conexión, estado de salud y bus (empresa). El de estado de
+    # conexión + último contacto es además el que recorre el barrido de desconexiones (jetson_connectivity_service).
+    __table_args__ = (
+        Index('ix_jetson_nanos_estado_conexion_ultima_conexion', 'estado_conexion', 'ultima_conexion_cloud_at'),
+        Index('ix_jetson_nanos_estado_salud', 'estado_salud'),
+        Index('ix_jetson_nanos_id_bus', 'id_bus'),
+    )
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
     id_hardware_jetson = Column(String, unique=True, nullable=False) 
     id_bus = Column(UUID(as_uuid=True), ForeignKey('buses.id'), nullable=True) 
@@ -153,6 +161,10 @@ class JetsonNano(Base):
     ultima_actualizacion_firmware_at = Column(DateTime)
     ultima_conexion_cloud_at = Column(DateTime) 
     last_telemetry_at = Column(DateTime) # Keep this to track last telemetry arrival
+    # 'Conectado' / 'Desconectado', persistido en cada transición: la reconexión la escribe el primer contacto
+    # y la desconexión el barrido periódico. 'Mantenimiento' se deriva de activo.
+    estado_conexion = Column(String, default='Desconectado', nullable=False)
+    estado_conexion_at = Column(DateTime) # Momento de la última transición
     fecha_instalacion = Column(DateTime, default=datetime.utcnow)
     activo = Column(Boolean, default=True)
     observaciones = Column(Text)
@@ -168,9 +180,15 @@ class JetsonNano(Base):
 
 class JetsonTelemetry(Base): # NEW TABLE
     __tablename__ = 'jetson_telemetry'
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
+    # Tabla particionada por mes en PostgreSQL (ver partition_maintenance_service).
+    # La clave de partición debe formar parte de la PK, por eso la PK es (id, timestamp_telemetry).
+    __table_args__ = (
+        Index('ix_jetson_telemetry_hardware_timestamp', 'id_hardware_jetson', 'timestamp_telemetry'),
+        {'postgresql_partition_by': 'RANGE (timestamp_telemetry)'},
+    )
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, nullable=False)
     id_hardware_jetson = Column(String, ForeignKey('jetson_nanos.id_hardware_jetson'), nullable=False) # Link to JetsonNano by its hardware ID
-    timestamp_telemetry = Column(DateTime, default=datetime.utcnow, nullable=False)
+    timestamp_telemetry = Column(DateTime, primary_key=True, default=datetime.utcnow, nullable=False)
     ram_usage_gb = Column(Numeric)
     cpu_usage_percent = Column(Numeric)
     disk_usage_gb = Column(Numeric)
@@ -185,16 +203,46 @@ class JetsonTelemetry(Base): # NEW TABLE
         return (f"<JetsonTelemetry(id='{self.id}', hardware_id='{self.id_hardware_jetson}', "
                 f"timestamp='{self.timestamp_telemetry}', cpu='{self.cpu_usage_percent}')>")
 
+class JetsonTelemetryRollup(Base):
+    """
+    Agregados de telemetría por dispositivo, resolución ('1m', '1h', '1d'), inicio del intervalo y
+    métrica (una de las columnas numéricas de JetsonTelemetry). Se actualizan al ingerir cada muestra
+    (min/max/suma/conteo se combinan en el upsert) y se pueden recalcular con el comando de backfill.
+    La media es suma / conteo.
+    """
+    __tablename__ = 'jetson_telemetry_rollups'
+    id_hardware_jetson = Column(String, ForeignKey('jetson_nanos.id_hardware_jetson'), primary_key=True, nullable=False)
+    resolucion = Column(String, primary_key=True, nullable=False)
+    bucket_inicio = Column(DateTime, primary_key=True, nullable=False)
+    metrica = Column(String, primary_key=True, nullable=False)
+    minimo = Column(Float, nullable=False)
+    maximo = Column(Float, nullable=False)
+    suma = Column(Float, nullable=False)
+    conteo = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return (f"<JetsonTelemetryRollup(hardware_id='{self.id_hardware_jetson}', resolucion='{self.resolucion}', "
+                f"bucket='{self.bucket_inicio}', metrica='{self.metrica}', conteo='{self.conteo}')>")
+
 # --- Datos Transaccionales (Cloud) ---
 
 class Evento(Base):
     __tablename__ = 'eventos'
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
+    # Tabla particionada por mes en PostgreSQL (ver partition_maintenance_service).
+    # La clave de partición debe formar parte de la PK, por eso la PK es (id, timestamp_evento).
+    __table_args__ = (
+        Index('ix_eventos_bus_timestamp', 'id_bus', 'timestamp_evento'),
+        Index('ix_eventos_conductor_timestamp', 'id_conductor', 'timestamp_evento'),
+        Index('ix_eventos_sesion', 'id_sesion_conduccion'),
+        Index('ix_eventos_timestamp', 'timestamp_evento'),
+        {'postgresql_partition_by': 'RANGE (timestamp_evento)'},
+    )
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, nullable=False)
     id_local_jetson = Column(Integer, nullable=True) 
     id_bus = Column(UUID(as_uuid=True), ForeignKey('buses.id'), nullable=False)
     id_conductor = Column(UUID(as_uuid=True), ForeignKey('conductores.id'), nullable=False)
     id_sesion_conduccion = Column(UUID(as_uuid=True), ForeignKey('sesiones_conduccion.id_sesion_conduccion_jetson'), nullable=True) 
-    timestamp_evento = Column(DateTime, nullable=False)
+    timestamp_evento = Column(DateTime, primary_key=True, nullable=False)
     tipo_evento = Column(String, nullable=False) 
     subtipo_evento = Column(String) 
     duracion_segundos = Column(Numeric) 
@@ -212,7 +260,8 @@ class Evento(Base):
     bus = relationship("Bus", back_populates="eventos")
     conductor = relationship("Conductor", back_populates="eventos")
     sesion_conduccion = relationship("SesionConduccion", back_populates="eventos")
-    alerta = relationship("Alerta", uselist=False, back_populates="evento") 
+    alerta = relationship("Alerta", uselist=False, back_populates="evento",
+                          primaryjoin="Evento.id == foreign(Alerta.id_evento)") 
 
     def __repr__(self):
         return (f"<Evento(id='{self.id}', bus='{self.id_bus}', conductor='{self.id_conductor}', "
@@ -247,8 +296,10 @@ class CalificacionConductor(Base):
 class Alerta(Base):
     __tablename__ = 'alertas'
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
-    id_evento = Column(UUID(as_uuid=True), ForeignKey('eventos.id'), nullable=True) 
-    id_conductor = Column(UUID(as_uuid=True), ForeignKey('conductores.id'), nullable=False)
+    # Sin FK: 'eventos' está particionada y su PK es (id, timestamp_evento), así que eventos.id no es único por sí solo.
+    id_evento = Column(UUID(as_uuid=True), nullable=True, index=True) 
+    # Nulo en las alertas de salud de las Jetson (device_health_service), que no tienen conductor.
+    id_conductor = Column(UUID(as_uuid=True), ForeignKey('conductores.id'), nullable=True)
     id_bus = Column(UUID(as_uuid=True), ForeignKey('buses.id'), nullable=False)
     id_sesion_conduccion = Column(UUID(as_uuid=True), ForeignKey('sesiones_conduccion.id_sesion_conduccion_jetson'), nullable=True)
     timestamp_alerta = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -267,7 +318,7 @@ class Alerta(Base):
     # Relaciones
     conductor = relationship("Conductor", back_populates="alertas")
     bus = relationship("Bus", back_populates="alertas")
-    evento = relationship("Evento", back_populates="alerta")
+    evento = relationship("Evento", back_populates="alerta", primaryjoin="foreign(Alerta.id_evento) == Evento.id")
     sesion_conduccion = relationship("SesionConduccion", back_populates="alertas")
 
     gestionada_por_usuario = relationship("Usuario", back_populates="alertas_gestionadas_rel") # Corrected back_populates
@@ -276,6 +327,118 @@ class Alerta(Base):
         return (f"<Alerta(id='{self.id}', tipo='{self.tipo_alerta}', criticidad='{self.nivel_criticidad}', "
                 f"estado='{self.estado_alerta}', time='{self.timestamp_alerta}')>")
 
+class ReglaAlerta(Base):
+    """
+    Regla de disparo de alertas a partir de eventos, configurable por empresa.
+    id_empresa NULL = regla global (aplica a todas las empresas que no la redefinan).
+    subtipo_evento NULL = aplica a cualquier subtipo del tipo_evento.
+    Sin campo_condicion la regla dispara siempre; con él, si el valor del evento >= umbral.
+    Con ventana_minutos la regla es de correlación: dispara cuando hay al menos conteo_minimo
+    eventos que la cumplen en esa ventana para el mismo conductor o bus (agrupar_por).
+    """
+    __tablename__ = 'reglas_alerta'
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
+    id_empresa = Column(UUID(as_uuid=True), ForeignKey('empresas.id'), nullable=True, index=True)
+    tipo_evento = Column(String, nullable=False)
+    subtipo_evento = Column(String, nullable=True)
+    campo_condicion = Column(String, nullable=True) # Ej. 'duracion_segundos', 'confidence_score_ia'
+    umbral = Column(Numeric, nullable=True)
+    tipo_alerta = Column(String, nullable=False)
+    descripcion_plantilla = Column(Text, nullable=False) # Ej. "El conductor se distrajo por {duracion_segundos} segundos."
+    nivel_criticidad = Column(String, nullable=False)
+    cooldown_minutos = Column(Integer, default=0, nullable=False)
+    prioridad = Column(Integer, default=100, nullable=False) # Menor = se evalúa antes
+    ventana_minutos = Column(Integer, nullable=True) # Sólo reglas de correlación
+    conteo_minimo = Column(Integer, nullable=True)
+    agrupar_por = Column(String, nullable=True) # 'conductor' (por defecto) o 'bus'
+    activa = Column(Boolean, default=True, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    # Relaciones
+    empresa = relationship("Empresa", back_populates="reglas_alerta")
+
+    def __repr__(self):
+        return (f"<ReglaAlerta(id='{self.id}', empresa='{self.id_empresa}', evento='{self.tipo_evento}/{self.subtipo_evento}', "
+                f"alerta='{self.tipo_alerta}', activa='{self.activa}')>")
+
+class AlertaCooldown(Base):
+    """
+    Última alerta disparada por (bus, tipo de alerta). Es el estado compartido entre workers
+    del periodo de enfriamiento de las alertas; cada proceso lo cachea en memoria.
+    """
+    __tablename__ = 'alertas_cooldown'
+    id_bus = Column(UUID(as_uuid=True), ForeignKey('buses.id'), primary_key=True, nullable=False)
+    tipo_alerta = Column(String, primary_key=True, nullable=False)
+    ultima_alerta_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<AlertaCooldown(bus='{self.id_bus}', tipo='{self.tipo_alerta}', ultima='{self.ultima_alerta_at}')>"
+
+class NotificacionOutbox(Base):
+    """
+    Outbox de notificaciones de alertas: un mensaje por (alerta, canal, destinatario), escrito en la
+    misma transacción que la Alerta y entregado después por el NotificationDispatcher.
+    estado: 'Pendiente' -> 'Enviando' (reclamado, con lease) -> 'Enviada' | 'Fallida' (agotó reintentos).
+    """
+    __tablename__ = 'notificaciones_outbox'
+    __table_args__ = (
+        Index('ix_notificaciones_outbox_estado_proximo', 'estado', 'proximo_intento_at'),
+    )
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
+    id_alerta = Column(UUID(as_uuid=True), ForeignKey('alertas.id'), nullable=False, index=True)
+    canal = Column(String, nullable=False) # 'email', 'sms', 'dashboard'
+    destinatario = Column(String, nullable=False)
+    asunto = Column(String, nullable=True)
+    cuerpo = Column(Text, nullable=False)
+    estado = Column(String, default='Pendiente', nullable=False)
+    intentos = Column(Integer, default=0, nullable=False)
+    proximo_intento_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    lease_hasta = Column(DateTime, nullable=True) # Mientras está 'Enviando'; vencido, otro dispatcher lo reclama
+    ultimo_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    enviada_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return (f"<NotificacionOutbox(id='{self.id}', alerta='{self.id_alerta}', canal='{self.canal}', "
+                f"estado='{self.estado}', intentos='{self.intentos}')>")
+
+class StreamMessage(Base):
+    """
+    Registro compartido de los mensajes del stream en vivo (SSE) de alertas y eventos.
+    Se escribe en la misma transacción que la ingesta; cada worker lo lee en orden de id y lo
+    reparte a sus suscriptores. El id creciente es el 'id' SSE (reanudación con Last-Event-ID).
+    """
+    __tablename__ = 'stream_messages'
+    # BIGSERIAL en PostgreSQL; en SQLite sólo INTEGER PRIMARY KEY es autoincremental
+    id = Column(BigInteger().with_variant(Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    tipo = Column(String, nullable=False) # 'alerta', 'evento' o 'conexion'
+    id_empresa = Column(UUID(as_uuid=True), nullable=True)
+    id_bus = Column(UUID(as_uuid=True), nullable=True)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<StreamMessage(id='{self.id}', tipo='{self.tipo}', empresa='{self.id_empresa}', bus='{self.id_bus}')>"
+
+class ContadorDashboard(Base):
+    """
+    Contadores del resumen del dashboard por empresa. Se incrementan/decrementan en la misma
+    transacción que el cambio que los mueve (alerta creada o gestionada, sesión abierta o cerrada,
+    Jetson que vuelve a conectarse) y una tarea periódica los recalcula para corregir la deriva.
+    """
+    __tablename__ = 'contadores_dashboard'
+    id_empresa = Column(UUID(as_uuid=True), ForeignKey('empresas.id'), primary_key=True, nullable=False)
+    alertas_activas = Column(Integer, default=0, nullable=False)
+    jetsons_conectadas = Column(Integer, default=0, nullable=False)
+    sesiones_activas = Column(Integer, default=0, nullable=False)
+    last_updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    reconciliado_at = Column(DateTime, nullable=True) # Último recálculo completo
+
+    def __repr__(self):
+        return (f"<ContadorDashboard(empresa='{self.id_empresa}', alertas='{self.alertas_activas}', "
+                f"jetsons='{self.jetsons_conectadas}', sesiones='{self.sesiones_activas}')>")
+
 # --- Datos de Entrenamiento (Cloud) ---
 
 class VideoEntrenamiento(Base):
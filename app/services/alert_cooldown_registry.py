@@ -0,0 +1,113 @@
+# app/services/alert_cooldown_registry.py
+import logging
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config.settings import settings
+from app.crud.crud_alerta_cooldown import alerta_cooldown_crud
+
+# Setup logger para este módulo
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+CooldownKey = Tuple[uuid.UUID, str]
+
+class AlertCooldownRegistry:
+    """
+    Periodo de enfriamiento de alertas por (id_bus, tipo_alerta), cacheado en memoria.
+
+    La caché guarda, por clave, hasta cuándo dura el enfriamiento; la entrada se descarta al
+    vencer (TTL = el propio periodo). Mientras una clave está en enfriamiento la comprobación no
+    toca la BD: es el caso de una cámara que envía cientos de eventos iguales por minuto.
+
+    El estado compartido entre workers es la tabla alertas_cooldown (en SQLite, el mismo fichero
+    de la BD hace de almacén compartido):
+    - En el primer fallo de caché de una clave se calienta desde la BD (o desde la última alerta).
+    - Cuando la caché dice que la alerta puede dispararse, se reclama con un upsert condicional;
+      si otro worker ya la disparó, el upsert no aplica y se cachea su enfriamiento.
+    Así el enfriamiento sólo puede acortarse por error si una transacción se deshace tras reclamar,
+    y en ese caso la entrada de caché vence sola con el periodo.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._cooldown_until: Dict[CooldownKey, datetime] = {}
+        self._warmed: Dict[CooldownKey, bool] = {}
+
+    def is_on_cooldown(self, db: Session, bus_id: uuid.UUID, alert_type: str, cooldown_minutes: int,
+                       alert_at: Optional[datetime] = None, now: Optional[datetime] = None) -> bool:
+        """
+        Indica si una alerta de (bus, tipo) está en enfriamiento. Si no lo está, la registra como
+        disparada en alert_at (por defecto ahora) dentro de la transacción actual.
+        Como antes, el periodo se cuenta desde el timestamp de la última alerta.
+        """
+        now = now or datetime.utcnow()
+        alert_at = alert_at or now
+        key = (bus_id, alert_type)
+        window = timedelta(minutes=cooldown_minutes)
+
+        until = self._cooldown_until.get(key)
+        if until is not None:
+            if until > now:
+                return True
+            self._forget(key)
+
+        if key not in self._warmed:
+            last_alert_at = alerta_cooldown_crud.get_last_alert_at(db, bus_id, alert_type)
+            self._warmed[key] = True
+            if last_alert_at is not None and last_alert_at + window > now:
+                self._remember(key, last_alert_at + window, now)
+                return True
+
+        if alerta_cooldown_crud.try_claim(db, bus_id, alert_type, alert_at, threshold=now - window):
+            self._remember(key, alert_at + window, now)
+            return False
+
+        # Otro worker la disparó dentro del periodo: se cachea su enfriamiento.
+        last_alert_at = alerta_cooldown_crud.get_last_alert_at(db, bus_id, alert_type)
+        self._remember(key, (last_alert_at or now) + window, now)
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cooldown_until.clear()
+            self._warmed.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._cooldown_until), "warmed_keys": len(self._warmed), "capacity": self.max_entries}
+
+    def _remember(self, key: CooldownKey, until: datetime, now: datetime) -> None:
+        with self._lock:
+            self._cooldown_until[key] = until
+            if len(self._cooldown_until) > self.max_entries:
+                self._evict(now)
+
+    def _forget(self, key: CooldownKey) -> None:
+        with self._lock:
+            self._cooldown_until.pop(key, None)
+
+    def _evict(self, now: datetime) -> None:
+        """Descarta las entradas vencidas; si aún sobra, las que vencen antes (y su marca de calentado)."""
+        expired = [key for key, until in self._cooldown_until.items() if until <= now]
+        for key in expired:
+            del self._cooldown_until[key]
+        overflow = len(self._cooldown_until) - self.max_entries
+        if overflow > 0:
+            for key, _ in sorted(self._cooldown_until.items(), key=lambda item: item[1])[:overflow]:
+                del self._cooldown_until[key]
+        if len(self._warmed) > self.max_entries:
+            self._warmed = {key: True for key in self._cooldown_until}
+
+
+# Instancia del registro para ser utilizada en la aplicación.
+alert_cooldown_registry = AlertCooldownRegistry(settings.ALERT_COOLDOWN_CACHE_CAPACITY)
@@ -1,7 +1,7 @@
 # app/services/alert_notification_service.py
 import logging
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Callable, Tuple, Union
 import uuid 
 
 from sqlalchemy.orm import Session 
@@ -11,6 +11,9 @@ from app.crud.crud_alerta import alerta_crud
 from app.crud.crud_user import user_crud # Para registrar quién gestionó la alerta
 from app.crud.crud_bus import bus_crud # Para obtener detalles del bus para notificación
 from app.crud.crud_conductor import conductor_crud # Para obtener detalles del conductor para notificación
+from app.crud.crud_notificacion_outbox import notificacion_outbox_crud # Outbox de notificaciones
+from app.config.settings import settings
+from app.services.dashboard_counter_service import dashboard_counter_service
 
 # Importar modelos
 from app.models_db.cloud_database_models import Alerta, Usuario, Bus, Conductor 
@@ -37,6 +40,26 @@ class MockNotifier:
         logger.info(f"[NOTIFICACIÓN - DASHBOARD PUSH SIMULADO]: A Usuario '{user_id}' - Mensaje: '{message[:50]}...'")
 
 mock_notifier = MockNotifier()
+
+def build_channel_senders(notifier: Any) -> Dict[str, Callable[[str, Optional[str], str], None]]:
+    """
+    Adapta un notificador (MockNotifier o uno real con la misma interfaz) a funciones por canal
+    send(destinatario, asunto, cuerpo). Un envío fallido debe lanzar una excepción.
+    """
+    return {
+        'email': lambda to, subject, body: notifier.send_email(to_email=to, subject=subject or '', body=body),
+        'sms': lambda to, subject, body: notifier.send_sms(to_phone=to, message=body),
+        'dashboard': lambda to, subject, body: notifier.send_dashboard_push(user_id=uuid.UUID(to), message=body),
+    }
+
+def parse_notification_targets(raw: str) -> List[Tuple[str, str]]:
+    """Convierte 'email:a@b.com,sms:+57300...' en [('email', 'a@b.com'), ('sms', '+57300...')]."""
+    targets = []
+    for item in raw.split(','):
+        channel, _, recipient = item.strip().partition(':')
+        if channel and recipient:
+            targets.append((channel.strip(), recipient.strip()))
+    return targets
 # -----------------------------------------------------
 
 class AlertNotificationService:
@@ -61,13 +84,16 @@ class AlertNotificationService:
         logger.info(f"Intentando crear una nueva alerta: {alert_data.get('tipo_alerta')}")
 
         # Validaciones de FK (id_bus, id_conductor, id_evento, id_sesion_conduccion)
+        # (el bus y el conductor cargados aquí se reutilizan para el mensaje de notificación)
         bus_id = alert_data.get('id_bus')
-        if bus_id and not bus_crud.get(db, bus_id):
+        bus: Optional[Bus] = bus_crud.get(db, bus_id) if bus_id else None
+        if bus_id and not bus:
             logger.warning(f"Fallo al crear alerta: Bus ID '{bus_id}' no encontrado.")
             return None
         
         conductor_id = alert_data.get('id_conductor')
-        if conductor_id and not conductor_crud.get(db, conductor_id):
+        conductor: Optional[Conductor] = conductor_crud.get(db, conductor_id) if conductor_id else None
+        if conductor_id and not conductor:
             logger.warning(f"Fallo al crear alerta: Conductor ID '{conductor_id}' no encontrado.")
             return None
         
@@ -75,12 +101,13 @@ class AlertNotificationService:
         # si se permite que una alerta exista sin un evento o sesión directa por fallos.
         
         try:
-            new_alert = alerta_crud.create(db, alert_data)
+            # La alerta y sus notificaciones (outbox) se confirman en la misma transacción.
+            new_alert = alerta_crud.create(db, alert_data, commit=False)
+            self.send_alert_notification(db, new_alert, bus, conductor)
+            dashboard_counter_service.alert_changed(db, new_alert.id_bus, False, new_alert.estado_alerta == 'Activa')
+            db.commit()
+            db.refresh(new_alert)
             logger.info(f"Alerta '{new_alert.tipo_alerta}' (ID: {new_alert.id}) creada exitosamente.")
-            
-            # Opcional: Enviar notificación inmediatamente después de crear la alerta
-            # self.send_alert_notification(db, new_alert)
-            
             return new_alert
         except Exception as e:
             logger.error(f"Error creando alerta: {e}", exc_info=True)
@@ -118,7 +145,11 @@ class AlertNotificationService:
                 updates['fecha_gestion'] = datetime.utcnow() # Registrar fecha de gestión
 
         try:
-            updated_alert = alerta_crud.update(db, alert_existente, updates)
+            was_active = alert_existente.estado_alerta == 'Activa'
+            updated_alert = alerta_crud.update(db, alert_existente, updates, commit=False)
+            dashboard_counter_service.alert_changed(db, updated_alert.id_bus, was_active, updated_alert.estado_alerta == 'Activa')
+            db.commit()
+            db.refresh(updated_alert)
             logger.info(f"Alerta ID '{alert_id}' actualizada exitosamente. Estado: {updated_alert.estado_alerta}")
             return updated_alert
         except Exception as e:
@@ -126,54 +157,62 @@ class AlertNotificationService:
             db.rollback()
             return None
 
-    def send_alert_notification(self, db: Session, alert: Alerta):
+    def send_alert_notification(self, db: Session, alert: Alerta, bus: Optional[Bus], conductor: Optional[Conductor]):
         """
-        Envía notificaciones para una alerta específica a través de los canales configurados.
-        Este método es conceptual y dependerá de tus integraciones reales (Twilio, SendGrid, etc.).
+        Encola las notificaciones de una alerta en el outbox (sin commit: van en la transacción
+        de la alerta). El envío real lo hace el NotificationDispatcher en segundo plano, así que
+        este método no bloquea esperando al proveedor de email/SMS.
+        El bus y el conductor (placa, nombre del conductor) los pasa quien ya los cargó; no hace consultas.
         """
         logger.info(f"Preparando notificación para alerta ID: {alert.id} ({alert.tipo_alerta})")
+        queued = self.enqueue_notifications(db, [alert], {alert.id_bus: bus} if bus else {},
+                                           {alert.id_conductor: conductor} if conductor else {})
+        logger.info(f"{queued} notificaciones de la alerta ID '{alert.id}' encoladas.")
 
-        # Obtener detalles adicionales para la notificación (ej. nombre del conductor, placa del bus)
-        bus: Optional[Bus] = bus_crud.get(db, alert.id_bus)
-        conductor: Optional[Conductor] = conductor_crud.get(db, alert.id_conductor)
+    def enqueue_notifications(self, db: Session, alerts: List[Union[Alerta, Dict[str, Any]]],
+                              buses: Dict[uuid.UUID, Bus], conductores: Dict[uuid.UUID, Conductor]) -> int:
+        """
+        Escribe en el outbox un mensaje por alerta y destino configurado (ALERT_NOTIFICATION_TARGETS)
+        con un INSERT multi-fila. Los buses y conductores se pasan ya cargados (p. ej. los que la
+        ingesta de eventos resolvió para el lote), así que no hace consultas. No hace commit.
 
-        notification_subject = f"ALERTA CRÍTICA: {alert.tipo_alerta} en Bus {bus.placa if bus else 'Desconocido'}"
+        Returns:
+            int: Número de mensajes encolados.
+        """
+        targets = parse_notification_targets(settings.ALERT_NOTIFICATION_TARGETS)
+        if not targets:
+            return 0
+        rows = []
+        now = datetime.utcnow()
+        for alert in alerts:
+            subject, body = self.build_notification_message(alert, buses.get(_alert_field(alert, 'id_bus')),
+                                                            conductores.get(_alert_field(alert, 'id_conductor')))
+            for channel, recipient in targets:
+                rows.append({
+                    "id": uuid.uuid4(), "id_alerta": _alert_field(alert, 'id'), "canal": channel,
+                    "destinatario": recipient, "asunto": subject, "cuerpo": body,
+                    "estado": "Pendiente", "intentos": 0, "proximo_intento_at": now, "created_at": now
+                })
+        return notificacion_outbox_crud.bulk_insert(db, rows)
+
+    @staticmethod
+    def build_notification_message(alert: Union[Alerta, Dict[str, Any]], bus: Optional[Bus],
+                                   conductor: Optional[Conductor]) -> Tuple[str, str]:
+        """Asunto y cuerpo de la notificación de una alerta (objeto Alerta o dict con sus campos)."""
+        timestamp_alerta = _alert_field(alert, 'timestamp_alerta')
+        notification_subject = f"ALERTA CRÍTICA: {_alert_field(alert, 'tipo_alerta')} en Bus {bus.placa if bus else 'Desconocido'}"
         notification_body = (
-            f"Alerta: {alert.tipo_alerta}\n"
-            f"Descripción: {alert.descripcion}\n"
-            f"Hora: {alert.timestamp_alerta.isoformat()}\n"
+            f"Alerta: {_alert_field(alert, 'tipo_alerta')}\n"
+            f"Descripción: {_alert_field(alert, 'descripcion')}\n"
+            f"Hora: {timestamp_alerta.isoformat() if timestamp_alerta else 'N/A'}\n"
             f"Bus: {bus.placa if bus else 'N/A'} ({bus.numero_interno if bus else 'N/A'})\n"
             f"Conductor: {conductor.nombre_completo if conductor else 'N/A'} ({conductor.cedula if conductor else 'N/A'})\n"
-            f"Nivel de Criticidad: {alert.nivel_criticidad}\n"
-            f"Estado: {alert.estado_alerta}\n"
-            f"ID de Alerta: {alert.id}"
+            f"Nivel de Criticidad: {_alert_field(alert, 'nivel_criticidad')}\n"
+            f"Estado: {_alert_field(alert, 'estado_alerta') or 'Activa'}\n"
+            f"ID de Alerta: {_alert_field(alert, 'id')}"
             # Aquí podrías añadir enlaces a videoclips/snapshots si el evento lo tiene
-            # f"Evidencia: {alert.evento.snapshot_url if alert.evento and alert.evento.snapshot_url else 'N/A'}"
         )
-
-        # Asumimos que los canales de notificación están en la alerta o en la configuración global
-        # Por ahora, simulamos el envío a un correo de ejemplo.
-        
-        # Enviar email
-        mock_notifier.send_email(
-            to_email="supervisores@tuempresa.com", # <<<<< CAMBIA ESTO POR UN EMAIL REAL DE SUPERVISIÓN
-            subject=notification_subject,
-            body=notification_body
-        )
-        
-        # Enviar SMS (si tuvieras números de teléfono de supervisores)
-        # mock_notifier.send_sms(
-        #     to_phone="+573001234567", # <<<<< CAMBIA POR NÚMERO REAL
-        #     message=f"Alerta: {alert.tipo_alerta} en Bus {bus.placa if bus else 'N/A'} con {conductor.nombre_completo if conductor else 'N/A'}"
-        # )
-
-        # Enviar notificación push al Dashboard (conceptual)
-        # mock_notifier.send_dashboard_push(
-        #     user_id=uuid.UUID("UUID_DEL_ADMINISTRADOR_PRINCIPAL"), # ID de un usuario administrador
-        #     message=f"Nueva Alerta: {alert.tipo_alerta} - Bus {bus.placa if bus else 'N/A'}"
-        # )
-
-        logger.info(f"Notificación de alerta ID '{alert.id}' enviada a canales configurados.")
+        return notification_subject, notification_body
 
     def get_alert_details(self, db: Session, alert_id: uuid.UUID) -> Optional[Alerta]:
         """
@@ -204,5 +243,8 @@ class AlertNotificationService:
         logger.info(f"Obteniendo alertas activas (skip={skip}, limit={limit}).")
         return alerta_crud.get_active_alerts(db, skip=skip, limit=limit)
 
+def _alert_field(alert: Union[Alerta, Dict[str, Any]], field: str) -> Any:
+    return alert.get(field) if isinstance(alert, dict) else getattr(alert, field, None)
+
 # Crea una instancia de AlertNotificationService para ser utilizada por los endpoints API.
 alert_notification_service = AlertNotificationService()
\ No newline at end of file
@@ -0,0 +1,350 @@
+# app/services/alert_rule_engine.py
+import logging
+import threading
+import time
+import uuid
+from decimal import Decimal
+from string import Formatter
+from typing import Optional, Dict, Any, List, Tuple
+
+from sqlalchemy import Integer, Numeric
+from sqlalchemy.orm import Session
+
+from app.config.settings import settings
+from app.crud.crud_regla_alerta import regla_alerta_crud
+from app.models_db.cloud_database_models import ReglaAlerta, Evento
+
+# Setup logger para este módulo
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+# Reglas de fábrica: las que antes estaban fijas en EventProcessingService._evaluate_for_alert.
+# Aplican a cualquier empresa que no tenga (ni herede de una regla global) una regla para la misma clave.
+DEFAULT_ALERT_RULES: List[Dict[str, Any]] = [
+    {
+        "tipo_evento": "Distraccion", "subtipo_evento": None,
+        "campo_condicion": "duracion_segundos", "umbral": 3,
+        "tipo_alerta": "Distracción Prolongada",
+        "descripcion_plantilla": "El conductor se distrajo por {duracion_segundos} segundos.",
+        "nivel_criticidad": "Crítica", "cooldown_minutos": 0,
+    },
+    {
+        "tipo_evento": "Fatiga", "subtipo_evento": None,
+        "campo_condicion": "confidence_score_ia", "umbral": 0.8,
+        "tipo_alerta": "Fatiga Severa",
+        "descripcion_plantilla": "Alta probabilidad de fatiga (score: {confidence_score_ia}).",
+        "nivel_criticidad": "Crítica", "cooldown_minutos": 0,
+    },
+    {
+        "tipo_evento": "RegulacionConduccion", "subtipo_evento": "Exceso Horas Conduccion",
+        "campo_condicion": None, "umbral": None,
+        "tipo_alerta": "Exceso Horas Conduccion",
+        "descripcion_plantilla": "El conductor ha excedido el límite de horas de conducción.",
+        "nivel_criticidad": "Crítica", "cooldown_minutos": 0,
+    },
+    {
+        "tipo_evento": "Identificacion", "subtipo_evento": "Conductor No Identificado",
+        "campo_condicion": None, "umbral": None,
+        "tipo_alerta": "Conductor No Identificado",
+        "descripcion_plantilla": "Alerta: Conductor no identificado en el bus '{id_bus}'.",
+        "nivel_criticidad": "Alta", "cooldown_minutos": 5,
+    },
+    {
+        # Correlación: distracciones repetidas del mismo conductor, aunque cada una sea corta.
+        "tipo_evento": "Distraccion", "subtipo_evento": None,
+        "campo_condicion": None, "umbral": None,
+        "ventana_minutos": 5, "conteo_minimo": 3, "agrupar_por": "conductor",
+        "tipo_alerta": "Distracción Recurrente",
+        "descripcion_plantilla": "El conductor acumuló {conteo} distracciones en {ventana_minutos} minutos.",
+        "nivel_criticidad": "Crítica", "cooldown_minutos": 5, "prioridad": 50,
+    },
+]
+
+# Campos de una regla que se pueden fijar desde la API
+RULE_FIELDS = ('id_empresa', 'tipo_evento', 'subtipo_evento', 'campo_condicion', 'umbral', 'tipo_alerta',
+               'descripcion_plantilla', 'nivel_criticidad', 'cooldown_minutos', 'prioridad', 'activa',
+               'ventana_minutos', 'conteo_minimo', 'agrupar_por')
+
+# Medidas numéricas del evento que pueden usarse como campo_condicion (se comparan con 'valor >= umbral');
+# los identificadores (id_local_jetson) no son medidas.
+CONDITION_FIELDS = frozenset(column.name for column in Evento.__table__.columns
+                             if isinstance(column.type, (Numeric, Integer)) and not column.name.startswith('id'))
+# Campos del evento disponibles en la plantilla; las reglas con ventana añaden {conteo} y {ventana_minutos}
+TEMPLATE_FIELDS = frozenset(column.name for column in Evento.__table__.columns)
+WINDOW_TEMPLATE_FIELDS = frozenset(('conteo', 'ventana_minutos'))
+GROUPING_FIELDS = ('conductor', 'bus')
+
+RuleKey = Tuple[str, Optional[str]]
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float, Decimal)) and not isinstance(value, bool)
+
+def validate_rule_data(data: Dict[str, Any]) -> Optional[str]:
+    """
+    Valida los campos de una regla (la regla completa, no sólo los que cambian) antes de guardarla.
+    Devuelve el mensaje de error, o None si la regla es válida. Una regla inválida no se rechaza
+    al evaluarla sino que nunca dispara (o rompe la compilación), por eso se valida al guardarla.
+    """
+    campo_condicion = data.get('campo_condicion')
+    if campo_condicion and campo_condicion not in CONDITION_FIELDS:
+        return (f"'campo_condicion' debe ser un campo numérico del evento "
+                f"({', '.join(sorted(CONDITION_FIELDS))}).")
+    if data.get('umbral') is not None and not _is_number(data['umbral']):
+        return "'umbral' debe ser numérico."
+    for field, minimum in (('ventana_minutos', 1), ('conteo_minimo', 1), ('cooldown_minutos', 0), ('prioridad', None)):
+        value = data.get(field)
+        if value is None:
+            continue
+        if not _is_number(value) or value != int(value):
+            return f"'{field}' debe ser un número entero."
+        if minimum is not None and value < minimum:
+            return f"'{field}' debe ser mayor o igual que {minimum}."
+    agrupar_por = data.get('agrupar_por')
+    if agrupar_por is not None and agrupar_por not in GROUPING_FIELDS:
+        return f"'agrupar_por' debe ser uno de: {', '.join(GROUPING_FIELDS)}."
+
+    plantilla = data.get('descripcion_plantilla')
+    if plantilla is not None:
+        if not isinstance(plantilla, str):
+            return "'descripcion_plantilla' debe ser un texto."
+        allowed = TEMPLATE_FIELDS | WINDOW_TEMPLATE_FIELDS if data.get('ventana_minutos') else TEMPLATE_FIELDS
+        try:
+            placeholders = [field_name for _, field_name, _, _ in Formatter().parse(plantilla) if field_name is not None]
+        except ValueError as e:
+            return f"'descripcion_plantilla' no es una plantilla válida: {e}."
+        for placeholder in placeholders:
+            if placeholder not in allowed:
+                return f"'descripcion_plantilla' usa un campo desconocido: {{{placeholder}}}."
+    return None
+
+class _EventFields(dict):
+    """Valores del evento para la plantilla de descripción; un campo desconocido queda vacío."""
+    def __init__(self, event: Any, extra: Optional[Dict[str, Any]] = None):
+        super().__init__(extra or {})
+        self.event = event
+
+    def __missing__(self, key: str) -> Any:
+        value = getattr(self.event, key, None)
+        return '' if value is None else value
+
+class CompiledRule:
+    """
+    Regla lista para evaluar: sin acceso a la BD ni al ORM.
+    La condición es 'valor del campo >= umbral'; sin campo_condicion la regla siempre dispara.
+    Las reglas con ventana_minutos son de correlación (ver EventCorrelationService): la condición
+    decide qué eventos cuentan y la regla dispara al llegar a conteo_minimo en la ventana.
+    """
+    __slots__ = ('id', 'identity', 'tipo_evento', 'subtipo_evento', 'campo_condicion', 'umbral', 'tipo_alerta',
+                 'descripcion_plantilla', 'nivel_criticidad', 'cooldown_minutos', 'prioridad', 'activa',
+                 'ventana_minutos', 'conteo_minimo', 'agrupar_por')
+
+    def __init__(self, data: Dict[str, Any], identity: Any = None):
+        self.id = data.get('id')
+        # Identidad estable entre recargas (los buffers de correlación se indexan por ella)
+        self.identity = identity if identity is not None else self.id
+        self.tipo_evento = data['tipo_evento']
+        self.subtipo_evento = data.get('subtipo_evento') or None
+        self.campo_condicion = data.get('campo_condicion') or None
+        umbral = data.get('umbral')
+        self.umbral = float(umbral) if umbral is not None else None
+        self.tipo_alerta = data['tipo_alerta']
+        self.descripcion_plantilla = data['descripcion_plantilla']
+        self.nivel_criticidad = data['nivel_criticidad']
+        self.cooldown_minutos = int(data.get('cooldown_minutos') or 0)
+        self.prioridad = int(data.get('prioridad') if data.get('prioridad') is not None else 100)
+        self.activa = data.get('activa', True) is not False
+        ventana_minutos = data.get('ventana_minutos')
+        self.ventana_minutos = int(ventana_minutos) if ventana_minutos else None
+        self.conteo_minimo = max(1, int(data.get('conteo_minimo') or 1))
+        self.agrupar_por = data.get('agrupar_por') or 'conductor'
+
+    @classmethod
+    def from_model(cls, regla: ReglaAlerta) -> 'CompiledRule':
+        return cls({field: getattr(regla, field) for field in RULE_FIELDS if field != 'id_empresa'} | {'id': regla.id})
+
+    @property
+    def key(self) -> RuleKey:
+        return self.tipo_evento, self.subtipo_evento
+
+    @property
+    def is_windowed(self) -> bool:
+        return self.ventana_minutos is not None
+
+    def matches(self, event: Any) -> bool:
+        if self.campo_condicion is None:
+            return True
+        value = getattr(event, self.campo_condicion, None)
+        if value is None:
+            return False
+        if self.umbral is None:
+            return bool(value)
+        try:
+            return float(value) >= self.umbral
+        except (TypeError, ValueError):
+            return False
+
+    def describe(self, event: Any, extra: Optional[Dict[str, Any]] = None) -> str:
+        """Rellena la plantilla con los campos del evento y, en reglas con ventana, {conteo} y {ventana_minutos}."""
+        try:
+            return self.descripcion_plantilla.format_map(_EventFields(event, extra))
+        except (ValueError, IndexError, AttributeError) as e:
+            logger.warning(f"Plantilla de descripción inválida en la regla {self.id}: {e}")
+            return self.descripcion_plantilla
+
+# Tabla de despacho: (tipo_evento, subtipo_evento) -> reglas activas ordenadas por prioridad.
+# Un subtipo None es el comodín del tipo.
+DispatchTable = Dict[RuleKey, List[CompiledRule]]
+
+class AlertRuleEngine:
+    """
+    Motor de reglas de alertas por empresa.
+
+    Las reglas (tabla reglas_alerta) se compilan en una tabla de despacho por empresa indexada
+    por (tipo_evento, subtipo_evento). Para cada clave se aplica la primera capa que la define:
+    reglas de la empresa, luego reglas globales (id_empresa NULL) y por último DEFAULT_ALERT_RULES.
+    Una regla inactiva también define su clave: sirve para desactivar una regla heredada.
+
+    Las tablas compiladas se guardan en memoria. Antes de cada lote se comprueba (como mucho cada
+    ALERT_RULES_VERSION_CHECK_SECONDS) la versión de las reglas en la BD con una consulta agregada;
+    si cambió, se recompilan. Así los cambios hechos por otro worker se recogen sin reiniciar, y
+    la evaluación de un lote no hace consultas adicionales.
+    """
+
+    def __init__(self, default_rules: List[Dict[str, Any]], version_check_seconds: float):
+        self.default_rules = [CompiledRule(rule, identity=('default', index)) for index, rule in enumerate(default_rules)]
+        self.version_check_seconds = version_check_seconds
+        self._lock = threading.Lock()
+        self._version: Optional[Tuple[Any, ...]] = None
+        self._checked_at = 0.0
+        self._global_rules: List[CompiledRule] = []
+        self._rules_by_empresa: Dict[uuid.UUID, List[CompiledRule]] = {}
+        self._tables: Dict[Optional[uuid.UUID], DispatchTable] = {}
+
+    def invalidate(self) -> None:
+        """Fuerza la recarga de las reglas en la próxima evaluación (recarga en caliente)."""
+        with self._lock:
+            self._version = None
+            self._checked_at = 0.0
+
+    def ensure_fresh(self, db: Session) -> None:
+        """
+        Recompila las reglas si cambiaron en la BD. Llamar una vez por lote, antes de evaluar.
+        Si la BD falla se siguen usando las reglas ya compiladas.
+        """
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < self.version_check_seconds:
+            return
+        try:
+            version = tuple(regla_alerta_crud.get_rules_version(db))
+            if version != self._version:
+                rules = regla_alerta_crud.get_all_rules(db)
+                self._load(rules, version)
+                logger.info(f"Reglas de alertas recompiladas: {len(rules)} reglas en BD (versión {version}).")
+            self._checked_at = now
+        except Exception as e:
+            logger.error(f"No se pudieron recargar las reglas de alertas; se usan las compiladas: {e}", exc_info=True)
+
+    def evaluate(self, event: Any, id_empresa: Optional[uuid.UUID]) -> Optional[CompiledRule]:
+        """
+        Devuelve la regla sin ventana que dispara para el evento (la de menor prioridad entre las
+        que se cumplen), o None. Busca primero la clave exacta (tipo, subtipo) y después el comodín
+        (tipo, None). No accede a la BD.
+        """
+        for rule in self._candidate_rules(event, id_empresa):
+            if not rule.is_windowed and rule.matches(event):
+                return rule
+        return None
+
+    def window_rules(self, event: Any, id_empresa: Optional[uuid.UUID]) -> List[CompiledRule]:
+        """Reglas con ventana cuya condición cumple el evento (el evento cuenta para su ventana)."""
+        return [rule for rule in self._candidate_rules(event, id_empresa) if rule.is_windowed and rule.matches(event)]
+
+    def _candidate_rules(self, event: Any, id_empresa: Optional[uuid.UUID]):
+        table = self._tables.get(id_empresa)
+        if table is None:
+            table = self._compile_table(id_empresa)
+        yield from table.get((event.tipo_evento, event.subtipo_evento), ())
+        if event.subtipo_evento is not None:
+            yield from table.get((event.tipo_evento, None), ())
+
+    # --- Gestión de reglas (cada escritura invalida la caché) ---
+
+    def list_rules(self, db: Session, id_empresa: Optional[uuid.UUID] = None, skip: int = 0, limit: int = 100) -> List[ReglaAlerta]:
+        """Reglas de una empresa, o las globales si id_empresa es None."""
+        return regla_alerta_crud.get_rules_by_empresa(db, id_empresa, skip=skip, limit=limit)
+
+    def get_rule(self, db: Session, rule_id: uuid.UUID) -> Optional[ReglaAlerta]:
+        return regla_alerta_crud.get(db, rule_id)
+
+    def create_rule(self, db: Session, rule_data: Dict[str, Any]) -> Optional[ReglaAlerta]:
+        data = {field: rule_data[field] for field in RULE_FIELDS if field in rule_data}
+        try:
+            regla = regla_alerta_crud.create(db, data)
+        except Exception as e:
+            logger.error(f"Error al crear la regla de alerta: {e}", exc_info=True)
+            db.rollback()
+            return None
+        self.invalidate()
+        return regla
+
+    def update_rule(self, db: Session, rule_id: uuid.UUID, updates: Dict[str, Any]) -> Optional[ReglaAlerta]:
+        regla = regla_alerta_crud.get(db, rule_id)
+        if not regla:
+            return None
+        data = {field: updates[field] for field in RULE_FIELDS if field in updates}
+        try:
+            regla = regla_alerta_crud.update(db, regla, data)
+        except Exception as e:
+            logger.error(f"Error al actualizar la regla de alerta {rule_id}: {e}", exc_info=True)
+            db.rollback()
+            return None
+        self.invalidate()
+        return regla
+
+    def delete_rule(self, db: Session, rule_id: uuid.UUID) -> bool:
+        regla = regla_alerta_crud.remove(db, rule_id)
+        self.invalidate()
+        return regla is not None
+
+    # --- Compilación ---
+
+    def _load(self, rules: List[ReglaAlerta], version: Tuple[Any, ...]) -> None:
+        global_rules: List[CompiledRule] = []
+        rules_by_empresa: Dict[uuid.UUID, List[CompiledRule]] = {}
+        for regla in rules:
+            compiled = CompiledRule.from_model(regla)
+            if regla.id_empresa is None:
+                global_rules.append(compiled)
+            else:
+                rules_by_empresa.setdefault(regla.id_empresa, []).append(compiled)
+        with self._lock:
+            self._global_rules = global_rules
+            self._rules_by_empresa = rules_by_empresa
+            # Las tablas se compilan bajo demanda por empresa; la de las empresas sin reglas propias es compartida.
+            self._tables = {}
+            self._version = version
+
+    def _compile_table(self, id_empresa: Optional[uuid.UUID]) -> DispatchTable:
+        empresa_rules = self._rules_by_empresa.get(id_empresa, []) if id_empresa is not None else []
+        if not empresa_rules and None in self._tables:
+            table = self._tables[None]
+        else:
+            table = {}
+            for layer in (empresa_rules, self._global_rules, self.default_rules):
+                layer_by_key: DispatchTable = {}
+                for rule in layer:
+                    layer_by_key.setdefault(rule.key, []).append(rule)
+                for key, key_rules in layer_by_key.items():
+                    if key not in table:
+                        table[key] = sorted((rule for rule in key_rules if rule.activa), key=lambda rule: rule.prioridad)
+        self._tables[id_empresa] = table
+        return table
+
+
+# Instancia del motor de reglas para ser utilizada en la aplicación.
+alert_rule_engine = AlertRuleEngine(DEFAULT_ALERT_RULES, settings.ALERT_RULES_VERSION_CHECK_SECONDS)
@@ -0,0 +1,178 @@
+# app/services/dashboard_counter_service.py
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, Iterable
+
+from sqlalchemy.orm import Session
+
+from app.config.settings import settings
+from app.core.scheduler import PeriodicTask
+from app.crud.crud_bus import bus_crud
+from app.crud.crud_contador_dashboard import contador_dashboard_crud, COUNTER_FIELDS
+
+# Setup logger para este módulo
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+class DashboardCounterService:
+    """
+    Resumen del dashboard por empresa (alertas activas, Jetsons conectadas, sesiones activas)
+    mantenido de forma incremental en contadores_dashboard.
+
+    - Los servicios que cambian el estado llaman a los métodos de incremento antes de su commit,
+      así el contador se confirma (o se deshace) junto con el cambio.
+    - Las Jetsons cuentan al pasar de desconectadas a conectadas (el primer contacto tras una
+      desconexión) y dejan de contar cuando el barrido de jetson_connectivity_service las marca
+      como desconectadas; ambas transiciones se persisten en jetson_nanos.estado_conexion.
+    - La reconciliación recalcula todos los contadores desde las tablas de origen y corrige la deriva
+      (cambios hechos fuera de estos servicios, incrementos concurrentes con un recálculo, etc.).
+    La empresa de alertas, sesiones y Jetsons es la de su bus; sin bus no cuentan.
+    Con el barrido de desconexiones desactivado (connectivity_sweep_enabled=False) nadie escribe
+    'Desconectado': el estado de conexión se calcula del último contacto (connection_cutoff) y
+    jetsons_conectadas se cuenta al leer el resumen.
+    """
+
+    def __init__(self, reconcile_interval_seconds: float, connection_timeout_seconds: int, connectivity_sweep_enabled: bool):
+        self.connection_timeout_seconds = connection_timeout_seconds
+        self.connectivity_sweep_enabled = connectivity_sweep_enabled
+        self.task = PeriodicTask('dashboard-counters-reconcile', reconcile_interval_seconds, self._run_reconcile,
+                                 run_immediately=True)
+
+    def start(self, app) -> None:
+        self.task.start(app)
+
+    def connection_cutoff(self, now: Optional[datetime] = None) -> Optional[datetime]:
+        """
+        Sin barrido de desconexiones, el último contacto a partir del cual una Jetson cuenta como
+        conectada; con barrido, None (vale el estado persistido).
+        """
+        if self.connectivity_sweep_enabled:
+            return None
+        return (now or datetime.utcnow()) - timedelta(seconds=self.connection_timeout_seconds)
+
+    def is_jetson_connected(self, activo: Optional[bool], estado_conexion: Optional[str],
+                            last_seen: Optional[datetime] = None) -> bool:
+        """
+        Una Jetson cuenta como conectada si está activa y su estado de conexión persistido es 'Conectado'
+        o, sin barrido de desconexiones, si su último contacto (last_seen) está dentro del timeout.
+        """
+        cutoff = self.connection_cutoff()
+        if cutoff is None:
+            return bool(activo) and estado_conexion == 'Conectado'
+        return bool(activo) and last_seen is not None and last_seen >= cutoff
+
+    # --- Incrementos (sin commit: van en la transacción del llamador) ---
+
+    def alerts_created(self, db: Session, alerts: Iterable[Dict[str, Any]], empresa_by_bus: Dict[uuid.UUID, uuid.UUID]) -> None:
+        """Suma las alertas activas de un lote (un incremento por empresa)."""
+        deltas: Dict[uuid.UUID, int] = {}
+        for alert in alerts:
+            empresa_id = empresa_by_bus.get(alert.get("id_bus"))
+            if empresa_id is not None and alert.get("estado_alerta", "Activa") == "Activa":
+                deltas[empresa_id] = deltas.get(empresa_id, 0) + 1
+        for empresa_id, delta in sorted(deltas.items()): # Mismo orden que el bloqueo de reconcile
+            contador_dashboard_crud.increment(db, empresa_id, {"alertas_activas": delta})
+
+    def alert_changed(self, db: Session, bus_id: Optional[uuid.UUID], was_active: bool, is_active: bool) -> None:
+        self._apply(db, bus_id, "alertas_activas", int(is_active) - int(was_active))
+
+    def session_changed(self, db: Session, previous_bus_id: Optional[uuid.UUID], was_active: bool,
+                        bus_id: Optional[uuid.UUID], is_active: bool) -> None:
+        """Sesión creada, actualizada o eliminada (previous_bus_id/was_active describen el estado anterior)."""
+        self._apply_transition(db, "sesiones_activas", previous_bus_id, was_active, bus_id, is_active)
+
+    def jetson_changed(self, db: Session, previous_bus_id: Optional[uuid.UUID], was_connected: bool,
+                       bus_id: Optional[uuid.UUID], is_connected: bool) -> None:
+        """Reconexión, desconexión o registro de una Jetson (previous_bus_id/was_connected: estado anterior)."""
+        self._apply_transition(db, "jetsons_conectadas", previous_bus_id, was_connected, bus_id, is_connected)
+
+    def jetsons_disconnected(self, db: Session, bus_ids: Iterable[Optional[uuid.UUID]],
+                             empresa_by_bus: Dict[uuid.UUID, uuid.UUID]) -> None:
+        """Resta las Jetsons (activas) de un barrido de desconexiones (un incremento por empresa)."""
+        deltas: Dict[uuid.UUID, int] = {}
+        for bus_id in bus_ids:
+            empresa_id = empresa_by_bus.get(bus_id)
+            if empresa_id is not None:
+                deltas[empresa_id] = deltas.get(empresa_id, 0) - 1
+        for empresa_id, delta in sorted(deltas.items()):
+            contador_dashboard_crud.increment(db, empresa_id, {"jetsons_conectadas": delta})
+
+    def _apply_transition(self, db: Session, field: str, previous_bus_id: Optional[uuid.UUID], was_counted: bool,
+                          bus_id: Optional[uuid.UUID], is_counted: bool) -> None:
+        if previous_bus_id == bus_id:
+            self._apply(db, bus_id, field, int(is_counted) - int(was_counted))
+        else:
+            self._apply(db, previous_bus_id, field, -int(was_counted))
+            self._apply(db, bus_id, field, int(is_counted))
+
+    def _apply(self, db: Session, bus_id: Optional[uuid.UUID], field: str, delta: int) -> None:
+        if not delta or bus_id is None:
+            return
+        bus = bus_crud.get(db, bus_id)
+        if bus is not None:
+            contador_dashboard_crud.increment(db, bus.id_empresa, {field: delta})
+
+    # --- Lectura y reconciliación ---
+
+    def get_summary(self, db: Session, empresa_id: uuid.UUID) -> Optional[Dict[str, Any]]:
+        """
+        Resumen de una empresa: una lectura por clave primaria. Si la empresa aún no tiene contadores
+        se calculan una vez. Devuelve None si la empresa no existe.
+        """
+        contador = contador_dashboard_crud.get_by_empresa(db, empresa_id)
+        if contador is None:
+            if not self.reconcile(db, empresa_id):
+                return None
+            contador = contador_dashboard_crud.get_by_empresa(db, empresa_id)
+        summary = {field: max(0, getattr(contador, field)) for field in COUNTER_FIELDS}
+        cutoff = self.connection_cutoff()
+        if cutoff is not None:
+            # Sin barrido las desconexiones no se descuentan: se cuentan en el momento.
+            summary["jetsons_conectadas"] = contador_dashboard_crud.count_connected_jetsons(db, empresa_id, cutoff)
+        summary["last_updated_at"] = contador.last_updated_at.isoformat()
+        summary["reconciliado_at"] = contador.reconciliado_at.isoformat() if contador.reconciliado_at else None
+        return summary
+
+    def reconcile(self, db: Session, empresa_id: Optional[uuid.UUID] = None) -> int:
+        """
+        Recalcula los contadores (de todas las empresas o de una) y los sobrescribe. Las filas se
+        bloquean antes de recalcular (ver CRUDContadorDashboard.lock_for_reconcile): si no, un
+        incremento confirmado entre el recálculo y la escritura se perdería.
+        Returns:
+            int: Número de empresas reconciliadas.
+        """
+        now = datetime.utcnow()
+        try:
+            contador_dashboard_crud.lock_for_reconcile(db, empresa_id)
+            counts = contador_dashboard_crud.compute_counts(db, empresa_id, self.connection_cutoff(now))
+            if empresa_id is None:
+                drifted = [
+                    contador.id_empresa for contador in contador_dashboard_crud.get_all(db)
+                    if contador.id_empresa in counts and any(getattr(contador, field) != counts[contador.id_empresa][field] for field in COUNTER_FIELDS)
+                ]
+                if drifted:
+                    logger.info(f"Contadores del dashboard corregidos en {len(drifted)} empresas.")
+            contador_dashboard_crud.replace_counts(db, counts, now)
+            db.commit()
+            return len(counts)
+        except Exception:
+            db.rollback()
+            raise
+
+    def _run_reconcile(self) -> None:
+        from app.config.database import db
+        self.reconcile(db.session)
+
+
+# Instancia del servicio para ser utilizada en la aplicación.
+dashboard_counter_service = DashboardCounterService(
+    reconcile_interval_seconds=settings.DASHBOARD_RECONCILE_INTERVAL_SECONDS,
+    connection_timeout_seconds=settings.JETSON_CONNECTION_TIMEOUT_SECONDS,
+    connectivity_sweep_enabled=settings.JETSON_CONNECTIVITY_SWEEP_SECONDS > 0
+)
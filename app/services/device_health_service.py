@@ -0,0 +1,280 @@
+# app/services/device_health_service.py
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config.settings import settings
+from app.core.scheduler import PeriodicTask
+from app.crud.crud_alerta import alerta_crud
+from app.crud.crud_bus import bus_crud
+from app.crud.crud_jetson_nano import jetson_nano_crud
+from app.crud.crud_jetson_telemetry import jetson_telemetry_crud, TELEMETRY_METRIC_FIELDS
+from app.services.alert_notification_service import alert_notification_service
+from app.services.dashboard_counter_service import dashboard_counter_service
+from app.services.jetson_last_seen_cache import jetson_last_seen_cache
+
+# Setup logger para este módulo
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+# Clave del advisory lock que evita que dos workers analicen la flota a la vez (PostgreSQL).
+DEVICE_HEALTH_LOCK_KEY = 74_210_023
+
+# Estados de salud que escribe el análisis. Sólo se vuelve a 'OK' desde uno de estos: el resto
+# (p. ej. lo que reporta la propia Jetson en el latido) no se pisa mientras no haya hallazgos.
+HEALTH_OK, HEALTH_WARNING, HEALTH_CRITICAL = 'OK', 'Advertencia', 'Crítico'
+ANALYZER_HEALTH_STATES = (HEALTH_WARNING, HEALTH_CRITICAL)
+# Gravedad de un hallazgo -> (estado_salud, nivel_criticidad de la alerta)
+SEVERITY_LEVELS = {
+    'warning': (HEALTH_WARNING, 'Alta'),
+    'critical': (HEALTH_CRITICAL, 'Crítica'),
+}
+
+ALERT_THERMAL = 'Sobrecalentamiento Jetson'
+ALERT_MEMORY_LEAK = 'Fuga de Memoria Jetson'
+ALERT_DISK_FULL = 'Disco Casi Lleno Jetson'
+HEALTH_ALERT_TYPES = (ALERT_THERMAL, ALERT_MEMORY_LEAK, ALERT_DISK_FULL)
+
+# Umbrales (pendientes por minuto, a partir de una regresión lineal sobre la ventana)
+MIN_TREND_SAMPLES = 3                # Muestras válidas mínimas para fiarse de una tendencia
+TEMP_CRITICAL_C = 85.0               # La Jetson empieza a limitar frecuencia en torno a esta temperatura
+TEMP_WARNING_C = 75.0
+TEMP_RUNAWAY_C_PER_MIN = 0.5         # Subida sostenida que se considera descontrolada
+RUNAWAY_MIN_RISING_FRACTION = 0.7    # Fracción de pasos consecutivos al alza
+MEMORY_LEAK_MIN_SAMPLES = 10
+MEMORY_LEAK_MIN_RISING_FRACTION = 0.9
+MEMORY_LEAK_MIN_GROWTH_GB = 0.2      # Crecimiento mínimo de la RAM en la ventana
+DISK_CRITICAL_PERCENT = 95.0
+DISK_WARNING_PERCENT = 90.0
+DISK_FULL_HORIZON_HOURS = 24.0       # Avisar si al ritmo actual el disco se llena antes de esto
+
+class FleetWindow:
+    """
+    Telemetría reciente de toda la flota como arrays, una posición por muestra, ordenadas por
+    dispositivo y tiempo: 'device' es el índice en hardware_ids, 'minutes' los minutos desde el
+    inicio de la ventana y 'metrics' un array float64 por métrica (NaN = nulo).
+    """
+    __slots__ = ('hardware_ids', 'device', 'minutes', 'metrics')
+
+    def __init__(self, hardware_ids: List[str], device: np.ndarray, minutes: np.ndarray, metrics: Dict[str, np.ndarray]):
+        self.hardware_ids = hardware_ids
+        self.device = device
+        self.minutes = minutes
+        self.metrics = metrics
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Sequence[Any]], start: datetime) -> 'FleetWindow':
+        """Construye la ventana a partir de tuplas (id_hardware_jetson, timestamp, métricas...)."""
+        if not rows:
+            empty = np.empty(0, dtype=np.float64)
+            return cls([], np.empty(0, dtype=np.intp), empty, {field: empty for field in TELEMETRY_METRIC_FIELDS})
+        columns = list(zip(*rows))
+        hardware_ids, device = np.unique(np.array(columns[0], dtype=str), return_inverse=True)
+        timestamps = np.array(columns[1], dtype='datetime64[us]')
+        minutes = (timestamps - np.datetime64(start, 'us')) / np.timedelta64(1, 'm')
+        order = np.lexsort((minutes, device))
+        metrics = {field: np.array(columns[2 + index], dtype=np.float64)[order]  # None -> NaN
+                   for index, field in enumerate(TELEMETRY_METRIC_FIELDS)}
+        return cls(hardware_ids.tolist(), device[order], minutes[order], metrics)
+
+    def __len__(self) -> int:
+        return len(self.hardware_ids)
+
+    def metric_stats(self, field: str) -> Dict[str, np.ndarray]:
+        """
+        Estadísticas de una métrica por dispositivo (arrays de len(self) posiciones), en una pasada
+        sobre toda la flota: conteo de muestras válidas, primer y último valor, pendiente por minuto
+        (mínimos cuadrados) y fracción de pasos consecutivos al alza.
+        """
+        devices = len(self)
+        values = self.metrics[field]
+        valid = ~np.isnan(values)
+        device, x, y = self.device[valid], self.minutes[valid], values[valid]
+        count = np.bincount(device, minlength=devices)
+        sum_x = np.bincount(device, x, minlength=devices)
+        sum_y = np.bincount(device, y, minlength=devices)
+        sum_xx = np.bincount(device, x * x, minlength=devices)
+        sum_xy = np.bincount(device, x * y, minlength=devices)
+        # Las muestras están ordenadas por dispositivo: cada uno ocupa un tramo contiguo
+        indexes = np.arange(devices)
+        first_position = np.searchsorted(device, indexes, side='left')
+        last_position = np.searchsorted(device, indexes, side='right') - 1
+        has_values = count > 0
+        padded = np.append(y, np.nan) # Posición extra para los dispositivos sin valores
+        first = np.where(has_values, padded[np.where(has_values, first_position, len(y))], np.nan)
+        latest = np.where(has_values, padded[np.where(has_values, last_position, len(y))], np.nan)
+        same_device = device[1:] == device[:-1]
+        steps = np.bincount(device[1:][same_device], minlength=devices)
+        rises = np.bincount(device[1:][same_device & (np.diff(y) > 0)], minlength=devices)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            denominator = count * sum_xx - sum_x * sum_x
+            slope = np.where(denominator > 0, (count * sum_xy - sum_x * sum_y) / denominator, np.nan)
+            rising_fraction = np.where(steps > 0, rises / steps, 0.0)
+        return {"count": count, "first": first, "latest": latest, "slope": slope, "rising_fraction": rising_fraction}
+
+
+class DeviceHealthService:
+    """
+    Análisis periódico de la salud de las Jetson a partir de su telemetría reciente.
+
+    En cada pasada lee con una sola consulta las muestras de toda la flota en la ventana
+    (window_minutes), calcula las estadísticas por dispositivo con NumPy (FleetWindow) y evalúa
+    las reglas como operaciones sobre arrays:
+    - sobrecalentamiento: temperatura crítica, o subida sostenida por encima de TEMP_WARNING_C;
+    - fuga de memoria: RAM que crece de forma casi monótona durante la ventana;
+    - disco casi lleno: porcentaje alto, o ritmo de llenado que lo completa en DISK_FULL_HORIZON_HOURS.
+    Los hallazgos actualizan estado_salud y crean una alerta por bus y tipo (no se repite mientras
+    haya una activa del mismo tipo). Con interval_seconds <= 0 la tarea no se arranca.
+    """
+
+    def __init__(self, window_minutes: int, interval_seconds: float):
+        self.window_minutes = window_minutes
+        self.task = PeriodicTask('device-health-analyzer', interval_seconds, self._run_analysis)
+
+    def start(self, app) -> None:
+        self.task.start(app)
+
+    def evaluate(self, window: FleetWindow) -> Dict[str, List[Tuple[str, str, str]]]:
+        """
+        Evalúa las reglas sobre la ventana.
+
+        Returns:
+            Dict[str, List[Tuple[str, str, str]]]: {id_hardware_jetson: [(tipo_alerta, gravedad, descripción)]}
+            sólo para los dispositivos con hallazgos; gravedad es 'warning' o 'critical'.
+        """
+        findings: Dict[str, List[Tuple[str, str, str]]] = {}
+        if not len(window):
+            return findings
+
+        def add(mask: np.ndarray, critical: np.ndarray, tipo_alerta: str, describe) -> None:
+            for index in np.flatnonzero(mask):
+                severity = 'critical' if critical[index] else 'warning'
+                findings.setdefault(window.hardware_ids[index], []).append((tipo_alerta, severity, describe(index)))
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            temp = window.metric_stats('temperatura_celsius')
+            temp_critical = temp["latest"] >= TEMP_CRITICAL_C
+            temp_runaway = ((temp["count"] >= MIN_TREND_SAMPLES) & (temp["slope"] >= TEMP_RUNAWAY_C_PER_MIN)
+                            & (temp["rising_fraction"] >= RUNAWAY_MIN_RISING_FRACTION) & (temp["latest"] >= TEMP_WARNING_C))
+            add(temp_critical | temp_runaway, temp_critical, ALERT_THERMAL,
+                lambda i: f"Temperatura de {temp['latest'][i]:.1f} °C, subiendo {temp['slope'][i]:.2f} °C/min "
+                          f"en los últimos {self.window_minutes} minutos.")
+
+            ram = window.metric_stats('ram_usage_gb')
+            ram_growth = ram["latest"] - ram["first"]
+            memory_leak = ((ram["count"] >= MEMORY_LEAK_MIN_SAMPLES) & (ram["slope"] > 0)
+                           & (ram["rising_fraction"] >= MEMORY_LEAK_MIN_RISING_FRACTION)
+                           & (ram_growth >= MEMORY_LEAK_MIN_GROWTH_GB))
+            add(memory_leak, np.zeros(len(window), dtype=bool), ALERT_MEMORY_LEAK,
+                lambda i: f"La RAM ha crecido de forma sostenida {ram_growth[i]:.2f} GB (hasta {ram['latest'][i]:.2f} GB) "
+                          f"en los últimos {self.window_minutes} minutos.")
+
+            disk = window.metric_stats('disk_usage_percent')
+            hours_to_full = (100.0 - disk["latest"]) / (disk["slope"] * 60.0)
+            disk_critical = disk["latest"] >= DISK_CRITICAL_PERCENT
+            disk_filling = ((disk["count"] >= MIN_TREND_SAMPLES) & (disk["slope"] > 0)
+                            & (disk["rising_fraction"] >= RUNAWAY_MIN_RISING_FRACTION) & (hours_to_full <= DISK_FULL_HORIZON_HOURS))
+            add(disk_critical | (disk["latest"] >= DISK_WARNING_PERCENT) | disk_filling, disk_critical, ALERT_DISK_FULL,
+                lambda i: f"Disco al {disk['latest'][i]:.1f} %"
+                          + (f"; al ritmo actual se llena en {hours_to_full[i]:.1f} h." if disk_filling[i] else "."))
+        return findings
+
+    def analyze_once(self, db: Session, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Una pasada del análisis sobre toda la flota, en una transacción con commit.
+
+        Returns:
+            Dict[str, int]: {"devices": dispositivos con muestras, "updated": estados de salud
+            cambiados, "alerts": alertas creadas}
+        """
+        now = now or datetime.utcnow()
+        start = now - timedelta(minutes=self.window_minutes)
+        stats = {"devices": 0, "updated": 0, "alerts": 0}
+        try:
+            if db.get_bind().dialect.name == 'postgresql' and not db.execute(
+                    text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": DEVICE_HEALTH_LOCK_KEY}).scalar():
+                db.rollback()
+                logger.info("Otro proceso está analizando la salud de la flota; se omite este ciclo.")
+                return stats
+            window = FleetWindow.from_rows(jetson_telemetry_crud.get_metric_window(db, start, now), start)
+            stats["devices"] = len(window)
+            findings = self.evaluate(window)
+            jetsons = jetson_nano_crud.get_by_hardware_ids(db, window.hardware_ids)
+
+            estados: Dict[str, str] = {}
+            for hardware_id, jetson in jetsons.items():
+                device_findings = findings.get(hardware_id)
+                if device_findings:
+                    estado = SEVERITY_LEVELS['critical' if any(f[1] == 'critical' for f in device_findings) else 'warning'][0]
+                elif jetson.estado_salud in ANALYZER_HEALTH_STATES:
+                    estado = HEALTH_OK
+                else:
+                    continue
+                if estado != jetson.estado_salud:
+                    estados[hardware_id] = estado
+            jetson_nano_crud.set_estados_salud(db, estados)
+
+            alerts = self._build_alerts(db, findings, jetsons, now)
+            if alerts:
+                buses = {bus.id: bus for bus in bus_crud.get_multi_by_ids(db, list({alert["id_bus"] for alert in alerts}))}
+                empresa_by_bus = {bus_id: bus.id_empresa for bus_id, bus in buses.items()}
+                alerta_crud.bulk_insert(db, alerts)
+                alert_notification_service.enqueue_notifications(db, alerts, buses, {})
+                dashboard_counter_service.alerts_created(db, alerts, empresa_by_bus)
+                if settings.LIVE_STREAM_ENABLED:
+                    from app.services.live_stream_service import live_stream_service
+                    live_stream_service.publish_in_transaction(db, [], alerts, empresa_by_bus)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        for hardware_id in estados:
+            jetson_last_seen_cache.forget(hardware_id) # El latido volverá a leer estado_salud
+        for alert in alerts:
+            logger.info(f"ALERTA DE SALUD: {alert['tipo_alerta']} para bus {alert['id_bus']}. ID Alerta: {alert['id']}")
+        stats["updated"], stats["alerts"] = len(estados), len(alerts)
+        return stats
+
+    def _build_alerts(self, db: Session, findings: Dict[str, List[Tuple[str, str, str]]],
+                      jetsons: Dict[str, Any], now: datetime) -> List[Dict[str, Any]]:
+        """Filas de Alerta de los hallazgos, salvo las de dispositivos sin bus o con una alerta activa del mismo tipo."""
+        if not findings:
+            return []
+        active = alerta_crud.get_active_bus_types(db, HEALTH_ALERT_TYPES)
+        alerts = []
+        for hardware_id, device_findings in sorted(findings.items()):
+            jetson = jetsons.get(hardware_id)
+            if jetson is None or jetson.id_bus is None:
+                continue
+            for tipo_alerta, severity, descripcion in device_findings:
+                if (jetson.id_bus, tipo_alerta) in active:
+                    continue
+                active.add((jetson.id_bus, tipo_alerta))
+                alerts.append({
+                    "id": uuid.uuid4(), "id_evento": None, "id_conductor": None, "id_bus": jetson.id_bus,
+                    "id_sesion_conduccion": None, "timestamp_alerta": now, "tipo_alerta": tipo_alerta,
+                    "descripcion": f"Jetson {hardware_id}: {descripcion}",
+                    "nivel_criticidad": SEVERITY_LEVELS[severity][1], "estado_alerta": "Activa"
+                })
+        return alerts
+
+    def _run_analysis(self) -> None:
+        from app.config.database import db
+        self.analyze_once(db.session)
+
+
+# Instancia del servicio para ser utilizada en la aplicación.
+device_health_service = DeviceHealthService(
+    window_minutes=settings.DEVICE_HEALTH_WINDOW_MINUTES,
+    interval_seconds=settings.DEVICE_HEALTH_INTERVAL_SECONDS
+)
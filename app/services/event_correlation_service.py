@@ -0,0 +1,147 @@
+# app/services/event_correlation_service.py
+import logging
+import threading
+import uuid
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Any, Dict, Hashable, Tuple
+
+from app.config.settings import settings
+
+# Setup logger para este módulo
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+EPOCH = datetime(1970, 1, 1)
+NULL_UUID = uuid.UUID("00000000-0000-0000-0000-000000000000")
+_ID_MASK = 0x7FFF_FFFF_FFFF_FFFF
+
+class EventWindow:
+    """
+    Eventos recientes de un conductor o bus para una regla: timestamps (segundos desde epoch)
+    ordenados y un resumen de 63 bits del ID de cada evento, en dos arrays paralelos.
+    Tiene capacidad fija: al llenarse se descartan los más antiguos.
+    """
+    __slots__ = ('timestamps', 'event_ids')
+
+    def __init__(self):
+        self.timestamps = array('d')
+        self.event_ids = array('q')
+
+    def add(self, timestamp: float, event_id: int, capacity: int, horizon_seconds: float) -> bool:
+        """
+        Inserta un evento en su posición (aunque llegue desordenado). Devuelve False si ya estaba
+        (reintento del mismo evento) o si queda fuera del buffer (más antiguo que el horizonte o
+        que todo lo que cabe en él).
+        """
+        timestamps = self.timestamps
+        index = bisect_left(timestamps, timestamp)
+        probe = index
+        while probe < len(timestamps) and timestamps[probe] == timestamp:
+            if self.event_ids[probe] == event_id:
+                return False
+            probe += 1
+        if len(timestamps) >= capacity and index == 0:
+            return False
+        timestamps.insert(index, timestamp)
+        self.event_ids.insert(index, event_id)
+
+        # Poda: fuera del horizonte (respecto al más reciente) o sobre la capacidad.
+        drop = bisect_left(timestamps, timestamps[-1] - horizon_seconds)
+        drop = max(drop, len(timestamps) - capacity)
+        if drop > 0:
+            del timestamps[:drop]
+            del self.event_ids[:drop]
+        return drop <= index
+
+    def max_count_around(self, timestamp: float, window_seconds: float) -> int:
+        """
+        Máximo número de eventos en una ventana [inicio, inicio + window_seconds] que contenga 'timestamp'.
+        Contempla ventanas que empiezan antes del evento, para los eventos que llegan desordenados.
+        """
+        timestamps = self.timestamps
+        lo = bisect_left(timestamps, timestamp - window_seconds)
+        hi = bisect_right(timestamps, timestamp + window_seconds)
+        best = 0
+        for start in range(lo, hi):
+            if timestamps[start] > timestamp:
+                break
+            best = max(best, bisect_right(timestamps, timestamps[start] + window_seconds, start, hi) - start)
+        return best
+
+class EventCorrelationService:
+    """
+    Etapa de correlación en streaming para las reglas de alerta con ventana (ReglaAlerta.ventana_minutos).
+
+    Por cada (regla, conductor o bus) guarda un EventWindow con los eventos recientes que cumplen
+    la regla, y dispara cuando alguna ventana que contenga el evento llega a conteo_minimo.
+    No consulta 'eventos': todo sale de los buffers en memoria.
+
+    La memoria está acotada: como mucho max_keys buffers (se descarta el menos usado) de
+    max_events_per_key eventos cada uno. Un evento que llega más de max_lateness_seconds
+    por detrás del más reciente de su buffer ya no se correlaciona.
+    Los buffers son por proceso: tras un reinicio, o si los eventos de un mismo conductor los
+    procesan workers distintos (p. ej. sin spool), el conteo sólo ve los eventos de este proceso.
+    """
+
+    def __init__(self, max_keys: int, max_events_per_key: int, max_lateness_seconds: float):
+        self.max_keys = max(1, max_keys)
+        self.max_events_per_key = max(2, max_events_per_key)
+        self.max_lateness_seconds = max(0.0, max_lateness_seconds)
+        self._lock = threading.Lock()
+        self._windows: 'OrderedDict[Tuple[Hashable, str, uuid.UUID], EventWindow]' = OrderedDict()
+
+    def observe(self, rule: Any, event: Any) -> Optional[int]:
+        """
+        Registra un evento que cumple una regla con ventana y devuelve el conteo de la ventana si
+        alcanza rule.conteo_minimo (o None si no dispara o el evento no tiene conductor/bus).
+        """
+        group = rule.agrupar_por or 'conductor'
+        entity_id = event.id_bus if group == 'bus' else event.id_conductor
+        if entity_id is None or entity_id == NULL_UUID or event.timestamp_evento is None:
+            return None
+
+        window_seconds = rule.ventana_minutos * 60.0
+        timestamp = (event.timestamp_evento - EPOCH).total_seconds()
+        event_id = event.id.int & _ID_MASK
+        key = (rule.identity, group, entity_id)
+
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None:
+                window = self._windows[key] = EventWindow()
+                if len(self._windows) > self.max_keys:
+                    self._windows.popitem(last=False)
+            else:
+                self._windows.move_to_end(key)
+            # Se conserva la ventana más el retraso admitido: un evento que llega tarde (p. ej. el
+            # backlog de una Jetson que estuvo sin conexión) aún puede completar una ventana.
+            if not window.add(timestamp, event_id, self.max_events_per_key, window_seconds + self.max_lateness_seconds):
+                return None
+            count = window.max_count_around(timestamp, window_seconds)
+        return count if count >= rule.conteo_minimo else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._windows.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "keys": len(self._windows),
+            "events": sum(len(window.timestamps) for window in self._windows.values()),
+            "max_keys": self.max_keys,
+            "max_events_per_key": self.max_events_per_key,
+        }
+
+
+# Instancia del servicio para ser utilizada en la aplicación.
+event_correlation_service = EventCorrelationService(
+    settings.CORRELATION_MAX_KEYS, settings.CORRELATION_MAX_EVENTS_PER_KEY, settings.CORRELATION_MAX_LATENESS_SECONDS
+)
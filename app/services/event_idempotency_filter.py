@@ -0,0 +1,89 @@
+# app/services/event_idempotency_filter.py
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, Tuple
+
+from app.config.settings import settings
+
+class RecentEventFilter:
+    """
+    Filtro LRU acotado de eventos ya guardados, para descartar reenvíos de la Jetson
+    sin tocar la base de datos.
+
+    La clave es el UUID del evento y el valor un hash del contenido: un reenvío idéntico
+    es un acierto (se descarta), mientras que el mismo ID con contenido distinto es un
+    fallo y se procesa normalmente como actualización.
+    Es local a cada proceso y thread-safe.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(0, capacity)
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    @staticmethod
+    def content_hash(event_data: Dict[str, Any]) -> str:
+        """Hash estable del contenido de un evento (independiente del orden de las claves)."""
+        payload = json.dumps(event_data, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+    def is_duplicate(self, event_id: str, content_hash: str) -> bool:
+        """
+        Indica si el evento ya se guardó con exactamente el mismo contenido.
+        Actualiza los contadores de aciertos/fallos.
+        """
+        if not self.enabled:
+            return False
+        key = event_id.lower()
+        with self._lock:
+            if self._entries.get(key) == content_hash:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return True
+            self._misses += 1
+            return False
+
+    def remember(self, items: Iterable[Tuple[str, str]]) -> None:
+        """
+        Registra pares (event_id, content_hash) de eventos ya confirmados en la BD.
+        Sólo debe llamarse tras el commit, para no descartar reintentos de escrituras fallidas.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            for event_id, content_hash in items:
+                key = event_id.lower()
+                self._entries[key] = content_hash
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores para dimensionar el filtro."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "capacity": self.capacity,
+                "size": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": (self._hits / lookups) if lookups else 0.0
+            }
+
+
+# Instancia del filtro para ser utilizada por EventProcessingService.
+recent_event_filter = RecentEventFilter(capacity=settings.EVENT_DEDUP_CAPACITY)
@@ -0,0 +1,609 @@
+# app/services/event_ingest_spool.py
+import fcntl
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple
+
+from app.config.settings import settings
+
+# Setup logger para este módulo
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+MAX_SPOOL_SLOTS = 64 # Máximo de procesos (workers de gunicorn) que pueden compartir el directorio del spool
+COMPLETED_STATUS_CAPACITY = 10000 # Estados de tickets terminados que se recuerdan en memoria
+DEAD_LETTER_FILE = "dead-letter.log" # Lotes que agotaron los reintentos, por slot
+
+class EventIngestSpool:
+    """
+    Spool local, durable y de solo-anexado para la ingesta asíncrona de lotes de eventos.
+
+    Cada proceso reclama un "slot" (subdirectorio con lock exclusivo) y escribe los lotes
+    aceptados en segmentos 'segment-<n>.log' (una línea JSON por lote). Los fsync se agrupan:
+    las escrituras concurrentes comparten un mismo fsync antes de devolver el ticket.
+    Un pool de hilos drena el spool hacia EventProcessingService y registra el resultado de
+    cada ticket en 'segment-<n>.ack' (con fsync). Cuando todos los lotes de un segmento están
+    confirmados se borra su '.log'; el '.ack' se conserva ack_retention_seconds para poder
+    consultar el estado de sus tickets.
+    Un lote que falla max_attempts veces se copia (con fsync) a 'dead-letter.log' antes de
+    confirmarse como 'failed', así que un lote aceptado nunca se pierde; se reprocesa con
+    replay_dead_letters ('flask spool-replay-dead-letters').
+    Al reiniciar, el proceso que reclama el slot re-encola los lotes sin confirmar. Además adopta
+    los slots huérfanos (p. ej. gunicorn arranca con menos workers): toma el flock de cada slot
+    libre, re-encola sus lotes pendientes y lo libera cuando están todos confirmados.
+    """
+
+    def __init__(self, base_path: str, segment_max_bytes: int, num_workers: int,
+                 fsync_interval_ms: int, max_attempts: int, ack_retention_seconds: float):
+        self.base_path = base_path
+        self.segment_max_bytes = segment_max_bytes
+        self.num_workers = max(1, num_workers)
+        self.fsync_interval = max(0, fsync_interval_ms) / 1000.0
+        self.max_attempts = max(1, max_attempts)
+        self.ack_retention_seconds = ack_retention_seconds
+
+        self._app = None
+        self._slot: Optional[int] = None
+        self._slot_dir: Optional[str] = None
+        self._slot_lock_file = None
+        self._started = False
+        self._stopping = threading.Event()
+        # (ticket_id, directorio del slot, segmento, eventos, intentos)
+        self._queue: "queue.Queue[Optional[Tuple[str, str, int, List[Dict[str, Any]], int]]]" = queue.Queue()
+        self._workers: List[threading.Thread] = []
+
+        # Estado de escritura (protegido por _write_lock)
+        self._write_lock = threading.Lock()
+        self._active_seq = 0
+        self._active_file = None
+        self._active_size = 0
+        self._written_seq = 0
+        self._pending_by_segment: Dict[int, int] = {}
+        # Slots huérfanos adoptados: directorio -> (archivo del flock, lotes pendientes por segmento)
+        self._adopted_slots: Dict[str, Tuple[Any, Dict[int, int]]] = {}
+        self._ack_lock = threading.Lock()
+        self._dead_letter_lock = threading.Lock()
+
+        # Estado de fsync agrupado (protegido por _sync_cond)
+        self._sync_cond = threading.Condition()
+        self._synced_seq = 0
+        self._sync_in_progress = False
+
+        # Estado de tickets (protegido por _status_lock)
+        self._status_lock = threading.Lock()
+        self._pending_status: Dict[str, Dict[str, Any]] = {}
+        self._completed_status: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    # --- Ciclo de vida ---
+
+    def start(self, app) -> None:
+        """
+        Reclama un slot del spool, recupera los lotes pendientes de ejecuciones anteriores
+        y arranca el pool de workers. Es idempotente.
+        """
+        if self._started:
+            return
+        self._app = app
+        os.makedirs(self.base_path, exist_ok=True)
+        self._claim_slot()
+        self._recover()
+        self._adopt_orphan_slots()
+        self._open_new_segment()
+        for i in range(self.num_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"event-spool-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        self._started = True
+        logger.info(f"Spool de ingesta iniciado en '{self._slot_dir}' con {self.num_workers} workers.")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Detiene los workers y cierra el segmento activo. Los lotes no procesados
+        se recuperan en el siguiente arranque.
+        """
+        if not self._started:
+            return
+        self._stopping.set()
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout)
+        with self._write_lock:
+            if self._active_file:
+                self._active_file.flush()
+                os.fsync(self._active_file.fileno())
+                self._active_file.close()
+                self._active_file = None
+            for lock_file, _ in self._adopted_slots.values():
+                lock_file.close() # Sus lotes pendientes los recupera el próximo arranque
+            self._adopted_slots.clear()
+        if self._slot_lock_file:
+            self._slot_lock_file.close() # Libera el flock del slot
+            self._slot_lock_file = None
+        self._started = False
+
+    @property
+    def is_running(self) -> bool:
+        return self._started
+
+    # --- API pública ---
+
+    def append(self, events: List[Dict[str, Any]]) -> str:
+        """
+        Anexa un lote de eventos al spool y espera a que sea durable (fsync).
+
+        Returns:
+            str: El ticket del lote, con el formato '<slot>-<segmento>-<uuid>'.
+        """
+        if not self._started:
+            raise RuntimeError("El spool de ingesta no está iniciado.")
+
+        received_at = datetime.utcnow().isoformat()
+        with self._write_lock:
+            if self._active_size > 0 and self._active_size >= self.segment_max_bytes:
+                self._rotate_segment()
+            segment_seq = self._active_seq
+            ticket_id = f"{self._slot}-{segment_seq}-{uuid.uuid4().hex}"
+            line = json.dumps({"ticket_id": ticket_id, "received_at": received_at, "events": events},
+                              separators=(',', ':'), default=str) + "\n"
+            data = line.encode('utf-8')
+            self._active_file.write(data)
+            self._active_file.flush()
+            self._active_size += len(data)
+            self._written_seq += 1
+            write_seq = self._written_seq
+            self._pending_by_segment[segment_seq] = self._pending_by_segment.get(segment_seq, 0) + 1
+
+        self._wait_durable(write_seq)
+
+        with self._status_lock:
+            self._pending_status[ticket_id] = {
+                "ticket_id": ticket_id, "status": "accepted",
+                "received_at": received_at, "events_count": len(events)
+            }
+        self._queue.put((ticket_id, self._slot_dir, segment_seq, events, 0))
+        return ticket_id
+
+    def get_status(self, ticket_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Devuelve el estado de un ticket ('accepted', 'processing', 'done' o 'failed'), o None si
+        es desconocido o su resultado ya expiró. Los tickets de otros procesos se resuelven
+        leyendo los archivos de su slot.
+        """
+        with self._status_lock:
+            status = self._pending_status.get(ticket_id) or self._completed_status.get(ticket_id)
+            if status is not None:
+                return dict(status)
+        return self._lookup_status_on_disk(ticket_id)
+
+    # --- Escritura y fsync agrupado ---
+
+    def _wait_durable(self, write_seq: int) -> None:
+        """
+        Bloquea hasta que la escritura 'write_seq' esté en disco. El primer hilo que llega
+        hace de líder: espera una ventana corta para acumular escrituras y ejecuta un único
+        fsync para todas ellas; el resto espera a que el líder termine.
+        """
+        with self._sync_cond:
+            while self._synced_seq < write_seq:
+                if self._sync_in_progress:
+                    self._sync_cond.wait()
+                    continue
+                self._sync_in_progress = True
+                break
+            else:
+                return
+
+        synced = False
+        target = 0
+        try:
+            if self.fsync_interval:
+                time.sleep(self.fsync_interval)
+            with self._write_lock:
+                target = self._written_seq
+                fd = os.dup(self._active_file.fileno())
+            try:
+                os.fsync(fd)
+                synced = True
+            finally:
+                os.close(fd)
+        finally:
+            with self._sync_cond:
+                if synced:
+                    self._synced_seq = max(self._synced_seq, target)
+                self._sync_in_progress = False
+                self._sync_cond.notify_all()
+
+    def _rotate_segment(self) -> None:
+        """Cierra el segmento activo (con fsync) y abre uno nuevo. Requiere _write_lock."""
+        self._active_file.flush()
+        os.fsync(self._active_file.fileno())
+        self._active_file.close()
+        with self._sync_cond:
+            self._synced_seq = max(self._synced_seq, self._written_seq)
+            self._sync_cond.notify_all()
+        closed_seq = self._active_seq
+        self._open_new_segment()
+        if self._pending_by_segment.get(closed_seq, 0) == 0:
+            self._delete_segment(closed_seq)
+        self._prune_acks()
+
+    def _open_new_segment(self) -> None:
+        self._active_seq += 1
+        self._active_file = open(self._segment_path(self._active_seq, 'log'), 'ab')
+        self._active_size = 0
+        self._pending_by_segment.setdefault(self._active_seq, 0)
+
+    # --- Workers ---
+
+    def _worker_loop(self) -> None:
+        from app.config.database import db
+        from app.services.event_processing_service import event_processing_service
+
+        while not self._stopping.is_set():
+            item = self._queue.get()
+            if item is None:
+                break
+            ticket_id, slot_dir, segment_seq, events, attempts = item
+            self._set_pending_status(ticket_id, status="processing")
+            try:
+                with self._app.app_context():
+                    try:
+                        result = event_processing_service.bulk_ingest_events(db.session, events)
+                    finally:
+                        db.session.remove()
+                outcomes = result["outcomes"]
+                self._acknowledge(ticket_id, slot_dir, segment_seq, {
+                    "status": "done",
+                    "processed_count": len(result["processed_events"]),
+                    "rejected_count": sum(1 for o in outcomes if o["status"] == "rejected"),
+                })
+            except Exception as e:
+                attempts += 1
+                backoff = min(2 ** attempts, 60)
+                if attempts < self.max_attempts:
+                    logger.warning(f"Error procesando ticket {ticket_id} (intento {attempts}). Reintento en {backoff}s: {e}")
+                    self._retry_later(ticket_id, slot_dir, segment_seq, events, attempts, backoff)
+                    continue
+                logger.error(f"Ticket {ticket_id} falló tras {attempts} intentos: {e}", exc_info=True)
+                try:
+                    self._write_dead_letter(ticket_id, slot_dir, events, str(e))
+                except Exception:
+                    # Sin copia en el dead-letter el lote sólo está en su segmento: no se confirma.
+                    logger.exception(f"No se pudo guardar el ticket {ticket_id} en el dead-letter. Reintento en {backoff}s.")
+                    self._retry_later(ticket_id, slot_dir, segment_seq, events, attempts, backoff)
+                    continue
+                self._acknowledge(ticket_id, slot_dir, segment_seq, {"status": "failed", "error": str(e), "dead_letter": True})
+
+    def _retry_later(self, ticket_id: str, slot_dir: str, segment_seq: int, events: List[Dict[str, Any]],
+                     attempts: int, backoff: float) -> None:
+        self._set_pending_status(ticket_id, status="accepted", attempts=attempts)
+        timer = threading.Timer(backoff, self._queue.put, args=((ticket_id, slot_dir, segment_seq, events, attempts),))
+        timer.daemon = True
+        timer.start()
+
+    def _set_pending_status(self, ticket_id: str, **fields) -> None:
+        with self._status_lock:
+            status = self._pending_status.get(ticket_id)
+            if status is not None:
+                status.update(fields)
+
+    def _acknowledge(self, ticket_id: str, slot_dir: str, segment_seq: int, ack: Dict[str, Any]) -> None:
+        """
+        Registra (con fsync) el resultado de un ticket y borra el '.log' de su segmento si ya no
+        tiene lotes pendientes. Sin el fsync, un corte tras borrar el segmento perdería el estado
+        del ticket, y uno antes haría reprocesar lotes ya confirmados.
+        """
+        ack = dict(ack, ticket_id=ticket_id, finished_at=datetime.utcnow().isoformat())
+        ack_path = self._segment_path(segment_seq, 'ack', slot_dir)
+        with self._ack_lock:
+            created = not os.path.exists(ack_path)
+            with open(ack_path, 'a', encoding='utf-8') as ack_file:
+                ack_file.write(json.dumps(ack) + "\n")
+                ack_file.flush()
+                os.fsync(ack_file.fileno())
+            if created:
+                self._fsync_dir(slot_dir)
+        with self._write_lock:
+            if slot_dir == self._slot_dir:
+                remaining = self._pending_by_segment.get(segment_seq, 1) - 1
+                self._pending_by_segment[segment_seq] = remaining
+                if remaining <= 0 and segment_seq != self._active_seq:
+                    self._delete_segment(segment_seq)
+            else:
+                self._acknowledge_adopted(slot_dir, segment_seq)
+
+        with self._status_lock:
+            status = self._pending_status.pop(ticket_id, {"ticket_id": ticket_id})
+            status.update(ack)
+            self._remember_completed(ticket_id, status)
+
+    def _write_dead_letter(self, ticket_id: str, slot_dir: str, events: List[Dict[str, Any]], error: str) -> None:
+        with self._status_lock:
+            received_at = (self._pending_status.get(ticket_id) or {}).get("received_at")
+        record = {"ticket_id": ticket_id, "received_at": received_at, "failed_at": datetime.utcnow().isoformat(),
+                  "error": error, "events": events}
+        with self._dead_letter_lock:
+            self._append_dead_letter(slot_dir, record)
+
+    @classmethod
+    def _append_dead_letter(cls, slot_dir: str, record: Dict[str, Any]) -> None:
+        """Anexa un lote al dead-letter del slot y espera a que sea durable (fsync)."""
+        path = os.path.join(slot_dir, DEAD_LETTER_FILE)
+        created = not os.path.exists(path)
+        with open(path, 'ab') as dead_letter_file:
+            dead_letter_file.write((json.dumps(record, separators=(',', ':'), default=str) + "\n").encode('utf-8'))
+            dead_letter_file.flush()
+            os.fsync(dead_letter_file.fileno())
+        if created:
+            cls._fsync_dir(slot_dir)
+
+    def replay_dead_letters(self, db) -> Dict[str, int]:
+        """
+        Reprocesa de forma síncrona, en este proceso, los lotes del dead-letter de todos los slots.
+        Cada archivo se renombra antes de leerlo (los workers pueden seguir anexando fallos nuevos)
+        y se borra al terminar; los lotes que vuelven a fallar se anexan de nuevo al dead-letter.
+        Un archivo renombrado que quedó a medias (proceso interrumpido) se retoma: la ingesta es
+        idempotente.
+
+        Returns:
+            Dict[str, int]: {"replayed": lotes reprocesados, "failed": lotes que vuelven a fallar}
+        """
+        from app.services.event_processing_service import event_processing_service
+
+        stats = {"replayed": 0, "failed": 0}
+        if not os.path.isdir(self.base_path):
+            return stats
+        for name in sorted(os.listdir(self.base_path)):
+            slot_dir = os.path.join(self.base_path, name)
+            if not name.startswith("slot-") or not os.path.isdir(slot_dir):
+                continue
+            dead_letter_path = os.path.join(slot_dir, DEAD_LETTER_FILE)
+            if os.path.exists(dead_letter_path):
+                os.rename(dead_letter_path, os.path.join(slot_dir, f"dead-letter-{uuid.uuid4().hex}.replaying"))
+            for replaying in sorted(f for f in os.listdir(slot_dir) if f.endswith(".replaying")):
+                replaying_path = os.path.join(slot_dir, replaying)
+                with open(replaying_path, 'rb') as replaying_file:
+                    for raw_line in replaying_file:
+                        try:
+                            record = json.loads(raw_line)
+                        except ValueError:
+                            logger.warning(f"Spool: línea corrupta ignorada en '{replaying_path}'.")
+                            continue
+                        try:
+                            event_processing_service.bulk_ingest_events(db, record.get("events") or [])
+                            stats["replayed"] += 1
+                        except Exception as e:
+                            logger.error(f"El ticket {record.get('ticket_id')} del dead-letter vuelve a fallar: {e}")
+                            with self._dead_letter_lock:
+                                self._append_dead_letter(slot_dir, dict(record, failed_at=datetime.utcnow().isoformat(), error=str(e)))
+                            stats["failed"] += 1
+                os.remove(replaying_path)
+        return stats
+
+    def _remember_completed(self, ticket_id: str, status: Dict[str, Any]) -> None:
+        """Requiere _status_lock."""
+        self._completed_status[ticket_id] = status
+        while len(self._completed_status) > COMPLETED_STATUS_CAPACITY:
+            self._completed_status.popitem(last=False)
+
+    # --- Slots, recuperación y archivos ---
+
+    def _claim_slot(self) -> None:
+        """Reclama el primer slot libre con un flock exclusivo que se mantiene mientras viva el proceso."""
+        for slot in range(MAX_SPOOL_SLOTS):
+            lock_file = open(os.path.join(self.base_path, f"slot-{slot}.lock"), 'a+')
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                continue
+            self._slot = slot
+            self._slot_lock_file = lock_file
+            self._slot_dir = os.path.join(self.base_path, f"slot-{slot}")
+            os.makedirs(self._slot_dir, exist_ok=True)
+            return
+        raise RuntimeError(f"No hay slots libres en el spool '{self.base_path}'.")
+
+    def _recover(self) -> None:
+        """Re-encola los lotes sin confirmar de segmentos escritos por ejecuciones anteriores del slot."""
+        pending_by_segment = self._requeue_pending(self._slot_dir)
+        for segment_seq, pending in pending_by_segment.items():
+            self._pending_by_segment[segment_seq] = pending
+            self._active_seq = max(self._active_seq, segment_seq)
+            if pending == 0:
+                self._delete_segment(segment_seq)
+        self._prune_acks()
+        recovered = sum(pending_by_segment.values())
+        if recovered:
+            logger.info(f"Spool: {recovered} lotes pendientes recuperados del slot {self._slot}.")
+
+    def _adopt_orphan_slots(self) -> None:
+        """
+        Adopta los slots que ningún proceso tiene reclamados (su flock está libre) y re-encola sus
+        lotes sin confirmar. El flock se mantiene hasta confirmarlos todos, así que ningún otro
+        proceso lo reclama ni lo adopta mientras tanto; los acks y el dead-letter van a ese slot.
+        """
+        for name in sorted(os.listdir(self.base_path)):
+            if not (name.startswith("slot-") and name.endswith(".lock")):
+                continue
+            slot_dir = os.path.join(self.base_path, name[:-len(".lock")])
+            if slot_dir == self._slot_dir or not os.path.isdir(slot_dir):
+                continue
+            lock_file = open(os.path.join(self.base_path, name), 'a+')
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close() # Lo tiene otro proceso vivo
+                continue
+            pending_by_segment = self._requeue_pending(slot_dir)
+            for segment_seq, pending in list(pending_by_segment.items()):
+                if pending == 0:
+                    self._delete_segment(segment_seq, slot_dir)
+                    del pending_by_segment[segment_seq]
+            self._prune_acks(slot_dir)
+            if not pending_by_segment:
+                lock_file.close()
+                continue
+            with self._write_lock:
+                self._adopted_slots[slot_dir] = (lock_file, pending_by_segment)
+            logger.info(f"Spool: slot huérfano '{slot_dir}' adoptado con {sum(pending_by_segment.values())} lotes pendientes.")
+
+    def _acknowledge_adopted(self, slot_dir: str, segment_seq: int) -> None:
+        """Cuenta un lote confirmado de un slot adoptado; lo libera al confirmar el último. Requiere _write_lock."""
+        adopted = self._adopted_slots.get(slot_dir)
+        if adopted is None:
+            return
+        lock_file, pending_by_segment = adopted
+        remaining = pending_by_segment.get(segment_seq, 1) - 1
+        if remaining > 0:
+            pending_by_segment[segment_seq] = remaining
+            return
+        pending_by_segment.pop(segment_seq, None)
+        self._delete_segment(segment_seq, slot_dir)
+        if not pending_by_segment:
+            del self._adopted_slots[slot_dir]
+            lock_file.close()
+            logger.info(f"Spool: slot adoptado '{slot_dir}' vaciado y liberado.")
+
+    def _requeue_pending(self, slot_dir: str) -> Dict[int, int]:
+        """Re-encola los lotes sin ack de los segmentos de un slot. Devuelve los pendientes por segmento."""
+        pending_by_segment: Dict[int, int] = {}
+        for segment_seq in self._list_segments(slot_dir):
+            acks = self._read_acks(slot_dir, segment_seq)
+            pending = 0
+            for record in self._read_records(slot_dir, segment_seq):
+                ticket_id = record.get("ticket_id")
+                if not ticket_id:
+                    continue
+                if ticket_id in acks:
+                    with self._status_lock:
+                        self._remember_completed(ticket_id, acks[ticket_id])
+                    continue
+                events = record.get("events") or []
+                with self._status_lock:
+                    self._pending_status[ticket_id] = {
+                        "ticket_id": ticket_id, "status": "accepted",
+                        "received_at": record.get("received_at"), "events_count": len(events)
+                    }
+                self._queue.put((ticket_id, slot_dir, segment_seq, events, 0))
+                pending += 1
+            pending_by_segment[segment_seq] = pending
+        return pending_by_segment
+
+    def _lookup_status_on_disk(self, ticket_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            slot_str, segment_str, _ = ticket_id.split('-', 2)
+            slot, segment_seq = int(slot_str), int(segment_str)
+        except ValueError:
+            return None
+        slot_dir = os.path.join(self.base_path, f"slot-{slot}")
+        acks = self._read_acks(slot_dir, segment_seq)
+        if ticket_id in acks:
+            return acks[ticket_id]
+        for record in self._read_records(slot_dir, segment_seq):
+            if record.get("ticket_id") == ticket_id:
+                return {"ticket_id": ticket_id, "status": "accepted",
+                        "received_at": record.get("received_at"), "events_count": len(record.get("events") or [])}
+        # Sin ack ni registro en el segmento: desconocido, o su resultado ya expiró (ack_retention_seconds)
+        return None
+
+    def _segment_path(self, segment_seq: int, extension: str, slot_dir: Optional[str] = None) -> str:
+        return os.path.join(slot_dir or self._slot_dir, f"segment-{segment_seq:012d}.{extension}")
+
+    def _delete_segment(self, segment_seq: int, slot_dir: Optional[str] = None) -> None:
+        """Borra el '.log' de un segmento confirmado; su '.ack' se conserva hasta _prune_acks."""
+        try:
+            os.remove(self._segment_path(segment_seq, 'log', slot_dir))
+        except FileNotFoundError:
+            pass
+        if slot_dir is None or slot_dir == self._slot_dir:
+            self._pending_by_segment.pop(segment_seq, None)
+
+    def _prune_acks(self, slot_dir: Optional[str] = None) -> None:
+        """Borra los '.ack' de segmentos ya borrados con más de ack_retention_seconds."""
+        slot_dir = slot_dir or self._slot_dir
+        cutoff = time.time() - self.ack_retention_seconds
+        for name in os.listdir(slot_dir):
+            if not (name.startswith("segment-") and name.endswith(".ack")):
+                continue
+            path = os.path.join(slot_dir, name)
+            try:
+                if not os.path.exists(path[:-len(".ack")] + ".log") and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except FileNotFoundError:
+                continue
+
+    @staticmethod
+    def _fsync_dir(path: str) -> None:
+        """fsync de un directorio, para que un archivo recién creado sobreviva a un corte."""
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _list_segments(slot_dir: str) -> List[int]:
+        segments = []
+        for name in os.listdir(slot_dir):
+            if name.startswith("segment-") and name.endswith(".log"):
+                try:
+                    segments.append(int(name[len("segment-"):-len(".log")]))
+                except ValueError:
+                    continue
+        return sorted(segments)
+
+    @staticmethod
+    def _read_records(slot_dir: str, segment_seq: int):
+        path = os.path.join(slot_dir, f"segment-{segment_seq:012d}.log")
+        try:
+            with open(path, 'rb') as log_file:
+                for raw_line in log_file:
+                    try:
+                        yield json.loads(raw_line)
+                    except ValueError:
+                        # Línea incompleta de una escritura que nunca llegó a confirmarse.
+                        logger.warning(f"Spool: línea corrupta ignorada en '{path}'.")
+        except FileNotFoundError:
+            return
+
+    @staticmethod
+    def _read_acks(slot_dir: str, segment_seq: int) -> Dict[str, Dict[str, Any]]:
+        acks: Dict[str, Dict[str, Any]] = {}
+        path = os.path.join(slot_dir, f"segment-{segment_seq:012d}.ack")
+        try:
+            with open(path, 'r', encoding='utf-8') as ack_file:
+                for raw_line in ack_file:
+                    try:
+                        ack = json.loads(raw_line)
+                    except ValueError:
+                        continue
+                    if ack.get("ticket_id"):
+                        acks[ack["ticket_id"]] = ack
+        except FileNotFoundError:
+            pass
+        return acks
+
+
+# Instancia del spool para ser utilizada por la aplicación y los endpoints API.
+event_ingest_spool = EventIngestSpool(
+    base_path=settings.SPOOL_PATH,
+    segment_max_bytes=settings.SPOOL_SEGMENT_MAX_BYTES,
+    num_workers=settings.SPOOL_WORKERS,
+    fsync_interval_ms=settings.SPOOL_FSYNC_INTERVAL_MS,
+    max_attempts=settings.SPOOL_MAX_ATTEMPTS,
+    ack_retention_seconds=settings.SPOOL_ACK_RETENTION_SECONDS,
+)
@@ -1,17 +1,27 @@
 # app/services/event_processing_service.py
 import logging
 from datetime import datetime, timedelta 
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 import uuid 
 
 from sqlalchemy.orm import Session 
+from sqlalchemy.exc import IntegrityError, DataError
 
+from app.config.settings import settings
 # Importar operaciones CRUD
 from app.crud.crud_evento import evento_crud
 from app.crud.crud_alerta import alerta_crud 
 from app.crud.crud_bus import bus_crud
 from app.crud.crud_conductor import conductor_crud
 from app.crud.crud_sesion_conduccion import sesion_conduccion_crud
+# Filtro de reenvíos idénticos
+from app.services.event_idempotency_filter import recent_event_filter
+from app.services.alert_rule_engine import alert_rule_engine
+from app.services.alert_cooldown_registry import alert_cooldown_registry
+from app.services.event_correlation_service import event_correlation_service
+from app.services.alert_notification_service import alert_notification_service
+from app.services.live_stream_service import live_stream_service
+from app.services.dashboard_counter_service import dashboard_counter_service
 
 # Importar modelos para tipado
 from app.models_db.cloud_database_models import Evento, Alerta, Bus, Conductor, SesionConduccion 
@@ -25,10 +35,15 @@ if not logger.handlers:
     handler.setFormatter(formatter)
     logger.addHandler(handler)
 
-# --- Umbrales de Alerta (Ejemplo, AJUSTAR SEGÚN TUS NECESIDADES) ---
-DISTRACTION_ALERT_THRESHOLD_SECONDS = 3  
-FATIGUE_ALERT_THRESHOLD_SCORE = 0.8     
-UNIDENTIFIED_DRIVER_ALERT_COOLDOWN_MINUTES = 5 
+NULL_UUID_STR = "00000000-0000-0000-0000-000000000000"
+NULL_UUID = uuid.UUID(NULL_UUID_STR)
+
+# Columnas del modelo Evento y campos NOT NULL sin default que debe traer cada evento
+EVENTO_COLUMNS = frozenset(Evento.__table__.columns.keys())
+EVENTO_REQUIRED_FIELDS = ('id_bus', 'id_conductor', 'timestamp_evento', 'tipo_evento')
+# 'eventos' está particionada por timestamp_evento: el ON CONFLICT usa la PK completa
+# (bulk_upsert resuelve el timestamp almacenado de los IDs que ya existen)
+EVENTO_CONFLICT_FIELDS = ('id', 'timestamp_evento')
 
 class EventProcessingService:
     """
@@ -48,169 +63,344 @@ class EventProcessingService:
         Returns:
             List[Evento]: Lista de objetos Evento guardados en la BD central.
         """
+        return self.bulk_ingest_events(db, events_data)["processed_events"]
+
+    def bulk_ingest_events(self, db: Session, events_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Ingesta masiva de un lote de eventos.
+        0. Descarta los reenvíos idénticos ya guardados (filtro en memoria, sin consultas).
+        1. Valida y normaliza todo el lote en memoria, resolviendo buses, conductores y
+           sesiones con una consulta IN por tabla (número fijo de consultas por lote).
+        2. Escribe los eventos válidos con un INSERT ... ON CONFLICT (id, timestamp_evento) DO UPDATE multi-fila por bloque
+           de EVENT_INGEST_TRANSACTION_CHUNK_SIZE eventos, cada escritura dentro de un SAVEPOINT.
+        3. Evalúa alertas sobre los eventos guardados del bloque y confirma el bloque (un commit por bloque).
+        Un evento que la BD rechaza se reporta individualmente sin perder el resto de su bloque.
+
+        Args:
+            db (Session): La sesión de la base de datos.
+            events_data (List[Dict[str, Any]]): Lista de diccionarios con datos de eventos.
+
+        Returns:
+            Dict[str, Any]: {
+                "processed_events": List[Evento] guardados en la BD central,
+                "outcomes": List[Dict] con el resultado por evento, en el orden de entrada:
+                            {"id": str, "status": "created"|"updated"|"duplicate"|"rejected", "reason": str|None}
+            }
+        """
         logger.info(f"Procesando lote de {len(events_data)} eventos entrantes.")
-        processed_events: List[Evento] = []
+        outcomes: List[Dict[str, Any]] = []
+        rows_by_id: Dict[uuid.UUID, Dict[str, Any]] = {}
+        outcome_by_id: Dict[uuid.UUID, Dict[str, Any]] = {}
 
-        for event_data_raw in events_data: # Renombramos para trabajar con una copia modificable
-            event_data = event_data_raw.copy() # Aseguramos una copia para no modificar el original
-            try:
-                event_id_jetson = event_data.get('id') 
-                if not event_id_jetson or not isinstance(event_id_jetson, str):
-                    logger.warning(f"Evento sin ID válido. Saltando: {event_data.get('tipo_evento')}")
-                    continue
-                try:
-                    event_data['id'] = uuid.UUID(event_id_jetson)
-                except ValueError:
-                    logger.warning(f"ID de evento '{event_id_jetson}' no es un UUID válido. Saltando.")
-                    continue
-                
-                # Convertir timestamp_evento a datetime
-                if 'timestamp_evento' in event_data and isinstance(event_data['timestamp_evento'], str):
-                    try:
-                        event_data['timestamp_evento'] = datetime.fromisoformat(event_data['timestamp_evento'])
-                    except ValueError:
-                        logger.warning(f"Formato de timestamp_evento inválido para evento {event_id_jetson}. Usando hora actual.")
-                        event_data['timestamp_evento'] = datetime.utcnow() 
-
-                # Asegurar que id_bus y id_conductor son UUIDs
-                for field in ['id_bus', 'id_conductor']:
-                    if field in event_data and isinstance(event_data[field], str) and event_data[field] != "00000000-0000-0000-0000-000000000000": 
-                        try:
-                            event_data[field] = uuid.UUID(event_data[field])
-                        except ValueError:
-                            logger.warning(f"ID inválido para {field} en evento {event_id_jetson}. Se establece a None.")
-                            event_data[field] = None
-                    elif event_data[field] == "00000000-0000-0000-0000-000000000000":
-                        event_data[field] = None 
-
-                # >>>>>>>>>>>>>>> CAMBIO AQUI: Renombrar id_sesion_conduccion_jetson a id_sesion_conduccion <<<<<<<<<<<<<
-                id_sesion_conduccion_jetson_str = event_data.get('id_sesion_conduccion_jetson')
-                event_data['id_sesion_conduccion'] = None # Inicializar con None
-                if id_sesion_conduccion_jetson_str and isinstance(id_sesion_conduccion_jetson_str, str):
-                    try:
-                        id_sesion_conduccion_jetson_uuid = uuid.UUID(id_sesion_conduccion_jetson_str)
-                        sesion_existente = sesion_conduccion_crud.get_by_jetson_session_id(db, id_sesion_conduccion_jetson_uuid)
-                        if sesion_existente:
-                            event_data['id_sesion_conduccion'] = id_sesion_conduccion_jetson_uuid # Usa el UUID real de la Jetson
-                        else:
-                            logger.warning(f"Sesión '{id_sesion_conduccion_jetson_str}' no encontrada en la nube para evento {event_id_jetson}. Evento no se vinculará a sesión.")
-                    except ValueError:
-                        logger.warning(f"ID de sesión '{id_sesion_conduccion_jetson_str}' no es un UUID válido. Evento no se vinculará a sesión.")
-                
-                # Quitar el campo original si existe en la data antes de pasar al modelo
-                if 'id_sesion_conduccion_jetson' in event_data:
-                    del event_data['id_sesion_conduccion_jetson']
-
-                # Validar existencia de Bus y Conductor
-                if event_data.get('id_bus') is None:
-                    logger.warning(f"Evento {event_id_jetson} sin ID de bus válido. No se procesa.")
-                    continue
-                bus_existente = bus_crud.get(db, event_data['id_bus'])
-                if not bus_existente:
-                    logger.warning(f"Bus '{event_data['id_bus']}' no encontrado para evento {event_id_jetson}. No se procesa el evento.")
-                    continue
-                
-                if event_data.get('id_conductor') is not None:
-                    conductor_existente = conductor_crud.get(db, event_data['id_conductor'])
-                    if not conductor_existente:
-                        logger.warning(f"Conductor '{event_data['id_conductor']}' no encontrado para evento {event_id_jetson}. Se anula el vínculo.")
-                        event_data['id_conductor'] = None 
-
-                # Convertir floats de string si es necesario (ej. confidence_score_ia)
-                if 'confidence_score_ia' in event_data and isinstance(event_data['confidence_score_ia'], str):
-                    try:
-                        event_data['confidence_score_ia'] = float(event_data['confidence_score_ia'])
-                    except ValueError:
-                        event_data['confidence_score_ia'] = None
-                
-                # Asegurar que los URLs de evidencia no son null si el campo es no-null en la DB
-                if 'snapshot_url' not in event_data: event_data['snapshot_url'] = None
-                if 'video_clip_url' not in event_data: event_data['video_clip_url'] = None
-
-                # Crear el evento en la BD central
-                new_db_event = evento_crud.create_or_update(db, event_data, unique_field='id')
-                processed_events.append(new_db_event)
-                logger.info(f"Evento ID {new_db_event.id} ({new_db_event.tipo_evento}) procesado y guardado.")
+        content_hashes: Dict[uuid.UUID, Tuple[str, str]] = {}
 
-                # --- Evaluación de Alertas ---
-                self._evaluate_for_alert(db, new_db_event)
+        # 1. Normalización en memoria (sin consultas a la BD)
+        normalized: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+        for event_data_raw in events_data:
+            raw_id = event_data_raw.get('id') if isinstance(event_data_raw, dict) else None
+            outcome = {"id": raw_id if isinstance(raw_id, str) else None, "status": "rejected", "reason": None}
+            outcomes.append(outcome)
+
+            # Reenvío idéntico de un evento ya guardado: se descarta sin tocar la BD.
+            content_hash = None
+            if isinstance(raw_id, str) and recent_event_filter.enabled:
+                content_hash = recent_event_filter.content_hash(event_data_raw)
+                if recent_event_filter.is_duplicate(raw_id, content_hash):
+                    outcome["status"] = "duplicate"
+                    outcome["reason"] = "Evento ya procesado anteriormente con el mismo contenido."
+                    continue
 
+            try:
+                event_data, reason = self._normalize_event_data(event_data_raw)
             except Exception as e:
-                logger.error(f"Error procesando evento: {event_data.get('id')} - {e}", exc_info=True)
-        
-        db.commit() # Un solo commit para todo el lote de eventos procesados
-        return processed_events
-
-    def _evaluate_for_alert(self, db: Session, event: Evento):
-        """
-        Evalúa un evento individual para determinar si debe disparar una alerta.
-        """
-        alert_triggered = False
-        alert_type = None
-        description = None
-        severity = None
-
-        if event.tipo_evento == 'Distraccion' and event.duracion_segundos is not None and event.duracion_segundos >= DISTRACTION_ALERT_THRESHOLD_SECONDS:
-            alert_type = 'Distracción Prolongada'
-            description = f"El conductor se distrajo por {event.duracion_segundos} segundos."
-            severity = 'Crítica'
-            alert_triggered = True
-        elif event.tipo_evento == 'Fatiga' and event.confidence_score_ia is not None and event.confidence_score_ia >= FATIGUE_ALERT_THRESHOLD_SCORE:
-            alert_type = 'Fatiga Severa'
-            description = f"Alta probabilidad de fatiga (score: {event.confidence_score_ia})."
-            severity = 'Crítica'
-            alert_triggered = True
-        elif event.tipo_evento == 'RegulacionConduccion' and event.subtipo_evento == 'Exceso Horas Conduccion':
-            alert_type = 'Exceso Horas Conduccion'
-            description = f"El conductor ha excedido el límite de horas de conducción."
-            severity = 'Crítica'
-            alert_triggered = True
-        elif event.tipo_evento == 'Identificacion' and event.subtipo_evento == 'Conductor No Identificado':
-            alert_type = 'Conductor No Identificado'
-            description = f"Alerta: Conductor no identificado en el bus '{event.id_bus}'."
-            severity = 'Alta'
-            alert_triggered = True
-            if self._is_on_cooldown(db, event.id_bus, 'Conductor No Identificado', UNIDENTIFIED_DRIVER_ALERT_COOLDOWN_MINUTES):
-                logger.info(f"Alerta de 'Conductor No Identificado' para bus {event.id_bus} en periodo de enfriamiento. No se dispara.")
-                alert_triggered = False
-
-
-        if alert_triggered:
+                logger.error(f"Error validando evento: {raw_id} - {e}", exc_info=True)
+                event_data, reason = None, "Error interno al validar el evento."
+
+            if event_data is None:
+                outcome["reason"] = reason
+                continue
+            if content_hash is not None:
+                content_hashes[event_data['id']] = (raw_id, content_hash)
+            normalized.append((event_data, outcome))
+
+        # 2. Resolución de referencias: una consulta IN por tabla para todo el lote
+        references = self._prefetch_event_references(db, [event_data for event_data, _ in normalized])
+
+        for event_data, outcome in normalized:
+            event_data, reason = self._resolve_event_references(event_data, references)
+            if event_data is None:
+                outcome["reason"] = reason
+                continue
+
+            # Un mismo ID repetido dentro del lote: gana la última aparición.
+            previous = outcome_by_id.get(event_data['id'])
+            if previous is not None:
+                previous["status"] = "duplicate"
+                previous["reason"] = "ID repetido dentro del mismo lote; se conserva la última aparición."
+            rows_by_id[event_data['id']] = event_data
+            outcome_by_id[event_data['id']] = outcome
+
+        # 3. Escritura por bloques: cada bloque de EVENT_INGEST_TRANSACTION_CHUNK_SIZE eventos
+        #    (con sus alertas) es una transacción; cada escritura va dentro de un SAVEPOINT.
+        processed_events: List[Evento] = []
+        event_ids = list(rows_by_id.keys())
+        # Reglas de alertas por empresa: se comprueba su versión una vez por lote y la evaluación
+        # de cada evento no consulta la BD (el enfriamiento se resuelve en memoria).
+        alert_rule_engine.ensure_fresh(db)
+        empresa_by_bus = {bus_id: bus.id_empresa for bus_id, bus in references["buses"].items()}
+        chunk_size = max(1, settings.EVENT_INGEST_TRANSACTION_CHUNK_SIZE)
+        for start in range(0, len(event_ids), chunk_size):
+            chunk_ids = event_ids[start:start + chunk_size]
             try:
-                alert_data = {
-                    "id_evento": event.id,
-                    "id_conductor": event.id_conductor if event.id_conductor else uuid.UUID('00000000-0000-0000-0000-000000000000'), 
-                    "id_bus": event.id_bus,
-                    "id_sesion_conduccion": event.id_sesion_conduccion,
-                    "timestamp_alerta": event.timestamp_evento, 
-                    "tipo_alerta": alert_type,
-                    "descripcion": description,
-                    "nivel_criticidad": severity,
-                    "estado_alerta": "Activa" 
-                }
-                
-                new_alert = alerta_crud.create(db, alert_data) 
-                logger.info(f"ALERTA DISPARADA: {new_alert.tipo_alerta} para bus {new_alert.id_bus}, conductor {new_alert.id_conductor}. ID Alerta: {new_alert.id}")
-                event.alerta_disparada = True 
-                db.add(event) 
+                chunk_rows = [rows_by_id[event_id] for event_id in chunk_ids]
+                written_ids = self._write_event_chunk(db, chunk_rows, outcome_by_id)
+
+                # Recargar los eventos escritos con una sola consulta IN para evaluar alertas,
+                # acotada al rango de timestamps del bloque para leer sólo sus particiones.
+                chunk_timestamps = [row['timestamp_evento'] for row in chunk_rows]
+                saved_by_id = {
+                    evento.id: evento for evento in evento_crud.get_events_by_ids(
+                        db, written_ids, start_time=min(chunk_timestamps),
+                        end_time=max(chunk_timestamps) + timedelta(microseconds=1))
+                } if written_ids else {}
+                chunk_events = [saved_by_id[event_id] for event_id in written_ids if event_id in saved_by_id]
+
+                # --- Evaluación de Alertas ---
+                # Se generan las alertas pendientes de todo el bloque y se escriben juntas:
+                # un INSERT multi-fila de alertas y un UPDATE de alerta_disparada por lista de IDs.
+                pending_alerts = []
+                for new_db_event in chunk_events:
+                    try:
+                        alert_data = self._evaluate_for_alert(db, new_db_event, empresa_by_bus.get(new_db_event.id_bus))
+                    except Exception as e:
+                        logger.error(f"Error evaluando alertas para evento {new_db_event.id}: {e}", exc_info=True)
+                        continue
+                    if alert_data is not None:
+                        pending_alerts.append(alert_data)
+                self._write_pending_alerts(db, pending_alerts, references)
+                if settings.LIVE_STREAM_ENABLED:
+                    # Stream en vivo: sólo eventos nuevos (no los reenvíos) y sus alertas, en la misma transacción.
+                    live_stream_service.publish_in_transaction(
+                        db, [evento for evento in chunk_events if outcome_by_id[evento.id]["status"] == "created"],
+                        pending_alerts, empresa_by_bus)
+                db.commit()
             except Exception as e:
-                logger.error(f"Error al crear alerta para evento {event.id}: {e}", exc_info=True)
+                # Un fallo de escritura no es culpa de los eventos: se propaga para que el lote
+                # se reintente (la Jetson recibe un 500, el spool lo vuelve a encolar).
+                # Los bloques anteriores ya están confirmados; el upsert hace el reintento idempotente.
+                db.rollback()
+                logger.error(f"Error en la escritura masiva del lote de eventos: {e}", exc_info=True)
+                raise
+
+            processed_events.extend(chunk_events)
+            recent_event_filter.remember(content_hashes[event_id] for event_id in written_ids if event_id in content_hashes)
+
+        if processed_events:
+            logger.info(f"{len(processed_events)} eventos guardados en {-(-len(event_ids) // chunk_size)} transacciones.")
+        return {"processed_events": processed_events, "outcomes": outcomes}
+
+    def _write_event_chunk(self, db: Session, rows: List[Dict[str, Any]], outcome_by_id: Dict[uuid.UUID, Dict[str, Any]]) -> List[uuid.UUID]:
+        """
+        Escribe un bloque de eventos con un único upsert multi-fila dentro de un SAVEPOINT.
+        Si la BD rechaza el bloque por un dato inválido, se reintenta evento a evento, cada uno
+        en su propio SAVEPOINT, para aislar y reportar sólo los eventos culpables.
+        Los errores que no son de datos (conexión, etc.) se propagan.
+
+        Returns:
+            List[uuid.UUID]: IDs de los eventos escritos, en el orden del bloque.
+        """
+        try:
+            with db.begin_nested():
+                existing_ids = evento_crud.bulk_upsert(db, rows, unique_field='id', conflict_fields=EVENTO_CONFLICT_FIELDS)
+            written_ids = [row['id'] for row in rows]
+        except (IntegrityError, DataError) as e:
+            logger.warning(f"La BD rechazó un bloque de {len(rows)} eventos ({e.orig}). Reintentando evento a evento.")
+            existing_ids = set()
+            written_ids = []
+            for row in rows:
+                try:
+                    with db.begin_nested():
+                        existing_ids |= evento_crud.bulk_upsert(db, [row], unique_field='id', conflict_fields=EVENTO_CONFLICT_FIELDS)
+                    written_ids.append(row['id'])
+                except (IntegrityError, DataError) as row_error:
+                    logger.warning(f"Evento {row['id']} rechazado por la base de datos: {row_error.orig}")
+                    outcome_by_id[row['id']]["reason"] = f"Rechazado por la base de datos: {row_error.orig}"
+
+        for event_id in written_ids:
+            outcome_by_id[event_id]["status"] = "updated" if event_id in existing_ids else "created"
+        return written_ids
+
+    def _normalize_event_data(self, event_data_raw: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Valida y normaliza en memoria los datos de un evento (tipos, IDs, campos del modelo).
+        No consulta la base de datos; las referencias se resuelven después para todo el lote.
+
+        Returns:
+            Tuple[Optional[Dict[str, Any]], Optional[str]]: (datos normalizados, None) si el evento es
+            válido, o (None, motivo del rechazo) en caso contrario. El ID de sesión de la Jetson queda
+            pendiente de resolver en 'id_sesion_conduccion'.
+        """
+        if not isinstance(event_data_raw, dict):
+            return None, "El evento no es un objeto JSON."
+        event_data = event_data_raw.copy() # Aseguramos una copia para no modificar el original
+
+        event_id_jetson = event_data.get('id')
+        if not event_id_jetson or not isinstance(event_id_jetson, str):
+            logger.warning(f"Evento sin ID válido. Saltando: {event_data.get('tipo_evento')}")
+            return None, "Evento sin ID válido."
 
+        # Renombrar id_sesion_conduccion_jetson a id_sesion_conduccion (se valida al resolver referencias)
+        event_data['id_sesion_conduccion'] = event_data.pop('id_sesion_conduccion_jetson', None)
 
-    def _is_on_cooldown(self, db: Session, bus_id: uuid.UUID, alert_type: str, cooldown_minutes: int) -> bool:
+        # Conversión de tipos con el plan precalculado del modelo (UUIDs, fechas, numéricos, JSON).
+        # La escritura masiva no admite columnas desconocidas: se descartan los campos extra.
+        processed = evento_crud.coercion_plan.apply({k: v for k, v in event_data.items() if k in EVENTO_COLUMNS})
+
+        if processed['id'] is None:
+            logger.warning(f"ID de evento '{event_id_jetson}' no es un UUID válido. Saltando.")
+            return None, "El ID del evento no es un UUID válido."
+
+        if processed.get('timestamp_evento') is None and event_data.get('timestamp_evento') is not None:
+            # No se sustituye por la hora actual: cada reintento tendría otra clave de partición.
+            logger.warning(f"Formato de timestamp_evento inválido para evento {event_id_jetson}. No se procesa.")
+            return None, "Formato de 'timestamp_evento' inválido."
+
+        # Asegurar que id_bus y id_conductor son UUIDs (el UUID nulo de la Jetson equivale a None)
+        for field in ['id_bus', 'id_conductor']:
+            if processed.get(field) == NULL_UUID:
+                processed[field] = None
+            elif event_data.get(field) is not None and not isinstance(processed.get(field), uuid.UUID):
+                logger.warning(f"ID inválido para {field} en evento {event_id_jetson}. Se establece a None.")
+                processed[field] = None
+
+        if processed.get('id_bus') is None:
+            logger.warning(f"Evento {event_id_jetson} sin ID de bus válido. No se procesa.")
+            return None, "Evento sin ID de bus válido."
+
+        if event_data['id_sesion_conduccion'] and not isinstance(processed['id_sesion_conduccion'], uuid.UUID):
+            logger.warning(f"ID de sesión '{event_data['id_sesion_conduccion']}' no es un UUID válido. Evento no se vinculará a sesión.")
+            processed['id_sesion_conduccion'] = None
+
+        # Asegurar que los URLs de evidencia están presentes (aunque sean None)
+        processed.setdefault('snapshot_url', None)
+        processed.setdefault('video_clip_url', None)
+
+        return processed, None
+
+    def _prefetch_event_references(self, db: Session, events: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
-        Verifica si una alerta de un tipo específico para un bus específico está en un período de enfriamiento.
-        Esto previene el spam de alertas por la misma condición.
+        Resuelve en bloque los buses, conductores y sesiones referenciados por un lote de eventos.
+        Ejecuta como máximo una consulta IN por tabla, sin importar el tamaño del lote.
+
+        Returns:
+            Dict[str, Any]: {"buses": {id: Bus}, "conductores": {id: Conductor}, "sesiones": {id_sesion_conduccion_jetson}}
         """
-        cooldown_threshold = datetime.utcnow() - timedelta(minutes=cooldown_minutes)
-        last_alert: Optional[Alerta] = db.query(Alerta).filter(
-            Alerta.id_bus == bus_id,
-            Alerta.tipo_alerta == alert_type
-        ).order_by(Alerta.timestamp_alerta.desc()).first()
+        bus_ids = {e['id_bus'] for e in events if e.get('id_bus') is not None}
+        conductor_ids = {e['id_conductor'] for e in events if e.get('id_conductor') is not None}
+        session_ids = {e['id_sesion_conduccion'] for e in events if e.get('id_sesion_conduccion') is not None}
 
-        if last_alert and last_alert.timestamp_alerta >= cooldown_threshold:
-            return True 
-        return False
+        buses = {bus.id: bus for bus in bus_crud.get_multi_by_ids(db, list(bus_ids))} if bus_ids else {}
+        conductores = {c.id: c for c in conductor_crud.get_multi_by_ids(db, list(conductor_ids))} if conductor_ids else {}
+        sesiones = sesion_conduccion_crud.get_existing_jetson_session_ids(db, list(session_ids)) if session_ids else set()
+        return {"buses": buses, "conductores": conductores, "sesiones": sesiones}
+
+    def _resolve_event_references(self, event_data: Dict[str, Any], references: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Valida las referencias de un evento normalizado contra las entidades precargadas del lote.
+
+        Returns:
+            Tuple[Optional[Dict[str, Any]], Optional[str]]: (datos listos para el modelo Evento, None)
+            si el evento es válido, o (None, motivo del rechazo) en caso contrario.
+        """
+        event_id = event_data['id']
+
+        session_id = event_data.get('id_sesion_conduccion')
+        if session_id is not None and session_id not in references["sesiones"]:
+            logger.warning(f"Sesión '{session_id}' no encontrada en la nube para evento {event_id}. Evento no se vinculará a sesión.")
+            event_data['id_sesion_conduccion'] = None
+
+        # Validar existencia de Bus y Conductor
+        if event_data['id_bus'] not in references["buses"]:
+            logger.warning(f"Bus '{event_data['id_bus']}' no encontrado para evento {event_id}. No se procesa el evento.")
+            return None, f"Bus '{event_data['id_bus']}' no encontrado."
+
+        if event_data.get('id_conductor') is not None and event_data['id_conductor'] not in references["conductores"]:
+            logger.warning(f"Conductor '{event_data['id_conductor']}' no encontrado para evento {event_id}. Se anula el vínculo.")
+            event_data['id_conductor'] = None
+
+        # En la escritura masiva un NOT NULL violado haría fallar todo el lote, así que se rechaza aquí.
+        missing = [field for field in EVENTO_REQUIRED_FIELDS if event_data.get(field) is None]
+        if missing:
+            logger.warning(f"Evento {event_id} sin campos requeridos {missing}. No se procesa.")
+            return None, f"Faltan campos requeridos: {missing}."
+
+        return event_data, None
+
+    def _evaluate_for_alert(self, db: Session, event: Evento, id_empresa: Optional[uuid.UUID] = None) -> Optional[Dict[str, Any]]:
+        """
+        Evalúa un evento individual con las reglas de alertas de su empresa (ver AlertRuleEngine)
+        para determinar si debe disparar una alerta.
+        No escribe la alerta: devuelve sus datos (con ID ya asignado) para escribirla con el resto
+        del bloque en _write_pending_alerts, o None si no se dispara.
+        """
+        # Correlación: el evento cuenta en las ventanas de todas las reglas con ventana que cumple,
+        # aunque al final dispare otra regla. Un evento tiene como mucho una alerta: entre las
+        # candidatas gana la de menor prioridad que no esté en enfriamiento.
+        candidates = []
+        for window_rule in alert_rule_engine.window_rules(event, id_empresa):
+            count = event_correlation_service.observe(window_rule, event)
+            if count is not None:
+                candidates.append((window_rule, {"conteo": count, "ventana_minutos": window_rule.ventana_minutos}))
+        rule = alert_rule_engine.evaluate(event, id_empresa)
+        if rule is not None:
+            candidates.append((rule, None))
+        candidates.sort(key=lambda candidate: candidate[0].prioridad)
+
+        for rule, extra in candidates:
+            if rule.cooldown_minutos > 0:
+                # El registro del enfriamiento va en un SAVEPOINT: si falla, no aborta el bloque.
+                with db.begin_nested():
+                    on_cooldown = alert_cooldown_registry.is_on_cooldown(
+                        db, event.id_bus, rule.tipo_alerta, rule.cooldown_minutos, alert_at=event.timestamp_evento)
+                if on_cooldown:
+                    logger.info(f"Alerta de '{rule.tipo_alerta}' para bus {event.id_bus} en periodo de enfriamiento. No se dispara.")
+                    continue
+            return self._build_alert_data(event, rule, extra)
+        return None
+
+    def _build_alert_data(self, event: Evento, rule: Any, extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return {
+            "id": uuid.uuid4(),
+            "id_evento": event.id,
+            "id_conductor": event.id_conductor if event.id_conductor else NULL_UUID,
+            "id_bus": event.id_bus,
+            "id_sesion_conduccion": event.id_sesion_conduccion,
+            "timestamp_alerta": event.timestamp_evento,
+            "tipo_alerta": rule.tipo_alerta,
+            "descripcion": rule.describe(event, extra),
+            "nivel_criticidad": rule.nivel_criticidad,
+            "estado_alerta": "Activa"
+        }
+
+    def _write_pending_alerts(self, db: Session, pending_alerts: List[Dict[str, Any]], references: Dict[str, Any]) -> None:
+        """
+        Escribe las alertas de un bloque con un INSERT multi-fila, marca sus eventos con un solo
+        UPDATE por lista de IDs, encola sus notificaciones en el outbox (con los buses y
+        conductores ya resueltos para el lote) y suma las alertas activas a los contadores del
+        dashboard. No hace commit: va en la transacción del bloque.
+        """
+        if not pending_alerts:
+            return
+        alerta_crud.bulk_insert(db, pending_alerts)
+        alert_timestamps = [alert["timestamp_alerta"] for alert in pending_alerts]
+        evento_crud.mark_alerts_triggered(
+            db, [alert["id_evento"] for alert in pending_alerts],
+            start_time=min(alert_timestamps), end_time=max(alert_timestamps) + timedelta(microseconds=1))
+        alert_notification_service.enqueue_notifications(db, pending_alerts, references["buses"], references["conductores"])
+        dashboard_counter_service.alerts_created(
+            db, pending_alerts, {bus_id: bus.id_empresa for bus_id, bus in references["buses"].items()})
+        for alert in pending_alerts:
+            logger.info(f"ALERTA DISPARADA: {alert['tipo_alerta']} para bus {alert['id_bus']}, conductor {alert['id_conductor']}. ID Alerta: {alert['id']}")
 
 
 # Crea una instancia de EventProcessingService para ser utilizada por los endpoints API.
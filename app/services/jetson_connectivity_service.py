@@ -0,0 +1,150 @@
+# app/services/jetson_connectivity_service.py
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List
+
+from sqlalchemy import Row
+from sqlalchemy.orm import Session
+
+from app.config.settings import settings
+from app.core.scheduler import PeriodicTask
+from app.crud.crud_alerta import alerta_crud
+from app.crud.crud_bus import bus_crud
+from app.crud.crud_jetson_nano import jetson_nano_crud
+from app.services.alert_notification_service import alert_notification_service
+from app.services.dashboard_counter_service import dashboard_counter_service
+
+# Setup logger para este módulo
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+ALERT_DISCONNECTED = 'Jetson Desconectada'
+
+class JetsonConnectivityService:
+    """
+    Transiciones de conexión de las Jetson, persistidas en jetson_nanos.estado_conexion.
+
+    - Desconexión: un barrido periódico (sweep_once) pasa a 'Desconectado', con un único UPDATE
+      condicional ... RETURNING, las Jetsons conectadas sin contacto en connection_timeout_seconds.
+      El UPDATE recorre ix_jetson_nanos_estado_conexion_ultima_conexion, así que su coste depende de
+      las transiciones y no del tamaño de la flota. Por cada transición: ajuste del contador del
+      dashboard, una alerta 'Jetson Desconectada' (sólo la crea la transición, así que hay una por
+      caída) y un mensaje 'conexion' en el stream en vivo.
+    - Reconexión: la escribe el primer contacto con otro UPDATE condicional (ver JetsonLastSeenCache
+      y create_or_update_jetson_nano), que llama a connection_restored: contador, cierre de la alerta
+      de la caída y mensaje 'conexion'.
+    Con varios workers, cada transición la aplica sólo el que consigue escribirla.
+    """
+
+    def __init__(self, connection_timeout_seconds: int, sweep_interval_seconds: float):
+        self.connection_timeout_seconds = connection_timeout_seconds
+        self.task = PeriodicTask('jetson-connectivity-sweeper', sweep_interval_seconds, self._run_sweep)
+
+    def start(self, app) -> None:
+        self.task.start(app)
+
+    # --- Desconexiones ---
+
+    def sweep_once(self, db: Session, now: Optional[datetime] = None) -> List[Row]:
+        """
+        Marca como desconectadas las Jetsons que han superado el timeout desde el último barrido y
+        aplica sus consecuencias, en una transacción con commit.
+
+        Returns:
+            List[Row]: (id_hardware_jetson, id_bus, activo, ultima_conexion_cloud_at) de cada desconexión.
+        """
+        now = now or datetime.utcnow()
+        try:
+            rows = jetson_nano_crud.mark_disconnected(db, now - timedelta(seconds=self.connection_timeout_seconds), now)
+            if rows:
+                self._apply_disconnections(db, rows, now)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        for row in rows:
+            logger.info(f"Jetson {row.id_hardware_jetson} desconectada (último contacto: {row.ultima_conexion_cloud_at}).")
+        return rows
+
+    def _apply_disconnections(self, db: Session, rows: List[Row], now: datetime) -> None:
+        bus_ids = list({row.id_bus for row in rows if row.id_bus is not None})
+        buses = {bus.id: bus for bus in bus_crud.get_multi_by_ids(db, bus_ids)} if bus_ids else {}
+        empresa_by_bus = {bus_id: bus.id_empresa for bus_id, bus in buses.items()}
+        dashboard_counter_service.jetsons_disconnected(db, [row.id_bus for row in rows if row.activo], empresa_by_bus)
+
+        alerts: List[Dict[str, Any]] = []
+        active = alerta_crud.get_active_bus_types(db, [ALERT_DISCONNECTED])
+        for row in rows:
+            # Las Jetsons en mantenimiento o sin bus no alertan
+            if not row.activo or row.id_bus is None or (row.id_bus, ALERT_DISCONNECTED) in active:
+                continue
+            active.add((row.id_bus, ALERT_DISCONNECTED))
+            last_contact = row.ultima_conexion_cloud_at.strftime('%Y-%m-%d %H:%M:%S') + ' UTC' \
+                if row.ultima_conexion_cloud_at else 'nunca'
+            alerts.append({
+                "id": uuid.uuid4(), "id_evento": None, "id_conductor": None, "id_bus": row.id_bus,
+                "id_sesion_conduccion": None, "timestamp_alerta": now, "tipo_alerta": ALERT_DISCONNECTED,
+                "descripcion": f"Jetson {row.id_hardware_jetson} sin contacto durante más de "
+                               f"{self.connection_timeout_seconds // 60} minutos (último contacto: {last_contact}).",
+                "nivel_criticidad": "Alta", "estado_alerta": "Activa"
+            })
+        if alerts:
+            alerta_crud.bulk_insert(db, alerts)
+            alert_notification_service.enqueue_notifications(db, alerts, buses, {})
+            dashboard_counter_service.alerts_created(db, alerts, empresa_by_bus)
+        if settings.LIVE_STREAM_ENABLED:
+            from app.services.live_stream_service import live_stream_service
+            live_stream_service.publish_in_transaction(db, [], alerts, empresa_by_bus)
+            live_stream_service.publish_connection_changes(db, [
+                {"id_hardware_jetson": row.id_hardware_jetson, "id_bus": row.id_bus, "estado_conexion": "Desconectado",
+                 "timestamp": now, "ultima_conexion_cloud_at": row.ultima_conexion_cloud_at}
+                for row in rows
+            ], empresa_by_bus)
+
+    # --- Reconexiones ---
+
+    def connection_restored(self, db: Session, id_hardware_jetson: str, id_bus: Optional[uuid.UUID],
+                            activo: Optional[bool], seen_at: datetime) -> None:
+        """
+        Consecuencias de una reconexión ya escrita (claim_reconnection): vuelve a contar la Jetson en
+        el dashboard y cierra la caída (close_outage). No hace commit.
+        """
+        dashboard_counter_service.jetson_changed(db, id_bus, False, id_bus, bool(activo))
+        self.close_outage(db, id_hardware_jetson, id_bus, seen_at)
+
+    def close_outage(self, db: Session, id_hardware_jetson: str, id_bus: Optional[uuid.UUID], seen_at: datetime) -> None:
+        """Cierra la alerta de desconexión del bus y publica el mensaje 'conexion' de la reconexión. No hace commit."""
+        bus = bus_crud.get(db, id_bus) if id_bus is not None else None
+        if bus is not None:
+            resolved = alerta_crud.resolve_active(db, id_bus, ALERT_DISCONNECTED, seen_at,
+                                                  f"Conexión restablecida (Jetson {id_hardware_jetson}).")
+            for _ in range(resolved):
+                dashboard_counter_service.alert_changed(db, id_bus, True, False)
+        if settings.LIVE_STREAM_ENABLED:
+            from app.services.live_stream_service import live_stream_service
+            live_stream_service.publish_connection_changes(db, [
+                {"id_hardware_jetson": id_hardware_jetson, "id_bus": id_bus, "estado_conexion": "Conectado",
+                 "timestamp": seen_at, "ultima_conexion_cloud_at": seen_at}
+            ], {id_bus: bus.id_empresa} if bus is not None else {})
+        logger.info(f"Jetson {id_hardware_jetson} reconectada.")
+
+    def _run_sweep(self) -> None:
+        from app.config.database import db
+        # Importación local: la caché depende de este servicio para las reconexiones.
+        # Antes de barrer se escriben los contactos que este worker tiene en memoria.
+        from app.services.jetson_last_seen_cache import jetson_last_seen_cache
+        jetson_last_seen_cache.flush(db.session)
+        self.sweep_once(db.session)
+
+
+# Instancia del servicio para ser utilizada en la aplicación.
+jetson_connectivity_service = JetsonConnectivityService(
+    connection_timeout_seconds=settings.JETSON_CONNECTION_TIMEOUT_SECONDS,
+    sweep_interval_seconds=settings.JETSON_CONNECTIVITY_SWEEP_SECONDS
+)
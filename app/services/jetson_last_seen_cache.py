@@ -0,0 +1,213 @@
+# app/services/jetson_last_seen_cache.py
+import logging
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config.settings import settings
+from app.core.scheduler import PeriodicTask
+from app.crud.crud_jetson_nano import jetson_nano_crud
+from app.models_db.cloud_database_models import JetsonNano
+from app.services.dashboard_counter_service import dashboard_counter_service
+from app.services.jetson_connectivity_service import jetson_connectivity_service
+
+# Setup logger para este módulo
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+class DeviceState:
+    """Estado de una Jetson que necesita el latido (activo, bus y estado de salud), con la hora de lectura."""
+    __slots__ = ('activo', 'id_bus', 'estado_salud', 'loaded_at')
+
+    def __init__(self, activo: Optional[bool], id_bus: Optional[uuid.UUID], estado_salud: Optional[str], loaded_at: datetime):
+        self.activo = activo
+        self.id_bus = id_bus
+        self.estado_salud = estado_salud
+        self.loaded_at = loaded_at
+
+class JetsonLastSeenCache:
+    """
+    Caché write-behind del último contacto de cada Jetson (ultima_conexion_cloud_at y last_telemetry_at).
+
+    - Latidos y telemetría anotan el contacto en memoria (touch) en lugar de actualizar la fila de
+      jetson_nanos en cada petición; una PeriodicTask escribe lo acumulado cada flush_interval_seconds
+      con un único UPDATE multi-fila (ver CRUDJetsonNano.record_last_seen).
+    - La reconexión (contacto de una Jetson marcada como 'Desconectado' por el barrido de
+      JetsonConnectivityService) se escribe en el momento con un UPDATE condicional, para que sus
+      consecuencias (contador, cierre de la alerta, stream) se apliquen una sola vez aunque los
+      latidos lleguen a varios workers.
+    - last_seen combina la BD con lo pendiente en este worker. Los demás workers, y el barrido, ven la
+      BD con un retraso de como mucho flush_interval_seconds (muy inferior al timeout de conexión).
+      Al parar el proceso se pierde, como mucho, ese intervalo.
+    - El latido (heartbeat) no carga la entidad: guarda el estado del dispositivo (DeviceState) hasta
+      device_state_ttl_seconds, así que un latido de una Jetson conectada no ejecuta ninguna sentencia;
+      si no, ejecuta un único UPDATE ... RETURNING.
+    Con flush_interval_seconds <= 0 la caché se desactiva y cada contacto se escribe en la transacción
+    del llamador (el latido, con un único UPDATE ... RETURNING).
+    """
+
+    def __init__(self, flush_interval_seconds: float, connection_timeout_seconds: int, device_state_ttl_seconds: float):
+        self.enabled = flush_interval_seconds > 0
+        self.connection_timeout_seconds = connection_timeout_seconds
+        self.device_state_ttl_seconds = device_state_ttl_seconds
+        self._lock = threading.Lock()
+        # Serializa los volcados: los lanzan la PeriodicTask y el barrido de conexión, que pueden solaparse.
+        self._flush_lock = threading.Lock()
+        self._pending: Dict[str, Tuple[datetime, Optional[datetime]]] = {}
+        self._flushing: Dict[str, Tuple[datetime, Optional[datetime]]] = {}
+        self._devices: Dict[str, DeviceState] = {}
+        self.task = PeriodicTask('jetson-last-seen-flush', flush_interval_seconds, self._run_flush)
+
+    def start(self, app) -> None:
+        self.task.start(app)
+
+    def last_seen(self, id_hardware_jetson: str, stored: Optional[datetime]) -> Optional[datetime]:
+        """Último contacto conocido: el más reciente entre el de la BD ('stored') y el pendiente de escribir."""
+        with self._lock:
+            candidates = [entry[0] for entry in (self._pending.get(id_hardware_jetson), self._flushing.get(id_hardware_jetson)) if entry]
+        if stored is not None:
+            candidates.append(stored)
+        return max(candidates) if candidates else None
+
+    def last_seen_of(self, jetson: JetsonNano) -> Optional[datetime]:
+        return self.last_seen(jetson.id_hardware_jetson, jetson.ultima_conexion_cloud_at)
+
+    def is_connected(self, jetson: JetsonNano) -> bool:
+        return dashboard_counter_service.is_jetson_connected(jetson.activo, jetson.estado_conexion, self.last_seen_of(jetson))
+
+    def _is_recent(self, last_seen: Optional[datetime], now: datetime) -> bool:
+        """Último contacto dentro del timeout de conexión (sin mirar 'activo')."""
+        return last_seen is not None and now - last_seen <= timedelta(seconds=self.connection_timeout_seconds)
+
+    def touch(self, db: Session, jetson: JetsonNano, seen_at: datetime, last_telemetry_at: Optional[datetime] = None) -> None:
+        """
+        Anota un contacto de la Jetson (y, con telemetría, el timestamp de la última muestra). Si constaba
+        como desconectada, escribe la reconexión y aplica sus consecuencias en la transacción del
+        llamador; si no, lo deja pendiente para el siguiente volcado. No hace commit.
+        """
+        hardware_id = jetson.id_hardware_jetson
+        self._remember(hardware_id, jetson.activo, jetson.id_bus, jetson.estado_salud, seen_at)
+        if jetson.estado_conexion != 'Conectado':
+            row = jetson_nano_crud.claim_reconnection(db, hardware_id, seen_at, last_telemetry_at)
+            if row is not None:
+                jetson_connectivity_service.connection_restored(db, hardware_id, row.id_bus, row.activo, seen_at)
+                return
+        self._record(db, hardware_id, seen_at, last_telemetry_at)
+
+    def heartbeat(self, db: Session, id_hardware_jetson: str, seen_at: datetime,
+                  estado_salud: Optional[str] = None) -> Optional[DeviceState]:
+        """
+        Latido de una Jetson sin cargar la entidad JetsonNano:
+        - estado en memoria y contacto reciente: se anota como pendiente (ninguna sentencia);
+        - si no: UPDATE ... RETURNING condicionado a que siguiera conectada (una sentencia); si no
+          actualiza nada, la reconexión (UPDATE condicional) y sus consecuencias (connection_restored).
+        Con estado_salud distinto del conocido, además un UPDATE de esa columna. No hace commit.
+
+        Returns:
+            Optional[DeviceState]: Estado del dispositivo, o None si no existe.
+        """
+        state = self._device_state(id_hardware_jetson, seen_at)
+        # loaded_at es un contacto ya escrito (o pendiente) de cuando se leyó el estado
+        if self.enabled and state is not None and self._is_recent(self.last_seen(id_hardware_jetson, state.loaded_at), seen_at):
+            self._record(db, id_hardware_jetson, seen_at, None)
+        else:
+            row = jetson_nano_crud.touch_returning(db, id_hardware_jetson, seen_at, only_connected=True)
+            if row is None:
+                row = jetson_nano_crud.claim_reconnection(db, id_hardware_jetson, seen_at, None)
+                if row is not None:
+                    jetson_connectivity_service.connection_restored(db, id_hardware_jetson, row.id_bus, row.activo, seen_at)
+                else:
+                    # Otro worker la reconectó entre ambas sentencias, o el dispositivo no existe
+                    row = jetson_nano_crud.touch_returning(db, id_hardware_jetson, seen_at)
+            if row is None:
+                self.forget(id_hardware_jetson)
+                return None
+            state = self._remember(id_hardware_jetson, row.activo, row.id_bus, row.estado_salud, seen_at)
+        if estado_salud is not None and estado_salud != state.estado_salud:
+            jetson_nano_crud.set_estado_salud(db, id_hardware_jetson, estado_salud)
+            state = self._remember(id_hardware_jetson, state.activo, state.id_bus, estado_salud, state.loaded_at)
+        return state
+
+    def forget(self, id_hardware_jetson: str) -> None:
+        """Descarta el estado en memoria de un dispositivo (tras modificarlo o eliminarlo)."""
+        with self._lock:
+            self._devices.pop(id_hardware_jetson, None)
+
+    def _device_state(self, id_hardware_jetson: str, now: datetime) -> Optional[DeviceState]:
+        with self._lock:
+            state = self._devices.get(id_hardware_jetson)
+        if state is None or (now - state.loaded_at).total_seconds() > self.device_state_ttl_seconds:
+            return None
+        return state
+
+    def _remember(self, id_hardware_jetson: str, activo: Optional[bool], id_bus: Optional[uuid.UUID],
+                  estado_salud: Optional[str], loaded_at: datetime) -> DeviceState:
+        state = DeviceState(activo, id_bus, estado_salud, loaded_at)
+        with self._lock:
+            self._devices[id_hardware_jetson] = state
+        return state
+
+    def _record(self, db: Session, id_hardware_jetson: str, seen_at: datetime, last_telemetry_at: Optional[datetime]) -> None:
+        if not self.enabled:
+            jetson_nano_crud.record_last_seen(db, {id_hardware_jetson: (seen_at, last_telemetry_at)})
+            return
+        # Se anota aunque la transacción del llamador falle: el contacto ocurrió igualmente.
+        with self._lock:
+            self._pending[id_hardware_jetson] = self._merge(self._pending.get(id_hardware_jetson), (seen_at, last_telemetry_at))
+
+    def flush(self, db: Session) -> int:
+        """
+        Escribe los contactos pendientes con un único UPDATE multi-fila y hace commit. Si falla,
+        vuelven a quedar pendientes. Un volcado concurrente espera a que termine el anterior.
+
+        Returns:
+            int: Número de dispositivos escritos.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                # self._flushing sólo lo lee last_seen mientras dura la escritura; el volcado usa su copia local
+                flushing = self._flushing = self._pending
+                self._pending = {}
+            try:
+                jetson_nano_crud.record_last_seen(db, flushing)
+                db.commit()
+                return len(flushing)
+            except Exception:
+                db.rollback()
+                with self._lock:
+                    for hardware_id, entry in flushing.items():
+                        self._pending[hardware_id] = self._merge(self._pending.get(hardware_id), entry)
+                raise
+            finally:
+                with self._lock:
+                    self._flushing = {}
+
+    @staticmethod
+    def _merge(current: Optional[Tuple[datetime, Optional[datetime]]],
+               new: Tuple[datetime, Optional[datetime]]) -> Tuple[datetime, Optional[datetime]]:
+        if current is None:
+            return new
+        telemetry = [value for value in (current[1], new[1]) if value is not None]
+        return max(current[0], new[0]), max(telemetry) if telemetry else None
+
+    def _run_flush(self) -> None:
+        from app.config.database import db
+        self.flush(db.session)
+
+
+# Instancia de la caché para ser utilizada en la aplicación.
+jetson_last_seen_cache = JetsonLastSeenCache(
+    flush_interval_seconds=settings.JETSON_LAST_SEEN_FLUSH_SECONDS,
+    connection_timeout_seconds=settings.JETSON_CONNECTION_TIMEOUT_SECONDS,
+    device_state_ttl_seconds=settings.JETSON_DEVICE_STATE_TTL_SECONDS
+)
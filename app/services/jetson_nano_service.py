@@ -1,6 +1,8 @@
+import base64
+import binascii
 import uuid
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
@@ -9,6 +11,11 @@ import logging
 # Import the cloud database models
 # Assuming your cloud database models are in a path like 'app.models_db.cloud_database_models'
 from app.models_db.cloud_database_models import JetsonNano, JetsonTelemetry, Bus
+from app.config.settings import settings
+from app.crud.crud_jetson_nano import jetson_nano_crud
+from app.services.dashboard_counter_service import dashboard_counter_service
+from app.services.jetson_connectivity_service import jetson_connectivity_service
+from app.services.jetson_last_seen_cache import jetson_last_seen_cache
 
 # Configure logger for this service
 logger = logging.getLogger(__name__)
@@ -54,10 +61,17 @@ def create_or_update_jetson_nano(
         if jetson:
             # Update existing JetsonNano record
             logger.debug(f"JetsonNano with hardware ID {id_hardware_jetson} found. Updating...")
+            now = datetime.utcnow()
+            previous_bus_id = jetson.id_bus
+            was_connected = jetson_last_seen_cache.is_connected(jetson)
+            reconnected = jetson.estado_conexion != 'Conectado'
             jetson.id_bus = id_bus
             jetson.version_firmware = version_firmware if version_firmware is not None else jetson.version_firmware
             jetson.estado_salud = estado_salud if estado_salud is not None else jetson.estado_salud
-            jetson.ultima_conexion_cloud_at = datetime.utcnow() # Update last connection timestamp
+            jetson.ultima_conexion_cloud_at = now # Update last connection timestamp
+            if reconnected:
+                jetson.estado_conexion = 'Conectado'
+                jetson.estado_conexion_at = now
             jetson.activo = activo
             jetson.observaciones = observaciones if observaciones is not None else jetson.observaciones
             # last_updated_at is handled by SQLAlchemy's onupdate
@@ -69,8 +83,13 @@ def create_or_update_jetson_nano(
                     logger.warning(f"Bus with ID {id_bus} not found in cloud database for JetsonNano {id_hardware_jetson}. Setting id_bus to None.")
                     jetson.id_bus = None # Prevent foreign key error if bus doesn't exist
             
+            dashboard_counter_service.jetson_changed(db, previous_bus_id, was_connected, jetson.id_bus, bool(jetson.activo))
+            if reconnected:
+                # The outage alert (if any) was raised on the previous bus
+                jetson_connectivity_service.close_outage(db, id_hardware_jetson, previous_bus_id, now)
             db.commit()
             db.refresh(jetson)
+            jetson_last_seen_cache.forget(id_hardware_jetson) # activo/id_bus pueden haber cambiado
             logger.info(f"JetsonNano {id_hardware_jetson} updated successfully.")
             return jetson
         else:
@@ -84,17 +103,21 @@ def create_or_update_jetson_nano(
                     logger.warning(f"Bus with ID {id_bus} not found in cloud database for new JetsonNano {id_hardware_jetson}. Setting id_bus to None.")
                     id_bus = None # Prevent foreign key error if bus doesn't exist
 
+            now = datetime.utcnow()
             new_jetson = JetsonNano(
                 id_hardware_jetson=id_hardware_jetson,
                 id_bus=id_bus,
                 version_firmware=version_firmware,
                 estado_salud=estado_salud,
-                ultima_conexion_cloud_at=datetime.utcnow(),
+                ultima_conexion_cloud_at=now,
+                estado_conexion='Conectado',
+                estado_conexion_at=now,
                 fecha_instalacion=fecha_instalacion if fecha_instalacion is not None else datetime.utcnow(),
                 activo=activo,
                 observaciones=observaciones
             )
             db.add(new_jetson)
+            dashboard_counter_service.jetson_changed(db, None, False, new_jetson.id_bus, bool(activo))
             db.commit()
             db.refresh(new_jetson)
             logger.info(f"New JetsonNano {id_hardware_jetson} created successfully.")
@@ -184,3 +207,45 @@ def create_jetson_telemetry_record(
         logger.error(f"Unexpected error creating telemetry for {id_hardware_jetson}: {e}", exc_info=True)
         return None
 
+
+CONNECTION_STATUSES = ('Conectado', 'Desconectado', 'Mantenimiento')
+
+def encode_listing_cursor(id_hardware_jetson: str) -> str:
+    """Cursor opaco del listado de Jetsons (base64 URL-safe del último id_hardware_jetson de la página)."""
+    return base64.urlsafe_b64encode(id_hardware_jetson.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_listing_cursor(cursor: str) -> str:
+    """Inverso de encode_listing_cursor. Lanza ValueError si el cursor no es válido."""
+    try:
+        return base64.b64decode(cursor + '=' * (-len(cursor) % 4), altchars=b'-_', validate=True).decode('utf-8')
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
+
+def list_jetson_nanos(
+    db: Session,
+    estado_conexion: Optional[str] = None,
+    estado_salud: Optional[str] = None,
+    id_empresa: Optional[uuid.UUID] = None,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100
+) -> Tuple[List[Tuple[JetsonNano, str, Optional[datetime]]], Optional[str]]:
+    """
+    Listado filtrado de Jetsons con el estado de conexión persistido (ver CRUDJetsonNano.get_listing
+    y JetsonConnectivityService; sin barrido, calculado del último contacto) y paginación por cursor.
+
+    El último contacto se corrige con la caché de último contacto de este worker (latidos aún no
+    escritos en la BD). El cursor siguiente apunta a la última fila leída.
+
+    Returns:
+        Tuple: ([(jetson, estado_conexion, ultima_conexion_cloud_at), ...], cursor siguiente o None)
+    """
+    after_hardware_id = decode_listing_cursor(cursor) if cursor else None
+    rows = jetson_nano_crud.get_listing(db, estado_conexion=estado_conexion, estado_salud=estado_salud,
+                                        id_empresa=id_empresa, after_hardware_id=after_hardware_id,
+                                        skip=0 if cursor else skip, limit=limit,
+                                        stale_before=dashboard_counter_service.connection_cutoff())
+    items = [(jetson, current_estado_conexion, jetson_last_seen_cache.last_seen_of(jetson))
+             for jetson, current_estado_conexion in rows]
+    next_cursor = encode_listing_cursor(rows[-1][0].id_hardware_jetson) if len(rows) == limit else None
+    return items, next_cursor
@@ -1,14 +1,21 @@
 # app/services/jetson_telemetry_service.py
+import base64
+import binascii
 import logging
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Set, Tuple
 import uuid
 
 from sqlalchemy.orm import Session
 
 # Import CRUDs needed
-from app.crud.crud_jetson_telemetry import jetson_telemetry_crud
+from app.crud.crud_jetson_telemetry import jetson_telemetry_crud, TELEMETRY_METRIC_FIELDS
 from app.crud.crud_jetson_nano import jetson_nano_crud
+from app.crud.coercion import get_coercion_plan
+from app.services.jetson_last_seen_cache import jetson_last_seen_cache
+from app.services.telemetry_archive_service import telemetry_archive_service
+from app.services.telemetry_rollup_service import telemetry_rollup_service
+from app.config.settings import settings
 from app.models_db.cloud_database_models import JetsonTelemetry, JetsonNano
 
 # Setup logger for this module
@@ -77,19 +84,20 @@ class JetsonTelemetryService:
 
         try:
             # Create the new telemetry record usando solo los campos válidos
-            new_telemetry_record = jetson_telemetry_crud.create(db, cloud_telemetry_data)
+            new_telemetry_record = jetson_telemetry_crud.create(db, cloud_telemetry_data, commit=False)
+            if settings.TELEMETRY_ROLLUPS_ENABLED:
+                # Los agregados 1m/1h/1d se confirman junto con la muestra.
+                telemetry_rollup_service.record_samples(db, [{
+                    field: getattr(new_telemetry_record, field)
+                    for field in ('id_hardware_jetson', 'timestamp_telemetry') + TELEMETRY_METRIC_FIELDS
+                }])
 
             # Update BOTH last_telemetry_at AND ultima_conexion_cloud_at in the JetsonNano device
+            # (a través de la caché de último contacto: la fila se escribe en el siguiente volcado)
             jetson_device = jetson_nano_crud.get_by_hardware_id(db, id_hardware_jetson)
             if jetson_device:
-                current_time = datetime.utcnow()
-                jetson_device.last_telemetry_at = new_telemetry_record.timestamp_telemetry
-                jetson_device.ultima_conexion_cloud_at = current_time  # IMPORTANTE: Actualizar conexión
-                
-                db.add(jetson_device)
-                db.commit()
-                db.refresh(jetson_device)
-                logger.info(f"Updated last_telemetry_at and ultima_conexion_cloud_at for JetsonNano '{id_hardware_jetson}'.")
+                jetson_last_seen_cache.touch(db, jetson_device, datetime.utcnow(), new_telemetry_record.timestamp_telemetry)
+                logger.info(f"Recorded last_telemetry_at and ultima_conexion_cloud_at for JetsonNano '{id_hardware_jetson}'.")
             else:
                 logger.warning(f"JetsonNano device with hardware ID '{id_hardware_jetson}' not found. Cannot update timestamps.")
 
@@ -104,6 +112,114 @@ class JetsonTelemetryService:
             db.rollback()
             return None
 
+    def process_telemetry_batch(self, db: Session, samples: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Procesa un lote de muestras de telemetría (de uno o varios dispositivos) en una transacción:
+        - valida las muestras y resuelve los dispositivos con una sola consulta IN;
+        - inserta todas las muestras válidas con un INSERT multi-fila (si la muestra trae 'id', un
+          reenvío del mismo lote no la duplica, y un ID repetido en el lote se queda con su última
+          aparición) y suma las nuevas a los agregados 1m/1h/1d;
+        - anota cada dispositivo una sola vez en la caché de último contacto: last_telemetry_at con
+          el timestamp máximo de sus muestras y ultima_conexion_cloud_at con la hora de recepción.
+
+        Returns:
+            Dict[str, Any]: {"inserted_count": int, "results": [{"id", "status", "reason"}, ...]}
+                            con un resultado por muestra en el orden recibido
+                            (status: 'created', 'duplicate' o 'rejected').
+        """
+        received_at = datetime.utcnow()
+        plan = get_coercion_plan(JetsonTelemetry)
+        results: List[Dict[str, Any]] = []
+        rows: List[Dict[str, Any]] = []
+        row_results: List[Dict[str, Any]] = []
+        generated_ids: Set[uuid.UUID] = set()
+
+        for sample in samples:
+            if not isinstance(sample, dict):
+                results.append({"id": None, "status": "rejected", "reason": "La muestra debe ser un objeto JSON."})
+                continue
+            sample_id = sample.get('id')
+            result = {"id": str(sample_id) if sample_id is not None else None, "status": "rejected", "reason": None}
+            results.append(result)
+
+            id_hardware_jetson = sample.get('id_hardware_jetson')
+            if not id_hardware_jetson or not isinstance(id_hardware_jetson, str):
+                result["reason"] = "'id_hardware_jetson' es requerido."
+                continue
+            row = plan.apply({field: sample.get(field) for field in ('id', 'timestamp_telemetry') + TELEMETRY_METRIC_FIELDS})
+            if sample_id is not None and not isinstance(row['id'], uuid.UUID):
+                result["reason"] = f"'id' '{sample_id}' no es un UUID válido."
+                continue
+            if sample.get('timestamp_telemetry') is None:
+                row['timestamp_telemetry'] = received_at
+            elif not isinstance(row['timestamp_telemetry'], datetime):
+                # En un lote las muestras suelen ser antiguas: no se sustituye por la hora actual.
+                result["reason"] = "Formato de 'timestamp_telemetry' inválido."
+                continue
+            if row['id'] is None:
+                row['id'] = uuid.uuid4()
+                generated_ids.add(row['id'])
+            row['id_hardware_jetson'] = id_hardware_jetson
+            row['created_at'] = received_at
+            result["id"] = str(row['id'])
+            rows.append(row)
+            row_results.append(result)
+
+        devices = jetson_nano_crud.get_by_hardware_ids(db, list({row['id_hardware_jetson'] for row in rows}))
+        valid_rows_by_id: Dict[uuid.UUID, Dict[str, Any]] = {}
+        result_by_id: Dict[uuid.UUID, Dict[str, Any]] = {}
+        for row, result in zip(rows, row_results):
+            if row['id_hardware_jetson'] not in devices:
+                result["reason"] = f"Jetson Nano '{row['id_hardware_jetson']}' no registrada."
+                continue
+            # Un mismo ID repetido dentro del lote: gana la última aparición (se inserta y agrega una sola vez).
+            previous = result_by_id.get(row['id'])
+            if previous is not None:
+                previous["status"] = "duplicate"
+                previous["reason"] = "ID repetido dentro del mismo lote; se conserva la última aparición."
+            valid_rows_by_id[row['id']] = row
+            result_by_id[row['id']] = result
+            result["status"] = "created"
+        valid_rows = list(valid_rows_by_id.values())
+        if not valid_rows:
+            return {"inserted_count": 0, "results": results}
+
+        last_telemetry_by_device: Dict[str, datetime] = {}
+        for row in valid_rows:
+            hardware_id = row['id_hardware_jetson']
+            if hardware_id not in last_telemetry_by_device or row['timestamp_telemetry'] > last_telemetry_by_device[hardware_id]:
+                last_telemetry_by_device[hardware_id] = row['timestamp_telemetry']
+
+        try:
+            # Un reenvío del mismo lote no duplica muestras: sin columnas a actualizar es ON CONFLICT DO NOTHING.
+            # Sólo los IDs de la Jetson pueden existir ya; los generados aquí se insertan sin buscarlos.
+            existing_keys = jetson_telemetry_crud.bulk_upsert(
+                db, [row for row in valid_rows if row['id'] not in generated_ids], unique_field='id',
+                conflict_fields=('id', 'timestamp_telemetry'),
+                update_exclude=('id_hardware_jetson', 'timestamp_telemetry', 'created_at') + TELEMETRY_METRIC_FIELDS)
+            jetson_telemetry_crud.bulk_insert(db, [row for row in valid_rows if row['id'] in generated_ids])
+            if settings.TELEMETRY_ROLLUPS_ENABLED:
+                # Sólo las muestras nuevas: un reenvío no debe contar dos veces en los agregados.
+                telemetry_rollup_service.record_samples(db, [row for row in valid_rows if row['id'] not in existing_keys])
+            for hardware_id, last_telemetry_at in last_telemetry_by_device.items():
+                jetson_last_seen_cache.touch(db, devices[hardware_id], received_at, last_telemetry_at)
+            db.commit()
+        except Exception as e:
+            logger.error(f"Error processing telemetry batch of {len(valid_rows)} samples: {e}", exc_info=True)
+            db.rollback()
+            raise
+
+        inserted_count = 0
+        for row, result in zip(rows, row_results):
+            if result["status"] != "created":
+                continue
+            if row['id'] in existing_keys:
+                result["status"] = "duplicate"
+            else:
+                inserted_count += 1
+        logger.info(f"Telemetry batch processed: {inserted_count} samples inserted for {len(last_telemetry_by_device)} devices.")
+        return {"inserted_count": inserted_count, "results": results}
+
     def get_recent_telemetry(self, db: Session, id_hardware_jetson: str) -> Optional[JetsonTelemetry]:
         """
         Recupera el registro de telemetría más reciente para un Jetson Nano específico.
@@ -116,18 +232,54 @@ class JetsonTelemetryService:
             logger.error(f"Error recuperando telemetría reciente para Jetson '{id_hardware_jetson}': {e}", exc_info=True)
             return None
 
-    def get_telemetry_history(self, db: Session, id_hardware_jetson: str, skip: int = 0, limit: int = 100) -> List[JetsonTelemetry]:
+    def get_telemetry_history(self, db: Session, id_hardware_jetson: str, skip: int = 0, limit: int = 100,
+                              start_time: Optional[datetime] = None, end_time: Optional[datetime] = None) -> List[JetsonTelemetry]:
         """
-        Recupera el historial de telemetría para un Jetson Nano específico con paginación.
+        Recupera el historial de telemetría para un Jetson Nano específico con paginación,
+        opcionalmente acotado a [start_time, end_time) para leer sólo las particiones del rango.
+        Incluye las muestras ya movidas al archivo columnar (ver TelemetryArchiveService).
         """
         logger.info(f"Recuperando historial de telemetría para Jetson hardware ID: {id_hardware_jetson} (skip={skip}, limit={limit}).")
         try:
-            # Usar el método correcto del CRUD
-            return jetson_telemetry_crud.get_telemetry_by_hardware_id(db, id_hardware_jetson, skip=skip, limit=limit)
+            return telemetry_archive_service.get_samples(db, id_hardware_jetson, skip=skip, limit=limit,
+                                                         start_time=start_time, end_time=end_time)
         except Exception as e:
             logger.error(f"Error recuperando historial de telemetría para Jetson '{id_hardware_jetson}': {e}", exc_info=True)
             return []
 
+    def get_telemetry_page(self, db: Session, id_hardware_jetson: str, cursor: Optional[str] = None, skip: int = 0,
+                           limit: int = 100, start_time: Optional[datetime] = None,
+                           end_time: Optional[datetime] = None) -> Tuple[List[JetsonTelemetry], Optional[str]]:
+        """
+        Página del historial crudo (de la más reciente a la más antigua) con paginación por cursor,
+        para exportar rangos largos: el cursor apunta a la última muestra de la página anterior y la
+        siguiente página empieza justo después, aunque entren muestras nuevas entre peticiones.
+        'cursor' tiene prioridad sobre 'skip'. Lanza ValueError si el cursor no es válido.
+
+        Returns:
+            Tuple: (muestras, cursor siguiente o None si la página no está completa)
+        """
+        before = decode_telemetry_cursor(cursor) if cursor else None
+        records = telemetry_archive_service.get_samples(db, id_hardware_jetson, skip=0 if cursor else skip, limit=limit,
+                                                        start_time=start_time, end_time=end_time, before=before)
+        next_cursor = encode_telemetry_cursor(records[-1].timestamp_telemetry, records[-1].id) if len(records) == limit else None
+        return records, next_cursor
+
+
+def encode_telemetry_cursor(timestamp_telemetry: datetime, sample_id: uuid.UUID) -> str:
+    """Cursor opaco del historial de telemetría (base64 URL-safe de 'timestamp|id' de la última muestra de la página)."""
+    raw = f"{timestamp_telemetry.isoformat()}|{sample_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_telemetry_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """Inverso de encode_telemetry_cursor. Lanza ValueError si el cursor no es válido."""
+    try:
+        timestamp, sample_id = base64.b64decode(cursor + '=' * (-len(cursor) % 4), altchars=b'-_', validate=True) \
+            .decode('utf-8').split('|')
+        return datetime.fromisoformat(timestamp), uuid.UUID(sample_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
+
 
 # Create an instance of JetsonTelemetryService
 jetson_telemetry_service = JetsonTelemetryService()
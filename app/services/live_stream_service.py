@@ -0,0 +1,253 @@
+# app/services/live_stream_service.py
+import logging
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List, Iterable, Sequence
+
+from sqlalchemy.orm import Session
+
+from app.config.settings import settings
+from app.core.scheduler import PeriodicTask
+from app.crud.crud_stream_message import stream_message_crud
+from app.models_db.cloud_database_models import Evento, StreamMessage
+
+# Setup logger para este módulo
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+STREAM_TYPES = ('alerta', 'evento', 'conexion')
+# Un id que falta en la secuencia puede ser una transacción aún sin confirmar (se espera) o una
+# que se deshizo (nunca aparecerá): pasado este tiempo se deja de buscar.
+GAP_TIMEOUT_SECONDS = 10.0
+MAX_TRACKED_GAPS = 10000
+POLL_BATCH_SIZE = 500
+CLEANUP_INTERVAL_SECONDS = 60.0
+
+def serialize_event(evento: Evento) -> Dict[str, Any]:
+    return {
+        "id": str(evento.id),
+        "id_bus": str(evento.id_bus),
+        "id_conductor": str(evento.id_conductor) if evento.id_conductor else None,
+        "id_sesion_conduccion": str(evento.id_sesion_conduccion) if evento.id_sesion_conduccion else None,
+        "timestamp_evento": evento.timestamp_evento.isoformat(),
+        "tipo_evento": evento.tipo_evento,
+        "subtipo_evento": evento.subtipo_evento,
+        "duracion_segundos": float(evento.duracion_segundos) if evento.duracion_segundos is not None else None,
+        "severidad": evento.severidad,
+        "confidence_score_ia": float(evento.confidence_score_ia) if evento.confidence_score_ia is not None else None,
+        "alerta_disparada": evento.alerta_disparada,
+        "snapshot_url": evento.snapshot_url,
+        "video_clip_url": evento.video_clip_url,
+    }
+
+def serialize_alert(alert: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": str(alert["id"]),
+        "id_evento": str(alert["id_evento"]) if alert.get("id_evento") else None,
+        "id_conductor": str(alert["id_conductor"]) if alert.get("id_conductor") else None,
+        "id_bus": str(alert["id_bus"]) if alert.get("id_bus") else None,
+        "timestamp_alerta": alert["timestamp_alerta"].isoformat(),
+        "tipo_alerta": alert["tipo_alerta"],
+        "descripcion": alert["descripcion"],
+        "nivel_criticidad": alert["nivel_criticidad"],
+        "estado_alerta": alert.get("estado_alerta", "Activa"),
+    }
+
+def serialize_connection_change(change: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id_hardware_jetson": change["id_hardware_jetson"],
+        "id_bus": str(change["id_bus"]) if change.get("id_bus") else None,
+        "estado_conexion": change["estado_conexion"],
+        "timestamp": change["timestamp"].isoformat(),
+        "ultima_conexion_cloud_at": change["ultima_conexion_cloud_at"].isoformat() if change.get("ultima_conexion_cloud_at") else None,
+    }
+
+class Subscription:
+    """Cola de un cliente SSE con sus filtros. Si la cola se desborda, el stream se cierra
+    y el cliente se reconecta con Last-Event-ID."""
+    __slots__ = ('queue', 'tipos', 'id_empresa', 'id_bus', 'overflowed')
+
+    def __init__(self, tipos: Sequence[str], id_empresa: Optional[uuid.UUID], id_bus: Optional[uuid.UUID], maxsize: int):
+        self.queue: 'queue.Queue[Dict[str, Any]]' = queue.Queue(maxsize=maxsize)
+        self.tipos = frozenset(tipos)
+        self.id_empresa = id_empresa
+        self.id_bus = id_bus
+        self.overflowed = False
+
+    def accepts(self, message: Dict[str, Any]) -> bool:
+        return (message["tipo"] in self.tipos
+                and (self.id_empresa is None or message["id_empresa"] == self.id_empresa)
+                and (self.id_bus is None or message["id_bus"] == self.id_bus))
+
+class LiveStreamService:
+    """
+    Pub/sub de alertas, eventos y cambios de conexión de las Jetson para el stream SSE.
+
+    - Publicación: la ingesta escribe los mensajes en stream_messages dentro de su transacción,
+      así que sólo se publican datos confirmados, venga de donde venga (petición, spool, otro worker).
+    - Reparto: en cada worker una PeriodicTask lee los mensajes nuevos (una consulta por intervalo,
+      sin importar cuántos navegadores hay conectados) y los copia a las colas de los suscriptores
+      que los aceptan. Sin suscriptores no se consulta.
+    - Reanudación: el id del mensaje es el id SSE; con Last-Event-ID se rellenan desde la tabla los
+      mensajes posteriores (hasta LIVE_STREAM_RETENTION_MINUTES de antigüedad).
+
+    Con ids de secuencia, una transacción que confirma tarde puede dejar un hueco temporal: los
+    ids que faltan se vuelven a buscar durante GAP_TIMEOUT_SECONDS.
+    Las conexiones SSE son largas: en gunicorn requieren workers con hilos o asíncronos (gthread/gevent).
+    """
+
+    def __init__(self, poll_interval_seconds: float, retention_minutes: int, queue_size: int):
+        self.retention_minutes = retention_minutes
+        self.queue_size = max(1, queue_size)
+        self._lock = threading.Lock()
+        self._subscriptions: List[Subscription] = []
+        self._last_id: Optional[int] = None
+        self._gaps: Dict[int, float] = {}
+        self._last_cleanup = 0.0
+        self.task = PeriodicTask('live-stream-poller', poll_interval_seconds, self._run_poll)
+
+    # --- Publicación (dentro de la transacción de ingesta) ---
+
+    def publish_in_transaction(self, db: Session, events: Iterable[Evento], alerts: Iterable[Dict[str, Any]],
+                               empresa_by_bus: Dict[uuid.UUID, Optional[uuid.UUID]]) -> int:
+        """Escribe los mensajes de eventos y alertas con un INSERT multi-fila. No hace commit."""
+        now = datetime.utcnow()
+        rows = [
+            {"tipo": "evento", "id_empresa": empresa_by_bus.get(evento.id_bus), "id_bus": evento.id_bus,
+             "payload": serialize_event(evento), "created_at": now}
+            for evento in events
+        ]
+        rows.extend(
+            {"tipo": "alerta", "id_empresa": empresa_by_bus.get(alert["id_bus"]), "id_bus": alert["id_bus"],
+             "payload": serialize_alert(alert), "created_at": now}
+            for alert in alerts
+        )
+        return stream_message_crud.bulk_insert(db, rows)
+
+    def publish_connection_changes(self, db: Session, changes: Iterable[Dict[str, Any]],
+                                   empresa_by_bus: Dict[uuid.UUID, Optional[uuid.UUID]]) -> int:
+        """
+        Escribe un mensaje 'conexion' por transición de una Jetson ({id_hardware_jetson, id_bus,
+        estado_conexion, timestamp, ultima_conexion_cloud_at}) con un INSERT multi-fila. No hace commit.
+        """
+        now = datetime.utcnow()
+        return stream_message_crud.bulk_insert(db, [
+            {"tipo": "conexion", "id_empresa": empresa_by_bus.get(change["id_bus"]), "id_bus": change["id_bus"],
+             "payload": serialize_connection_change(change), "created_at": now}
+            for change in changes
+        ])
+
+    # --- Suscripción ---
+
+    def subscribe(self, db: Session, tipos: Sequence[str], id_empresa: Optional[uuid.UUID] = None,
+                  id_bus: Optional[uuid.UUID] = None) -> Subscription:
+        """Registra un suscriptor; recibe los mensajes confirmados a partir de este momento."""
+        subscription = Subscription(tipos, id_empresa, id_bus, self.queue_size)
+        with self._lock:
+            if self._last_id is None:
+                self._last_id = stream_message_crud.get_max_id(db)
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def backfill(self, db: Session, subscription: Subscription, after_id: int, limit: int) -> List[Dict[str, Any]]:
+        """Mensajes posteriores a after_id (Last-Event-ID) que acepta el suscriptor."""
+        rows = stream_message_crud.get_after(db, after_id, limit=limit, tipos=list(subscription.tipos),
+                                             id_empresa=subscription.id_empresa, id_bus=subscription.id_bus)
+        return [self._to_message(row) for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"subscribers": len(self._subscriptions), "last_id": self._last_id, "pending_gaps": len(self._gaps)}
+
+    def start(self, app) -> None:
+        self.task.start(app)
+
+    # --- Reparto ---
+
+    def poll(self, db: Session) -> int:
+        """Lee los mensajes nuevos y los reparte a los suscriptores de este worker. Devuelve cuántos leyó."""
+        now = time.monotonic()
+        if now - self._last_cleanup >= CLEANUP_INTERVAL_SECONDS:
+            self._last_cleanup = now
+            self._cleanup(db)
+
+        with self._lock:
+            if not self._subscriptions:
+                # Sin suscriptores no se sigue la tabla; el próximo suscriptor fija el cursor.
+                self._last_id = None
+                self._gaps.clear()
+                return 0
+            last_id = self._last_id
+
+        rows = stream_message_crud.get_after(db, last_id, limit=POLL_BATCH_SIZE)
+        if self._gaps:
+            rows = sorted(list(rows) + list(stream_message_crud.get_by_ids(db, list(self._gaps))), key=lambda row: row.id)
+        db.rollback() # Cierra la transacción de lectura: la próxima consulta ve lo confirmado después
+
+        messages = []
+        for row in rows:
+            if row.id in self._gaps:
+                del self._gaps[row.id]
+            elif row.id > last_id:
+                for missing in range(last_id + 1, min(row.id, last_id + 1 + MAX_TRACKED_GAPS)):
+                    self._gaps[missing] = now
+                last_id = row.id
+            else:
+                continue
+            messages.append(self._to_message(row))
+
+        for missing, seen_at in list(self._gaps.items()):
+            if now - seen_at > GAP_TIMEOUT_SECONDS:
+                del self._gaps[missing]
+
+        with self._lock:
+            self._last_id = last_id
+            subscriptions = list(self._subscriptions)
+        for message in messages:
+            for subscription in subscriptions:
+                if subscription.overflowed or not subscription.accepts(message):
+                    continue
+                try:
+                    subscription.queue.put_nowait(message)
+                except queue.Full:
+                    subscription.overflowed = True
+        return len(rows)
+
+    def _cleanup(self, db: Session) -> None:
+        try:
+            deleted = stream_message_crud.delete_older_than(db, datetime.utcnow() - timedelta(minutes=self.retention_minutes))
+            db.commit()
+            if deleted:
+                logger.info(f"{deleted} mensajes del stream en vivo eliminados por antigüedad.")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error limpiando stream_messages: {e}", exc_info=True)
+
+    @staticmethod
+    def _to_message(row: StreamMessage) -> Dict[str, Any]:
+        return {"id": row.id, "tipo": row.tipo, "id_empresa": row.id_empresa, "id_bus": row.id_bus, "payload": row.payload}
+
+    def _run_poll(self) -> None:
+        from app.config.database import db
+        while self.poll(db.session) >= POLL_BATCH_SIZE:
+            pass
+
+
+# Instancia del servicio para ser utilizada en la aplicación.
+live_stream_service = LiveStreamService(
+    poll_interval_seconds=settings.LIVE_STREAM_POLL_INTERVAL_SECONDS,
+    retention_minutes=settings.LIVE_STREAM_RETENTION_MINUTES,
+    queue_size=settings.LIVE_STREAM_QUEUE_SIZE
+)
@@ -0,0 +1,199 @@
+# app/services/notification_dispatcher.py
+import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List, Callable
+
+from sqlalchemy.orm import Session
+
+from app.config.settings import settings
+from app.core.scheduler import PeriodicTask
+from app.crud.crud_alerta import alerta_crud
+from app.crud.crud_notificacion_outbox import notificacion_outbox_crud
+from app.services.alert_notification_service import build_channel_senders, mock_notifier
+
+# Setup logger para este módulo
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+DEFAULT_CHANNEL_CONCURRENCY = 2
+
+def parse_channel_concurrency(raw: str) -> Dict[str, int]:
+    """Convierte 'email:4,sms:2' en {'email': 4, 'sms': 2}; ignora entradas mal formadas."""
+    limits = {}
+    for item in raw.split(','):
+        channel, _, value = item.strip().partition(':')
+        try:
+            limits[channel.strip()] = max(1, int(value))
+        except ValueError:
+            continue
+    return limits
+
+class NotificationDispatcher:
+    """
+    Entrega en segundo plano las notificaciones del outbox (notificaciones_outbox).
+
+    Cada ciclo (una PeriodicTask por proceso):
+    1. Reclama un lote de mensajes listos con un UPDATE condicional y lease (commit inmediato),
+       de modo que varios workers/procesos pueden drenar el outbox sin enviar dos veces el mismo
+       mensaje; si un proceso muere, el lease vence y otro lo reintenta.
+    2. Envía los mensajes en un pool de hilos, con un semáforo por canal que limita los envíos
+       simultáneos a cada proveedor.
+    3. Guarda el resultado: 'Enviada', o reintento con backoff exponencial (con jitter) hasta
+       max_attempts, tras lo cual queda 'Fallida'. El estado por canal se refleja en
+       Alerta.notificado_canales.
+    """
+
+    def __init__(self, senders: Dict[str, Callable[[str, Optional[str], str], None]], channel_limits: Dict[str, int],
+                 max_workers: int, batch_size: int, lease_seconds: int, max_attempts: int,
+                 backoff_base_seconds: float, backoff_max_seconds: float, interval_seconds: float):
+        self.senders = senders
+        self.channel_limits = channel_limits
+        self.max_workers = max(1, max_workers)
+        self.batch_size = max(1, batch_size)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._semaphores_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self.task = PeriodicTask('notification-dispatcher', interval_seconds, self._run_dispatch, run_immediately=True)
+
+    def start(self, app) -> None:
+        self.task.start(app)
+
+    def stop(self) -> None:
+        self.task.stop()
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def dispatch_once(self, db: Session, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Ejecuta un ciclo: reclama, envía y registra un lote.
+
+        Returns:
+            Dict[str, int]: {"claimed", "sent", "retry", "failed"}.
+        """
+        now = now or datetime.utcnow()
+        claimed = notificacion_outbox_crud.claim_due(
+            db, now, now + timedelta(seconds=self.lease_seconds), limit=self.batch_size)
+        db.commit()
+        stats = {"claimed": len(claimed), "sent": 0, "retry": 0, "failed": 0}
+        if not claimed:
+            return stats
+
+        executor = self._get_executor()
+        errors = list(executor.map(self._deliver, claimed))
+
+        finished_at = datetime.utcnow()
+        results = []
+        for message, error in zip(claimed, errors):
+            attempts = message["intentos"] + 1
+            result = {"id": message["id"], "intentos": attempts, "ultimo_error": error,
+                      "enviada_at": None, "proximo_intento_at": finished_at}
+            if error is None:
+                result.update(estado='Enviada', enviada_at=finished_at)
+                stats["sent"] += 1
+            elif attempts >= self.max_attempts:
+                result["estado"] = 'Fallida'
+                stats["failed"] += 1
+                logger.error(f"Notificación {message['id']} ({message['canal']}) descartada tras {attempts} intentos: {error}")
+            else:
+                result.update(estado='Pendiente', proximo_intento_at=finished_at + timedelta(seconds=self._backoff(attempts)))
+                stats["retry"] += 1
+            results.append(result)
+
+        try:
+            notificacion_outbox_crud.record_results(db, results)
+            self._record_alert_channels(db, claimed, results, finished_at)
+            db.commit()
+        except Exception:
+            # Los mensajes siguen 'Enviando': al vencer el lease se reintentan (entrega al menos una vez).
+            db.rollback()
+            raise
+        logger.info(f"Notificaciones: {stats['sent']} enviadas, {stats['retry']} a reintentar, {stats['failed']} fallidas.")
+        return stats
+
+    def _deliver(self, message: Dict[str, Any]) -> Optional[str]:
+        """Envía un mensaje respetando el límite de su canal. Devuelve el error o None si se envió."""
+        channel = message["canal"]
+        sender = self.senders.get(channel)
+        if sender is None:
+            return f"Canal de notificación desconocido: '{channel}'."
+        with self._semaphore(channel):
+            try:
+                sender(message["destinatario"], message["asunto"], message["cuerpo"])
+                return None
+            except Exception as e:
+                logger.warning(f"Fallo enviando notificación {message['id']} por '{channel}': {e}")
+                return str(e) or e.__class__.__name__
+
+    def _record_alert_channels(self, db: Session, claimed: List[Dict[str, Any]], results: List[Dict[str, Any]],
+                               attempted_at: datetime) -> None:
+        """
+        Refleja el estado de cada envío en Alerta.notificado_canales ({canal: {destinatario: {...}}}).
+        Las alertas se bloquean (FOR UPDATE) antes de leer el JSON: los mensajes se reclaman uno a uno,
+        así que otro worker puede estar registrando otro canal de la misma alerta.
+        """
+        by_alert: Dict[Any, List[Any]] = {}
+        for message, result in zip(claimed, results):
+            by_alert.setdefault(message["id_alerta"], []).append((message, result))
+        for alerta in alerta_crud.get_for_update(db, list(by_alert.keys())):
+            channels = {channel: dict(recipients) for channel, recipients in (alerta.notificado_canales or {}).items()}
+            for message, result in by_alert[alerta.id]:
+                channels.setdefault(message["canal"], {})[message["destinatario"]] = {
+                    "estado": result["estado"],
+                    "intentos": result["intentos"],
+                    "ultimo_intento_at": attempted_at.isoformat(),
+                    "error": result["ultimo_error"],
+                }
+            alerta.notificado_canales = channels # Se reasigna el dict para que SQLAlchemy detecte el cambio
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.backoff_max_seconds, self.backoff_base_seconds * (2 ** (attempts - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _semaphore(self, channel: str) -> threading.BoundedSemaphore:
+        with self._semaphores_lock:
+            semaphore = self._semaphores.get(channel)
+            if semaphore is None:
+                semaphore = self._semaphores[channel] = threading.BoundedSemaphore(
+                    self.channel_limits.get(channel, DEFAULT_CHANNEL_CONCURRENCY))
+            return semaphore
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='notification')
+            return self._executor
+
+    def _run_dispatch(self) -> None:
+        from app.config.database import db
+        # Se drena mientras haya lotes completos; el siguiente ciclo recoge el resto.
+        while self.dispatch_once(db.session)["claimed"] >= self.batch_size:
+            pass
+
+
+# Instancia del dispatcher para ser utilizada en la aplicación (se arranca desde create_app).
+notification_dispatcher = NotificationDispatcher(
+    senders=build_channel_senders(mock_notifier),
+    channel_limits=parse_channel_concurrency(settings.NOTIFICATION_CHANNEL_CONCURRENCY),
+    max_workers=settings.NOTIFICATION_WORKERS,
+    batch_size=settings.NOTIFICATION_DISPATCH_BATCH_SIZE,
+    lease_seconds=settings.NOTIFICATION_LEASE_SECONDS,
+    max_attempts=settings.NOTIFICATION_MAX_ATTEMPTS,
+    backoff_base_seconds=settings.NOTIFICATION_BACKOFF_BASE_SECONDS,
+    backoff_max_seconds=settings.NOTIFICATION_BACKOFF_MAX_SECONDS,
+    interval_seconds=settings.NOTIFICATION_DISPATCH_INTERVAL_SECONDS
+)
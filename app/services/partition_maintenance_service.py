@@ -0,0 +1,183 @@
+# app/services/partition_maintenance_service.py
+import logging
+import re
+from datetime import datetime, date
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config.settings import settings
+from app.core.scheduler import PeriodicTask
+
+# Setup logger para este módulo
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+# Clave del advisory lock que serializa el mantenimiento entre procesos/workers.
+PARTITION_MAINTENANCE_LOCK_KEY = 74_210_009
+
+def _add_months(month_start: date, months: int) -> date:
+    index = month_start.year * 12 + (month_start.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+class PartitionMaintenanceService:
+    """
+    Mantenimiento de las tablas particionadas por mes (sólo PostgreSQL):
+    - Crea por adelantado las particiones mensuales de los próximos meses y una partición
+      DEFAULT que recoge filas fuera de rango (p. ej. Jetson con el reloj desfasado).
+    - Aplica la retención separando (DETACH) las particiones completas más antiguas que
+      el periodo configurado, en lugar de un DELETE fila a fila. Opcionalmente las elimina.
+
+    Las particiones se llaman <tabla>_pAAAAMM y cubren [primer día del mes, primer día del mes siguiente).
+    En otros motores (SQLite de desarrollo) las tablas no están particionadas y no se hace nada.
+
+    Nota: create_all sólo crea la tabla particionada si no existe; una BD con las tablas
+    antiguas sin particionar debe migrarse aparte (crear la tabla nueva y copiar con INSERT ... SELECT).
+    """
+
+    def __init__(self, tables: Dict[str, int], premake_months: int, drop_detached: bool):
+        """
+        Args:
+            tables (Dict[str, int]): Tabla particionada -> meses de retención (0 = sin retención).
+            premake_months (int): Meses futuros para los que se crean particiones por adelantado.
+            drop_detached (bool): Si True, las particiones separadas por retención se eliminan.
+        """
+        self.tables = tables
+        self.premake_months = max(0, premake_months)
+        self.drop_detached = drop_detached
+
+    @staticmethod
+    def partition_name(table: str, month_start: date) -> str:
+        return f"{table}_p{month_start.year:04d}{month_start.month:02d}"
+
+    def is_supported(self, db: Session) -> bool:
+        return db.get_bind().dialect.name == 'postgresql'
+
+    def run_maintenance(self, db: Session, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Crea las particiones que falten y aplica la retención en todas las tablas configuradas.
+        Es idempotente y se serializa entre procesos con un advisory lock de transacción.
+
+        Returns:
+            Dict[str, Any]: {tabla: {"created": [...], "detached": [...]}} (vacío si no aplica).
+        """
+        if not self.is_supported(db):
+            return {}
+        now = now or datetime.utcnow()
+        summary: Dict[str, Any] = {}
+        try:
+            db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_MAINTENANCE_LOCK_KEY})
+            for table, retention_months in self.tables.items():
+                if not self._is_partitioned(db, table):
+                    logger.warning(f"La tabla '{table}' no está particionada; se omite su mantenimiento. "
+                                   f"Requiere migración a tabla particionada.")
+                    continue
+                created = self.ensure_partitions(db, table, now)
+                detached = self.apply_retention(db, table, retention_months, now) if retention_months > 0 else []
+                summary[table] = {"created": created, "detached": detached}
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error en el mantenimiento de particiones: {e}", exc_info=True)
+            raise
+
+        for table, result in summary.items():
+            if result["created"] or result["detached"]:
+                logger.info(f"Particiones de '{table}': creadas {result['created']}, separadas {result['detached']}.")
+        return summary
+
+    def ensure_partitions(self, db: Session, table: str, now: datetime) -> List[str]:
+        """Crea la partición DEFAULT y las mensuales desde el mes actual hasta premake_months por delante."""
+        existing = {name for name, _ in self.list_partitions(db, table)}
+        created = []
+
+        default_name = f"{table}_default"
+        if default_name not in existing:
+            db.execute(text(f'CREATE TABLE IF NOT EXISTS "{default_name}" PARTITION OF "{table}" DEFAULT'))
+            created.append(default_name)
+
+        current_month = date(now.year, now.month, 1)
+        for offset in range(0, self.premake_months + 1):
+            month_start = _add_months(current_month, offset)
+            name = self.partition_name(table, month_start)
+            if name in existing:
+                continue
+            month_end = _add_months(month_start, 1)
+            # Si la partición DEFAULT ya tiene filas de este mes, PostgreSQL rechaza la creación:
+            # se hace dentro de un SAVEPOINT para no abortar el resto del mantenimiento.
+            try:
+                with db.begin_nested():
+                    db.execute(text(
+                        f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" '
+                        f"FOR VALUES FROM ('{month_start.isoformat()}') TO ('{month_end.isoformat()}')"
+                    ))
+                created.append(name)
+            except Exception as e:
+                logger.error(f"No se pudo crear la partición '{name}' (¿filas del mes en '{default_name}'?): {e}")
+        return created
+
+    def apply_retention(self, db: Session, table: str, retention_months: int, now: datetime) -> List[str]:
+        """
+        Separa (y opcionalmente elimina) las particiones mensuales que terminan antes del
+        inicio del periodo de retención. Es una operación de catálogo: no recorre filas.
+        """
+        cutoff = _add_months(date(now.year, now.month, 1), -retention_months)
+        detached = []
+        for name, month_start in self.list_partitions(db, table):
+            if month_start is None or _add_months(month_start, 1) > cutoff:
+                continue
+            db.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+            if self.drop_detached:
+                db.execute(text(f'DROP TABLE "{name}"'))
+            detached.append(name)
+        return detached
+
+    def list_partitions(self, db: Session, table: str) -> List[Tuple[str, Optional[date]]]:
+        """
+        Lista las particiones adjuntas de una tabla: (nombre, primer día del mes) ordenadas por nombre.
+        El mes es None para particiones que no siguen el esquema <tabla>_pAAAAMM (p. ej. la DEFAULT).
+        """
+        rows = db.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :table ORDER BY c.relname"
+        ), {"table": table}).scalars().all()
+        pattern = re.compile(rf"^{re.escape(table)}_p(\d{{4}})(\d{{2}})$")
+        partitions = []
+        for name in rows:
+            match = pattern.match(name)
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1) if match else None))
+        return partitions
+
+    @staticmethod
+    def _is_partitioned(db: Session, table: str) -> bool:
+        return db.execute(text(
+            "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :table"
+        ), {"table": table}).first() is not None
+
+
+# Instancia del servicio para ser utilizada en la aplicación.
+partition_maintenance_service = PartitionMaintenanceService(
+    tables={
+        'eventos': settings.EVENTOS_RETENTION_MONTHS,
+        'jetson_telemetry': settings.TELEMETRY_RETENTION_MONTHS,
+    },
+    premake_months=settings.PARTITION_PREMAKE_MONTHS,
+    drop_detached=settings.PARTITION_DROP_DETACHED
+)
+
+def _run_partition_maintenance() -> None:
+    from app.config.database import db
+    partition_maintenance_service.run_maintenance(db.session)
+
+# Tarea periódica que mantiene las particiones al día (se arranca desde create_app en PostgreSQL).
+partition_maintenance_task = PeriodicTask(
+    'partition-maintenance', settings.PARTITION_MAINTENANCE_INTERVAL_SECONDS, _run_partition_maintenance
+)
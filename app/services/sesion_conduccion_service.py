@@ -1,7 +1,7 @@
 # app/services/sesion_conduccion_service.py
 import logging
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 import uuid 
 
 from sqlalchemy.orm import Session 
@@ -10,6 +10,7 @@ from sqlalchemy.orm import Session
 from app.crud.crud_sesion_conduccion import sesion_conduccion_crud
 from app.crud.crud_conductor import conductor_crud
 from app.crud.crud_bus import bus_crud
+from app.services.dashboard_counter_service import dashboard_counter_service
 # Importar los modelos para tipado
 from app.models_db.cloud_database_models import SesionConduccion, Conductor, Bus 
 
@@ -91,10 +92,19 @@ class SesionConduccionService:
         session_data['id_bus'] = bus_id # Asegurar que sea UUID para el CRUD
 
         try:
-            # Usar create_or_update para manejar tanto la creación como la actualización de la sesión
-            # La clave única será 'id_sesion_conduccion_jetson'
-            session_obj = sesion_conduccion_crud.create_or_update(db, session_data, unique_field='id_sesion_conduccion_jetson')
-            
+            # Crear o actualizar la sesión (clave única 'id_sesion_conduccion_jetson') y ajustar el
+            # contador de sesiones activas del dashboard en la misma transacción.
+            session_obj = sesion_conduccion_crud.get_by_jetson_session_id(db, jetson_session_id)
+            previous_bus_id, was_active = self._counter_state(session_obj)
+            if session_obj:
+                update_data = {k: v for k, v in session_data.items() if k != 'id_sesion_conduccion_jetson'}
+                session_obj = sesion_conduccion_crud.update(db, session_obj, update_data, commit=False)
+            else:
+                session_obj = sesion_conduccion_crud.create(db, session_data, commit=False)
+            dashboard_counter_service.session_changed(db, previous_bus_id, was_active, *self._counter_state(session_obj))
+            db.commit()
+            db.refresh(session_obj)
+
             logger.info(f"Sesión de conducción '{session_obj.id_sesion_conduccion_jetson}' procesada exitosamente. Estado: {session_obj.estado_sesion}.")
             return session_obj
         except Exception as e:
@@ -182,7 +192,11 @@ class SesionConduccionService:
                 return None
         
         try:
-            updated_sesion = sesion_conduccion_crud.update(db, sesion_existente, updates)
+            previous_bus_id, was_active = self._counter_state(sesion_existente)
+            updated_sesion = sesion_conduccion_crud.update(db, sesion_existente, updates, commit=False)
+            dashboard_counter_service.session_changed(db, previous_bus_id, was_active, *self._counter_state(updated_sesion))
+            db.commit()
+            db.refresh(updated_sesion)
             logger.info(f"Sesión de conducción ID '{sesion_id}' actualizada exitosamente.")
             return updated_sesion
         except Exception as e:
@@ -202,16 +216,23 @@ class SesionConduccionService:
             return False
         
         try:
-            deleted_sesion = sesion_conduccion_crud.remove(db, sesion_id)
-            if deleted_sesion:
-                logger.info(f"Sesión de conducción ID '{sesion_id}' eliminada exitosamente.")
-                return True
-            else:
-                return False 
+            previous_bus_id, was_active = self._counter_state(sesion_to_delete)
+            db.delete(sesion_to_delete)
+            dashboard_counter_service.session_changed(db, previous_bus_id, was_active, None, False)
+            db.commit()
+            logger.info(f"Sesión de conducción ID '{sesion_id}' eliminada exitosamente.")
+            return True
         except Exception as e:
             logger.error(f"Error eliminando sesión de conducción ID '{sesion_id}': {e}", exc_info=True)
             db.rollback()
             return False
 
+    @staticmethod
+    def _counter_state(sesion: Optional[SesionConduccion]) -> Tuple[Optional[uuid.UUID], bool]:
+        """(bus, activa) de una sesión para los contadores del dashboard; activa = 'Activa' y sin fecha de fin."""
+        if sesion is None:
+            return None, False
+        return sesion.id_bus, sesion.estado_sesion == 'Activa' and sesion.fecha_fin_real is None
+
 # Crea una instancia de SesionConduccionService para ser utilizada por los endpoints API.
 sesion_conduccion_service = SesionConduccionService()
\ No newline at end of file
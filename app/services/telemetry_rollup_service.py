@@ -0,0 +1,258 @@
+# app/services/telemetry_rollup_service.py
+import logging
+import math
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, Iterable, List, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.crud.crud_jetson_telemetry import jetson_telemetry_crud, TELEMETRY_METRIC_FIELDS
+from app.crud.crud_jetson_telemetry_rollup import jetson_telemetry_rollup_crud
+from app.services.telemetry_archive_service import telemetry_archive_service, from_microseconds, ID_COLUMN, TIMESTAMP_COLUMN
+
+# Setup logger para este módulo
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    logger.addHandler(handler)
+
+EPOCH = datetime(1970, 1, 1)
+# Resoluciones de los agregados, de la más fina a la más gruesa: (nombre, segundos por intervalo)
+ROLLUP_RESOLUTIONS: Tuple[Tuple[str, int], ...] = (('1m', 60), ('1h', 3600), ('1d', 86400))
+RAW_RESOLUTION = 'raw'
+
+def bucket_start(timestamp: datetime, seconds: int) -> datetime:
+    """Inicio del intervalo de 'seconds' segundos (alineado a epoch, UTC) que contiene 'timestamp'."""
+    elapsed = int((timestamp - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=elapsed - elapsed % seconds)
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Índices de los puntos que conserva Largest-Triangle-Three-Buckets (Steinarsson, 2013) al reducir
+    la serie (x creciente) a 'threshold' puntos: el primero, el último y, en cada uno de los
+    threshold - 2 intervalos intermedios, el que forma el triángulo de mayor área con el punto elegido
+    en el intervalo anterior y la media del siguiente.
+
+    Los límites de los intervalos y sus medias se calculan vectorizados (reduceat) y el área de cada
+    intervalo es una operación sobre arrays; sólo la elección, que encadena cada punto con el
+    anterior, recorre los intervalos.
+    """
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1][:threshold], dtype=np.intp)
+    middle = threshold - 2
+    # Intervalo i: [edges[i], edges[i + 1]) sobre los puntos 1..n-2 (aritmética entera, sin errores de redondeo)
+    edges = np.arange(middle + 1) * (n - 2) // middle + 1
+    sizes = np.diff(edges)
+    next_x = np.append(np.add.reduceat(x[1:n - 1], edges[:-1] - 1)[1:] / sizes[1:], x[n - 1])
+    next_y = np.append(np.add.reduceat(y[1:n - 1], edges[:-1] - 1)[1:] / sizes[1:], y[n - 1])
+    selected = np.empty(threshold, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    anchor = 0
+    for bucket in range(middle):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        ax, ay = x[anchor], y[anchor]
+        area = np.abs((ax - next_x[bucket]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (next_y[bucket] - ay))
+        anchor = lo + int(area.argmax())
+        selected[bucket + 1] = anchor
+    return selected
+
+class TelemetryRollupService:
+    """
+    Agregados de telemetría por dispositivo (min/max/media/conteo) a 1 minuto, 1 hora y 1 día.
+
+    - Ingesta: record_samples agrega las muestras de la petición en memoria y las combina con los
+      agregados existentes con un upsert multi-fila, en la misma transacción que las muestras.
+    - Backfill: recalcula los agregados desde jetson_telemetry y el archivo, día a día (ver el comando
+      'flask telemetry-rollups-backfill').
+    - Historial: get_history elige la resolución más fina cuyo número de puntos cabe en max_points
+      (datos crudos si caben; si no, 1m, 1h o 1d). get_lttb_history reduce cada métrica con LTTB.
+    """
+
+    def aggregate(self, samples: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Agrega muestras (id_hardware_jetson, timestamp_telemetry y métricas) en filas de agregados,
+        una por (dispositivo, resolución, intervalo, métrica). Las métricas nulas no cuentan.
+        """
+        aggregates: Dict[Tuple[str, str, datetime, str], List[float]] = {}
+        for sample in samples:
+            hardware_id = sample['id_hardware_jetson']
+            timestamp = sample['timestamp_telemetry']
+            values = [(field, float(sample[field])) for field in TELEMETRY_METRIC_FIELDS if sample.get(field) is not None]
+            if not values:
+                continue
+            for resolution, seconds in ROLLUP_RESOLUTIONS:
+                start = bucket_start(timestamp, seconds)
+                for field, value in values:
+                    key = (hardware_id, resolution, start, field)
+                    aggregate = aggregates.get(key)
+                    if aggregate is None:
+                        aggregates[key] = [value, value, value, 1]
+                    else:
+                        if value < aggregate[0]:
+                            aggregate[0] = value
+                        if value > aggregate[1]:
+                            aggregate[1] = value
+                        aggregate[2] += value
+                        aggregate[3] += 1
+        return [
+            {'id_hardware_jetson': hardware_id, 'resolucion': resolution, 'bucket_inicio': start, 'metrica': field,
+             'minimo': minimo, 'maximo': maximo, 'suma': suma, 'conteo': conteo}
+            for (hardware_id, resolution, start, field), (minimo, maximo, suma, conteo) in aggregates.items()
+        ]
+
+    def record_samples(self, db: Session, samples: Iterable[Dict[str, Any]]) -> None:
+        """Suma muestras nuevas a los agregados. No hace commit: va en la transacción de la ingesta."""
+        jetson_telemetry_rollup_crud.merge(db, self.aggregate(samples))
+
+    def backfill(self, db: Session, start_time: datetime, end_time: datetime, id_hardware_jetson: Optional[str] = None) -> int:
+        """
+        Recalcula los agregados de [start_time, end_time) desde los datos crudos, ampliado a días
+        completos. Cada día se sustituye en su propia transacción, así que se puede repetir o
+        reanudar. Las muestras que se ingieran durante el recálculo de un día pueden perderse en
+        sus agregados: conviene lanzarlo sobre rangos ya cerrados.
+
+        Returns:
+            int: Número de filas de agregados escritas.
+        """
+        day = bucket_start(start_time, 86400)
+        written = 0
+        while day < end_time:
+            next_day = day + timedelta(days=1)
+            rows = self.aggregate(self._iter_day_samples(db, day, next_day, id_hardware_jetson))
+            try:
+                jetson_telemetry_rollup_crud.replace_range(db, day, next_day, rows, id_hardware_jetson)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            written += len(rows)
+            logger.info(f"Agregados de telemetría recalculados para {day.date()}: {len(rows)} filas.")
+            day = next_day
+        return written
+
+    def _iter_day_samples(self, db: Session, day: datetime, next_day: datetime,
+                          id_hardware_jetson: Optional[str]) -> Iterable[Dict[str, Any]]:
+        """Muestras de un día: las archivadas y las de la tabla (sin repetir las que estén en ambos sitios)."""
+        archived_ids = set()
+        for sample in telemetry_archive_service.iter_day_samples(day.date(), id_hardware_jetson):
+            archived_ids.add(sample['id'])
+            yield sample
+        for sample in jetson_telemetry_crud.iter_samples(db, day, next_day, id_hardware_jetson, with_ids=bool(archived_ids)):
+            if not archived_ids or sample['id'] not in archived_ids:
+                yield sample
+
+    def choose_resolution(self, db: Session, id_hardware_jetson: str, start_time: datetime, end_time: datetime,
+                          max_points: int) -> str:
+        """Resolución más fina (crudo, 1m, 1h, 1d) con como mucho max_points puntos en el rango; si ninguna cabe, 1d."""
+        count = jetson_telemetry_crud.count_in_range(db, id_hardware_jetson, start_time, end_time, max_points + 1)
+        if count <= max_points:
+            count += telemetry_archive_service.count_in_range(id_hardware_jetson, start_time, end_time)
+        if count <= max_points:
+            return RAW_RESOLUTION
+        for resolution, seconds in ROLLUP_RESOLUTIONS:
+            first_bucket = bucket_start(start_time, seconds)
+            if math.ceil((end_time - first_bucket).total_seconds() / seconds) <= max_points:
+                return resolution
+        return ROLLUP_RESOLUTIONS[-1][0]
+
+    def get_history(self, db: Session, id_hardware_jetson: str, start_time: datetime, end_time: datetime,
+                    max_points: int) -> Dict[str, Any]:
+        """
+        Historial de [start_time, end_time) con como mucho ~max_points puntos. Cada punto tiene
+        'timestamp' (muestra o inicio del intervalo) y, por métrica, {min, max, avg, count}.
+        """
+        resolution = self.choose_resolution(db, id_hardware_jetson, start_time, end_time, max_points)
+        if resolution == RAW_RESOLUTION:
+            samples = telemetry_archive_service.get_samples(
+                db, id_hardware_jetson, limit=max_points, start_time=start_time, end_time=end_time)
+            points = []
+            for sample in reversed(samples):
+                point = {"timestamp": sample.timestamp_telemetry.isoformat()}
+                for field in TELEMETRY_METRIC_FIELDS:
+                    value = getattr(sample, field)
+                    if value is not None:
+                        value = float(value)
+                        point[field] = {"min": value, "max": value, "avg": value, "count": 1}
+                points.append(point)
+            return {"resolucion": resolution, "points": points}
+
+        seconds = dict(ROLLUP_RESOLUTIONS)[resolution]
+        rollups = jetson_telemetry_rollup_crud.get_range(
+            db, id_hardware_jetson, resolution, bucket_start(start_time, seconds), end_time)
+        points_by_bucket: Dict[datetime, Dict[str, Any]] = {}
+        for rollup in rollups:
+            point = points_by_bucket.setdefault(rollup.bucket_inicio, {"timestamp": rollup.bucket_inicio.isoformat()})
+            point[rollup.metrica] = {"min": rollup.minimo, "max": rollup.maximo,
+                                     "avg": rollup.suma / rollup.conteo, "count": rollup.conteo}
+        return {"resolucion": resolution, "points": list(points_by_bucket.values())}
+
+    def load_series(self, db: Session, id_hardware_jetson: str, start_time: datetime, end_time: datetime,
+                    max_input_points: int) -> Tuple[str, Dict[str, Tuple[np.ndarray, np.ndarray]]]:
+        """
+        Series de [start_time, end_time) por métrica como arrays (timestamps en microsegundos desde
+        epoch, valores), en orden de tiempo y sin nulos: las muestras crudas (tabla y archivo) si caben
+        en max_input_points y, si no, la media de la resolución de agregados más fina que quepa.
+
+        Returns:
+            Tuple: (resolución usada, {métrica: (timestamps, valores)})
+        """
+        resolution = self.choose_resolution(db, id_hardware_jetson, start_time, end_time, max_input_points)
+        if resolution == RAW_RESOLUTION:
+            columns = telemetry_archive_service.read_columns(id_hardware_jetson, start_time, end_time)
+            live = jetson_telemetry_crud.get_metric_window(db, start_time, end_time, id_hardware_jetson, with_ids=True)
+            if live:
+                live_columns = list(zip(*live))
+                keep = np.ones(len(live), dtype=bool)
+                if len(columns[TIMESTAMP_COLUMN]): # Muestras en ambos sitios mientras se archiva su día
+                    archived_ids = {sample_id.tobytes() for sample_id in columns[ID_COLUMN]}
+                    keep = np.array([sample_id.bytes not in archived_ids for sample_id in live_columns[-1]], dtype=bool)
+                columns[TIMESTAMP_COLUMN] = np.concatenate([
+                    columns[TIMESTAMP_COLUMN], np.array(live_columns[1], dtype='datetime64[us]').astype(np.int64)[keep]])
+                for index, field in enumerate(TELEMETRY_METRIC_FIELDS):
+                    columns[field] = np.concatenate([columns[field], np.array(live_columns[2 + index], dtype=np.float64)[keep]])
+            order = np.argsort(columns[TIMESTAMP_COLUMN], kind='stable')
+            timestamps = columns[TIMESTAMP_COLUMN][order]
+            series = {}
+            for field in TELEMETRY_METRIC_FIELDS:
+                values = columns[field][order]
+                valid = ~np.isnan(values)
+                series[field] = (timestamps[valid], values[valid])
+            return resolution, series
+
+        seconds = dict(ROLLUP_RESOLUTIONS)[resolution]
+        rows = jetson_telemetry_rollup_crud.get_average_series(
+            db, id_hardware_jetson, resolution, bucket_start(start_time, seconds), end_time)
+        if not rows:
+            return resolution, {}
+        metricas, buckets, averages = (np.array(column) for column in zip(*rows))
+        timestamps = buckets.astype('datetime64[us]').astype(np.int64)
+        averages = averages.astype(np.float64)
+        return resolution, {field: (timestamps[metricas == field], averages[metricas == field])
+                            for field in TELEMETRY_METRIC_FIELDS if (metricas == field).any()}
+
+    def get_lttb_history(self, db: Session, id_hardware_jetson: str, start_time: datetime, end_time: datetime,
+                         max_points: int, max_input_points: int) -> Dict[str, Any]:
+        """
+        Historial de [start_time, end_time) con como mucho max_points puntos por métrica, elegidos con
+        LTTB (conservan picos y forma de la curva, a diferencia de promediar). La entrada son las
+        muestras crudas si hay como mucho max_input_points; si no, las medias de los agregados.
+        Cada serie es una lista de {timestamp, value}.
+        """
+        resolution, series = self.load_series(db, id_hardware_jetson, start_time, end_time, max_input_points)
+        result = {}
+        for field, (timestamps, values) in series.items():
+            selected = lttb_indices(timestamps.astype(np.float64), values, max_points)
+            result[field] = [{"timestamp": from_microseconds(timestamp).isoformat(), "value": value}
+                             for timestamp, value in zip(timestamps[selected].tolist(), values[selected].tolist())]
+        return {"resolucion": resolution, "algoritmo": "lttb", "series": result}
+
+
+# Instancia del servicio para ser utilizada en la aplicación.
+telemetry_rollup_service = TelemetryRollupService()
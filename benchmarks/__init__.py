@@ -0,0 +1,5 @@
+# benchmarks/__init__.py
+"""
+Benchmarks y simuladores de carga del backend en la nube.
+Se ejecutan como módulos, por ejemplo: python -m benchmarks.fleet_simulator --help
+"""
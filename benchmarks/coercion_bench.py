@@ -0,0 +1,125 @@
+# benchmarks/coercion_bench.py
+"""
+Microbenchmark de la conversión de tipos de las filas entrantes (filas/segundo).
+
+Compara la implementación anterior de CRUDBase._process_data_for_model, que recorría
+todas las columnas del modelo y consultaba python_type en cada llamada, con el plan
+de conversión precalculado por modelo (app/crud/coercion.py).
+No necesita base de datos.
+
+Uso:
+    python -m benchmarks.coercion_bench --rows 50000 --output coercion.json
+"""
+import argparse
+import time
+import uuid
+from datetime import datetime, date
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.common import write_results
+
+
+def legacy_process_data_for_model(data: Dict[str, Any], model_class) -> Dict[str, Any]:
+    """Copia literal de la implementación anterior, como línea base."""
+    processed_data = data.copy()
+    for col_name, column in model_class.__table__.columns.items():
+        if col_name in processed_data and isinstance(processed_data[col_name], str):
+            if hasattr(column.type, 'python_type'):
+                if column.type.python_type == uuid.UUID:
+                    try:
+                        processed_data[col_name] = uuid.UUID(processed_data[col_name])
+                    except ValueError:
+                        processed_data[col_name] = None
+                elif column.type.python_type == datetime:
+                    try:
+                        processed_data[col_name] = datetime.fromisoformat(processed_data[col_name])
+                    except ValueError:
+                        processed_data[col_name] = None
+                elif column.type.python_type == date:
+                    try:
+                        processed_data[col_name] = datetime.fromisoformat(processed_data[col_name]).date()
+                    except ValueError:
+                        processed_data[col_name] = None
+    return processed_data
+
+
+def sample_rows(kind: str, count: int) -> List[Dict[str, Any]]:
+    now = datetime.utcnow().isoformat()
+    if kind == 'evento':
+        template = {
+            "id": None,
+            "id_local_jetson": 1,
+            "id_bus": str(uuid.uuid4()),
+            "id_conductor": str(uuid.uuid4()),
+            "id_sesion_conduccion": str(uuid.uuid4()),
+            "timestamp_evento": now,
+            "tipo_evento": "Distraccion",
+            "subtipo_evento": "Mirada Fuera de la Via",
+            "duracion_segundos": "4.5",
+            "severidad": "Media",
+            "confidence_score_ia": "0.87",
+            "ubicacion_gps_evento": "4.600000,-74.080000",
+            "snapshot_url": None,
+            "video_clip_url": None,
+            "metadatos_ia_json": {"frames": 20},
+            "sent_to_cloud_at": now,
+        }
+    else:
+        template = {
+            "id_hardware_jetson": "JETSON-0001",
+            "timestamp_telemetry": now,
+            "ram_usage_gb": 2.1,
+            "cpu_usage_percent": "55.3",
+            "disk_usage_gb": 14.2,
+            "disk_usage_percent": 61.0,
+            "temperatura_celsius": "58.5",
+        }
+    rows = []
+    for _ in range(count):
+        row = dict(template)
+        if 'id' in row:
+            row['id'] = str(uuid.uuid4())
+        rows.append(row)
+    return rows
+
+
+def measure(convert: Callable[[Dict[str, Any]], Dict[str, Any]], rows: List[Dict[str, Any]], repeat: int) -> float:
+    """Mejor tiempo de 'repeat' pasadas, expresado en filas por segundo."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for row in rows:
+            convert(row)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return len(rows) / best if best else float('inf')
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Microbenchmark de conversión de tipos por modelo.")
+    parser.add_argument("--rows", type=int, default=50000, help="Filas por pasada.")
+    parser.add_argument("--repeat", type=int, default=5, help="Pasadas por variante (se toma la mejor).")
+    parser.add_argument("--output", default=None, help="Archivo JSON de salida (por defecto stdout).")
+    args = parser.parse_args(argv)
+
+    from app.crud.coercion import get_coercion_plan
+    from app.models_db.cloud_database_models import Evento, JetsonTelemetry
+
+    results: Dict[str, Any] = {"benchmark": "coercion", "rows": args.rows, "repeat": args.repeat, "models": {}}
+    for kind, model in (('evento', Evento), ('telemetry', JetsonTelemetry)):
+        rows = sample_rows(kind, args.rows)
+        plan = get_coercion_plan(model)
+        legacy_rps = measure(lambda row: legacy_process_data_for_model(row, model), rows, args.repeat)
+        plan_rps = measure(plan.apply, rows, args.repeat)
+        results["models"][model.__tablename__] = {
+            "legacy_rows_per_second": legacy_rps,
+            "plan_rows_per_second": plan_rps,
+            "speedup": plan_rps / legacy_rps if legacy_rps else None
+        }
+
+    write_results(results, args.output)
+    return results
+
+
+if __name__ == '__main__':
+    main()
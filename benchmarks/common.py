@@ -0,0 +1,117 @@
+# benchmarks/common.py
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+# Permite ejecutar los benchmarks desde la raíz del repositorio sin instalar el paquete.
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+
+def configure_database_url(database_url: Optional[str]) -> str:
+    """
+    Fija DATABASE_URL antes de importar la aplicación (settings la lee al importarse).
+    Sin URL explícita se usa un SQLite temporal como sustituto de PostgreSQL.
+    """
+    if not database_url:
+        database_url = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="movai_bench_"), "bench.db")
+    os.environ["DATABASE_URL"] = database_url
+    return database_url
+
+
+def configure_sqlite_for_concurrency(engine, busy_timeout_ms: int = 30000) -> None:
+    """
+    Ajusta un engine SQLite para aguantar varios hilos escribiendo a la vez:
+    WAL, busy_timeout y BEGIN IMMEDIATE (receta de SQLAlchemy para pysqlite), de modo que
+    las transacciones de escritura se serialicen en vez de fallar con 'database is locked'.
+    No hace nada con otros motores.
+    """
+    from sqlalchemy import event
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None # El BEGIN lo emite SQLAlchemy (ver abajo)
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _on_begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    engine.dispose() # Las conexiones ya abiertas no tendrían la configuración
+
+
+class QueryCounter:
+    """
+    Cuenta las sentencias SQL ejecutadas por el hilo actual, usando el evento
+    'before_cursor_execute' del engine. Cada hilo tiene su propio contador, por lo que
+    sirve para medir consultas por petición cuando cada cliente corre en su propio hilo.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def install(self, engine) -> None:
+        from sqlalchemy import event
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self._local.count = getattr(self._local, 'count', 0) + 1
+
+    def reset(self) -> None:
+        self._local.count = 0
+
+    @property
+    def count(self) -> int:
+        return getattr(self._local, 'count', 0)
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize_latencies(latencies_ms: List[float]) -> Dict[str, Any]:
+    ordered = sorted(latencies_ms)
+    return {
+        "p50_ms": percentile(ordered, 50),
+        "p95_ms": percentile(ordered, 95),
+        "p99_ms": percentile(ordered, 99),
+        "max_ms": ordered[-1] if ordered else None,
+        "mean_ms": (sum(ordered) / len(ordered)) if ordered else None
+    }
+
+
+def environment_info(database_url: str) -> Dict[str, Any]:
+    """Metadatos para poder comparar resultados entre versiones."""
+    from sqlalchemy.engine import make_url
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "database_dialect": make_url(database_url).get_backend_name()
+    }
+
+
+def write_results(results: Dict[str, Any], output: Optional[str]) -> None:
+    """Escribe los resultados como JSON (estable y ordenado) en un archivo o en stdout."""
+    payload = json.dumps(results, indent=2, sort_keys=True, default=str)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(payload + "\n")
+    else:
+        print(payload)
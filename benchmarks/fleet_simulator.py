@@ -0,0 +1,401 @@
+# benchmarks/fleet_simulator.py
+"""
+Simulador de carga de una flota de Jetson Nano contra el backend en la nube.
+
+Cada Jetson simulada corre en su propio hilo con un cliente de pruebas de Flask
+(en proceso, sin red) y mezcla peticiones a:
+    POST /api/v1/eventos/
+    POST /api/v1/jetson-nanos/telemetry
+    POST /api/v1/jetson-nanos/<id_hardware_jetson>/heartbeat
+    POST /api/v1/sesiones-conduccion/
+Periódicamente toda la flota pierde conectividad, acumula eventos y reconecta a la vez
+(ráfaga de reconexión), que es el patrón que más castiga a la ingesta.
+
+Reporta por endpoint: rendimiento (req/s), latencias p50/p95/p99 y consultas SQL por
+petición, en JSON para poder comparar resultados entre versiones.
+
+Uso:
+    python -m benchmarks.fleet_simulator --jetsons 20 --duration 30 --output resultados.json
+    DATABASE_URL=postgresql://... python -m benchmarks.fleet_simulator --database-url "$DATABASE_URL"
+"""
+import argparse
+import contextlib
+import logging
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from benchmarks.common import (
+    QueryCounter, configure_database_url, configure_sqlite_for_concurrency, environment_info,
+    summarize_latencies, write_results
+)
+
+EVENT_TYPES = [
+    # (tipo_evento, subtipo_evento, peso)
+    ('Distraccion', 'Mirada Fuera de la Via', 40),
+    ('Distraccion', 'Uso de Celular', 15),
+    ('Fatiga', 'Bostezo', 20),
+    ('Fatiga', 'Ojos Cerrados', 10),
+    ('RegulacionConduccion', 'Exceso Horas Conduccion', 3),
+    ('Identificacion', 'Conductor No Identificado', 2),
+    ('Identificacion', 'Conductor Identificado', 10),
+]
+
+DEFAULT_MIX = "eventos=45,telemetry=25,heartbeat=25,sesiones=5"
+
+
+class EndpointStats:
+    """Acumulador de métricas de un endpoint dentro de un hilo (se fusiona al final)."""
+
+    def __init__(self):
+        self.latencies_ms: List[float] = []
+        self.queries: List[int] = []
+        self.status_codes: Dict[int, int] = defaultdict(int)
+        self.errors = 0
+        self.items = 0
+
+    def merge(self, other: "EndpointStats") -> None:
+        self.latencies_ms.extend(other.latencies_ms)
+        self.queries.extend(other.queries)
+        for code, count in other.status_codes.items():
+            self.status_codes[code] += count
+        self.errors += other.errors
+        self.items += other.items
+
+
+class FleetClock:
+    """
+    Controla las caídas de conectividad de toda la flota.
+    'online' se limpia durante la caída; al volver, cada Jetson vacía su backlog.
+    """
+
+    def __init__(self, reconnect_interval: float, outage_seconds: float):
+        self.reconnect_interval = reconnect_interval
+        self.outage_seconds = outage_seconds
+        self.online = threading.Event()
+        self.online.set()
+        self.outages = 0
+
+    def run(self, stop: threading.Event) -> None:
+        if self.reconnect_interval <= 0 or self.outage_seconds <= 0:
+            return
+        while not stop.wait(self.reconnect_interval):
+            self.online.clear()
+            self.outages += 1
+            if stop.wait(self.outage_seconds):
+                break
+            self.online.set()
+        self.online.set()
+
+
+class SimulatedJetson:
+    """Una Jetson Nano con su bus, conductor y sesión de conducción activa."""
+
+    def __init__(self, index: int, device: Dict[str, str], args: argparse.Namespace, mix: Dict[str, int]):
+        self.index = index
+        self.hardware_id = device['hardware_id']
+        self.bus_id = device['bus_id']
+        self.conductor_id = device['conductor_id']
+        self.args = args
+        self.rng = random.Random(args.seed * 1000 + index)
+        self.mix_names = list(mix.keys())
+        self.mix_weights = list(mix.values())
+        self.session_id: Optional[str] = None
+        self.session_started_at: Optional[datetime] = None
+        self.local_event_id = 0
+        self.backlog: List[Dict[str, Any]] = []
+        self.last_batch: Optional[List[Dict[str, Any]]] = None
+        self.stats: Dict[str, EndpointStats] = defaultdict(EndpointStats)
+
+    # --- Payloads ---
+
+    def _event(self, timestamp: datetime) -> Dict[str, Any]:
+        tipo, subtipo, _ = self.rng.choices(EVENT_TYPES, weights=[t[2] for t in EVENT_TYPES])[0]
+        self.local_event_id += 1
+        event = {
+            "id": str(uuid.uuid4()),
+            "id_local_jetson": self.local_event_id,
+            "id_bus": self.bus_id,
+            "id_conductor": self.conductor_id,
+            "id_sesion_conduccion_jetson": self.session_id,
+            "timestamp_evento": timestamp.isoformat(),
+            "tipo_evento": tipo,
+            "subtipo_evento": subtipo,
+            "duracion_segundos": round(self.rng.uniform(0.5, 12.0), 2),
+            "severidad": self.rng.choice(['Baja', 'Media', 'Alta']),
+            "confidence_score_ia": round(self.rng.uniform(0.5, 0.99), 3),
+            "ubicacion_gps_evento": f"{4.6 + self.rng.uniform(-0.1, 0.1):.6f},{-74.08 + self.rng.uniform(-0.1, 0.1):.6f}",
+            "sent_to_cloud_at": datetime.utcnow().isoformat(),
+        }
+        if self.rng.random() < 0.3:
+            event["snapshot_url"] = f"/static/uploads/snapshots/{event['id']}.jpg"
+        if self.rng.random() < 0.5:
+            event["metadatos_ia_json"] = {
+                "modelo": "yolov8n-driver",
+                "frames": self.rng.randint(5, 60),
+                "landmarks": [round(self.rng.random(), 4) for _ in range(8)]
+            }
+        return event
+
+    def _events_batch(self) -> List[Dict[str, Any]]:
+        size = max(1, int(self.rng.expovariate(1.0 / self.args.events_per_batch)))
+        now = datetime.utcnow()
+        return [self._event(now - timedelta(seconds=self.rng.uniform(0, 5))) for _ in range(size)]
+
+    def _telemetry(self) -> Dict[str, Any]:
+        return {
+            "id_hardware_jetson": self.hardware_id,
+            "timestamp_telemetry": datetime.utcnow().isoformat(),
+            "ram_usage_gb": round(self.rng.uniform(1.5, 3.8), 2),
+            "cpu_usage_percent": round(self.rng.uniform(20, 95), 1),
+            "disk_usage_gb": round(self.rng.uniform(10, 28), 2),
+            "disk_usage_percent": round(self.rng.uniform(30, 90), 1),
+            "temperatura_celsius": round(self.rng.uniform(40, 80), 1),
+        }
+
+    def _session(self, finished: bool) -> Dict[str, Any]:
+        data = {
+            "id_sesion_conduccion_jetson": self.session_id,
+            "id_conductor": self.conductor_id,
+            "id_bus": self.bus_id,
+            "fecha_inicio_real": self.session_started_at.isoformat(),
+            "estado_sesion": 'Finalizada' if finished else 'Activa',
+        }
+        if finished:
+            now = datetime.utcnow()
+            data["fecha_fin_real"] = now.isoformat()
+            data["duracion_total_seg"] = int((now - self.session_started_at).total_seconds())
+        return data
+
+    # --- Peticiones ---
+
+    def _request(self, client, counter: QueryCounter, name: str, url: str, payload: Any, items: int = 1):
+        counter.reset()
+        started = time.perf_counter()
+        try:
+            response = client.post(url, json=payload)
+            status = response.status_code
+        except Exception:
+            status = None
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+
+        stats = self.stats[name]
+        stats.latencies_ms.append(elapsed_ms)
+        stats.queries.append(counter.count)
+        if status is None:
+            stats.errors += 1
+        else:
+            stats.status_codes[status] += 1
+            if status >= 400:
+                stats.errors += 1
+            else:
+                stats.items += items
+        return status
+
+    def _start_session(self, client, counter: QueryCounter) -> None:
+        self.session_id = str(uuid.uuid4())
+        self.session_started_at = datetime.utcnow()
+        self._request(client, counter, "POST /api/v1/sesiones-conduccion/",
+                      "/api/v1/sesiones-conduccion/", self._session(finished=False))
+
+    def _send_events(self, client, counter: QueryCounter, name: str, events: List[Dict[str, Any]]) -> None:
+        self._request(client, counter, name, "/api/v1/eventos/", {"events": events}, items=len(events))
+
+    def run(self, app, counter: QueryCounter, clock: FleetClock, stop: threading.Event) -> None:
+        client = app.test_client()
+        self._start_session(client, counter)
+        think = self.args.think_ms / 1000.0
+
+        while not stop.is_set():
+            if not clock.online.is_set():
+                # Sin conectividad: la Jetson sigue generando eventos en su cola local.
+                self.backlog.extend(self._events_batch())
+                stop.wait(max(think, 0.05))
+                continue
+
+            if self.backlog:
+                # Ráfaga de reconexión: latido y vaciado de la cola local en un solo lote.
+                self._request(client, counter, "POST /api/v1/jetson-nanos/<id>/heartbeat",
+                              f"/api/v1/jetson-nanos/{self.hardware_id}/heartbeat", {"estado_salud": "Bueno"})
+                backlog, self.backlog = self.backlog, []
+                self._send_events(client, counter, "POST /api/v1/eventos/ (reconnect burst)", backlog)
+                continue
+
+            action = self.rng.choices(self.mix_names, weights=self.mix_weights)[0]
+            if action == 'eventos':
+                if self.last_batch is not None and self.rng.random() < self.args.retry_ratio:
+                    # Reintento de un lote ya enviado (la Jetson no recibió la respuesta).
+                    batch = self.last_batch
+                else:
+                    batch = self._events_batch()
+                self._send_events(client, counter, "POST /api/v1/eventos/", batch)
+                self.last_batch = batch
+            elif action == 'telemetry':
+                self._request(client, counter, "POST /api/v1/jetson-nanos/telemetry",
+                              "/api/v1/jetson-nanos/telemetry", self._telemetry())
+            elif action == 'heartbeat':
+                payload = {"estado_salud": "Bueno"} if self.rng.random() < 0.2 else {}
+                self._request(client, counter, "POST /api/v1/jetson-nanos/<id>/heartbeat",
+                              f"/api/v1/jetson-nanos/{self.hardware_id}/heartbeat", payload)
+            elif action == 'sesiones':
+                # Cambio de turno: cierra la sesión actual y abre una nueva.
+                self._request(client, counter, "POST /api/v1/sesiones-conduccion/",
+                              "/api/v1/sesiones-conduccion/", self._session(finished=True))
+                self._start_session(client, counter)
+
+            if think > 0:
+                stop.wait(self.rng.expovariate(1.0 / think))
+
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ('eventos', 'telemetry', 'heartbeat', 'sesiones'):
+            raise ValueError(f"Endpoint desconocido en --mix: '{name}'")
+        weights[name] = int(weight)
+    return weights
+
+
+def seed_fleet(db, num_jetsons: int) -> List[Dict[str, str]]:
+    """Crea una empresa y, por cada Jetson, su bus, conductor y registro JetsonNano."""
+    from app.models_db.cloud_database_models import Empresa, Bus, Conductor, JetsonNano
+
+    run_tag = uuid.uuid4().hex[:8]
+    empresa = Empresa(nombre_empresa=f"Benchmark {run_tag}", nit=f"BENCH-{run_tag}")
+    db.session.add(empresa)
+    db.session.flush()
+
+    devices = []
+    for i in range(num_jetsons):
+        bus = Bus(id_empresa=empresa.id, placa=f"B{run_tag[:4]}{i:04d}", numero_interno=str(i))
+        conductor = Conductor(id_empresa=empresa.id, cedula=f"{run_tag}{i:06d}", nombre_completo=f"Conductor {i}")
+        db.session.add_all([bus, conductor])
+        db.session.flush()
+        hardware_id = f"BENCH-{run_tag}-{i:04d}"
+        db.session.add(JetsonNano(id_hardware_jetson=hardware_id, id_bus=bus.id,
+                                  ultima_conexion_cloud_at=datetime.utcnow()))
+        devices.append({"hardware_id": hardware_id, "bus_id": str(bus.id), "conductor_id": str(conductor.id)})
+    db.session.commit()
+    return devices
+
+
+def build_results(args, database_url: str, fleet: List[SimulatedJetson], clock: FleetClock,
+                  elapsed: float) -> Dict[str, Any]:
+    merged: Dict[str, EndpointStats] = defaultdict(EndpointStats)
+    for jetson in fleet:
+        for name, stats in jetson.stats.items():
+            merged[name].merge(stats)
+
+    endpoints = {}
+    total_requests = 0
+    total_errors = 0
+    for name in sorted(merged):
+        stats = merged[name]
+        requests = len(stats.latencies_ms)
+        total_requests += requests
+        total_errors += stats.errors
+        endpoints[name] = {
+            "requests": requests,
+            "errors": stats.errors,
+            "status_codes": {str(code): count for code, count in sorted(stats.status_codes.items())},
+            "throughput_rps": requests / elapsed if elapsed else None,
+            "items": stats.items,
+            "items_per_second": stats.items / elapsed if elapsed else None,
+            "latency": summarize_latencies(stats.latencies_ms),
+            "queries_per_request": {
+                "mean": (sum(stats.queries) / len(stats.queries)) if stats.queries else None,
+                "max": max(stats.queries) if stats.queries else None
+            }
+        }
+
+    return {
+        "benchmark": "fleet_simulator",
+        "environment": environment_info(database_url),
+        "config": {
+            "jetsons": args.jetsons,
+            "duration_s": args.duration,
+            "events_per_batch": args.events_per_batch,
+            "think_ms": args.think_ms,
+            "mix": args.mix,
+            "retry_ratio": args.retry_ratio,
+            "reconnect_interval_s": args.reconnect_interval,
+            "outage_s": args.outage,
+            "seed": args.seed
+        },
+        "elapsed_s": elapsed,
+        "reconnect_bursts": clock.outages,
+        "totals": {
+            "requests": total_requests,
+            "errors": total_errors,
+            "throughput_rps": total_requests / elapsed if elapsed else None
+        },
+        "endpoints": endpoints
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Simulador de carga de una flota de Jetson Nano.")
+    parser.add_argument("--jetsons", type=int, default=20, help="Número de Jetson simuladas (un hilo cada una).")
+    parser.add_argument("--duration", type=float, default=30.0, help="Duración de la medición en segundos.")
+    parser.add_argument("--database-url", default=None,
+                        help="URL de la BD. Por defecto un SQLite temporal como sustituto de PostgreSQL.")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Pesos por endpoint (por defecto '{DEFAULT_MIX}').")
+    parser.add_argument("--events-per-batch", type=float, default=10.0, help="Tamaño medio de lote de eventos.")
+    parser.add_argument("--think-ms", type=float, default=50.0, help="Pausa media entre peticiones de una Jetson.")
+    parser.add_argument("--retry-ratio", type=float, default=0.05, help="Fracción de lotes de eventos reenviados.")
+    parser.add_argument("--reconnect-interval", type=float, default=10.0,
+                        help="Segundos entre caídas de conectividad de la flota (0 las desactiva).")
+    parser.add_argument("--outage", type=float, default=2.0, help="Duración de cada caída en segundos.")
+    parser.add_argument("--seed", type=int, default=1, help="Semilla para reproducir la mezcla de payloads.")
+    parser.add_argument("--output", default=None, help="Archivo JSON de salida (por defecto stdout).")
+    parser.add_argument("--verbose", action="store_true", help="Mantiene los logs INFO de la aplicación.")
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    database_url = configure_database_url(args.database_url)
+
+    # Importar la app sólo después de fijar DATABASE_URL.
+    from main import create_app
+    from app.config.database import db
+
+    with contextlib.redirect_stdout(sys.stderr): # create_app imprime en stdout; stdout queda para el JSON
+        app = create_app()
+    if not args.verbose:
+        logging.disable(logging.INFO)
+
+    counter = QueryCounter()
+    with app.app_context():
+        configure_sqlite_for_concurrency(db.engine)
+        counter.install(db.engine)
+        devices = seed_fleet(db, args.jetsons)
+
+    fleet = [SimulatedJetson(i, device, args, mix) for i, device in enumerate(devices)]
+    clock = FleetClock(args.reconnect_interval, args.outage)
+    stop = threading.Event()
+
+    threads = [threading.Thread(target=clock.run, args=(stop,), daemon=True)]
+    threads += [threading.Thread(target=jetson.run, args=(app, counter, clock, stop), daemon=True) for jetson in fleet]
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    stop.wait(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    results = build_results(args, database_url, fleet, clock, elapsed)
+    write_results(results, args.output)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -38,6 +38,10 @@ def create_app():
     api_blueprint = create_api_blueprint()
     app.register_blueprint(api_blueprint, url_prefix='/api') # Todas las rutas de API bajo /api
 
+    # --- Comandos de la CLI de Flask (mantenimiento) ---
+    from app.core.commands import register_commands
+    register_commands(app)
+
     # --- Manejo de errores globales (Opcional, Flask ya tiene uno básico) ---
     @app.errorhandler(404)
     def not_found(error):
@@ -80,6 +84,57 @@ def create_app():
     with app.app_context(): # Es necesario un contexto de aplicación para interactuar con la BD
         create_db_and_tables() # Llama a la función para crear tablas
 
+    # --- Particiones mensuales (sólo PostgreSQL) ---
+    # Se crean las particiones del mes actual y siguientes antes de aceptar escrituras,
+    # y una tarea periódica las mantiene al día y aplica la retención.
+    from app.services.partition_maintenance_service import partition_maintenance_service, partition_maintenance_task
+    with app.app_context():
+        if partition_maintenance_service.is_supported(db.session):
+            partition_maintenance_service.run_maintenance(db.session)
+            partition_maintenance_task.start(app)
+
+    # --- Notificaciones de alertas ---
+    # El dispatcher drena en segundo plano el outbox que se escribe junto con cada alerta.
+    from app.services.notification_dispatcher import notification_dispatcher
+    notification_dispatcher.start(app)
+
+    # --- Stream en vivo (SSE) ---
+    # Cada worker sigue la tabla stream_messages y reparte los mensajes a sus clientes conectados.
+    if settings.LIVE_STREAM_ENABLED:
+        from app.services.live_stream_service import live_stream_service
+        live_stream_service.start(app)
+
+    # --- Contadores del dashboard ---
+    # Se mantienen con cada cambio; la reconciliación periódica corrige la deriva.
+    from app.services.dashboard_counter_service import dashboard_counter_service
+    dashboard_counter_service.start(app)
+
+    # --- Último contacto de las Jetson ---
+    # Latidos y telemetría se acumulan en memoria y se escriben en bloque cada JETSON_LAST_SEEN_FLUSH_SECONDS.
+    from app.services.jetson_last_seen_cache import jetson_last_seen_cache
+    jetson_last_seen_cache.start(app)
+
+    # --- Conectividad de las Jetson ---
+    # Marca como desconectadas las Jetsons sin contacto cada JETSON_CONNECTIVITY_SWEEP_SECONDS (alerta por caída).
+    from app.services.jetson_connectivity_service import jetson_connectivity_service
+    jetson_connectivity_service.start(app)
+
+    # --- Archivo de telemetría antigua ---
+    # Mueve los días anteriores a TELEMETRY_ARCHIVE_AFTER_DAYS a archivos columnares (intervalo 0 = desactivado).
+    from app.services.telemetry_archive_service import telemetry_archive_service
+    telemetry_archive_service.start(app)
+
+    # --- Salud de las Jetson ---
+    # Analiza cada DEVICE_HEALTH_INTERVAL_SECONDS la telemetría reciente de toda la flota (estado_salud y alertas).
+    from app.services.device_health_service import device_health_service
+    device_health_service.start(app)
+
+    # --- Ingesta asíncrona de eventos ---
+    # En modo 'spool' se recuperan los lotes pendientes y se arrancan los workers que los procesan.
+    if settings.EVENT_INGEST_MODE == 'spool':
+        from app.services.event_ingest_spool import event_ingest_spool
+        event_ingest_spool.start(app)
+
     logger.info("Aplicación Flask creada y configurada.")
     return app
     
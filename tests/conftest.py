@@ -0,0 +1,98 @@
+# tests/conftest.py
+import os
+import sys
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+# Permite ejecutar las pruebas desde la raíz del repositorio sin instalar el paquete.
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+# settings lee el entorno al importarse: SQLite en memoria y sin tareas en segundo plano
+# (intervalo 0 = desactivada), para que las pruebas sean deterministas.
+os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+os.environ["EVENT_INGEST_MODE"] = "sync"
+for _name in ("NOTIFICATION_DISPATCH_INTERVAL_SECONDS", "LIVE_STREAM_POLL_INTERVAL_SECONDS",
+              "DASHBOARD_RECONCILE_INTERVAL_SECONDS", "JETSON_CONNECTIVITY_SWEEP_SECONDS",
+              "JETSON_LAST_SEEN_FLUSH_SECONDS", "TELEMETRY_ARCHIVE_INTERVAL_SECONDS",
+              "DEVICE_HEALTH_INTERVAL_SECONDS"):
+    os.environ[_name] = "0"
+
+
+@pytest.fixture(scope="session")
+def app():
+    from main import create_app
+    return create_app()
+
+
+@pytest.fixture
+def db_session(app):
+    """Sesión sobre una BD en memoria nueva (se descarta al terminar cada prueba)."""
+    from app.config.database import db
+    from app.models_db.cloud_database_models import Base
+    with app.app_context():
+        Base.metadata.create_all(db.engine)
+        yield db.session
+        db.session.remove()
+        db.engine.dispose() # Cierra la única conexión del pool: la BD en memoria desaparece con ella
+
+
+@pytest.fixture
+def client(app, db_session):
+    return app.test_client()
+
+
+@pytest.fixture
+def fleet(db_session):
+    """Una empresa con un bus, un conductor y una sesión de conducción activa."""
+    from app.models_db.cloud_database_models import Empresa, Bus, Conductor, SesionConduccion
+    empresa = Empresa(nombre_empresa="Empresa de prueba", nit=str(uuid.uuid4()))
+    db_session.add(empresa)
+    db_session.flush()
+    bus = Bus(id_empresa=empresa.id, placa=f"T{uuid.uuid4().hex[:5]}", numero_interno="1")
+    conductor = Conductor(id_empresa=empresa.id, cedula=uuid.uuid4().hex[:10], nombre_completo="Conductor de prueba")
+    db_session.add_all([bus, conductor])
+    db_session.flush()
+    sesion = SesionConduccion(id_sesion_conduccion_jetson=uuid.uuid4(), id_conductor=conductor.id, id_bus=bus.id,
+                              fecha_inicio_real=datetime.utcnow())
+    db_session.add(sesion)
+    db_session.commit()
+    return SimpleNamespace(empresa=empresa, bus=bus, conductor=conductor, sesion=sesion)
+
+
+@pytest.fixture
+def make_event(fleet):
+    """Construye un evento tal como lo envía la Jetson (IDs y fechas en string)."""
+    def _make_event(**overrides):
+        event = {
+            "id": str(uuid.uuid4()),
+            "id_bus": str(fleet.bus.id),
+            "id_conductor": str(fleet.conductor.id),
+            "id_sesion_conduccion_jetson": str(fleet.sesion.id_sesion_conduccion_jetson),
+            "timestamp_evento": datetime.utcnow().isoformat(),
+            "tipo_evento": "Distraccion",
+            "duracion_segundos": 1
+        }
+        event.update(overrides)
+        return event
+    return _make_event
+
+
+
+@pytest.fixture
+def sql_statements(db_session):
+    """Sentencias SQL ejecutadas durante la prueba (evento 'before_cursor_execute' del engine)."""
+    from sqlalchemy import event
+    statements = []
+
+    def _on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db_session.get_bind()
+    event.listen(engine, "before_cursor_execute", _on_execute)
+    yield statements
+    event.remove(engine, "before_cursor_execute", _on_execute)
@@ -0,0 +1,41 @@
+# tests/test_alert_cooldown_registry.py
+from datetime import datetime, timedelta
+
+from app.services.alert_cooldown_registry import AlertCooldownRegistry
+
+START = datetime(2024, 1, 1, 8, 0)
+TIPO = "Fatiga Severa"
+
+
+def _cooldown_queries(statements):
+    return [statement for statement in statements if "alertas_cooldown" in statement or "FROM alertas" in statement]
+
+
+def test_cached_cooldown_does_not_query_the_database(db_session, fleet, sql_statements):
+    registry = AlertCooldownRegistry(max_entries=10)
+    assert not registry.is_on_cooldown(db_session, fleet.bus.id, TIPO, 5, now=START)
+    db_session.commit()
+    del sql_statements[:]
+
+    for seconds in range(1, 100):
+        assert registry.is_on_cooldown(db_session, fleet.bus.id, TIPO, 5, now=START + timedelta(seconds=seconds))
+
+    assert _cooldown_queries(sql_statements) == []
+
+
+def test_claim_won_by_another_worker_puts_the_key_on_cooldown(db_session, fleet, sql_statements):
+    worker_a, worker_b = AlertCooldownRegistry(max_entries=10), AlertCooldownRegistry(max_entries=10)
+    assert not worker_b.is_on_cooldown(db_session, fleet.bus.id, TIPO, 5, now=START)
+    db_session.commit()
+
+    # Vencido el periodo, otro worker dispara la alerta antes que este
+    later = START + timedelta(minutes=10)
+    assert not worker_a.is_on_cooldown(db_session, fleet.bus.id, TIPO, 5, now=later)
+    db_session.commit()
+
+    assert worker_b.is_on_cooldown(db_session, fleet.bus.id, TIPO, 5, now=later + timedelta(seconds=1))
+    del sql_statements[:]
+    # Queda cacheado el enfriamiento del otro worker: hasta que vence, sin consultas
+    assert worker_b.is_on_cooldown(db_session, fleet.bus.id, TIPO, 5, now=later + timedelta(minutes=4))
+    assert _cooldown_queries(sql_statements) == []
+    assert not worker_b.is_on_cooldown(db_session, fleet.bus.id, TIPO, 5, now=later + timedelta(minutes=5, seconds=1))
@@ -0,0 +1,48 @@
+# tests/test_dashboard_counter_service.py
+from datetime import datetime
+
+from app.crud.crud_contador_dashboard import contador_dashboard_crud
+from app.models_db.cloud_database_models import Alerta
+from app.services.dashboard_counter_service import dashboard_counter_service
+
+
+def _add_active_alert(db_session, fleet):
+    db_session.add(Alerta(id_bus=fleet.bus.id, id_conductor=fleet.conductor.id, timestamp_alerta=datetime.utcnow(),
+                          tipo_alerta="Fatiga Severa", descripcion="Alta probabilidad de fatiga.",
+                          nivel_criticidad="Crítica", estado_alerta="Activa"))
+    db_session.commit()
+
+
+def test_reconcile_corrects_drift(db_session, fleet):
+    # Una alerta escrita fuera de los servicios no mueve el contador
+    _add_active_alert(db_session, fleet)
+    dashboard_counter_service.alert_changed(db_session, fleet.bus.id, True, False)
+    db_session.commit()
+
+    assert dashboard_counter_service.reconcile(db_session) == 1
+    assert dashboard_counter_service.get_summary(db_session, fleet.empresa.id)["alertas_activas"] == 1
+
+
+def test_reconcile_locks_the_counters_before_counting(db_session, fleet, sql_statements):
+    _add_active_alert(db_session, fleet)
+    del sql_statements[:]
+
+    dashboard_counter_service.reconcile(db_session, fleet.empresa.id)
+
+    lock = next(i for i, statement in enumerate(sql_statements)
+                if statement.startswith("INSERT INTO contadores_dashboard") and "DO NOTHING" in statement)
+    first_count = next(i for i, statement in enumerate(sql_statements) if "FROM alertas" in statement)
+    assert lock < first_count
+    assert contador_dashboard_crud.get_by_empresa(db_session, fleet.empresa.id).alertas_activas == 1
+
+
+def test_increment_after_reconcile_adds_to_the_recomputed_value(db_session, fleet):
+    _add_active_alert(db_session, fleet)
+    dashboard_counter_service.reconcile(db_session, fleet.empresa.id)
+
+    _add_active_alert(db_session, fleet)
+    dashboard_counter_service.alert_changed(db_session, fleet.bus.id, False, True)
+    db_session.commit()
+
+    db_session.expire_all()
+    assert contador_dashboard_crud.get_by_empresa(db_session, fleet.empresa.id).alertas_activas == 2
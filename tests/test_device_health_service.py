@@ -0,0 +1,94 @@
+# tests/test_device_health_service.py
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.crud.crud_jetson_telemetry import TELEMETRY_METRIC_FIELDS
+from app.models_db.cloud_database_models import Alerta, JetsonNano, JetsonTelemetry
+from app.services.device_health_service import (
+    DeviceHealthService, FleetWindow, ALERT_DISK_FULL, ALERT_MEMORY_LEAK, ALERT_THERMAL
+)
+
+
+@pytest.fixture
+def service():
+    return DeviceHealthService(window_minutes=30, interval_seconds=0)
+
+
+def _window(**series):
+    """FleetWindow con un dispositivo por serie: {id: {métrica: [valor por minuto]}} (el resto, NaN)."""
+    hardware_ids = sorted(series)
+    device, minutes, metrics = [], [], {field: [] for field in TELEMETRY_METRIC_FIELDS}
+    for index, hardware_id in enumerate(hardware_ids):
+        length = max(len(values) for values in series[hardware_id].values())
+        device += [index] * length
+        minutes += list(range(length))
+        for field in TELEMETRY_METRIC_FIELDS:
+            metrics[field] += series[hardware_id].get(field, [np.nan] * length)
+    return FleetWindow(hardware_ids, np.array(device, dtype=np.intp), np.array(minutes, dtype=np.float64),
+                       {field: np.array(values, dtype=np.float64) for field, values in metrics.items()})
+
+
+def _types(findings, hardware_id):
+    return [(tipo_alerta, severity) for tipo_alerta, severity, _ in findings.get(hardware_id, [])]
+
+
+def test_thermal_runaway_and_critical_temperature(service):
+    findings = service.evaluate(_window(
+        rising={"temperatura_celsius": [70.0 + step for step in range(10)]},     # 1 °C/min hasta 79 °C
+        critical={"temperatura_celsius": [86.0, 86.0, 86.0]},
+        hot_but_stable={"temperatura_celsius": [78.0, 78.2, 77.9, 78.1, 78.0]},
+        rising_but_cool={"temperatura_celsius": [50.0 + step for step in range(10)]},
+    ))
+
+    assert _types(findings, "rising") == [(ALERT_THERMAL, "warning")]
+    assert _types(findings, "critical") == [(ALERT_THERMAL, "critical")]
+    assert "hot_but_stable" not in findings and "rising_but_cool" not in findings
+
+
+def test_memory_leak_needs_sustained_growth(service):
+    findings = service.evaluate(_window(
+        leaking={"ram_usage_gb": [1.0 + 0.05 * step for step in range(12)]},
+        short={"ram_usage_gb": [1.0 + 0.1 * step for step in range(5)]},
+        noisy={"ram_usage_gb": [1.0, 1.4, 1.1, 1.5, 1.2, 1.6, 1.3, 1.7, 1.4, 1.8, 1.5, 1.9]},
+    ))
+
+    assert _types(findings, "leaking") == [(ALERT_MEMORY_LEAK, "warning")]
+    assert "short" not in findings and "noisy" not in findings
+
+
+def test_disk_filling_and_almost_full(service):
+    findings = service.evaluate(_window(
+        filling={"disk_usage_percent": [80.0 + 0.5 * step for step in range(10)]}, # Se llena en ~0,5 h
+        slow={"disk_usage_percent": [50.0 + 0.001 * step for step in range(10)]},
+        full={"disk_usage_percent": [96.0, 96.0, 96.0]},
+    ))
+
+    assert _types(findings, "filling") == [(ALERT_DISK_FULL, "warning")]
+    assert "se llena en" in findings["filling"][0][2]
+    assert _types(findings, "full") == [(ALERT_DISK_FULL, "critical")]
+    assert "slow" not in findings
+
+
+def test_empty_window_has_no_findings(service):
+    assert service.evaluate(FleetWindow.from_rows([], datetime.utcnow())) == {}
+
+
+def test_alert_is_not_repeated_while_one_is_active(db_session, fleet, service):
+    now = datetime.utcnow()
+    db_session.add(JetsonNano(id_hardware_jetson="HW-HOT", id_bus=fleet.bus.id, activo=True))
+    db_session.add_all([JetsonTelemetry(id_hardware_jetson="HW-HOT", timestamp_telemetry=now - timedelta(minutes=minutes),
+                                        temperatura_celsius=90) for minutes in (1, 2, 3)])
+    db_session.commit()
+
+    assert service.analyze_once(db_session, now)["alerts"] == 1
+    assert service.analyze_once(db_session, now + timedelta(seconds=30))["alerts"] == 0
+    alert = db_session.query(Alerta).one()
+    assert (alert.tipo_alerta, alert.nivel_criticidad) == (ALERT_THERMAL, "Crítica")
+    assert db_session.get(JetsonNano, db_session.query(JetsonNano.id).scalar()).estado_salud == "Crítico"
+
+    # Resuelta la alerta, el siguiente hallazgo vuelve a alertar
+    alert.estado_alerta = "Resuelta"
+    db_session.commit()
+    assert service.analyze_once(db_session, now + timedelta(seconds=60))["alerts"] == 1
@@ -0,0 +1,69 @@
+# tests/test_event_correlation_service.py
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from app.services.event_correlation_service import EventCorrelationService, EventWindow
+
+START = datetime(2024, 1, 1, 8, 0)
+
+
+def _window(*events, capacity=100, horizon_seconds=3600.0):
+    window = EventWindow()
+    for timestamp, event_id in events:
+        window.add(timestamp, event_id, capacity, horizon_seconds)
+    return window
+
+
+def _event(conductor_id, seconds, event_id=None):
+    return SimpleNamespace(id=event_id or uuid.uuid4(), id_bus=None, id_conductor=conductor_id,
+                           timestamp_evento=START + timedelta(seconds=seconds))
+
+
+def test_late_event_completes_a_window_that_started_before_it():
+    window = _window((0.0, 1), (40.0, 2), (100.0, 3))
+    assert window.max_count_around(40.0, 60.0) == 2
+
+    assert window.add(20.0, 4, 100, 3600.0)
+    assert list(window.timestamps) == [0.0, 20.0, 40.0, 100.0]
+    assert window.max_count_around(20.0, 60.0) == 3 # [0, 60] contiene 0, 20 y 40
+
+
+def test_retried_event_is_not_counted_twice():
+    window = _window((10.0, 1), (10.0, 2))
+
+    assert not window.add(10.0, 1, 100, 3600.0)
+    assert not window.add(10.0, 2, 100, 3600.0)
+    assert window.max_count_around(10.0, 60.0) == 2
+
+
+def test_full_window_drops_the_oldest_and_rejects_older_events():
+    window = _window((1.0, 1), (2.0, 2), (3.0, 3), (4.0, 4), capacity=3)
+    assert list(window.timestamps) == [2.0, 3.0, 4.0]
+
+    assert not window.add(1.5, 5, 3, 3600.0) # Más antiguo que todo lo que cabe
+    assert window.add(2.5, 6, 3, 3600.0)
+    assert list(window.timestamps) == [2.5, 3.0, 4.0]
+    assert list(window.event_ids) == [6, 3, 4]
+
+
+def test_events_beyond_the_horizon_are_dropped():
+    window = _window((0.0, 1), (5.0, 2), (20.0, 3), horizon_seconds=10.0)
+    assert list(window.timestamps) == [20.0]
+
+    assert not window.add(8.0, 4, 100, 10.0) # Llega más tarde de lo que se conserva
+    assert window.add(12.0, 5, 100, 10.0)
+    assert list(window.timestamps) == [12.0, 20.0]
+
+
+def test_observe_fires_on_a_late_event_and_ignores_retries():
+    service = EventCorrelationService(max_keys=10, max_events_per_key=100, max_lateness_seconds=600)
+    rule = SimpleNamespace(identity="regla", agrupar_por=None, ventana_minutos=1, conteo_minimo=3)
+    conductor_id = uuid.uuid4()
+    late = _event(conductor_id, 20)
+
+    assert service.observe(rule, _event(conductor_id, 0)) is None
+    assert service.observe(rule, _event(conductor_id, 40)) is None
+    assert service.observe(rule, late) == 3
+    assert service.observe(rule, late) is None # El reintento del mismo evento no vuelve a disparar
+    assert service.stats()["events"] == 3
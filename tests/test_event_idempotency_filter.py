@@ -0,0 +1,72 @@
+# tests/test_event_idempotency_filter.py
+import pytest
+
+from app.models_db.cloud_database_models import Evento
+from app.services.event_idempotency_filter import RecentEventFilter, recent_event_filter
+from app.services.event_processing_service import event_processing_service
+
+
+@pytest.fixture(autouse=True)
+def clear_filter():
+    recent_event_filter.clear()
+    yield
+    recent_event_filter.clear()
+
+
+def _statuses(result):
+    return [outcome["status"] for outcome in result["outcomes"]]
+
+
+def test_identical_resend_is_skipped_without_touching_the_database(db_session, make_event, sql_statements):
+    event = make_event()
+    event_processing_service.bulk_ingest_events(db_session, [event])
+    del sql_statements[:]
+
+    # Mismo contenido con las claves en otro orden
+    result = event_processing_service.bulk_ingest_events(db_session, [dict(reversed(list(event.items())))])
+
+    assert _statuses(result) == ["duplicate"]
+    assert not [statement for statement in sql_statements if "eventos" in statement]
+    assert recent_event_filter.stats()["hits"] == 1
+
+
+def test_changed_content_is_processed_as_an_update(db_session, make_event):
+    event = make_event(severidad="Baja")
+    event_processing_service.bulk_ingest_events(db_session, [event])
+
+    result = event_processing_service.bulk_ingest_events(db_session, [dict(event, severidad="Alta")])
+
+    assert _statuses(result) == ["updated"]
+    db_session.expire_all()
+    assert db_session.query(Evento).one().severidad == "Alta"
+    # Ahora lo recordado es el contenido nuevo
+    assert _statuses(event_processing_service.bulk_ingest_events(db_session, [dict(event, severidad="Alta")])) == ["duplicate"]
+
+
+def test_events_are_remembered_only_after_commit(db_session, make_event, monkeypatch):
+    event = make_event()
+
+    def _failing_write(db, pending_alerts, references):
+        raise RuntimeError("BD no disponible")
+
+    monkeypatch.setattr(event_processing_service, "_write_pending_alerts", _failing_write)
+    with pytest.raises(RuntimeError):
+        event_processing_service.bulk_ingest_events(db_session, [event])
+    assert recent_event_filter.stats()["size"] == 0
+
+    monkeypatch.undo()
+    # El reintento no se descarta: vuelve a escribirse (con pysqlite el SAVEPOINT ya dejó la fila: 'updated')
+    assert _statuses(event_processing_service.bulk_ingest_events(db_session, [event])) in (["created"], ["updated"])
+    assert db_session.query(Evento).count() == 1
+
+
+def test_filter_evicts_the_least_recently_used_entry():
+    event_filter = RecentEventFilter(capacity=2)
+    event_filter.remember([("A", "h1"), ("B", "h2")])
+    assert event_filter.is_duplicate("a", "h1") # Sin distinguir mayúsculas; A pasa a ser la más reciente
+
+    event_filter.remember([("C", "h3")])
+
+    assert not event_filter.is_duplicate("B", "h2")
+    assert event_filter.is_duplicate("A", "h1") and event_filter.is_duplicate("C", "h3")
+    assert not RecentEventFilter(capacity=0).enabled
@@ -0,0 +1,122 @@
+# tests/test_event_ingest_spool.py
+import fcntl
+import json
+import os
+import time
+import uuid
+
+import pytest
+
+from app.models_db.cloud_database_models import Evento
+from app.services.event_ingest_spool import EventIngestSpool, DEAD_LETTER_FILE
+from app.services.event_processing_service import event_processing_service
+
+
+@pytest.fixture
+def spool_factory(app, tmp_path):
+    spools = []
+
+    def _spool(max_attempts=1):
+        spool = EventIngestSpool(str(tmp_path / "spool"), segment_max_bytes=1024 * 1024, num_workers=1,
+                                 fsync_interval_ms=0, max_attempts=max_attempts, ack_retention_seconds=3600)
+        spool.start(app)
+        spools.append(spool)
+        return spool
+
+    yield _spool
+    for spool in spools:
+        spool.stop()
+
+
+def _wait_for_status(spool, ticket_id, status, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        current = spool.get_status(ticket_id)
+        if current and current["status"] == status:
+            return current
+        time.sleep(0.02)
+    raise AssertionError(f"El ticket {ticket_id} no llegó a '{status}': {spool.get_status(ticket_id)}")
+
+
+def test_failed_batch_is_kept_in_the_dead_letter_and_can_be_replayed(db_session, make_event, spool_factory, monkeypatch):
+    def _failing_ingest(db, events):
+        raise RuntimeError("BD no disponible")
+
+    events = [make_event(), make_event()]
+    with monkeypatch.context() as patch:
+        patch.setattr(event_processing_service, "bulk_ingest_events", _failing_ingest)
+        spool = spool_factory(max_attempts=1)
+        ticket_id = spool.append(events)
+        status = _wait_for_status(spool, ticket_id, "failed")
+
+    assert status["dead_letter"] is True
+    with open(os.path.join(spool._slot_dir, DEAD_LETTER_FILE), encoding="utf-8") as dead_letter_file:
+        records = [json.loads(line) for line in dead_letter_file]
+    assert [record["ticket_id"] for record in records] == [ticket_id]
+    assert records[0]["events"] == events
+
+    assert spool.replay_dead_letters(db_session) == {"replayed": 1, "failed": 0}
+    assert db_session.query(Evento).count() == 2
+    assert not any(name.startswith("dead-letter") for name in os.listdir(spool._slot_dir))
+
+
+def test_ticket_status_survives_restart_after_its_segment_is_deleted(db_session, make_event, spool_factory):
+    spool = spool_factory()
+    ticket_id = spool.append([make_event()])
+    _wait_for_status(spool, ticket_id, "done")
+    spool.stop()
+
+    restarted = spool_factory()
+
+    assert not any(name.endswith(".log") and name != f"segment-{restarted._active_seq:012d}.log"
+                   for name in os.listdir(restarted._slot_dir))
+    assert restarted.get_status(ticket_id)["status"] == "done"
+
+
+def test_unknown_ticket_has_no_status(db_session, spool_factory):
+    spool = spool_factory()
+
+    assert spool.get_status(f"{spool._slot}-1-{uuid.uuid4().hex}") is None
+    assert spool.get_status("no-es-un-ticket") is None
+
+
+def _write_orphan_segment(spool_path, slot, events):
+    """Deja en un slot el segmento de un proceso que murió antes de procesar su lote."""
+    slot_dir = os.path.join(spool_path, f"slot-{slot}")
+    os.makedirs(slot_dir, exist_ok=True)
+    open(os.path.join(spool_path, f"slot-{slot}.lock"), "a").close()
+    ticket_id = f"{slot}-1-{uuid.uuid4().hex}"
+    with open(os.path.join(slot_dir, "segment-000000000001.log"), "w", encoding="utf-8") as log_file:
+        log_file.write(json.dumps({"ticket_id": ticket_id, "received_at": None, "events": events}) + "\n")
+    return ticket_id, slot_dir
+
+
+def test_pending_batches_of_an_orphan_slot_are_recovered(db_session, make_event, spool_factory, tmp_path):
+    spool_path = str(tmp_path / "spool")
+    ticket_id, slot_dir = _write_orphan_segment(spool_path, 3, [make_event(), make_event()])
+
+    spool = spool_factory()
+    status = _wait_for_status(spool, ticket_id, "done")
+
+    assert spool._slot == 0
+    assert status["processed_count"] == 2
+    assert db_session.query(Evento).count() == 2
+    assert not os.path.exists(os.path.join(slot_dir, "segment-000000000001.log"))
+    # Vaciado el slot adoptado, su flock queda libre para otro proceso
+    with open(os.path.join(spool_path, "slot-3.lock"), "a+") as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+def test_a_slot_held_by_a_live_process_is_not_adopted(db_session, make_event, spool_factory, tmp_path):
+    spool_path = str(tmp_path / "spool")
+    ticket_id, slot_dir = _write_orphan_segment(spool_path, 1, [make_event()])
+
+    with open(os.path.join(spool_path, "slot-1.lock"), "a+") as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB) # Otro proceso vivo tiene el slot
+        spool = spool_factory()
+        time.sleep(0.2)
+
+        assert spool._slot == 0
+        assert spool.get_status(ticket_id)["status"] == "accepted"
+        assert os.path.exists(os.path.join(slot_dir, "segment-000000000001.log"))
+        assert db_session.query(Evento).count() == 0
@@ -0,0 +1,124 @@
+# tests/test_event_processing_service.py
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app.models_db.cloud_database_models import Evento
+from app.services.event_processing_service import event_processing_service
+
+
+def _statuses(result):
+    return [outcome["status"] for outcome in result["outcomes"]]
+
+
+def test_bulk_ingest_reports_created_events(db_session, make_event):
+    events = [make_event(), make_event(sent_to_cloud_at=datetime.utcnow().isoformat())]
+
+    result = event_processing_service.bulk_ingest_events(db_session, events)
+
+    assert _statuses(result) == ["created", "created"]
+    assert len(result["processed_events"]) == 2
+    assert db_session.query(Evento).count() == 2
+
+
+def test_bulk_ingest_reports_updated_events(db_session, make_event):
+    event = make_event(severidad="Baja")
+    event_processing_service.bulk_ingest_events(db_session, [event])
+
+    result = event_processing_service.bulk_ingest_events(db_session, [dict(event, severidad="Alta")])
+
+    assert _statuses(result) == ["updated"]
+    db_session.expire_all()
+    stored = db_session.query(Evento).filter(Evento.id == uuid.UUID(event["id"])).all()
+    assert [evento.severidad for evento in stored] == ["Alta"]
+
+
+def test_bulk_ingest_rejects_invalid_events_without_losing_the_batch(db_session, make_event):
+    events = [
+        make_event(id="no-es-un-uuid"),
+        make_event(id_bus=str(uuid.uuid4())),
+        make_event(tipo_evento=None),
+        make_event(),
+        "no es un objeto"
+    ]
+
+    result = event_processing_service.bulk_ingest_events(db_session, events)
+
+    assert _statuses(result) == ["rejected", "rejected", "rejected", "created", "rejected"]
+    assert all(outcome["reason"] for outcome in result["outcomes"] if outcome["status"] == "rejected")
+    assert db_session.query(Evento).count() == 1
+
+
+def test_bulk_ingest_keeps_last_occurrence_of_a_repeated_id(db_session, make_event):
+    first = make_event(severidad="Baja")
+    last = dict(first, severidad="Alta")
+
+    result = event_processing_service.bulk_ingest_events(db_session, [first, last])
+
+    assert _statuses(result) == ["duplicate", "created"]
+    assert db_session.query(Evento).one().severidad == "Alta"
+
+
+def _ingest_counting_lookups(db_session, sql_statements, events):
+    del sql_statements[:]
+    result = event_processing_service.bulk_ingest_events(db_session, events)
+    assert set(_statuses(result)) == {"created"}
+    lookups = {
+        table: sum(1 for statement in sql_statements if f"FROM {table}" in statement)
+        for table in ("buses", "conductores", "sesiones_conduccion")
+    }
+    return lookups, len(sql_statements)
+
+
+def test_bulk_ingest_issues_a_fixed_number_of_queries(db_session, make_event, sql_statements):
+    # Un tipo de evento sin reglas de alerta: cada alerta candidata añade su SAVEPOINT de enfriamiento
+    small_lookups, small_total = _ingest_counting_lookups(
+        db_session, sql_statements, [make_event(tipo_evento="Bostezo") for _ in range(5)])
+    large_lookups, large_total = _ingest_counting_lookups(
+        db_session, sql_statements, [make_event(tipo_evento="Bostezo") for _ in range(50)])
+
+    # Una consulta IN por tabla de referencias, sin importar el tamaño del lote
+    assert small_lookups == large_lookups == {"buses": 1, "conductores": 1, "sesiones_conduccion": 1}
+    assert small_total == large_total
+
+
+def test_a_row_rejected_by_the_database_does_not_abort_its_chunk(db_session, make_event):
+    # La BD (no la validación en memoria) rechaza un evento concreto del bloque
+    db_session.execute(text(
+        "CREATE TRIGGER rechazar_evento BEFORE INSERT ON eventos WHEN NEW.tipo_evento = 'Rechazado' "
+        "BEGIN SELECT RAISE(ABORT, 'evento rechazado'); END"))
+    db_session.commit()
+    events = [make_event(tipo_evento="Bostezo"), make_event(tipo_evento="Rechazado"), make_event(tipo_evento="Bostezo")]
+
+    result = event_processing_service.bulk_ingest_events(db_session, events)
+
+    assert _statuses(result) == ["created", "rejected", "created"]
+    assert "evento rechazado" in result["outcomes"][1]["reason"]
+    db_session.expire_all()
+    stored_ids = {str(evento.id) for evento in db_session.query(Evento).all()}
+    assert stored_ids == {events[0]["id"], events[2]["id"]}
+
+
+def test_resend_with_a_shifted_timestamp_updates_the_stored_event(db_session, make_event):
+    event = make_event(severidad="Baja")
+    event_processing_service.bulk_ingest_events(db_session, [event])
+    shifted = dict(event, severidad="Alta",
+                   timestamp_evento=(datetime.fromisoformat(event["timestamp_evento"]) + timedelta(seconds=30)).isoformat())
+
+    result = event_processing_service.bulk_ingest_events(db_session, [shifted])
+
+    assert _statuses(result) == ["updated"]
+    db_session.expire_all()
+    stored = db_session.query(Evento).filter(Evento.id == uuid.UUID(event["id"])).all()
+    assert len(stored) == 1
+    assert stored[0].severidad == "Alta"
+    assert stored[0].timestamp_evento == datetime.fromisoformat(event["timestamp_evento"])
+
+
+def test_bulk_ingest_rejects_an_unparseable_timestamp(db_session, make_event):
+    result = event_processing_service.bulk_ingest_events(db_session, [make_event(timestamp_evento="ayer")])
+
+    assert _statuses(result) == ["rejected"]
+    assert "timestamp_evento" in result["outcomes"][0]["reason"]
+    assert db_session.query(Evento).count() == 0
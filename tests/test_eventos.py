@@ -0,0 +1,77 @@
+# tests/test_eventos.py
+import gzip
+import json
+
+import pytest
+
+from app.config.settings import settings
+from app.models_db.cloud_database_models import Evento
+from app.services.event_processing_service import event_processing_service
+
+URL = "/api/v1/eventos/"
+NDJSON = "application/x-ndjson"
+
+
+@pytest.fixture
+def ingested_chunks(monkeypatch):
+    """Tamaño de cada bloque que llega a bulk_ingest_events (bloques de 2 eventos)."""
+    monkeypatch.setattr(settings, "EVENT_INGEST_CHUNK_SIZE", 2)
+    bulk_ingest_events = event_processing_service.bulk_ingest_events
+    sizes = []
+
+    def _bulk_ingest_events(db, events_data):
+        sizes.append(len(events_data))
+        return bulk_ingest_events(db, events_data)
+
+    monkeypatch.setattr(event_processing_service, "bulk_ingest_events", _bulk_ingest_events)
+    return sizes
+
+
+def _ndjson(lines):
+    """Cuerpo NDJSON: los diccionarios se serializan, las cadenas van tal cual."""
+    return "\n".join(line if isinstance(line, str) else json.dumps(line) for line in lines).encode()
+
+
+def test_ndjson_body_is_ingested_in_chunks(client, db_session, make_event, ingested_chunks):
+    response = client.post(URL, data=_ndjson([make_event() for _ in range(5)]), content_type=NDJSON)
+
+    assert response.status_code == 200
+    assert response.get_json()["created_count"] == 5
+    assert ingested_chunks == [2, 2, 1]
+    assert db_session.query(Evento).count() == 5
+
+
+def test_gzip_bodies_are_decoded(client, db_session, make_event):
+    events = [make_event() for _ in range(3)]
+    ndjson = client.post(URL, data=gzip.compress(_ndjson(events[:2])), content_type=NDJSON,
+                         headers={"Content-Encoding": "gzip"})
+    batch = client.post(URL, data=gzip.compress(json.dumps({"events": events[2:]}).encode()),
+                        content_type="application/json", headers={"Content-Encoding": "gzip"})
+
+    assert ndjson.status_code == 200 and ndjson.get_json()["created_count"] == 2
+    assert batch.status_code == 200 and batch.get_json()["created_count"] == 1
+    assert db_session.query(Evento).count() == 3
+
+
+def test_invalid_ndjson_lines_are_rejected_without_losing_the_rest(client, db_session, make_event):
+    body = _ndjson([make_event(), "no es json", "", '{"id": "sin cerrar"', make_event()])
+
+    response = client.post(URL, data=body, content_type=NDJSON)
+
+    data = response.get_json()
+    assert response.status_code == 200
+    assert (data["received_count"], data["created_count"], data["rejected_count"]) == (4, 2, 2)
+    assert [rejection["reason"] for rejection in data["rejected"]] == ["Línea 2: JSON inválido.", "Línea 4: JSON inválido."]
+    assert db_session.query(Evento).count() == 2
+
+
+def test_truncated_gzip_body_returns_400_after_committing_complete_chunks(client, db_session, make_event, ingested_chunks):
+    compressed = gzip.compress(_ndjson([make_event(snapshot_url="https://example.com/" + "x" * 200) for _ in range(20)]))
+
+    response = client.post(URL, data=compressed[:len(compressed) // 2], content_type=NDJSON,
+                           headers={"Content-Encoding": "gzip"})
+
+    data = response.get_json()
+    assert response.status_code == 400
+    assert data["processed_count"] == db_session.query(Evento).count() == sum(ingested_chunks)
+    assert 0 < data["processed_count"] < 20
@@ -0,0 +1,58 @@
+# tests/test_jetson_last_seen_cache.py
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from app.crud.crud_jetson_nano import jetson_nano_crud
+from app.services.jetson_last_seen_cache import JetsonLastSeenCache
+
+
+class _Session:
+    """Sesión mínima: el volcado sólo hace commit/rollback (la escritura se sustituye en la prueba)."""
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture
+def cache():
+    return JetsonLastSeenCache(flush_interval_seconds=60, connection_timeout_seconds=60, device_state_ttl_seconds=60)
+
+
+def test_overlapping_flushes_keep_every_contact(cache, monkeypatch):
+    release = threading.Event()
+    writes = []
+
+    def _record_last_seen(db, entries):
+        writes.append(dict(entries))
+        if len(writes) == 1:
+            release.wait(5)
+            raise RuntimeError("BD no disponible") # El primer volcado falla
+
+    monkeypatch.setattr(jetson_nano_crud, "record_last_seen", _record_last_seen)
+    seen_at = datetime.utcnow()
+    cache._record(None, "HW-A", seen_at, None)
+    first = threading.Thread(target=lambda: pytest.raises(RuntimeError, cache.flush, _Session()))
+    first.start()
+    while not writes:
+        time.sleep(0.01)
+
+    # Un segundo volcado (p. ej. el del barrido) mientras el primero escribe
+    cache._record(None, "HW-B", seen_at, None)
+    second = threading.Thread(target=cache.flush, args=(_Session(),))
+    second.start()
+    time.sleep(0.1)
+    assert cache.last_seen("HW-A", None) == seen_at
+    assert cache.last_seen("HW-B", None) == seen_at
+
+    release.set()
+    first.join(5)
+    second.join(5)
+
+    # El lote que falló vuelve a quedar pendiente y lo escribe el volcado siguiente
+    assert writes == [{"HW-A": (seen_at, None)}, {"HW-A": (seen_at, None), "HW-B": (seen_at, None)}]
+    assert cache.flush(_Session()) == 0
@@ -0,0 +1,124 @@
+# tests/test_jetson_nanos.py
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models_db.cloud_database_models import Bus, Empresa, JetsonNano
+from app.services.dashboard_counter_service import dashboard_counter_service
+from app.services.jetson_nano_service import list_jetson_nanos
+
+URL = "/api/v1/jetson-nanos/"
+
+
+def _add_jetson(db_session, id_bus, id_hardware_jetson, **overrides):
+    jetson = JetsonNano(id_hardware_jetson=id_hardware_jetson, id_bus=id_bus, **{"activo": True, **overrides})
+    db_session.add(jetson)
+    db_session.commit()
+    return jetson
+
+
+@pytest.fixture
+def stale_jetson(db_session, fleet):
+    # Quedó 'Conectado' en la BD, pero su último contacto es anterior al timeout
+    return _add_jetson(db_session, fleet.bus.id, "HW-STALE", estado_conexion="Conectado",
+                       ultima_conexion_cloud_at=datetime.utcnow() - timedelta(hours=1))
+
+
+def test_without_sweeper_connection_status_comes_from_last_contact(client, db_session, fleet, stale_jetson):
+    _add_jetson(db_session, None, "HW-RECENT", estado_conexion="Desconectado", ultima_conexion_cloud_at=datetime.utcnow())
+
+    listing = {jetson["id_hardware_jetson"]: jetson["estado_conexion"] for jetson in client.get(URL).get_json()}
+    assert listing == {"HW-RECENT": "Conectado", "HW-STALE": "Desconectado"}
+    connected = client.get(URL, query_string={"estado_conexion": "Conectado"}).get_json()
+    assert [jetson["id_hardware_jetson"] for jetson in connected] == ["HW-RECENT"]
+    assert client.get(f"{URL}HW-STALE").get_json()["estado_conexion"] == "Desconectado"
+
+    dashboard_counter_service.reconcile(db_session, fleet.empresa.id)
+    assert dashboard_counter_service.get_summary(db_session, fleet.empresa.id)["jetsons_conectadas"] == 0
+
+
+def test_with_sweeper_the_persisted_connection_status_is_used(client, db_session, stale_jetson, monkeypatch):
+    monkeypatch.setattr(dashboard_counter_service, "connectivity_sweep_enabled", True)
+
+    assert client.get(f"{URL}HW-STALE").get_json()["estado_conexion"] == "Conectado"
+    assert [jetson["estado_conexion"] for jetson in client.get(URL).get_json()] == ["Conectado"]
+
+
+@pytest.fixture
+def listing(db_session, fleet):
+    """Jetsons de dos empresas con distintos estados de conexión y salud."""
+    other = Empresa(nombre_empresa="Otra empresa", nit="900000001")
+    db_session.add(other)
+    db_session.flush()
+    other_bus = Bus(id_empresa=other.id, placa="OTR001", numero_interno="2")
+    db_session.add(other_bus)
+    db_session.flush()
+    now, stale = datetime.utcnow(), datetime.utcnow() - timedelta(hours=1)
+    for hardware_id, id_bus, last_seen, estado_salud, activo in [
+        ("HW-A", fleet.bus.id, now, "OK", True),
+        ("HW-B", fleet.bus.id, stale, "OK", True),
+        ("HW-C", fleet.bus.id, now, "Advertencia", False),
+        ("HW-D", other_bus.id, now, "Advertencia", True),
+        ("HW-E", other_bus.id, None, "OK", True),
+    ]:
+        _add_jetson(db_session, id_bus, hardware_id, ultima_conexion_cloud_at=last_seen, estado_salud=estado_salud, activo=activo)
+    return other
+
+
+def _hardware_ids(response):
+    assert response.status_code == 200
+    return [jetson["id_hardware_jetson"] for jetson in response.get_json()]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ({"estado_conexion": "Conectado"}, ["HW-A", "HW-D"]),
+    ({"estado_conexion": "Desconectado"}, ["HW-B", "HW-E"]),
+    ({"estado_conexion": "Mantenimiento"}, ["HW-C"]),
+    ({"estado_salud": "Advertencia"}, ["HW-C", "HW-D"]),
+    ({"estado_conexion": "Conectado", "estado_salud": "OK"}, ["HW-A"]),
+])
+def test_listing_filters(client, listing, query, expected):
+    assert _hardware_ids(client.get(URL, query_string=query)) == expected
+
+
+def test_listing_filters_by_company(client, fleet, listing):
+    assert _hardware_ids(client.get(URL, query_string={"id_empresa": str(fleet.empresa.id)})) == ["HW-A", "HW-B", "HW-C"]
+    assert _hardware_ids(client.get(URL, query_string={"id_empresa": str(listing.id), "estado_conexion": "Desconectado"})) == ["HW-E"]
+
+
+@pytest.mark.parametrize("query", [{"estado_conexion": "Apagado"}, {"id_empresa": "no-es-un-uuid"}, {"cursor": "%%%"}])
+def test_listing_rejects_invalid_parameters(client, listing, query):
+    assert client.get(URL, query_string=query).status_code == 400
+
+
+def test_listing_pages_with_the_next_cursor_header(client, listing):
+    received, cursor = [], None
+    while True:
+        response = client.get(URL, query_string={"limit": 2, **({"cursor": cursor} if cursor else {})})
+        received.extend(_hardware_ids(response))
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert received == ["HW-A", "HW-B", "HW-C", "HW-D", "HW-E"]
+
+
+def test_full_last_page_is_followed_by_an_empty_page(client, listing):
+    response = client.get(URL, query_string={"limit": 5})
+    assert len(_hardware_ids(response)) == 5
+
+    empty = client.get(URL, query_string={"limit": 5, "cursor": response.headers["X-Next-Cursor"]})
+    assert _hardware_ids(empty) == [] and "X-Next-Cursor" not in empty.headers
+
+
+def test_list_jetson_nanos_combines_filters_and_cursor(db_session, fleet, listing):
+    page, cursor = list_jetson_nanos(db_session, estado_salud="OK", limit=2)
+    assert [(jetson.id_hardware_jetson, estado) for jetson, estado, _ in page] == [("HW-A", "Conectado"), ("HW-B", "Desconectado")]
+
+    page, cursor = list_jetson_nanos(db_session, estado_salud="OK", cursor=cursor, limit=2)
+    assert [jetson.id_hardware_jetson for jetson, _, _ in page] == ["HW-E"]
+    assert cursor is None
+    # Con cursor se ignora skip
+    first, cursor = list_jetson_nanos(db_session, id_empresa=listing.id, limit=1)
+    page, _ = list_jetson_nanos(db_session, id_empresa=listing.id, cursor=cursor, skip=5, limit=1)
+    assert [jetson.id_hardware_jetson for jetson, _, _ in first + page] == ["HW-D", "HW-E"]
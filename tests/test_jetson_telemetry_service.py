@@ -0,0 +1,119 @@
+# tests/test_jetson_telemetry_service.py
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.crud.crud_jetson_telemetry import TELEMETRY_METRIC_FIELDS
+from app.models_db.cloud_database_models import JetsonNano, JetsonTelemetry, JetsonTelemetryRollup
+from app.services.jetson_telemetry_service import jetson_telemetry_service
+from app.services.telemetry_archive_service import (
+    telemetry_archive_service, to_microseconds, ID_COLUMN, TIMESTAMP_COLUMN, CREATED_AT_COLUMN
+)
+
+
+@pytest.fixture
+def jetson(db_session, fleet):
+    device = JetsonNano(id_hardware_jetson=f"HW-{uuid.uuid4().hex[:8]}", id_bus=fleet.bus.id,
+                        ultima_conexion_cloud_at=datetime.utcnow(), estado_conexion='Conectado')
+    db_session.add(device)
+    db_session.commit()
+    return device
+
+
+def _sample(jetson, **overrides):
+    sample = {
+        "id": str(uuid.uuid4()),
+        "id_hardware_jetson": jetson.id_hardware_jetson,
+        "timestamp_telemetry": datetime.utcnow().replace(second=10, microsecond=0).isoformat(),
+        "cpu_usage_percent": 40.0
+    }
+    sample.update(overrides)
+    return sample
+
+
+def _cpu_sample_count(db_session, jetson):
+    rollup = db_session.query(JetsonTelemetryRollup).filter_by(
+        id_hardware_jetson=jetson.id_hardware_jetson, resolucion='1m', metrica='cpu_usage_percent').one()
+    return rollup.conteo
+
+
+def test_resend_with_a_shifted_timestamp_is_a_duplicate(db_session, jetson):
+    sample = _sample(jetson)
+    jetson_telemetry_service.process_telemetry_batch(db_session, [sample])
+    shifted = dict(sample, timestamp_telemetry=(datetime.fromisoformat(sample["timestamp_telemetry"])
+                                                + timedelta(seconds=5)).isoformat())
+
+    result = jetson_telemetry_service.process_telemetry_batch(db_session, [shifted])
+
+    assert [r["status"] for r in result["results"]] == ["duplicate"]
+    assert result["inserted_count"] == 0
+    db_session.expire_all()
+    assert db_session.query(JetsonTelemetry).count() == 1
+    assert _cpu_sample_count(db_session, jetson) == 1
+
+
+def test_repeated_id_within_a_batch_keeps_the_last_sample(db_session, jetson):
+    first = _sample(jetson, cpu_usage_percent=10.0)
+    last = dict(first, cpu_usage_percent=90.0)
+
+    result = jetson_telemetry_service.process_telemetry_batch(db_session, [first, last, _sample(jetson)])
+
+    assert [r["status"] for r in result["results"]] == ["duplicate", "created", "created"]
+    assert result["inserted_count"] == 2
+    db_session.expire_all()
+    stored = db_session.query(JetsonTelemetry).filter(JetsonTelemetry.id == uuid.UUID(first["id"])).one()
+    assert float(stored.cpu_usage_percent) == 90.0
+    assert _cpu_sample_count(db_session, jetson) == 2
+
+
+def _archive(jetson, samples):
+    """Escribe (id, timestamp) en el archivo columnar del día de la primera muestra."""
+    telemetry_archive_service.write_day(jetson.id_hardware_jetson, samples[0][1].date(), {
+        ID_COLUMN: np.frombuffer(b''.join(sample_id.bytes for sample_id, _ in samples), dtype=np.uint8).reshape(-1, 16),
+        TIMESTAMP_COLUMN: np.array([to_microseconds(timestamp) for _, timestamp in samples], dtype=np.int64),
+        CREATED_AT_COLUMN: np.array([to_microseconds(timestamp) for _, timestamp in samples], dtype=np.int64),
+        **{field: np.full(len(samples), 1.0, dtype=np.float32) for field in TELEMETRY_METRIC_FIELDS},
+    })
+
+
+def test_telemetry_pages_cover_timestamp_ties_across_archive_and_table(db_session, jetson, tmp_path, monkeypatch):
+    monkeypatch.setattr(telemetry_archive_service, "base_path", str(tmp_path))
+    day = datetime(2024, 1, 1, 8, 0)
+    # Tres instantes con varias muestras cada uno, repartidas entre el archivo y la tabla
+    archived = [(uuid.uuid4(), day + timedelta(seconds=second)) for second in (0, 0, 0, 1, 1, 1, 1, 2)]
+    live = [(uuid.uuid4(), day + timedelta(seconds=second)) for second in (1, 2, 2)]
+    in_both = archived[3] # Archivada pero aún sin borrar de la tabla
+    _archive(jetson, archived)
+    db_session.add_all([JetsonTelemetry(id=sample_id, id_hardware_jetson=jetson.id_hardware_jetson,
+                                        timestamp_telemetry=timestamp, cpu_usage_percent=1.0)
+                        for sample_id, timestamp in live + [in_both]])
+    db_session.commit()
+
+    received, cursor = [], None
+    while True:
+        page, cursor = jetson_telemetry_service.get_telemetry_page(db_session, jetson.id_hardware_jetson, cursor=cursor, limit=3)
+        received.extend((sample.timestamp_telemetry, sample.id) for sample in page)
+        if cursor is None:
+            break
+
+    expected = sorted({(timestamp, sample_id) for sample_id, timestamp in archived + live}, reverse=True)
+    assert received == expected
+
+
+def test_only_client_ids_are_looked_up(db_session, jetson, sql_statements):
+    client_sample = _sample(jetson)
+    generated = _sample(jetson)
+    del generated["id"]
+    del sql_statements[:]
+
+    result = jetson_telemetry_service.process_telemetry_batch(db_session, [client_sample, generated, dict(generated)])
+
+    lookups = [statement for statement in sql_statements
+               if statement.startswith("SELECT jetson_telemetry.id") and " IN " in statement]
+    assert len(lookups) == 1 and lookups[0].count("?") == 1 # Sólo el id de la Jetson
+    assert [r["status"] for r in result["results"]] == ["created", "created", "created"]
+    assert result["inserted_count"] == 3
+    assert db_session.query(JetsonTelemetry).count() == 3
+    assert _cpu_sample_count(db_session, jetson) == 3
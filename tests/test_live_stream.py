@@ -0,0 +1,71 @@
+# tests/test_live_stream.py
+from datetime import datetime
+
+import pytest
+
+from app.config.settings import settings
+from app.crud.crud_stream_message import stream_message_crud
+from app.services.live_stream_service import live_stream_service
+
+URL = "/api/v1/alertas/stream"
+
+
+@pytest.fixture
+def stream_settings(monkeypatch):
+    monkeypatch.setattr(settings, "LIVE_STREAM_BACKFILL_LIMIT", 5)
+    monkeypatch.setattr(settings, "LIVE_STREAM_KEEPALIVE_SECONDS", 0.05)
+
+
+def _publish(db_session, count):
+    now = datetime.utcnow()
+    stream_message_crud.bulk_insert(db_session, [
+        {"tipo": "conexion", "id_empresa": None, "id_bus": None, "payload": {"n": n}, "created_at": now}
+        for n in range(count)
+    ])
+    db_session.commit()
+
+
+def _read_until_idle(response):
+    """Ids recibidos hasta que el stream se cierra o queda inactivo (primer keepalive)."""
+    ids = []
+    try:
+        for chunk in response.response:
+            chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+            if chunk.startswith(": keepalive"):
+                break
+            if chunk.startswith("id: "):
+                ids.append(int(chunk.split("\n", 1)[0][4:]))
+    finally:
+        response.close()
+    return ids
+
+
+def test_resume_across_more_than_the_backfill_limit_loses_no_messages(client, db_session, stream_settings):
+    live_stream_service.poll(db_session) # Sin suscriptores: descarta el cursor de pruebas anteriores
+    _publish(db_session, 12)
+
+    response = client.get(URL, headers={"Last-Event-ID": "0"}, buffered=False)
+    # Llega un mensaje en vivo mientras el cliente aún recibe el relleno
+    _publish(db_session, 1)
+    live_stream_service.poll(db_session)
+    first_page = _read_until_idle(response)
+
+    assert first_page == [1, 2, 3, 4, 5]
+    received = list(first_page)
+    while True:
+        page = _read_until_idle(client.get(URL, headers={"Last-Event-ID": str(received[-1])}, buffered=False))
+        if not page:
+            break
+        received.extend(page)
+    assert received == list(range(1, 14))
+
+
+def test_resume_within_the_backfill_limit_keeps_the_stream_open(client, db_session, stream_settings):
+    live_stream_service.poll(db_session)
+    _publish(db_session, 3)
+
+    response = client.get(URL, headers={"Last-Event-ID": "1"}, buffered=False)
+    _publish(db_session, 1)
+    live_stream_service.poll(db_session)
+
+    assert _read_until_idle(response) == [2, 3, 4]
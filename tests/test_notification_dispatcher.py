@@ -0,0 +1,115 @@
+# tests/test_notification_dispatcher.py
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.config.settings import settings
+from app.crud.crud_notificacion_outbox import notificacion_outbox_crud
+from app.models_db.cloud_database_models import Alerta
+from app.services.alert_notification_service import alert_notification_service, build_channel_senders, MockNotifier
+from app.services.notification_dispatcher import NotificationDispatcher
+
+
+class FailingSmsNotifier(MockNotifier):
+    def send_sms(self, to_phone: str, message: str):
+        raise ConnectionError("proveedor de SMS no disponible")
+
+
+@pytest.fixture
+def targets(monkeypatch):
+    user_id = uuid.uuid4()
+    monkeypatch.setattr(settings, "ALERT_NOTIFICATION_TARGETS", f"email:supervisores@example.com,sms:+573000000000,dashboard:{user_id}")
+
+
+@pytest.fixture
+def alert(db_session, fleet, targets):
+    return alert_notification_service.create_alert(db_session, {
+        "id_bus": fleet.bus.id,
+        "id_conductor": fleet.conductor.id,
+        "timestamp_alerta": datetime.utcnow(),
+        "tipo_alerta": "Fatiga Severa",
+        "descripcion": "Alta probabilidad de fatiga.",
+        "nivel_criticidad": "Crítica"
+    })
+
+
+def _dispatcher(notifier, max_attempts=3):
+    return NotificationDispatcher(
+        senders=build_channel_senders(notifier), channel_limits={}, max_workers=2, batch_size=10,
+        lease_seconds=60, max_attempts=max_attempts, backoff_base_seconds=1, backoff_max_seconds=1,
+        interval_seconds=0)
+
+
+def test_create_alert_queues_one_message_per_target(db_session, fleet, alert):
+    messages = notificacion_outbox_crud.get_by_alerta(db_session, alert.id)
+
+    assert sorted(message.canal for message in messages) == ["dashboard", "email", "sms"]
+    assert all(fleet.bus.placa in message.asunto for message in messages)
+    assert all(fleet.conductor.nombre_completo in message.cuerpo for message in messages)
+
+
+def test_send_alert_notification_uses_the_references_it_is_given(db_session, fleet, alert, sql_statements):
+    bus, conductor = fleet.bus, fleet.conductor
+    placa, nombre = bus.placa, conductor.nombre_completo # Se cargan antes de contar
+    del sql_statements[:]
+
+    alert_notification_service.send_alert_notification(db_session, alert, bus, conductor)
+
+    # Sólo el INSERT del outbox: ni el bus ni el conductor se vuelven a consultar
+    assert len(sql_statements) == 1 and sql_statements[0].startswith("INSERT INTO notificaciones_outbox")
+    db_session.commit()
+    messages = notificacion_outbox_crud.get_by_alerta(db_session, alert.id)
+    assert len(messages) == 6
+    assert all(placa in message.asunto and nombre in message.cuerpo for message in messages)
+
+
+def test_dispatch_sends_queued_messages_and_records_channels(db_session, alert):
+    dispatcher = _dispatcher(MockNotifier())
+    stats = dispatcher.dispatch_once(db_session)
+
+    assert stats == {"claimed": 3, "sent": 3, "retry": 0, "failed": 0}
+    assert {message.estado for message in notificacion_outbox_crud.get_by_alerta(db_session, alert.id)} == {"Enviada"}
+    db_session.expire_all()
+    canales = db_session.get(Alerta, alert.id).notificado_canales
+    assert canales["email"]["supervisores@example.com"]["estado"] == "Enviada"
+    assert dispatcher.dispatch_once(db_session)["claimed"] == 0
+    dispatcher.stop()
+
+
+def test_failed_channel_is_retried_and_then_marked_failed(db_session, alert):
+    dispatcher = _dispatcher(FailingSmsNotifier(), max_attempts=2)
+
+    assert dispatcher.dispatch_once(db_session) == {"claimed": 3, "sent": 2, "retry": 1, "failed": 0}
+    # Antes de que venza el backoff no hay nada que reclamar
+    assert dispatcher.dispatch_once(db_session)["claimed"] == 0
+    assert dispatcher.dispatch_once(db_session, now=datetime.utcnow() + timedelta(seconds=5)) == \
+        {"claimed": 1, "sent": 0, "retry": 0, "failed": 1}
+
+    sms = [message for message in notificacion_outbox_crud.get_by_alerta(db_session, alert.id) if message.canal == "sms"]
+    assert [(message.estado, message.intentos) for message in sms] == [("Fallida", 2)]
+    assert "SMS" in sms[0].ultimo_error
+    dispatcher.stop()
+
+
+def test_recording_channels_does_not_overwrite_another_workers_status(db_session, alert, monkeypatch):
+    other_worker_status = {"estado": "Enviada", "intentos": 1, "ultimo_intento_at": None, "error": None}
+    record_results = notificacion_outbox_crud.record_results
+
+    def _record_results(db, results):
+        # La alerta está en la sesión y, mientras tanto, otro worker registra otro destinatario
+        db.get(Alerta, alert.id).notificado_canales
+        alertas = Alerta.__table__ # UPDATE de Core: no toca la alerta que ya está en la sesión
+        db.execute(alertas.update().where(alertas.c.id == alert.id).values(
+            notificado_canales={"dashboard": {"otro-destinatario": other_worker_status}}))
+        record_results(db, results)
+
+    monkeypatch.setattr(notificacion_outbox_crud, "record_results", _record_results)
+    dispatcher = _dispatcher(MockNotifier())
+    dispatcher.dispatch_once(db_session)
+    dispatcher.stop()
+
+    db_session.expire_all()
+    canales = db_session.get(Alerta, alert.id).notificado_canales
+    assert canales["dashboard"]["otro-destinatario"] == other_worker_status
+    assert canales["sms"]["+573000000000"]["estado"] == "Enviada"
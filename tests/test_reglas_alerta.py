@@ -0,0 +1,68 @@
+# tests/test_reglas_alerta.py
+import pytest
+
+from app.models_db.cloud_database_models import ReglaAlerta
+
+URL = "/api/v1/reglas-alerta/"
+
+
+def _rule(**overrides):
+    rule = {
+        "tipo_evento": "Distraccion",
+        "campo_condicion": "duracion_segundos",
+        "umbral": 5,
+        "tipo_alerta": "Distracción Larga",
+        "descripcion_plantilla": "El conductor se distrajo por {duracion_segundos} segundos.",
+        "nivel_criticidad": "Alta"
+    }
+    rule.update(overrides)
+    return rule
+
+
+def test_create_rule_accepts_a_valid_correlation_rule(client, db_session):
+    response = client.post(URL, json=_rule(
+        campo_condicion=None, umbral=None, ventana_minutos=5, conteo_minimo=3, agrupar_por="bus",
+        descripcion_plantilla="{conteo} distracciones en {ventana_minutos} minutos en el bus {id_bus}."))
+
+    assert response.status_code == 201
+    assert response.get_json()["agrupar_por"] == "bus"
+
+
+@pytest.mark.parametrize("overrides, campo", [
+    ({"campo_condicion": "duracion_segundo"}, "campo_condicion"),
+    ({"campo_condicion": "tipo_evento"}, "campo_condicion"),
+    ({"agrupar_por": "empresa", "ventana_minutos": 5}, "agrupar_por"),
+    ({"umbral": "alto"}, "umbral"),
+    ({"ventana_minutos": "cinco"}, "ventana_minutos"),
+    ({"ventana_minutos": 5, "conteo_minimo": 2.5}, "conteo_minimo"),
+    ({"descripcion_plantilla": "Distracción de {duracion} segundos."}, "descripcion_plantilla"),
+    ({"descripcion_plantilla": "Se acumularon {conteo} distracciones."}, "descripcion_plantilla"),
+    ({"descripcion_plantilla": "Plantilla sin cerrar {duracion_segundos"}, "descripcion_plantilla"),
+])
+def test_create_rule_rejects_invalid_fields(client, db_session, overrides, campo):
+    response = client.post(URL, json=_rule(**overrides))
+
+    assert response.status_code == 400
+    assert campo in response.get_json()["message"]
+    assert db_session.query(ReglaAlerta).count() == 0
+
+
+def test_update_rule_validates_the_resulting_rule(client, db_session):
+    regla_id = client.post(URL, json=_rule()).get_json()["id"]
+
+    # {conteo} sólo existe en reglas con ventana
+    response = client.put(f"{URL}{regla_id}", json={"descripcion_plantilla": "{conteo} distracciones."})
+    assert response.status_code == 400
+    response = client.put(f"{URL}{regla_id}", json={"umbral": "alto"})
+    assert response.status_code == 400
+
+    response = client.put(f"{URL}{regla_id}", json={
+        "ventana_minutos": 10, "conteo_minimo": 2, "descripcion_plantilla": "{conteo} distracciones."})
+    assert response.status_code == 200
+    assert response.get_json()["ventana_minutos"] == 10
+
+
+def test_update_unknown_rule_returns_404(client, db_session):
+    response = client.put(f"{URL}00000000-0000-0000-0000-000000000001", json={"umbral": 3})
+
+    assert response.status_code == 404
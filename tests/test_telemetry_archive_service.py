@@ -0,0 +1,67 @@
+# tests/test_telemetry_archive_service.py
+import os
+import uuid
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.crud.crud_jetson_telemetry import TELEMETRY_METRIC_FIELDS
+from app.services import telemetry_archive_service as archive_module
+from app.services.telemetry_archive_service import (
+    TelemetryArchiveService, to_microseconds, ID_COLUMN, TIMESTAMP_COLUMN, CREATED_AT_COLUMN
+)
+
+DAY = date(2024, 1, 1)
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return TelemetryArchiveService(base_path=str(tmp_path), archive_after_days=1, interval_seconds=0, max_days_per_run=1)
+
+
+def _columns(count, offset=0):
+    timestamps = [datetime(2024, 1, 1) + timedelta(seconds=offset + n) for n in range(count)]
+    return {
+        ID_COLUMN: np.frombuffer(b''.join(uuid.uuid4().bytes for _ in range(count)), dtype=np.uint8).reshape(-1, 16),
+        TIMESTAMP_COLUMN: np.array([to_microseconds(t) for t in timestamps], dtype=np.int64),
+        CREATED_AT_COLUMN: np.array([to_microseconds(t) for t in timestamps], dtype=np.int64),
+        **{field: np.full(count, 1.5, dtype=np.float32) for field in TELEMETRY_METRIC_FIELDS},
+    }
+
+
+def test_rewriting_a_day_never_leaves_it_missing(archive, monkeypatch):
+    archive.write_day("HW-1", DAY, _columns(3))
+    rename = os.rename
+    visible = []
+
+    def _rename(src, dst):
+        visible.append(archive.open_day("HW-1", DAY) is not None)
+        rename(src, dst)
+
+    monkeypatch.setattr(os, "rename", _rename)
+    assert archive.write_day("HW-1", DAY, _columns(2, offset=10)) == 5
+
+    assert visible and all(visible)
+    assert archive.list_days("HW-1") == [DAY]
+    assert len(os.listdir(archive.device_path("HW-1"))) == 1 # La versión anterior se borró
+
+
+def test_open_day_does_not_mix_columns_of_two_versions(archive, monkeypatch):
+    archive.write_day("HW-1", DAY, _columns(3))
+    load = np.load
+    calls = []
+
+    def _load(path, *args, **kwargs):
+        calls.append(path)
+        if len(calls) == 2:
+            # Otra escritura publica una versión nueva mientras se abren las columnas
+            monkeypatch.setattr(archive_module.np, "load", load)
+            archive.write_day("HW-1", DAY, _columns(2, offset=10))
+            monkeypatch.setattr(archive_module.np, "load", _load)
+        return load(path, *args, **kwargs)
+
+    monkeypatch.setattr(archive_module.np, "load", _load)
+    archived = archive.open_day("HW-1", DAY)
+
+    assert {len(column) for column in archived.columns.values()} == {5}
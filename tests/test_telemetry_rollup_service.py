@@ -0,0 +1,49 @@
+# tests/test_telemetry_rollup_service.py
+import numpy as np
+import pytest
+
+from app.services.telemetry_rollup_service import lttb_indices
+
+
+def _reference_lttb(x, y, threshold):
+    """LTTB tal como lo describe Steinarsson (2013), punto a punto."""
+    n = len(x)
+    middle = threshold - 2
+    selected, anchor = [0], 0
+    for bucket in range(middle):
+        lo, hi = bucket * (n - 2) // middle + 1, (bucket + 1) * (n - 2) // middle + 1
+        next_hi = min((bucket + 2) * (n - 2) // middle + 1, n)
+        next_lo = hi if bucket < middle - 1 else n - 1
+        next_x = sum(x[next_lo:next_hi]) / (next_hi - next_lo)
+        next_y = sum(y[next_lo:next_hi]) / (next_hi - next_lo)
+        areas = [abs((x[anchor] - next_x) * (y[i] - y[anchor]) - (x[anchor] - x[i]) * (next_y - y[anchor]))
+                 for i in range(lo, hi)]
+        anchor = lo + areas.index(max(areas))
+        selected.append(anchor)
+    return selected + [n - 1]
+
+
+def test_lttb_keeps_the_peaks():
+    x = np.arange(10, dtype=np.float64)
+    y = np.array([0, 0, 0, 10, 0, 0, 0, -10, 0, 0], dtype=np.float64)
+
+    assert lttb_indices(x, y, 4).tolist() == [0, 3, 7, 9]
+
+
+@pytest.mark.parametrize("n, threshold", [(1000, 50), (101, 3), (37, 36), (500, 499)])
+def test_lttb_matches_the_reference_algorithm(n, threshold):
+    rng = np.random.default_rng(n)
+    x = np.cumsum(rng.uniform(0.5, 2.0, n))
+    y = rng.normal(size=n)
+
+    indices = lttb_indices(x, y, threshold)
+
+    assert indices.tolist() == _reference_lttb(x.tolist(), y.tolist(), threshold)
+    assert np.all(np.diff(indices) > 0)
+
+
+@pytest.mark.parametrize("threshold, expected", [(0, []), (1, [0]), (2, [0, 9]), (10, list(range(10))), (50, list(range(10)))])
+def test_lttb_small_thresholds_and_short_series(threshold, expected):
+    x = np.arange(10, dtype=np.float64)
+
+    assert lttb_indices(x, np.sin(x), threshold).tolist() == expected